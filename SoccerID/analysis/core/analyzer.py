@@ -166,7 +166,11 @@ def combined_analysis_optimized(input_path: str, output_path: str, **kwargs):
         if kwargs.get('export_csv', True):
             csv_exporter = CSVExporter()
             csv_path = output_path.replace('.mp4', '_tracking_data.csv')
-            csv_exporter.initialize_csv(csv_path)
+            csv_exporter.initialize_csv(csv_path, metadata={
+                'fps': video_processor.fps,
+                'width': video_processor.width,
+                'height': video_processor.height
+            })
         
         metadata_exporter = None
         if kwargs.get('export_metadata', True):
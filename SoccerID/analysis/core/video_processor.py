@@ -9,7 +9,8 @@ from typing import Optional, Tuple, Dict, Any, List
 import os
 import sys
 import threading
-from queue import Queue
+import time
+from queue import Queue, Empty, Full
 from collections import deque
 
 # Try new structure imports first, fallback to legacy
@@ -36,6 +37,9 @@ logger = get_logger("video_processor")
 class VideoProcessor:
     """Handles video processing operations with caching and background loading"""
     
+    # Forward gaps up to this many frames are skipped with grab() instead of a keyframe seek
+    MAX_GRAB_SKIP = 30
+    
     def __init__(self, video_path: str, 
                  enable_caching: bool = True,
                  cache_size_mb: int = 512,
@@ -67,12 +71,34 @@ class VideoProcessor:
             self.cache = None
         
         # Prefetching
+        # The prefetch worker decodes sequentially on its own capture and hands frames out
+        # in order through prefetch_queue. It only seeks when read_frame() requests a frame
+        # that is not next in its stream (a real discontinuity).
         self.enable_prefetch = enable_prefetch
-        self.prefetch_buffer = prefetch_buffer
-        self.prefetch_queue = Queue(maxsize=prefetch_buffer * 2)
+        self.prefetch_buffer = max(1, prefetch_buffer)
+        self.prefetch_queue = Queue(maxsize=self.prefetch_buffer)
         self.prefetch_thread = None
         self.prefetch_stop = threading.Event()
         self.current_read_position = 0
+        self._prefetch_lock = threading.Lock()
+        self._prefetch_generation = 0  # Bumped on every restart; stale queued frames are dropped
+        self._prefetch_restart_at: Optional[int] = None
+        self._prefetch_next = 0  # Next frame number the consumer expects from the prefetch stream
+        self._prefetch_ended = False
+        self._cap_position = 0  # Next frame self.cap will return without seeking
+        
+        # Throughput counters
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            'frames_decoded': 0,
+            'decode_seconds': 0.0,
+            'seeks': 0,
+            'frames_skipped': 0,
+            'prefetch_hits': 0,
+            'direct_reads': 0,
+            'cache_hits': 0,
+            'max_queue_depth': 0,
+        }
         
         self._open_video()
         
@@ -94,6 +120,7 @@ class VideoProcessor:
             height_val = self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)
             self.width = int(width_val) if width_val and not np.isnan(width_val) else 0
             self.height = int(height_val) if height_val and not np.isnan(height_val) else 0
+            self._cap_position = 0
             
             logger.info(f"Opened video: {self.video_path}")
             logger.info(f"Properties: {self.width}x{self.height} @ {self.fps:.2f} fps, {self.total_frames} frames")
@@ -102,6 +129,113 @@ class VideoProcessor:
             logger.error(f"Error opening video: {e}", exc_info=True)
             raise
     
+    def _count(self, key: str, amount=1):
+        with self._stats_lock:
+            self.stats[key] += amount
+    
+    def _decode_next(self, cap) -> Tuple[bool, Optional[np.ndarray]]:
+        """Decode the next frame from cap, updating throughput counters"""
+        decode_start = time.perf_counter()
+        ret, frame = cap.read()
+        elapsed = time.perf_counter() - decode_start
+        with self._stats_lock:
+            self.stats['decode_seconds'] += elapsed
+            if ret:
+                self.stats['frames_decoded'] += 1
+        return ret, frame
+    
+    def _position_capture(self, cap, current_position: int, target_frame: int) -> int:
+        """
+        Move cap so its next read returns target_frame.
+        
+        Sequential reads need nothing, short forward gaps are skipped with grab()
+        (no keyframe seek), and only backward jumps or long gaps seek.
+        
+        Returns:
+            The new position of cap
+        """
+        gap = target_frame - current_position
+        if gap == 0:
+            return current_position
+        if current_position >= 0 and 0 < gap <= self.MAX_GRAB_SKIP:
+            for _ in range(gap):
+                if not cap.grab():
+                    break
+            self._count('frames_skipped', gap)
+            return target_frame
+        cap.set(cv2.CAP_PROP_POS_FRAMES, target_frame)
+        self._count('seeks')
+        return target_frame
+    
+    def _cache_frame(self, frame_num: int, frame: np.ndarray):
+        """Store a decoded frame in the frame cache"""
+        if self.enable_caching and frame is not None:
+            try:
+                frame_size = frame.nbytes if hasattr(frame, 'nbytes') else sys.getsizeof(frame)
+                self.cache.put(f"frame_{frame_num}", frame.copy(), frame_size)
+            except:
+                pass
+    
+    def _read_direct(self, target_frame: int) -> Optional[np.ndarray]:
+        """Read target_frame from the main capture (seeking only on a discontinuity)"""
+        self._cap_position = self._position_capture(self.cap, self._cap_position, target_frame)
+        ret, frame = self._decode_next(self.cap)
+        if not ret:
+            # Position is unknown after a failed read - force a seek next time
+            self._cap_position = -1
+            return None
+        self._cap_position = target_frame + 1
+        self._count('direct_reads')
+        return frame
+    
+    def _read_prefetched(self, target_frame: int) -> Optional[np.ndarray]:
+        """
+        Take target_frame from the prefetch stream.
+        
+        Frames slightly behind the requested one (within the prefetch window) are drained;
+        anything else restarts the prefetch stream at the requested frame.
+        
+        Returns:
+            Frame, or None at end of video / if the prefetch worker is not running
+        """
+        if not (target_frame >= self._prefetch_next and
+                target_frame - self._prefetch_next <= self.prefetch_buffer):
+            self._restart_prefetch(target_frame)
+        
+        while True:
+            if self.prefetch_thread is None or not self.prefetch_thread.is_alive():
+                return None
+            try:
+                generation, frame_num, frame = self.prefetch_queue.get(timeout=0.5)
+            except Empty:
+                continue
+            if generation != self._prefetch_generation:
+                continue  # Decoded before the last restart
+            if frame is None:
+                # End of video
+                self._prefetch_ended = True
+                self._prefetch_next = frame_num
+                return None
+            self._prefetch_next = frame_num + 1
+            if frame_num < target_frame:
+                continue
+            self._count('prefetch_hits')
+            return frame
+    
+    def _restart_prefetch(self, start_frame: int):
+        """Point the prefetch worker at start_frame (one seek)"""
+        with self._prefetch_lock:
+            self._prefetch_generation += 1
+            self._prefetch_restart_at = start_frame
+        self._prefetch_next = start_frame
+        self._prefetch_ended = False
+        # Drop frames from the previous position so the worker isn't blocked on a full queue
+        while True:
+            try:
+                self.prefetch_queue.get_nowait()
+            except Empty:
+                break
+    
     def read_frame(self, frame_num: Optional[int] = None) -> Optional[Tuple[np.ndarray, int]]:
         """
         Read a frame from video (with caching and prefetching)
@@ -129,30 +263,29 @@ class VideoProcessor:
                 if cached_frame is not None:
                     self.frame_count = target_frame
                     self.current_read_position = target_frame + 1
+                    self._count('cache_hits')
                     return (cached_frame, target_frame)
             
-            # Read from video
-            if frame_num is not None:
-                self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_num)
-            
-            ret, frame = self.cap.read()
-            if ret:
-                current_frame = int(self.cap.get(cv2.CAP_PROP_POS_FRAMES)) - 1
-                self.frame_count = current_frame
-                self.current_read_position = current_frame + 1
-                
-                # Cache frame
-                if self.enable_caching and frame is not None:
-                    try:
-                        import sys
-                        frame_size = frame.nbytes if hasattr(frame, 'nbytes') else sys.getsizeof(frame)
-                        self.cache.put(f"frame_{current_frame}", frame.copy(), frame_size)
-                    except:
-                        pass
-                
-                return (frame, current_frame)
+            # Sequential reads (and short forward gaps) come from the prefetch stream;
+            # random access goes straight to the main capture
+            sequential = (frame_num is None or frame_num == self.current_read_position)
+            if self.enable_prefetch and self.prefetch_thread is not None and sequential:
+                if self._prefetch_ended and target_frame >= self._prefetch_next:
+                    return None
+                frame = self._read_prefetched(target_frame)
+                if frame is None and not self._prefetch_ended:
+                    # Prefetch worker stopped unexpectedly - fall back to the main capture
+                    frame = self._read_direct(target_frame)
             else:
+                frame = self._read_direct(target_frame)
+            
+            if frame is None:
                 return None
+            
+            self.frame_count = target_frame
+            self.current_read_position = target_frame + 1
+            self._cache_frame(target_frame, frame)
+            return (frame, target_frame)
                 
         except Exception as e:
             logger.error(f"Error reading frame: {e}", exc_info=True)
@@ -185,29 +318,22 @@ class VideoProcessor:
                 cached_frame = self.cache.get(cache_key)
                 if cached_frame is not None:
                     cached_frames[frame_num] = (cached_frame, frame_num)
+                    self._count('cache_hits')
                 else:
                     uncached_frames.append(frame_num)
             else:
                 uncached_frames.append(frame_num)
         
         # Read uncached frames sequentially (more efficient than random access)
+        # OPTIMIZATION: Only seek on real discontinuities - consecutive frames are read
+        # straight through and short gaps are skipped with grab()
         if uncached_frames and self.cap:
             try:
-                # Read frames in order
                 for frame_num in uncached_frames:
-                    self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_num)
-                    ret, frame = self.cap.read()
-                    if ret:
-                        current_frame = int(self.cap.get(cv2.CAP_PROP_POS_FRAMES)) - 1
-                        results[current_frame] = (frame, current_frame)
-                        
-                        # Cache frame
-                        if self.enable_caching:
-                            try:
-                                frame_size = frame.nbytes if hasattr(frame, 'nbytes') else sys.getsizeof(frame)
-                                self.cache.put(f"frame_{current_frame}", frame.copy(), frame_size)
-                            except:
-                                pass
+                    frame = self._read_direct(frame_num)
+                    if frame is not None:
+                        results[frame_num] = (frame, frame_num)
+                        self._cache_frame(frame_num, frame)
             except Exception as e:
                 logger.warning(f"Batch read error: {e}")
         
@@ -224,40 +350,56 @@ class VideoProcessor:
         if not self.enable_prefetch:
             return
         
-        def prefetch_worker():
-            """Background worker to prefetch frames"""
-            prefetch_cap = cv2.VideoCapture(self.video_path)
-            if not prefetch_cap.isOpened():
-                return
-            
-            prefetch_position = 0
-            
+        prefetch_cap = cv2.VideoCapture(self.video_path)
+        if not prefetch_cap.isOpened():
+            logger.warning("Could not open prefetch capture - reading frames directly")
+            return
+        
+        def put_frame(item) -> bool:
+            """Blocking put that gives up on stop or restart"""
             while not self.prefetch_stop.is_set():
+                if item[0] != self._prefetch_generation:
+                    return False
                 try:
-                    # Check if we need to prefetch
-                    if self.prefetch_queue.qsize() < self.prefetch_buffer:
-                        # Prefetch next frame
-                        prefetch_cap.set(cv2.CAP_PROP_POS_FRAMES, prefetch_position)
-                        ret, frame = prefetch_cap.read()
-                        
-                        if ret:
-                            # Try to add to queue (non-blocking)
-                            try:
-                                self.prefetch_queue.put_nowait((prefetch_position, frame))
-                                prefetch_position += 1
-                            except:
-                                pass  # Queue full, skip
-                        else:
-                            # End of video
-                            break
-                    else:
-                        # Queue is full, wait a bit
-                        self.prefetch_stop.wait(0.1)
-                except Exception as e:
-                    logger.warning(f"Prefetch error: {e}")
-                    break
+                    self.prefetch_queue.put(item, timeout=0.1)
+                    depth = self.prefetch_queue.qsize()
+                    with self._stats_lock:
+                        if depth > self.stats['max_queue_depth']:
+                            self.stats['max_queue_depth'] = depth
+                    return True
+                except Full:
+                    continue
+            return False
+        
+        def prefetch_worker():
+            """Background worker that decodes frames sequentially"""
+            prefetch_position = 0
             
-            prefetch_cap.release()
+            try:
+                while not self.prefetch_stop.is_set():
+                    with self._prefetch_lock:
+                        generation = self._prefetch_generation
+                        restart_at = self._prefetch_restart_at
+                        self._prefetch_restart_at = None
+                    if restart_at is not None:
+                        prefetch_position = self._position_capture(prefetch_cap, prefetch_position, restart_at)
+                    
+                    ret, frame = self._decode_next(prefetch_cap)
+                    if not ret:
+                        # End of video - wait for a restart (or stop)
+                        put_frame((generation, prefetch_position, None))
+                        while (not self.prefetch_stop.is_set() and
+                               generation == self._prefetch_generation):
+                            self.prefetch_stop.wait(0.05)
+                        prefetch_position = -1  # Unknown after a failed read
+                        continue
+                    
+                    put_frame((generation, prefetch_position, frame))
+                    prefetch_position += 1
+            except Exception as e:
+                logger.warning(f"Prefetch error: {e}")
+            finally:
+                prefetch_cap.release()
         
         self.prefetch_thread = threading.Thread(target=prefetch_worker, daemon=True)
         self.prefetch_thread.start()
@@ -304,6 +446,16 @@ class VideoProcessor:
             return self.cache.get_stats()
         return None
     
+    def get_stats(self) -> Dict[str, Any]:
+        """Get decode throughput and prefetch queue statistics"""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        decode_seconds = stats['decode_seconds']
+        stats['decode_fps'] = stats['frames_decoded'] / decode_seconds if decode_seconds > 0 else 0.0
+        stats['queue_depth'] = self.prefetch_queue.qsize()
+        stats['queue_capacity'] = self.prefetch_buffer
+        return stats
+    
     def __enter__(self):
         """Context manager entry"""
         return self
@@ -311,4 +463,3 @@ class VideoProcessor:
     def __exit__(self, exc_type, exc_val, exc_tb):
         """Context manager exit"""
         self.close()
-
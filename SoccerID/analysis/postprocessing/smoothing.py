@@ -24,10 +24,10 @@ logger = get_logger("smoothing")
 
 # GSI smoothing import
 try:
-    from gsi_smoothing import apply_gsi_realtime, SKLEARN_AVAILABLE as GSI_AVAILABLE
+    from gsi_smoothing import apply_gsi_realtime, GSI_AVAILABLE
 except ImportError:
     GSI_AVAILABLE = False
-    logger.warning("GSI smoothing not available. Install sklearn: pip install scikit-learn")
+    logger.warning("GSI smoothing not available (gsi_smoothing.py not found)")
 
 
 class SmoothingProcessor:
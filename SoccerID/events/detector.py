@@ -11,6 +11,12 @@ from dataclasses import dataclass, asdict
 from collections import deque
 import os
 
+try:
+    from tracking_data_io import load_tracking_data
+    TRACKING_DATA_IO_AVAILABLE = True
+except ImportError:
+    TRACKING_DATA_IO_AVAILABLE = False
+
 @dataclass
 class DetectedEvent:
     """Represents a detected game event"""
@@ -40,37 +46,40 @@ class EventDetector:
         self.events: List[DetectedEvent] = []
         self.frame_width = None
         self.frame_height = None
+        self._frame_index = None  # Built lazily by _build_frame_index()
         
     def load_tracking_data(self):
         """Load tracking data from CSV"""
         try:
-            # Read CSV, skipping comment lines
-            self.df = pd.read_csv(self.csv_path, comment='#')
-            
-            # Try to extract FPS from comment lines if available
-            try:
-                with open(self.csv_path, 'r') as f:
-                    for line in f:
-                        if line.startswith('# Video FPS:'):
-                            fps_str = line.split(':')[1].strip()
-                            self.fps = float(fps_str)
-                            break
-            except:
-                pass
+            # Read CSV, skipping comment lines (typed sidecar is used when current)
+            if TRACKING_DATA_IO_AVAILABLE:
+                self.df = load_tracking_data(self.csv_path)
+            else:
+                self.df = pd.read_csv(self.csv_path, comment='#')
+            self._frame_index = None
             
-            # Try to extract resolution from comment lines
-            try:
-                with open(self.csv_path, 'r') as f:
-                    for line in f:
-                        if line.startswith('# Video Resolution:'):
-                            res_str = line.split(':')[1].strip()
-                            if 'x' in res_str:
-                                w, h = res_str.split('x')
-                                self.frame_width = int(w.strip())
-                                self.frame_height = int(h.strip())
-                            break
-            except:
-                pass
+            # Try to extract FPS and resolution from file metadata / comment lines if available
+            # (metadata is only at the top of the file - don't scan every row looking for it)
+            metadata = self.df.attrs.get('tracking_metadata', {})
+            if not metadata:
+                try:
+                    with open(self.csv_path, 'r') as f:
+                        for _, line in zip(range(64), f):
+                            if line.startswith('# Video FPS:'):
+                                metadata['fps'] = float(line.split(':')[1].strip())
+                            elif line.startswith('# Video Resolution:'):
+                                res_str = line.split(':')[1].strip()
+                                if 'x' in res_str:
+                                    w, h = res_str.split('x')
+                                    metadata['width'] = int(w.strip())
+                                    metadata['height'] = int(h.strip().split()[0])
+                except:
+                    pass
+            if metadata.get('fps'):
+                self.fps = float(metadata['fps'])
+            if metadata.get('width') and metadata.get('height'):
+                self.frame_width = int(metadata['width'])
+                self.frame_height = int(metadata['height'])
             
             print(f"✓ Loaded {len(self.df)} rows of tracking data")
             print(f"  → FPS: {self.fps:.2f}")
@@ -91,196 +100,214 @@ class EventDetector:
             traceback.print_exc()
             return False
     
+    def _build_frame_index(self) -> Dict:
+        """
+        Build (once per loaded CSV) a sorted frame index with dense ball and player arrays.
+        
+        OPTIMIZATION: Replaces per-frame boolean filtering of self.df (O(frames x rows))
+        with searchsorted lookups into arrays sorted by frame.
+        
+        Returns dict with:
+            frames: sorted unique frame numbers
+            ball_x, ball_y: ball position per frame (first row of the frame, NaN if missing)
+            ball_rows: (frame, x, y) arrays of every row with a ball position, in file order
+            player_*: valid player rows (id and position present) sorted by frame; a player
+                      listed twice in one frame keeps the last row
+        """
+        if self._frame_index is not None:
+            return self._frame_index
+        
+        df = self.df
+        n = len(df)
+        
+        def float_column(name):
+            if name in df.columns:
+                return pd.to_numeric(df[name], errors='coerce').to_numpy(dtype=np.float64)
+            return np.full(n, np.nan)
+        
+        def object_column(name):
+            if name in df.columns:
+                values = df[name].to_numpy(dtype=object)
+                return np.where(pd.isna(values), None, values)
+            return np.full(n, None, dtype=object)
+        
+        frame_values = float_column('frame')
+        has_frame = ~np.isnan(frame_values)
+        rows = np.nonzero(has_frame)[0]
+        order = rows[np.argsort(frame_values[rows], kind='stable')]  # Frame order, file order within a frame
+        sorted_frames = frame_values[order].astype(np.int64)
+        frames, first_rows = np.unique(sorted_frames, return_index=True)
+        
+        ball_x = float_column('ball_x')
+        ball_y = float_column('ball_y')
+        ball_mask = has_frame & ~np.isnan(ball_x) & ~np.isnan(ball_y)
+        
+        player_id = float_column('player_id')
+        player_x = float_column('player_x')
+        player_y = float_column('player_y')
+        valid = has_frame & ~np.isnan(player_id) & ~np.isnan(player_x) & ~np.isnan(player_y)
+        player_rows = order[valid[order]]
+        
+        # Duplicate player in a frame: last row's values at the first row's position
+        # (same as filling a dict row by row)
+        keys = pd.DataFrame({'frame': frame_values[player_rows],
+                             'player_id': player_id[player_rows].astype(np.int64)})
+        duplicated = keys.duplicated(keep='last').to_numpy()
+        if duplicated.any():
+            group = keys.groupby(['frame', 'player_id'], sort=False).ngroup().to_numpy()
+            kept = np.nonzero(~duplicated)[0]
+            kept = kept[np.argsort(group[kept], kind='stable')]
+            player_rows = player_rows[kept]
+        
+        player_frame = frame_values[player_rows].astype(np.int64)
+        self._frame_index = {
+            'frames': frames,
+            'ball_x': ball_x[order[first_rows]],
+            'ball_y': ball_y[order[first_rows]],
+            'ball_rows': (frame_values[ball_mask].astype(np.int64), ball_x[ball_mask], ball_y[ball_mask]),
+            'player_frame': player_frame,
+            'player_slot': np.searchsorted(frames, player_frame),
+            'player_id': player_id[player_rows].astype(np.int64),
+            'player_x': player_x[player_rows],
+            'player_y': player_y[player_rows],
+            'player_name': object_column('player_name')[player_rows],
+            'player_team': object_column('team')[player_rows],
+        }
+        return self._frame_index
+    
     def _get_ball_positions(self) -> List[Tuple[int, float, float]]:
         """Get list of (frame, x, y) ball positions"""
-        ball_positions = []
-        for idx, row in self.df.iterrows():
-            frame = int(row['frame'])
-            ball_x = row.get('ball_x')
-            ball_y = row.get('ball_y')
-            
-            if pd.notna(ball_x) and pd.notna(ball_y):
-                ball_positions.append((frame, float(ball_x), float(ball_y)))
-        
-        return ball_positions
+        frames, xs, ys = self._build_frame_index()['ball_rows']
+        return list(zip(frames.tolist(), xs.tolist(), ys.tolist()))
+    
+    def _player_slice(self, frame_num: int) -> Tuple[int, int]:
+        """Index range of a frame's rows in the frame-sorted player arrays"""
+        player_frame = self._build_frame_index()['player_frame']
+        return (int(np.searchsorted(player_frame, frame_num, side='left')),
+                int(np.searchsorted(player_frame, frame_num, side='right')))
     
     def _get_player_positions_by_frame(self, frame_num: int) -> Dict[int, Dict]:
         """Get all player positions for a specific frame"""
-        frame_data = self.df[self.df['frame'] == frame_num]
+        index = self._build_frame_index()
+        lo, hi = self._player_slice(frame_num)
         players = {}
-        
-        for idx, row in frame_data.iterrows():
-            player_id = row.get('player_id')
-            if pd.isna(player_id):
-                continue
-            
-            player_id = int(player_id)
-            player_x = row.get('player_x')
-            player_y = row.get('player_y')
-            player_name = row.get('player_name')
-            team = row.get('team')
-            
-            if pd.notna(player_x) and pd.notna(player_y):
-                players[player_id] = {
-                    'x': float(player_x),
-                    'y': float(player_y),
-                    'name': player_name if pd.notna(player_name) else None,
-                    'team': team if pd.notna(team) else None
-                }
-        
+        for k in range(lo, hi):
+            players[int(index['player_id'][k])] = {
+                'x': float(index['player_x'][k]),
+                'y': float(index['player_y'][k]),
+                'name': index['player_name'][k],
+                'team': index['player_team'][k]
+            }
         return players
     
+    def _get_closest_player(self, frame_num: int, x: float, y: float) -> Optional[Dict]:
+        """Closest player to (x, y) in a frame (first listed wins ties), or None"""
+        index = self._build_frame_index()
+        lo, hi = self._player_slice(frame_num)
+        if hi <= lo:
+            return None
+        dists = np.sqrt((x - index['player_x'][lo:hi])**2 + (y - index['player_y'][lo:hi])**2)
+        k = lo + int(np.argmin(dists))
+        return {
+            'player_id': int(index['player_id'][k]),
+            'player_name': index['player_name'][k],
+            'team': index['player_team'][k]
+        }
+    
     def _find_possession_windows(self, possession_threshold: float = 1.5) -> List[Dict]:
         """
         Find time windows where ball is in possession of a player.
         Returns list of dicts with player_id, start_frame, end_frame, positions.
         """
+        index = self._build_frame_index()
+        frames = index['frames']
+        num_frames = len(frames)
+        if num_frames == 0:
+            return []
+        
+        # OPTIMIZATION: Ball-to-player distances for every player row at once
+        slots = index['player_slot']
+        dist = np.sqrt((index['ball_x'][slots] - index['player_x'])**2 +
+                       (index['ball_y'][slots] - index['player_y'])**2)
+        
+        # Calculate distance in pixels (assuming coordinates are in pixels)
+        if self.frame_width and self.frame_height:
+            # Normalize to percentage of frame diagonal, then approximate meters
+            # (assuming ~100m field diagonal in frame - would need field calibration for accuracy)
+            frame_diagonal = np.sqrt(self.frame_width**2 + self.frame_height**2)
+            dist_meters = dist / frame_diagonal * 100.0
+        else:
+            # Fallback: assume ~100 pixels = 1 meter (rough estimate)
+            dist_meters = dist / 100.0
+        
+        # Closest player within the threshold per frame (NaN ball distances never qualify)
+        candidates = np.nonzero(dist_meters < possession_threshold)[0]
+        order = np.lexsort((candidates, dist[candidates], slots[candidates]))
+        candidates = candidates[order]
+        owner_slots, first = np.unique(slots[candidates], return_index=True)
+        owner_row = np.full(num_frames, -1, dtype=np.int64)
+        owner_row[owner_slots] = candidates[first]
+        
+        # Owner per frame: player id, -1 = nobody close, -2 = no ball position
+        owner = np.full(num_frames, -1, dtype=np.int64)
+        has_owner = owner_row >= 0
+        owner[has_owner] = index['player_id'][owner_row[has_owner]]
+        owner[np.isnan(index['ball_x']) | np.isnan(index['ball_y'])] = -2
+        
+        # Runs of consecutive frames with the same owner
+        run_starts = np.nonzero((owner >= 0) & np.r_[True, owner[1:] != owner[:-1]])[0]
+        change_points = np.nonzero(np.r_[owner[1:] != owner[:-1], True])[0]
+        run_ends = change_points[np.searchsorted(change_points, run_starts)]
+        
         windows = []
-        current_window = None
-        
-        # Get unique frames
-        unique_frames = sorted(self.df['frame'].unique())
-        
-        for frame_num in unique_frames:
-            # Get ball position
-            ball_row = self.df[self.df['frame'] == frame_num].iloc[0] if len(self.df[self.df['frame'] == frame_num]) > 0 else None
-            if ball_row is None:
-                if current_window:
-                    windows.append(current_window)
-                    current_window = None
-                continue
-            
-            ball_x = ball_row.get('ball_x')
-            ball_y = ball_row.get('ball_y')
-            
-            if pd.isna(ball_x) or pd.isna(ball_y):
-                if current_window:
-                    windows.append(current_window)
-                    current_window = None
+        for start, end in zip(run_starts.tolist(), run_ends.tolist()):
+            length = end - start + 1
+            # Windows need at least 3 frames, unless the ball position was lost right after
+            ball_lost_next = end + 1 < num_frames and owner[end + 1] == -2
+            if length < 3 and not ball_lost_next:
                 continue
-            
-            # Find closest player
-            players = self._get_player_positions_by_frame(frame_num)
-            closest_player = None
-            min_dist = float('inf')
-            
-            # Calculate distance in pixels (assuming coordinates are in pixels)
-            # If normalized, we'd need to multiply by frame dimensions
-            for player_id, player_data in players.items():
-                dx = ball_x - player_data['x']
-                dy = ball_y - player_data['y']
-                dist = np.sqrt(dx**2 + dy**2)
-                
-                # Normalize distance if we have frame dimensions
-                if self.frame_width and self.frame_height:
-                    # Normalize to percentage of frame diagonal
-                    frame_diagonal = np.sqrt(self.frame_width**2 + self.frame_height**2)
-                    dist_normalized = dist / frame_diagonal
-                    # Convert to approximate meters (assuming ~100m field diagonal in frame)
-                    # This is approximate - would need field calibration for accuracy
-                    dist_meters = dist_normalized * 100.0
-                else:
-                    # Fallback: assume ~100 pixels = 1 meter (rough estimate)
-                    dist_meters = dist / 100.0
-                
-                if dist_meters < possession_threshold and dist < min_dist:
-                    min_dist = dist
-                    closest_player = {
-                        'player_id': player_id,
-                        'player_name': player_data['name'],
-                        'team': player_data['team'],
-                        'x': player_data['x'],
-                        'y': player_data['y'],
-                        'distance': dist_meters
-                    }
-            
-            # Check if we have a possession window
-            if closest_player:
-                if current_window is None:
-                    # Start new window
-                    current_window = {
-                        'player_id': closest_player['player_id'],
-                        'player_name': closest_player['player_name'],
-                        'team': closest_player['team'],
-                        'start_frame': frame_num,
-                        'start_x': closest_player['x'],
-                        'start_y': closest_player['y'],
-                        'end_frame': frame_num,
-                        'end_x': closest_player['x'],
-                        'end_y': closest_player['y'],
-                        'frames': 1
-                    }
-                elif current_window['player_id'] == closest_player['player_id']:
-                    # Extend current window
-                    current_window['end_frame'] = frame_num
-                    current_window['end_x'] = closest_player['x']
-                    current_window['end_y'] = closest_player['y']
-                    current_window['frames'] += 1
-                else:
-                    # Different player - close current window and start new
-                    if current_window['frames'] >= 3:  # Only keep windows with at least 3 frames
-                        windows.append(current_window)
-                    current_window = {
-                        'player_id': closest_player['player_id'],
-                        'player_name': closest_player['player_name'],
-                        'team': closest_player['team'],
-                        'start_frame': frame_num,
-                        'start_x': closest_player['x'],
-                        'start_y': closest_player['y'],
-                        'end_frame': frame_num,
-                        'end_x': closest_player['x'],
-                        'end_y': closest_player['y'],
-                        'frames': 1
-                    }
-            else:
-                # No possession - close window if open
-                if current_window and current_window['frames'] >= 3:
-                    windows.append(current_window)
-                current_window = None
-        
-        if current_window and current_window['frames'] >= 3:
-            windows.append(current_window)
+            start_row = owner_row[start]
+            end_row = owner_row[end]
+            windows.append({
+                'player_id': int(owner[start]),
+                'player_name': index['player_name'][start_row],
+                'team': index['player_team'][start_row],
+                'start_frame': int(frames[start]),
+                'start_x': float(index['player_x'][start_row]),
+                'start_y': float(index['player_y'][start_row]),
+                'end_frame': int(frames[end]),
+                'end_x': float(index['player_x'][end_row]),
+                'end_y': float(index['player_y'][end_row]),
+                'frames': length
+            })
         
         return windows
     
     def _calculate_ball_speeds(self, start_frame: int, end_frame: int) -> List[float]:
         """Calculate ball speeds for frames between start and end"""
-        speeds = []
-        prev_pos = None
+        index = self._build_frame_index()
+        frames = index['frames']
+        lo = np.searchsorted(frames, start_frame, side='left')
+        hi = np.searchsorted(frames, end_frame, side='right')
+        xs = index['ball_x'][lo:hi]
+        ys = index['ball_y'][lo:hi]
+        valid = ~np.isnan(xs) & ~np.isnan(ys)
+        xs = xs[valid]
+        ys = ys[valid]
+        if len(xs) < 2:
+            return []
         
-        for frame in range(start_frame, end_frame + 1):
-            frame_data = self.df[self.df['frame'] == frame]
-            if len(frame_data) == 0:
-                continue
-            
-            row = frame_data.iloc[0]
-            ball_x = row.get('ball_x')
-            ball_y = row.get('ball_y')
-            
-            if pd.isna(ball_x) or pd.isna(ball_y):
-                continue
-            
-            if prev_pos:
-                dx = ball_x - prev_pos[0]
-                dy = ball_y - prev_pos[1]
-                dt = 1.0 / self.fps if self.fps > 0 else 1.0 / 30.0
-                
-                # Calculate distance in pixels
-                dist_pixels = np.sqrt(dx**2 + dy**2)
-                
-                # Convert to approximate m/s
-                # Rough estimate: if frame is 3840x2160 and field is ~100m, then ~38 pixels/meter
-                if self.frame_width:
-                    pixels_per_meter = self.frame_width / 100.0  # Rough estimate
-                else:
-                    pixels_per_meter = 38.0  # Default estimate
-                
-                speed_mps = (dist_pixels / pixels_per_meter) / dt
-                speeds.append(speed_mps)
-            
-            prev_pos = (ball_x, ball_y)
+        dt = 1.0 / self.fps if self.fps > 0 else 1.0 / 30.0
+        
+        # Convert to approximate m/s
+        # Rough estimate: if frame is 3840x2160 and field is ~100m, then ~38 pixels/meter
+        if self.frame_width:
+            pixels_per_meter = self.frame_width / 100.0  # Rough estimate
+        else:
+            pixels_per_meter = 38.0  # Default estimate
         
-        return speeds
+        dist_pixels = np.sqrt(np.diff(xs)**2 + np.diff(ys)**2)
+        return ((dist_pixels / pixels_per_meter) / dt).tolist()
     
     def _calculate_pass_confidence(self, window1: Dict, window2: Dict, 
                                    ball_speeds: List[float], 
@@ -322,6 +349,48 @@ class EventDetector:
         
         return min(confidence, 1.0)
     
+    def _goal_membership(self, goal_pixel_areas: List[Dict], xs: np.ndarray, ys: np.ndarray,
+                         rectangle_prefilter: bool = True) -> np.ndarray:
+        """
+        Index of the first goal area containing each point (-1 = none).
+        
+        Args:
+            goal_pixel_areas: Goal areas in pixel coordinates (x1, y1, x2, y2, optional points)
+            xs, ys: Point coordinates
+            rectangle_prefilter: Require the bounding rectangle before the polygon test
+                                 (shot detection); otherwise only 'polygon' areas use the
+                                 polygon test and the rest use the rectangle (goal detection)
+        """
+        membership = np.full(len(xs), -1, dtype=np.int64)
+        for goal_order in reversed(range(len(goal_pixel_areas))):
+            goal_area = goal_pixel_areas[goal_order]
+            points = goal_area.get('points')
+            use_polygon = bool(points) and (rectangle_prefilter or goal_area.get('type') == 'polygon')
+            
+            if use_polygon:
+                if rectangle_prefilter:
+                    bounds = (goal_area['x1'], goal_area['y1'], goal_area['x2'], goal_area['y2'])
+                else:
+                    # Points outside the polygon's own bounding box can't be inside it
+                    bounds = (min(p[0] for p in points), min(p[1] for p in points),
+                              max(p[0] for p in points), max(p[1] for p in points))
+                inside = (bounds[0] <= xs) & (xs <= bounds[2]) & (bounds[1] <= ys) & (ys <= bounds[3])
+                
+                from goal_area_designator import GoalAreaDesignator
+                designator = GoalAreaDesignator("")
+                designator.goal_areas[goal_area['name']] = {
+                    'type': 'polygon',
+                    'points': points
+                }
+                for k in np.nonzero(inside)[0]:
+                    inside[k] = designator.is_point_in_goal(float(xs[k]), float(ys[k]), goal_area['name'])
+            else:
+                # Rectangle check
+                inside = ((goal_area['x1'] <= xs) & (xs <= goal_area['x2']) &
+                          (goal_area['y1'] <= ys) & (ys <= goal_area['y2']))
+            membership[inside] = goal_order
+        return membership
+    
     def detect_passes(self, 
                      min_ball_speed: float = 3.0,  # m/s
                      max_pass_duration: float = 2.0,  # seconds
@@ -499,9 +568,10 @@ class EventDetector:
         print(f"    Min approach distance: {min_approach_distance} m")
         
         shots = []
-        ball_positions = self._get_ball_positions()
+        ball_frames, ball_xs, ball_ys = self._build_frame_index()['ball_rows']
+        num_positions = len(ball_frames)
         
-        if len(ball_positions) < 10:
+        if num_positions < 10:
             print("  ⚠ Insufficient ball tracking data for shot detection")
             return []
         
@@ -530,103 +600,65 @@ class EventDetector:
             })
         
         # Look for ball moving fast toward goal
-        for i in range(len(ball_positions) - 5):
-            frame, ball_x, ball_y = ball_positions[i]
+        # OPTIMIZATION: Goal membership and approach speed for all ball positions at once
+        goal_index = self._goal_membership(goal_pixel_areas, ball_xs, ball_ys, rectangle_prefilter=True)
+        candidates = np.nonzero(goal_index[:max(num_positions - 5, 0)] >= 0)[0]
+        
+        # Look back ~1 second (30 positions) to find the approach
+        approach_start = np.maximum(candidates - 30, 0)
+        enough_history = (candidates - approach_start + 1) >= 5
+        candidates = candidates[enough_history]
+        approach_start = approach_start[enough_history]
+        
+        fps = self.fps if self.fps > 0 else 30.0
+        dt = (ball_frames[candidates] - ball_frames[approach_start]) / fps
+        moving = dt > 0
+        candidates, approach_start, dt = candidates[moving], approach_start[moving], dt[moving]
+        
+        # Convert to meters
+        if self.frame_width:
+            pixels_per_meter = self.frame_width / 100.0
+        else:
+            pixels_per_meter = 38.0
+        
+        dx = ball_xs[candidates] - ball_xs[approach_start]
+        dy = ball_ys[candidates] - ball_ys[approach_start]
+        dist_meters = np.sqrt(dx**2 + dy**2) / pixels_per_meter
+        speed_mps = dist_meters / dt
+        
+        # Check if approaching goal fast enough (and from far enough away)
+        is_shot = (speed_mps >= min_ball_speed) & (dist_meters >= min_approach_distance)
+        for k in np.nonzero(is_shot)[0]:
+            i = candidates[k]
+            start = approach_start[k]
+            frame = int(ball_frames[i])
+            ball_x, ball_y = float(ball_xs[i]), float(ball_ys[i])
+            current_goal = goal_pixel_areas[goal_index[i]]
             
-            # Check if ball is in any goal area
-            ball_in_goal = False
-            current_goal = None
-            for goal_area in goal_pixel_areas:
-                # Simple rectangle check
-                if goal_area['x1'] <= ball_x <= goal_area['x2'] and goal_area['y1'] <= ball_y <= goal_area['y2']:
-                    # If we have polygon points, do point-in-polygon test
-                    if goal_area.get('points'):
-                        from goal_area_designator import GoalAreaDesignator
-                        designator = GoalAreaDesignator("")
-                        designator.goal_areas[goal_area['name']] = {
-                            'type': 'polygon',
-                            'points': goal_area['points']
-                        }
-                        if designator.is_point_in_goal(ball_x, ball_y, goal_area['name']):
-                            ball_in_goal = True
-                            current_goal = goal_area
-                            break
-                    else:
-                        ball_in_goal = True
-                        current_goal = goal_area
-                        break
+            # Calculate confidence
+            confidence = min(float(speed_mps[k]) / 15.0, 1.0)  # 15 m/s = high confidence
             
-            if ball_in_goal and current_goal:
-                # Look back to find approach
-                approach_start_idx = max(0, i - 30)  # Look back ~1 second
-                approach_frames = ball_positions[approach_start_idx:i+1]
-                
-                if len(approach_frames) < 5:
-                    continue
-                
-                # Calculate approach speed
-                start_frame, start_x, start_y = approach_frames[0]
-                end_frame, end_x, end_y = approach_frames[-1]
-                
-                dx = end_x - start_x
-                dy = end_y - start_y
-                dt = (end_frame - start_frame) / self.fps if self.fps > 0 else (end_frame - start_frame) / 30.0
-                
-                if dt <= 0:
-                    continue
-                
-                # Convert to meters
-                if self.frame_width:
-                    pixels_per_meter = self.frame_width / 100.0
-                else:
-                    pixels_per_meter = 38.0
-                
-                dist_pixels = np.sqrt(dx**2 + dy**2)
-                dist_meters = dist_pixels / pixels_per_meter
-                speed_mps = dist_meters / dt
-                
-                # Check if approaching goal (moving toward goal area)
-                # Simple check: ball should be moving in direction of goal
-                if speed_mps >= min_ball_speed and dist_meters >= min_approach_distance:
-                    # Find closest player (likely shooter)
-                    players = self._get_player_positions_by_frame(frame)
-                    closest_player = None
-                    min_dist = float('inf')
-                    
-                    for player_id, player_data in players.items():
-                        dx_player = ball_x - player_data['x']
-                        dy_player = ball_y - player_data['y']
-                        dist = np.sqrt(dx_player**2 + dy_player**2)
-                        if dist < min_dist:
-                            min_dist = dist
-                            closest_player = {
-                                'player_id': player_id,
-                                'player_name': player_data['name'],
-                                'team': player_data['team']
-                            }
-                    
-                    # Calculate confidence
-                    confidence = min(speed_mps / 15.0, 1.0)  # 15 m/s = high confidence
-                    
-                    if confidence >= confidence_threshold:
-                        shot_event = DetectedEvent(
-                            event_type="shot",
-                            frame_num=frame,
-                            timestamp=frame / self.fps if self.fps > 0 else frame / 30.0,
-                            confidence=confidence,
-                            player_id=closest_player['player_id'] if closest_player else None,
-                            player_name=closest_player['player_name'] if closest_player else None,
-                            team=closest_player['team'] if closest_player else None,
-                            start_pos=(start_x, start_y),
-                            end_pos=(ball_x, ball_y),
-                            metadata={
-                                'ball_speed_mps': speed_mps,
-                                'approach_distance_m': dist_meters,
-                                'goal_area': current_goal['name'],
-                                'goal_bounds': (current_goal['x1'], current_goal['y1'], current_goal['x2'], current_goal['y2'])
-                            }
-                        )
-                        shots.append(shot_event)
+            if confidence >= confidence_threshold:
+                # Find closest player (likely shooter)
+                closest_player = self._get_closest_player(frame, ball_x, ball_y)
+                shot_event = DetectedEvent(
+                    event_type="shot",
+                    frame_num=frame,
+                    timestamp=frame / self.fps if self.fps > 0 else frame / 30.0,
+                    confidence=confidence,
+                    player_id=closest_player['player_id'] if closest_player else None,
+                    player_name=closest_player['player_name'] if closest_player else None,
+                    team=closest_player['team'] if closest_player else None,
+                    start_pos=(float(ball_xs[start]), float(ball_ys[start])),
+                    end_pos=(ball_x, ball_y),
+                    metadata={
+                        'ball_speed_mps': float(speed_mps[k]),
+                        'approach_distance_m': float(dist_meters[k]),
+                        'goal_area': current_goal['name'],
+                        'goal_bounds': (current_goal['x1'], current_goal['y1'], current_goal['x2'], current_goal['y2'])
+                    }
+                )
+                shots.append(shot_event)
         
         print(f"  ✓ Detected {len(shots)} shots (confidence >= {confidence_threshold})")
         return shots
@@ -683,9 +715,10 @@ class EventDetector:
         print(f"    Goal crossing frames: {goal_crossing_frames}")
         
         goals = []
-        ball_positions = self._get_ball_positions()
+        ball_frames, ball_xs, ball_ys = self._build_frame_index()['ball_rows']
+        num_positions = len(ball_frames)
         
-        if len(ball_positions) < goal_crossing_frames:
+        if num_positions < goal_crossing_frames:
             print("  ⚠ Insufficient ball tracking data for goal detection")
             return []
         
@@ -715,121 +748,74 @@ class EventDetector:
             })
         
         # Track ball crossing goal boundaries
-        prev_in_goal = {goal['name']: False for goal in goal_pixel_areas}
-        goal_sequence = {goal['name']: [] for goal in goal_pixel_areas}  # Track consecutive frames in goal
-        
-        for i in range(len(ball_positions)):
-            frame, ball_x, ball_y = ball_positions[i]
+        # OPTIMIZATION: Per-goal membership masks, then runs of consecutive positions in goal
+        if self.frame_width:
+            pixels_per_meter = self.frame_width / 100.0
+        else:
+            pixels_per_meter = 38.0
+        dt = 1.0 / self.fps if self.fps > 0 else 1.0 / 30.0
+        
+        candidates = []  # (exit position, goal order, event)
+        for goal_order, goal_area in enumerate(goal_pixel_areas):
+            in_goal = self._goal_membership([goal_area], ball_xs, ball_ys, rectangle_prefilter=False) >= 0
+            edges = np.diff(np.r_[False, in_goal, False].astype(np.int8))
+            run_starts = np.nonzero(edges == 1)[0]
+            run_exits = np.nonzero(edges == -1)[0]  # First position after the run
             
-            # Check which goal (if any) the ball is in
-            current_in_goal = {}
-            for goal_area in goal_pixel_areas:
-                in_goal = False
+            for entry, exit_pos in zip(run_starts.tolist(), run_exits.tolist()):
+                frames_in_goal = exit_pos - entry
+                # Only count once the ball has left the goal again
+                if exit_pos >= num_positions or frames_in_goal < goal_crossing_frames:
+                    continue
+                entry_frame = int(ball_frames[entry])
+                entry_x, entry_y = float(ball_xs[entry]), float(ball_ys[entry])
                 
-                # Check if point is in goal area
-                if goal_area.get('points') and goal_area['type'] == 'polygon':
-                    # Point-in-polygon test
-                    from goal_area_designator import GoalAreaDesignator
-                    designator = GoalAreaDesignator("")
-                    designator.goal_areas[goal_area['name']] = {
-                        'type': 'polygon',
-                        'points': goal_area['points']
-                    }
-                    in_goal = designator.is_point_in_goal(ball_x, ball_y, goal_area['name'])
-                else:
-                    # Rectangle check
-                    in_goal = (goal_area['x1'] <= ball_x <= goal_area['x2'] and 
-                              goal_area['y1'] <= ball_y <= goal_area['y2'])
+                # Find previous position (before entering goal)
+                prev_pos = None
+                for j in range(exit_pos - 1, -1, -1):
+                    if ball_frames[j] < entry_frame:
+                        prev_pos = (float(ball_xs[j]), float(ball_ys[j]))
+                        break
+                if not prev_pos:
+                    continue
                 
-                current_in_goal[goal_area['name']] = in_goal
+                # Calculate entry speed
+                dist_pixels = np.sqrt((entry_x - prev_pos[0])**2 + (entry_y - prev_pos[1])**2)
+                speed_mps = (dist_pixels / pixels_per_meter) / dt if dt > 0 else 0
+                if speed_mps < min_ball_speed:
+                    continue
                 
-                # Track consecutive frames in goal
-                if in_goal:
-                    goal_sequence[goal_area['name']].append((frame, ball_x, ball_y))
-                else:
-                    # Ball left goal - check if we had enough consecutive frames
-                    if len(goal_sequence[goal_area['name']]) >= goal_crossing_frames:
-                        # Potential goal - check if ball was moving when it entered
-                        entry_frame, entry_x, entry_y = goal_sequence[goal_area['name']][0]
-                        
-                        # Find previous position (before entering goal)
-                        prev_pos = None
-                        for j in range(i - 1, -1, -1):
-                            prev_frame, prev_x, prev_y = ball_positions[j]
-                            if prev_frame < entry_frame:
-                                prev_pos = (prev_x, prev_y)
-                                break
-                        
-                        if prev_pos:
-                            # Calculate entry speed
-                            dx = entry_x - prev_pos[0]
-                            dy = entry_y - prev_pos[1]
-                            dt = 1.0 / self.fps if self.fps > 0 else 1.0 / 30.0
-                            
-                            if self.frame_width:
-                                pixels_per_meter = self.frame_width / 100.0
-                            else:
-                                pixels_per_meter = 38.0
-                            
-                            dist_pixels = np.sqrt(dx**2 + dy**2)
-                            dist_meters = dist_pixels / pixels_per_meter
-                            speed_mps = dist_meters / dt if dt > 0 else 0
-                            
-                            if speed_mps >= min_ball_speed:
-                                # Find closest player (scorer)
-                                players = self._get_player_positions_by_frame(entry_frame)
-                                closest_player = None
-                                min_dist = float('inf')
-                                
-                                for player_id, player_data in players.items():
-                                    dx_player = entry_x - player_data['x']
-                                    dy_player = entry_y - player_data['y']
-                                    dist = np.sqrt(dx_player**2 + dy_player**2)
-                                    if dist < min_dist:
-                                        min_dist = dist
-                                        closest_player = {
-                                            'player_id': player_id,
-                                            'player_name': player_data['name'],
-                                            'team': player_data['team']
-                                        }
-                                
-                                # Calculate confidence based on speed and time in goal
-                                time_in_goal = len(goal_sequence[goal_area['name']]) / self.fps if self.fps > 0 else len(goal_sequence[goal_area['name']]) / 30.0
-                                speed_confidence = min(speed_mps / 10.0, 1.0)
-                                time_confidence = min(time_in_goal / 0.5, 1.0)  # 0.5s in goal = high confidence
-                                confidence = (speed_confidence * 0.6 + time_confidence * 0.4)
-                                
-                                if confidence >= confidence_threshold:
-                                    goal_event = DetectedEvent(
-                                        event_type="goal",
-                                        frame_num=entry_frame,
-                                        timestamp=entry_frame / self.fps if self.fps > 0 else entry_frame / 30.0,
-                                        confidence=confidence,
-                                        player_id=closest_player['player_id'] if closest_player else None,
-                                        player_name=closest_player['player_name'] if closest_player else None,
-                                        team=closest_player['team'] if closest_player else None,
-                                        start_pos=prev_pos,
-                                        end_pos=(entry_x, entry_y),
-                                        metadata={
-                                            'goal_area': goal_area['name'],
-                                            'ball_speed_mps': speed_mps,
-                                            'time_in_goal_s': time_in_goal,
-                                            'frames_in_goal': len(goal_sequence[goal_area['name']])
-                                        }
-                                    )
-                                    goals.append(goal_event)
-                    
-                    # Reset sequence
-                    goal_sequence[goal_area['name']] = []
-            
-            prev_in_goal = current_in_goal
+                # Calculate confidence based on speed and time in goal
+                time_in_goal = frames_in_goal / self.fps if self.fps > 0 else frames_in_goal / 30.0
+                speed_confidence = min(speed_mps / 10.0, 1.0)
+                time_confidence = min(time_in_goal / 0.5, 1.0)  # 0.5s in goal = high confidence
+                confidence = (speed_confidence * 0.6 + time_confidence * 0.4)
+                
+                if confidence >= confidence_threshold:
+                    # Find closest player (scorer)
+                    closest_player = self._get_closest_player(entry_frame, entry_x, entry_y)
+                    goal_event = DetectedEvent(
+                        event_type="goal",
+                        frame_num=entry_frame,
+                        timestamp=entry_frame / self.fps if self.fps > 0 else entry_frame / 30.0,
+                        confidence=confidence,
+                        player_id=closest_player['player_id'] if closest_player else None,
+                        player_name=closest_player['player_name'] if closest_player else None,
+                        team=closest_player['team'] if closest_player else None,
+                        start_pos=prev_pos,
+                        end_pos=(entry_x, entry_y),
+                        metadata={
+                            'goal_area': goal_area['name'],
+                            'ball_speed_mps': float(speed_mps),
+                            'time_in_goal_s': time_in_goal,
+                            'frames_in_goal': frames_in_goal
+                        }
+                    )
+                    candidates.append((exit_pos, goal_order, goal_event))
         
-        # Check for goals that are still in progress at end of video
-        for goal_area in goal_pixel_areas:
-            if len(goal_sequence[goal_area['name']]) >= goal_crossing_frames:
-                entry_frame, entry_x, entry_y = goal_sequence[goal_area['name']][0]
-                # Similar logic as above...
-                # (Could add this if needed, but usually goals are detected when ball exits)
+        # Report goals in the order the ball left the goal area
+        candidates.sort(key=lambda c: (c[0], c[1]))
+        goals = [goal_event for _, _, goal_event in candidates]
         
         print(f"  ✓ Detected {len(goals)} goals (confidence >= {confidence_threshold})")
         return goals
@@ -867,32 +853,35 @@ class EventDetector:
                 pixel_zones[zone_name] = (min_x, min_y, max_x, max_y)
         
         zone_stats = {}
-        unique_frames = sorted(self.df['frame'].unique())
-        
-        for frame_num in unique_frames:
-            timestamp = frame_num / self.fps if self.fps > 0 else frame_num / 30.0
-            players = self._get_player_positions_by_frame(frame_num)
-            
-            for player_id, player_data in players.items():
-                player_x = player_data['x']
-                player_y = player_data['y']
-                
-                # Determine which zone player is in
-                for zone_name, (min_x, min_y, max_x, max_y) in pixel_zones.items():
-                    if min_x <= player_x <= max_x and min_y <= player_y <= max_y:
-                        key = f"{player_id}_{zone_name}"
-                        if key not in zone_stats:
-                            zone_stats[key] = {
-                                'player_id': player_id,
-                                'player_name': player_data['name'],
-                                'team': player_data['team'],
-                                'zone': zone_name,
-                                'time': 0.0,
-                                'frames': 0
-                            }
-                        zone_stats[key]['time'] += 1.0 / self.fps if self.fps > 0 else 1.0 / 30.0
-                        zone_stats[key]['frames'] += 1
-                        break
+        index = self._build_frame_index()
+        unique_frames = index['frames']
+        
+        # OPTIMIZATION: First matching zone for every player row at once
+        player_x = index['player_x']
+        player_y = index['player_y']
+        zone_names = list(pixel_zones.keys())
+        zone_of = np.full(len(player_x), -1, dtype=np.int64)
+        for zone_order in reversed(range(len(zone_names))):
+            min_x, min_y, max_x, max_y = pixel_zones[zone_names[zone_order]]
+            in_zone = (min_x <= player_x) & (player_x <= max_x) & (min_y <= player_y) & (player_y <= max_y)
+            zone_of[in_zone] = zone_order
+        
+        rows = np.nonzero(zone_of >= 0)[0]
+        if len(rows) > 0:
+            keys = pd.DataFrame({'player_id': index['player_id'][rows], 'zone': zone_of[rows], 'row': rows})
+            grouped = keys.groupby(['player_id', 'zone'], sort=False)['row']
+            frame_time = 1.0 / self.fps if self.fps > 0 else 1.0 / 30.0
+            for (player_id, zone_order), first_row, count in zip(grouped.first().index, grouped.first().to_numpy(),
+                                                                grouped.size().to_numpy()):
+                zone_name = zone_names[zone_order]
+                zone_stats[f"{player_id}_{zone_name}"] = {
+                    'player_id': int(player_id),
+                    'player_name': index['player_name'][first_row],
+                    'team': index['player_team'][first_row],
+                    'zone': zone_name,
+                    'time': count * frame_time,
+                    'frames': int(count)
+                }
         
         print(f"  ✓ Analyzed {len(unique_frames)} frames")
         print(f"  ✓ Found {len(zone_stats)} player-zone combinations")
@@ -8,6 +8,12 @@ import os
 from typing import Optional, Dict, Tuple
 import numpy as np
 
+try:
+    from tracking_data_io import load_tracking_data
+    TRACKING_DATA_IO_AVAILABLE = True
+except ImportError:
+    TRACKING_DATA_IO_AVAILABLE = False
+
 
 class CSVManager:
     """Manages CSV tracking data"""
@@ -29,8 +35,11 @@ class CSVManager:
             return False
         
         try:
-            # Skip comment lines
-            self.df = pd.read_csv(csv_path, comment='#')
+            # Skip comment lines (typed sidecar is used when current)
+            if TRACKING_DATA_IO_AVAILABLE:
+                self.df = load_tracking_data(csv_path)
+            else:
+                self.df = pd.read_csv(csv_path, comment='#')
             
             if self.df.empty:
                 print(f"Error: CSV file is empty: {csv_path}")
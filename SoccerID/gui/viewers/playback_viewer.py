@@ -3022,7 +3022,7 @@ class PlaybackViewer:
         
         filename = filedialog.askopenfilename(
             title="Select Overlay Metadata File",
-            filetypes=[("JSON files", "*.json"), ("Metadata files", "*_overlay_metadata.json"), ("All files", "*.*")]
+            filetypes=[("JSON files", "*.json"), ("Metadata files", "*_overlay_metadata.json"), ("Overlay store", "*.ovl"), ("All files", "*.*")]
         )
         if not filename:
             return
@@ -3131,6 +3131,11 @@ class PlaybackViewer:
             if not os.path.exists(metadata_path):
                 # Try alternative naming
                 metadata_path = csv_path.replace('.csv', '_overlay_metadata.json')
+            if not os.path.exists(metadata_path):
+                # Chunked store written during analysis (loaded lazily per frame)
+                store_path = os.path.splitext(metadata_path)[0] + '.ovl'
+                if os.path.exists(store_path):
+                    metadata_path = store_path
             
             if os.path.exists(metadata_path):
                 from overlay_metadata import OverlayMetadata
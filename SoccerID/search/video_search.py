@@ -1,11 +1,26 @@
 """
 Video Search Module
 Search across multiple videos for events, players, and patterns
+
+The index is an inverted index in SQLite (WAL journal) next to the configured index
+file (video_search_index.json -> video_search_index.sqlite):
+- postings: (field, term) -> video, for player, event, team, date and metadata keywords
+- moments: per-video frame ranges for each player and event, so results can jump
+  straight to the moments that matched
+- videos: one row per indexed video; re-indexing a video only rewrites its own rows,
+  and is skipped when the tracking/events files have not changed
+
+A legacy JSON index (video_path -> entry) is imported once on first open.
 """
 
+import json
 import os
+import re
+import sqlite3
+import threading
+import numpy as np
 import pandas as pd
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 from pathlib import Path
 
 # Try to import logger
@@ -23,169 +38,472 @@ except ImportError:
 
 logger = get_logger("video_search")
 
+try:
+    from tracking_data_io import load_tracking_data
+    TRACKING_DATA_IO_AVAILABLE = True
+except ImportError:
+    TRACKING_DATA_IO_AVAILABLE = False
+
+SCHEMA_VERSION = 1
+
+# Posting fields (query key -> field)
+PLAYER_FIELD = 'player'
+EVENT_FIELD = 'event'
+TEAM_FIELD = 'team'
+DATE_FIELD = 'date'
+KEYWORD_FIELD = 'keyword'
+
+# A player absent for more than this many frames starts a new moment
+MOMENT_GAP_FRAMES = 30
+
+_TOKEN_RE = re.compile(r"[0-9a-z]+")
+
+
+def _tokenize(text: str) -> List[str]:
+    """Lower-case alphanumeric tokens of a string"""
+    return _TOKEN_RE.findall(str(text).lower())
+
+
+def _metadata_tokens(value: Any) -> set:
+    """Keyword tokens of every key and value in (nested) metadata"""
+    tokens = set()
+    if isinstance(value, dict):
+        for key, item in value.items():
+            tokens.update(_tokenize(key))
+            tokens.update(_metadata_tokens(item))
+    elif isinstance(value, (list, tuple, set)):
+        for item in value:
+            tokens.update(_metadata_tokens(item))
+    elif value is not None:
+        tokens.update(_tokenize(value))
+    return tokens
+
+
+def _normalize_date(value: Any) -> Optional[str]:
+    """ISO timestamp string (sorts chronologically), or None if not a date"""
+    if value is None or value == '':
+        return None
+    try:
+        return pd.Timestamp(value).isoformat()
+    except (ValueError, TypeError):
+        return None
+
+
+def _file_signature(path: str) -> Optional[str]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return f"{st.st_size}:{st.st_mtime_ns}"
+
+
+def _frame_ranges(frames: np.ndarray, max_gap: int = MOMENT_GAP_FRAMES) -> List[Tuple[int, int]]:
+    """Contiguous (start, end) ranges of sorted frames, split where the gap exceeds max_gap"""
+    if len(frames) == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(frames) > max_gap)
+    starts = np.concatenate(([frames[0]], frames[breaks + 1]))
+    ends = np.concatenate((frames[breaks], [frames[-1]]))
+    return list(zip(starts.tolist(), ends.tolist()))
+
 
 class VideoSearch:
     """
     Search across multiple videos
     """
-    
+
     def __init__(self, search_index_file: Optional[str] = None):
         """
         Initialize video search
-        
+
         Args:
-            search_index_file: Path to search index file
+            search_index_file: Path to search index file (the SQLite index is stored next
+                to it with a .sqlite suffix; a legacy JSON index there is imported once)
         """
         self.search_index_file = search_index_file or "video_search_index.json"
-        self.index = {}  # video_path -> metadata
+        path = Path(self.search_index_file)
+        self.index_db_file = str(path if path.suffix in ('.sqlite', '.db') else path.with_suffix('.sqlite'))
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
         self.load_index()
-    
+
+    # ------------------------------------------------------------------
+    # Storage
+    # ------------------------------------------------------------------
+
+    def _create_schema(self):
+        with self._conn:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                );
+                CREATE TABLE IF NOT EXISTS videos (
+                    video_id INTEGER PRIMARY KEY,
+                    video_path TEXT UNIQUE NOT NULL,
+                    csv_path TEXT,
+                    metadata TEXT,
+                    date TEXT,
+                    indexed_at TEXT,
+                    source_signature TEXT
+                );
+                CREATE TABLE IF NOT EXISTS postings (
+                    field TEXT NOT NULL,
+                    term TEXT NOT NULL,
+                    video_id INTEGER NOT NULL,
+                    PRIMARY KEY (field, term, video_id)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS postings_by_video ON postings (video_id);
+                CREATE TABLE IF NOT EXISTS moments (
+                    video_id INTEGER NOT NULL,
+                    field TEXT NOT NULL,
+                    term TEXT NOT NULL,
+                    frame_start INTEGER NOT NULL,
+                    frame_end INTEGER NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS moments_by_term ON moments (video_id, field, term, frame_start);
+            """)
+            self._conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('schema_version', ?)",
+                               (str(SCHEMA_VERSION),))
+
+    def _migrate_legacy_json(self):
+        """Import a legacy JSON index (video_path -> entry) once"""
+        if self.search_index_file == self.index_db_file or not os.path.exists(self.search_index_file):
+            return
+        if self._conn.execute("SELECT 1 FROM meta WHERE key = 'migrated_from'").fetchone():
+            return
+        try:
+            with open(self.search_index_file, 'r') as f:
+                legacy = json.load(f)
+        except Exception as e:
+            logger.error(f"Failed to load legacy index: {e}")
+            return
+
+        with self._lock, self._conn:
+            for video_path, entry in legacy.items():
+                self._write_entry(video_path, entry.get('csv_path'), entry.get('metadata') or {},
+                                  entry.get('date'), entry.get('teams') or [],
+                                  {name: [] for name in entry.get('players', [])},
+                                  {event: [] for event in entry.get('events', [])},
+                                  entry.get('indexed_at'), None)
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('migrated_from', ?)",
+                               (self.search_index_file,))
+        logger.info(f"Imported {len(legacy)} videos from legacy index {self.search_index_file}")
+
+    def _write_entry(self, video_path: str, csv_path: Optional[str], metadata: Dict[str, Any],
+                     date: Any, teams: List[str], player_moments: Dict[str, List[Tuple[int, int]]],
+                     event_moments: Dict[str, List[Tuple[int, int]]], indexed_at: Optional[str],
+                     source_signature: Optional[str]):
+        """Replace one video's row, postings and moments (caller holds the transaction)"""
+        conn = self._conn
+        row = conn.execute("SELECT video_id FROM videos WHERE video_path = ?", (video_path,)).fetchone()
+        values = (csv_path, json.dumps(metadata, default=str), _normalize_date(date),
+                  indexed_at or pd.Timestamp.now().isoformat(), source_signature)
+        if row:
+            video_id = row[0]
+            conn.execute("UPDATE videos SET csv_path = ?, metadata = ?, date = ?, indexed_at = ?, "
+                         "source_signature = ? WHERE video_id = ?", values + (video_id,))
+            conn.execute("DELETE FROM postings WHERE video_id = ?", (video_id,))
+            conn.execute("DELETE FROM moments WHERE video_id = ?", (video_id,))
+        else:
+            video_id = conn.execute("INSERT INTO videos (video_path, csv_path, metadata, date, indexed_at, "
+                                    "source_signature) VALUES (?, ?, ?, ?, ?, ?)",
+                                    (video_path,) + values).lastrowid
+
+        postings = set()
+        postings.update((PLAYER_FIELD, str(name)) for name in player_moments)
+        postings.update((EVENT_FIELD, str(event)) for event in event_moments)
+        postings.update((TEAM_FIELD, str(team)) for team in teams)
+        postings.update((KEYWORD_FIELD, token) for token in _metadata_tokens(metadata))
+        if values[2]:
+            postings.add((DATE_FIELD, values[2]))
+        conn.executemany("INSERT INTO postings (field, term, video_id) VALUES (?, ?, ?)",
+                         [(field, term, video_id) for field, term in postings])
+
+        moments = [(video_id, PLAYER_FIELD, str(name), start, end)
+                   for name, ranges in player_moments.items() for start, end in ranges]
+        moments += [(video_id, EVENT_FIELD, str(event), start, end)
+                    for event, ranges in event_moments.items() for start, end in ranges]
+        conn.executemany("INSERT INTO moments (video_id, field, term, frame_start, frame_end) "
+                         "VALUES (?, ?, ?, ?, ?)", moments)
+
+    # ------------------------------------------------------------------
+    # Indexing
+    # ------------------------------------------------------------------
+
     def index_video(self,
                    video_path: str,
                    csv_path: str,
-                   metadata: Optional[Dict[str, Any]] = None):
+                   metadata: Optional[Dict[str, Any]] = None,
+                   force: bool = False):
         """
         Index a video for searching
-        
+
         Args:
             video_path: Path to video file
             csv_path: Path to tracking CSV
             metadata: Optional metadata (date, teams, etc.)
+            force: Re-index even if the tracking/events files and metadata are unchanged
         """
         if not os.path.exists(csv_path):
             logger.warning(f"CSV not found: {csv_path}")
             return
-        
+
+        events_path = csv_path.replace('_tracking_data.csv', '_events.csv')
+        metadata = metadata or {}
+        source_signature = json.dumps([_file_signature(csv_path), _file_signature(events_path),
+                                       json.dumps(metadata, sort_keys=True, default=str)])
+
+        if not force:
+            row = self._conn.execute("SELECT source_signature, csv_path FROM videos WHERE video_path = ?",
+                                     (video_path,)).fetchone()
+            if row and row[0] == source_signature and row[1] == csv_path:
+                logger.info(f"Video already indexed and unchanged: {video_path}")
+                return
+
         try:
-            df = pd.read_csv(csv_path)
-            
-            # Extract searchable information
-            index_entry = {
-                'video_path': video_path,
-                'csv_path': csv_path,
-                'metadata': metadata or {},
-                'players': [],
-                'events': [],
-                'date': metadata.get('date') if metadata else None,
-                'teams': metadata.get('teams', []) if metadata else [],
-                'indexed_at': pd.Timestamp.now().isoformat()
-            }
-            
-            # Extract unique players
+            # Legacy writer uses 'frame', CSVExporter 'frame_num'
+            columns = ['frame', 'frame_num', 'player_name']
+            if TRACKING_DATA_IO_AVAILABLE:
+                df = load_tracking_data(csv_path, columns=columns)
+            else:
+                df = pd.read_csv(csv_path, comment='#', usecols=lambda c: c in columns)
+
+            # Per-player frame ranges
+            player_moments = {}
             if 'player_name' in df.columns:
-                index_entry['players'] = df['player_name'].dropna().unique().tolist()
-            
-            # Extract events (if events CSV exists)
-            events_path = csv_path.replace('_tracking_data.csv', '_events.csv')
+                named = df[df['player_name'].notna()]
+                frame_col = next((c for c in ('frame', 'frame_num') if c in named.columns), None)
+                if frame_col:
+                    frames = pd.to_numeric(named[frame_col], errors='coerce')
+                    named = named.assign(frame=frames)[frames.notna()]
+                    named = named.sort_values(['player_name', 'frame'], kind='stable')
+                    for name, group in named.groupby('player_name', sort=False):
+                        player_moments[name] = _frame_ranges(group['frame'].to_numpy().astype(np.int64))
+                else:
+                    player_moments = {name: [] for name in named['player_name'].unique().tolist()}
+
+            # Per-event frame ranges (if events CSV exists)
+            event_moments = {}
             if os.path.exists(events_path):
                 try:
                     events_df = pd.read_csv(events_path)
                     if 'event_type' in events_df.columns:
-                        index_entry['events'] = events_df['event_type'].unique().tolist()
+                        frame_col = next((c for c in ('frame_num', 'frame') if c in events_df.columns), None)
+                        if frame_col:
+                            events_df[frame_col] = pd.to_numeric(events_df[frame_col], errors='coerce')
+                        for event_type, group in events_df.groupby('event_type', sort=False):
+                            if frame_col:
+                                event_frames = group[frame_col].dropna().astype(np.int64).tolist()
+                                event_moments[event_type] = [(f, f) for f in sorted(event_frames)]
+                            else:
+                                event_moments[event_type] = []
                 except:
                     pass
-            
-            self.index[video_path] = index_entry
-            self.save_index()
-            
+
+            with self._lock, self._conn:
+                self._write_entry(video_path, csv_path, metadata, metadata.get('date'),
+                                  metadata.get('teams', []) or [], player_moments, event_moments,
+                                  None, source_signature)
+
             logger.info(f"Indexed video: {video_path}")
         except Exception as e:
             logger.error(f"Failed to index video: {e}")
-    
+
+    def remove_video(self, video_path: str) -> bool:
+        """Remove a video from the index"""
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT video_id FROM videos WHERE video_path = ?", (video_path,)).fetchone()
+            if not row:
+                return False
+            for table in ('postings', 'moments', 'videos'):
+                self._conn.execute(f"DELETE FROM {table} WHERE video_id = ?", (row[0],))
+        return True
+
+    # ------------------------------------------------------------------
+    # Search
+    # ------------------------------------------------------------------
+
+    def _postings(self, field: str, term: str) -> set:
+        rows = self._conn.execute("SELECT video_id FROM postings WHERE field = ? AND term = ?", (field, term))
+        return {row[0] for row in rows}
+
+    def _date_postings(self, start_date: Any, end_date: Any) -> Dict[int, str]:
+        start, end = _normalize_date(start_date), _normalize_date(end_date)
+        if start is None or end is None:
+            return {}
+        rows = self._conn.execute("SELECT video_id, term FROM postings WHERE field = ? AND term BETWEEN ? AND ?",
+                                  (DATE_FIELD, start, end))
+        return {video_id: term for video_id, term in rows}
+
+    def _keyword_postings(self, keywords: str) -> set:
+        """Videos whose metadata contains every keyword token (as a token prefix)"""
+        tokens = _tokenize(keywords)
+        if not tokens:
+            return set()
+        result = None
+        for token in tokens:
+            rows = self._conn.execute("SELECT video_id FROM postings WHERE field = ? AND term >= ? AND term < ?",
+                                      (KEYWORD_FIELD, token, token + '\uffff'))
+            videos = {row[0] for row in rows}
+            result = videos if result is None else result & videos
+            if not result:
+                break
+        return result or set()
+
+    def _moments(self, video_id: int, field: str, term: str) -> List[Dict[str, Any]]:
+        rows = self._conn.execute("SELECT frame_start, frame_end FROM moments WHERE video_id = ? AND field = ? "
+                                  "AND term = ? ORDER BY frame_start", (video_id, field, term))
+        return [{'type': field, 'value': term, 'frame_start': start, 'frame_end': end} for start, end in rows]
+
     def search(self,
               query: Dict[str, Any]) -> List[Dict[str, Any]]:
         """
         Search across indexed videos
-        
+
         Args:
             query: Search query dictionary:
                 - player_name: Search for player
                 - event_type: Search for event type
                 - date_range: Search by date range
                 - team: Search by team
-                - keywords: Text search in metadata
-                
+                - keywords: Text search in metadata (every word must appear)
+
         Returns:
-            List of matching videos with relevance scores
+            List of matching videos with relevance scores; 'moments' lists the frame
+            ranges of the matched player/event in that video
         """
-        results = []
-        
-        for video_path, entry in self.index.items():
-            score = 0.0
-            matches = []
-            
+        scores: Dict[int, float] = {}
+        matches: Dict[int, List[str]] = {}
+        moment_terms: Dict[int, List[Tuple[str, str]]] = {}
+
+        def add(video_ids, weight, label, moment_key=None):
+            for video_id in video_ids:
+                scores[video_id] = scores.get(video_id, 0.0) + weight
+                matches.setdefault(video_id, []).append(label(video_id) if callable(label) else label)
+                if moment_key:
+                    moment_terms.setdefault(video_id, []).append(moment_key)
+
+        with self._lock:
             # Player search
             if 'player_name' in query:
-                query_player = query['player_name']
-                if query_player in entry['players']:
-                    score += 10.0
-                    matches.append(f"Player: {query_player}")
-            
+                query_player = str(query['player_name'])
+                add(self._postings(PLAYER_FIELD, query_player), 10.0, f"Player: {query_player}",
+                    (PLAYER_FIELD, query_player))
+
             # Event search
             if 'event_type' in query:
-                query_event = query['event_type']
-                if query_event in entry['events']:
-                    score += 8.0
-                    matches.append(f"Event: {query_event}")
-            
+                query_event = str(query['event_type'])
+                add(self._postings(EVENT_FIELD, query_event), 8.0, f"Event: {query_event}",
+                    (EVENT_FIELD, query_event))
+
             # Date range search
             if 'date_range' in query:
                 start_date, end_date = query['date_range']
-                if entry['date']:
-                    entry_date = pd.Timestamp(entry['date'])
-                    if start_date <= entry_date <= end_date:
-                        score += 5.0
-                        matches.append(f"Date: {entry['date']}")
-            
+                dated = self._date_postings(start_date, end_date)
+                add(dated, 5.0, lambda video_id: f"Date: {dated[video_id]}")
+
             # Team search
             if 'team' in query:
-                query_team = query['team']
-                if query_team in entry['teams']:
-                    score += 7.0
-                    matches.append(f"Team: {query_team}")
-            
+                query_team = str(query['team'])
+                add(self._postings(TEAM_FIELD, query_team), 7.0, f"Team: {query_team}")
+
             # Keyword search
             if 'keywords' in query:
                 keywords = query['keywords'].lower()
-                metadata_str = str(entry['metadata']).lower()
-                if keywords in metadata_str:
-                    score += 3.0
-                    matches.append(f"Keywords: {keywords}")
-            
-            if score > 0:
+                add(self._keyword_postings(keywords), 3.0, f"Keywords: {keywords}")
+
+            results = []
+            for video_id, score in scores.items():
+                row = self._conn.execute("SELECT video_path, csv_path, metadata FROM videos WHERE video_id = ?",
+                                         (video_id,)).fetchone()
+                if not row:
+                    continue
+                moments = []
+                for field, term in moment_terms.get(video_id, []):
+                    moments.extend(self._moments(video_id, field, term))
                 results.append({
-                    'video_path': video_path,
-                    'csv_path': entry['csv_path'],
+                    'video_path': row[0],
+                    'csv_path': row[1],
                     'score': score,
-                    'matches': matches,
-                    'metadata': entry['metadata']
+                    'matches': matches[video_id],
+                    'metadata': json.loads(row[2]) if row[2] else {},
+                    'moments': moments
                 })
-        
+
         # Sort by relevance score
         results.sort(key=lambda x: x['score'], reverse=True)
-        
+
         logger.info(f"Search found {len(results)} matching videos")
         return results
-    
+
+    def get_moments(self, video_path: str, player_name: Optional[str] = None,
+                    event_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Frame ranges of a player and/or event type in one indexed video"""
+        with self._lock:
+            row = self._conn.execute("SELECT video_id FROM videos WHERE video_path = ?", (video_path,)).fetchone()
+            if not row:
+                return []
+            moments = []
+            if player_name is not None:
+                moments.extend(self._moments(row[0], PLAYER_FIELD, str(player_name)))
+            if event_type is not None:
+                moments.extend(self._moments(row[0], EVENT_FIELD, str(event_type)))
+        return sorted(moments, key=lambda m: m['frame_start'])
+
+    @property
+    def index(self) -> Dict[str, Dict[str, Any]]:
+        """Full index as {video_path: entry} (reads every posting - for export/inspection)"""
+        with self._lock:
+            entries = {}
+            by_id = {}
+            for video_id, video_path, csv_path, metadata, date, indexed_at in self._conn.execute(
+                    "SELECT video_id, video_path, csv_path, metadata, date, indexed_at FROM videos"):
+                metadata = json.loads(metadata) if metadata else {}
+                entry = {
+                    'video_path': video_path,
+                    'csv_path': csv_path,
+                    'metadata': metadata,
+                    'players': [],
+                    'events': [],
+                    'date': metadata.get('date', date),
+                    'teams': [],
+                    'indexed_at': indexed_at
+                }
+                entries[video_path] = by_id[video_id] = entry
+            field_keys = {PLAYER_FIELD: 'players', EVENT_FIELD: 'events', TEAM_FIELD: 'teams'}
+            for field, term, video_id in self._conn.execute(
+                    "SELECT field, term, video_id FROM postings WHERE field IN (?, ?, ?)", tuple(field_keys)):
+                if video_id in by_id:
+                    by_id[video_id][field_keys[field]].append(term)
+        return entries
+
     def save_index(self):
-        """Save search index"""
+        """Save search index (writes are committed per video; this checkpoints the WAL)"""
         try:
-            import json
-            with open(self.search_index_file, 'w') as f:
-                json.dump(self.index, f, indent=2)
+            with self._lock:
+                self._conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
         except Exception as e:
             logger.error(f"Failed to save index: {e}")
-    
+
     def load_index(self):
         """Load search index"""
-        if not os.path.exists(self.search_index_file):
-            return
-        
         try:
-            import json
-            with open(self.search_index_file, 'r') as f:
-                self.index = json.load(f)
-            logger.info(f"Loaded index for {len(self.index)} videos")
+            with self._lock:
+                if self._conn is None:
+                    self._conn = sqlite3.connect(self.index_db_file, check_same_thread=False)
+                    self._conn.execute("PRAGMA journal_mode=WAL")
+                    self._conn.execute("PRAGMA synchronous=NORMAL")
+                    self._create_schema()
+                    self._migrate_legacy_json()
+                count = self._conn.execute("SELECT COUNT(*) FROM videos").fetchone()[0]
+            logger.info(f"Loaded index for {count} videos")
         except Exception as e:
             logger.error(f"Failed to load index: {e}")
 
+    def close(self):
+        """Close the index database"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -13,6 +13,16 @@ from dataclasses import dataclass, asdict
 from datetime import datetime
 import numpy as np
 
+# Keyframe stream copy for clips without overlays (falls back to OpenCV re-encoding)
+try:
+    import ffmpeg_tools
+    FFMPEG_TOOLS_AVAILABLE = True
+except ImportError:
+    FFMPEG_TOOLS_AVAILABLE = False
+
+# Batch extraction reads straight through gaps up to this many frames instead of seeking
+_MAX_READ_THROUGH_GAP = 90
+
 
 @dataclass
 class VideoClip:
@@ -186,6 +196,271 @@ class ClipManager:
             progress_callback=progress_callback
         )
     
+    def create_clips_batch(self, video_path: str, items: List, fps: float = 30.0,
+                           clip_duration_before: float = 2.0,
+                           clip_duration_after: float = 3.0,
+                           include_overlays: bool = True, overlay_renderer=None,
+                           progress_callback=None) -> List[VideoClip]:
+        """
+        Create many clips from one video in a single pass
+        
+        Args:
+            video_path: Source video
+            items: Events (objects with frame_num/event_type/player_id/...), dicts with
+                   'frame_start'/'frame_end' (plus optional clip fields), or
+                   (frame_start, frame_end[, event_type]) tuples
+            fps: Fallback FPS (and the FPS used for event context before/after)
+            include_overlays: Render overlays with overlay_renderer (forces re-encoding)
+            progress_callback: Called with overall progress percent
+            
+        Returns:
+            Created clips, in the order of `items` (failed clips are skipped)
+        
+        Ranges are sorted and overlapping/nearby ones merged into decode spans, so the
+        source is decoded once, in order, and each frame is fanned out to every open
+        clip writer. Without overlays, clips are cut with FFmpeg keyframe stream copy
+        instead (no decode at all; each clip starts on the keyframe at or before its
+        start frame). The clip index is saved once at the end.
+        """
+        if not os.path.exists(video_path) or not items:
+            return []
+        
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            return []
+        video_fps = cap.get(cv2.CAP_PROP_FPS) or fps
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        
+        specs = [self._clip_spec(item, fps, clip_duration_before, clip_duration_after)
+                 for item in items]
+        specs = [spec for spec in specs if spec is not None]
+        
+        # Validate frame ranges
+        for spec in specs:
+            spec['frame_start'] = max(0, min(spec['frame_start'], total_frames - 1))
+            spec['frame_end'] = max(spec['frame_start'] + 1, min(spec['frame_end'], total_frames))
+        
+        render_overlays = include_overlays and overlay_renderer is not None
+        created = None
+        if not render_overlays and FFMPEG_TOOLS_AVAILABLE and ffmpeg_tools.ffmpeg_available():
+            cap.release()
+            created = self._create_clips_stream_copy(video_path, specs, video_fps, progress_callback)
+        if created is None:
+            if not cap.isOpened():
+                cap = cv2.VideoCapture(video_path)
+            created = self._create_clips_single_pass(cap, video_path, specs, video_fps, width, height,
+                                                     overlay_renderer if render_overlays else None,
+                                                     progress_callback)
+            cap.release()
+        
+        # Save clip index once for the whole batch
+        for clip in created:
+            self.clips[clip.clip_id] = clip
+        if created:
+            self.save_clips()
+        
+        return created
+    
+    def _clip_spec(self, item, fps: float, clip_duration_before: float,
+                   clip_duration_after: float) -> Optional[Dict]:
+        """Normalize an event, dict or (start, end[, event_type]) tuple into clip fields"""
+        fields = ('event_type', 'player_id', 'player_name', 'team', 'description')
+        if isinstance(item, dict):
+            spec = {key: item.get(key) for key in fields}
+            if 'frame_start' in item and 'frame_end' in item:
+                spec['frame_start'] = int(item['frame_start'])
+                spec['frame_end'] = int(item['frame_end'])
+            elif 'frame_num' in item:
+                frame_num = int(item['frame_num'])
+                spec['frame_start'] = max(0, frame_num - int(clip_duration_before * fps))
+                spec['frame_end'] = frame_num + int(clip_duration_after * fps)
+            else:
+                return None
+        elif isinstance(item, (tuple, list)):
+            if len(item) < 2:
+                return None
+            spec = {key: None for key in fields}
+            spec['frame_start'] = int(item[0])
+            spec['frame_end'] = int(item[1])
+            if len(item) > 2:
+                spec['event_type'] = item[2]
+        elif hasattr(item, 'frame_num'):
+            spec = {key: getattr(item, key, None) for key in fields}
+            spec['frame_start'] = max(0, int(item.frame_num) - int(clip_duration_before * fps))
+            spec['frame_end'] = int(item.frame_num) + int(clip_duration_after * fps)
+        else:
+            return None
+        spec['event_type'] = spec['event_type'] or 'clip'
+        return spec
+    
+    def _new_clip(self, video_path: str, spec: Dict, index: int, video_fps: float,
+                  clip_path: str, thumbnail_path: Optional[str]) -> VideoClip:
+        """VideoClip record for a batch spec"""
+        return VideoClip(
+            clip_id=spec['clip_id'],
+            event_type=spec['event_type'],
+            frame_start=spec['frame_start'],
+            frame_end=spec['frame_end'],
+            video_path=video_path,
+            clip_path=clip_path,
+            player_id=spec['player_id'],
+            player_name=spec['player_name'],
+            team=spec['team'],
+            description=spec['description'],
+            created_at=datetime.now().isoformat(),
+            duration=(spec['frame_end'] - spec['frame_start']) / video_fps,
+            thumbnail_path=thumbnail_path,
+            metadata={'batch_index': index}
+        )
+    
+    def _assign_clip_paths(self, video_path: str, specs: List[Dict]):
+        """Generate unique clip IDs / paths for a batch (same range twice gets a suffix)"""
+        video_basename = os.path.splitext(os.path.basename(video_path))[0]
+        stamp = int(time.time())
+        used = set(self.clips)
+        for spec in specs:
+            clip_id = f"{spec['event_type']}_{spec['frame_start']}_{spec['frame_end']}_{stamp}"
+            suffix = 1
+            while clip_id in used:
+                suffix += 1
+                clip_id = f"{spec['event_type']}_{spec['frame_start']}_{spec['frame_end']}_{stamp}_{suffix}"
+            used.add(clip_id)
+            spec['clip_id'] = clip_id
+            spec['clip_path'] = os.path.join(self.clips_dir, f"{video_basename}_{clip_id}.mp4")
+            spec['thumbnail_path'] = os.path.join(self.clips_dir, f"{clip_id}_thumb.jpg")
+    
+    def _create_clips_single_pass(self, cap, video_path: str, specs: List[Dict], video_fps: float,
+                                  width: int, height: int, overlay_renderer,
+                                  progress_callback) -> List[VideoClip]:
+        """Decode merged spans once in frame order and fan frames out to the open clip writers"""
+        self._assign_clip_paths(video_path, specs)
+        order = sorted(range(len(specs)), key=lambda k: (specs[k]['frame_start'], specs[k]['frame_end']))
+        
+        # Merge overlapping / nearby ranges into decode spans
+        spans = []  # [start, end, [spec indices]]
+        for k in order:
+            start, end = specs[k]['frame_start'], specs[k]['frame_end']
+            if spans and start <= spans[-1][1] + _MAX_READ_THROUGH_GAP:
+                spans[-1][1] = max(spans[-1][1], end)
+                spans[-1][2].append(k)
+            else:
+                spans.append([start, end, [k]])
+        
+        total_to_decode = sum(end - start for start, end, _ in spans) or 1
+        decoded = 0
+        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+        writers = {}  # spec index -> VideoWriter
+        thumbnails = {}  # spec index -> thumbnail path
+        finished = set()
+        failed = set()
+        position = -1
+        
+        for span_start, span_end, members in spans:
+            if position != span_start:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, span_start)
+            pending = list(members)  # sorted by start frame
+            active = []
+            
+            for frame_num in range(span_start, span_end):
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                position = frame_num + 1
+                
+                # Open writers for clips starting at this frame
+                while pending and specs[pending[0]]['frame_start'] <= frame_num:
+                    k = pending.pop(0)
+                    out = cv2.VideoWriter(specs[k]['clip_path'], fourcc, video_fps, (width, height))
+                    if not out.isOpened():
+                        failed.add(k)
+                        continue
+                    writers[k] = out
+                    active.append(k)
+                    # Create thumbnail from first frame
+                    if cv2.imwrite(specs[k]['thumbnail_path'], frame):
+                        thumbnails[k] = specs[k]['thumbnail_path']
+                
+                if active:
+                    # Apply overlays once per frame, shared by all overlapping clips
+                    if overlay_renderer is not None:
+                        try:
+                            frame = overlay_renderer.render_frame(frame, frame_num)
+                        except:
+                            pass  # Continue without overlays if rendering fails
+                    for k in active:
+                        writers[k].write(frame)
+                    
+                    # Close clips ending after this frame
+                    for k in [k for k in active if specs[k]['frame_end'] <= frame_num + 1]:
+                        writers.pop(k).release()
+                        active.remove(k)
+                        finished.add(k)
+                
+                decoded += 1
+                if progress_callback and decoded % 10 == 0:
+                    progress_callback((decoded / total_to_decode) * 100)
+            
+            # Video ended early - keep what was written (same as create_clip)
+            for k in active:
+                writers.pop(k).release()
+                finished.add(k)
+            failed.update(pending)
+        
+        if progress_callback:
+            progress_callback(100.0)
+        
+        return [self._new_clip(video_path, specs[k], k, video_fps, specs[k]['clip_path'], thumbnails.get(k))
+                for k in range(len(specs)) if k in finished and k not in failed]
+    
+    def _create_clips_stream_copy(self, video_path: str, specs: List[Dict], video_fps: float,
+                                  progress_callback) -> Optional[List[VideoClip]]:
+        """
+        Cut every clip with FFmpeg stream copy (start snapped to the preceding keyframe)
+        
+        Returns:
+            Created clips, or None if keyframes could not be read (caller re-encodes instead)
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        
+        keyframes = ffmpeg_tools.probe_keyframes(video_path)
+        if not keyframes:
+            return None
+        
+        start_times = []
+        for spec in specs:
+            start_time = ffmpeg_tools.keyframe_at_or_before(keyframes, spec['frame_start'] / video_fps)
+            start_times.append(start_time)
+            # Frame index is only metadata; the cut uses the exact keyframe time
+            spec['frame_start'] = min(int(round(start_time * video_fps)), spec['frame_start'])
+        self._assign_clip_paths(video_path, specs)
+        
+        def cut(k):
+            spec = specs[k]
+            ok = ffmpeg_tools.stream_copy_segment(video_path, spec['clip_path'],
+                                                  start_times[k],
+                                                  spec['frame_end'] / video_fps)
+            if not ok:
+                return None
+            # Create thumbnail from first frame of the clip (one decode)
+            thumbnail_path = None
+            clip_cap = cv2.VideoCapture(spec['clip_path'])
+            ret, thumbnail_frame = clip_cap.read()
+            clip_cap.release()
+            if ret and cv2.imwrite(spec['thumbnail_path'], thumbnail_frame):
+                thumbnail_path = spec['thumbnail_path']
+            return self._new_clip(video_path, spec, k, video_fps, spec['clip_path'], thumbnail_path)
+        
+        created = []
+        with ThreadPoolExecutor(max_workers=min(4, os.cpu_count() or 1)) as executor:
+            for done_count, clip in enumerate(executor.map(cut, range(len(specs))), start=1):
+                if clip is not None:
+                    created.append(clip)
+                if progress_callback:
+                    progress_callback((done_count / len(specs)) * 100)
+        return created
+    
     def get_clips_for_player(self, player_name: str) -> List[VideoClip]:
         """Get all clips for a specific player"""
         return [clip for clip in self.clips.values() 
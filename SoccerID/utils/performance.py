@@ -5,6 +5,8 @@ Hardware detection, optimal settings, and performance profiling
 
 import os
 import sys
+import threading
+from collections import OrderedDict
 from typing import Dict, Any, Optional
 
 # Try to import required libraries
@@ -20,6 +22,13 @@ try:
 except ImportError:
     PSUTIL_AVAILABLE = False
 
+try:
+    import cv2
+    import numpy as np
+    CV2_AVAILABLE = True
+except ImportError:
+    CV2_AVAILABLE = False
+
 # Try to import logger
 try:
     from .logger_config import get_logger
@@ -184,46 +193,121 @@ class PerformanceOptimizer:
 class FrameCache:
     """
     LRU cache for processed frames and detections
+    
+    O(1) hits and evictions (OrderedDict recency order) with exact byte accounting:
+    every entry remembers the size it was charged, and eviction subtracts the same amount.
+    
+    Optional second tier: frames evicted from memory can be kept JPEG-compressed
+    (compressed_size_mb > 0). A hit in the compressed tier decodes the frame and promotes it
+    back to the first tier. JPEG is lossy, so only enable it for display/scrubbing caches.
     """
     
-    def __init__(self, max_size_mb: int = 512):
+    def __init__(self, max_size_mb: int = 512, compressed_size_mb: int = 0, jpeg_quality: int = 90):
         """
         Initialize frame cache
         
         Args:
             max_size_mb: Maximum cache size in MB
+            compressed_size_mb: Size of the JPEG-compressed second tier in MB (0 = disabled)
+            jpeg_quality: JPEG quality for the compressed tier (1-100)
         """
         self.max_size_bytes = max_size_mb * 1024 * 1024
-        self.cache = {}
-        self.access_order = []
+        self.cache = OrderedDict()  # key -> value, least recently used first
+        self._sizes = {}  # key -> bytes charged for the entry
         self.current_size = 0
+        
+        # Compressed second tier (key -> (jpeg bytes, shape))
+        self.compressed_max_bytes = compressed_size_mb * 1024 * 1024 if CV2_AVAILABLE else 0
+        self.jpeg_quality = int(max(1, min(100, jpeg_quality)))
+        self.compressed = OrderedDict()
+        self.compressed_size = 0
+        
+        self._lock = threading.Lock()
+        
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.compressed_hits = 0
+        self.compressed_evictions = 0
     
     def get(self, key: str) -> Optional[Any]:
         """Get item from cache"""
-        if key in self.cache:
-            # Update access order
-            if key in self.access_order:
-                self.access_order.remove(key)
-            self.access_order.append(key)
-            return self.cache[key]
-        return None
+        with self._lock:
+            value = self.cache.get(key)
+            if value is not None or key in self.cache:
+                self.cache.move_to_end(key)
+                self.hits += 1
+                return value
+            
+            entry = self.compressed.pop(key, None) if self.compressed else None
+            if entry is None:
+                self.misses += 1
+                return None
+        
+        # Decode outside the lock, then promote back to the first tier
+        encoded, shape = entry
+        frame = cv2.imdecode(np.frombuffer(encoded, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+        with self._lock:
+            self.compressed_size -= len(encoded)
+            if frame is None:
+                self.misses += 1
+                return None
+            frame = frame.reshape(shape)
+            self.compressed_hits += 1
+            self._put_locked(key, frame, frame.nbytes)
+        return frame
     
-    def put(self, key: str, value: Any, size_bytes: int):
-        """Put item in cache"""
-        # Remove old items if needed
+    def put(self, key: str, value: Any, size_bytes: Optional[int] = None):
+        """Put item in cache (size_bytes defaults to an estimate of value's size)"""
+        if size_bytes is None:
+            size_bytes = self._estimate_size(value)
+        with self._lock:
+            self._put_locked(key, value, int(size_bytes))
+    
+    def _put_locked(self, key: str, value: Any, size_bytes: int):
+        # Replace existing entry (in either tier)
+        if key in self.cache:
+            del self.cache[key]
+            self.current_size -= self._sizes.pop(key)
+        old = self.compressed.pop(key, None)
+        if old is not None:
+            self.compressed_size -= len(old[0])
+        
+        if size_bytes > self.max_size_bytes:
+            return  # Larger than the whole cache
+        
+        # Remove least recently used items until the new one fits
         while self.current_size + size_bytes > self.max_size_bytes and self.cache:
-            if not self.access_order:
-                break
-            oldest_key = self.access_order.pop(0)
-            if oldest_key in self.cache:
-                old_size = self._estimate_size(self.cache[oldest_key])
-                del self.cache[oldest_key]
-                self.current_size -= old_size
+            oldest_key, oldest_value = self.cache.popitem(last=False)
+            self.current_size -= self._sizes.pop(oldest_key)
+            self.evictions += 1
+            self._demote(oldest_key, oldest_value)
         
         # Add new item
         self.cache[key] = value
+        self._sizes[key] = size_bytes
         self.current_size += size_bytes
-        self.access_order.append(key)
+    
+    def _demote(self, key: str, value: Any):
+        """Move an evicted frame into the compressed tier (if enabled and value is an image)"""
+        if self.compressed_max_bytes <= 0:
+            return
+        if not (isinstance(value, np.ndarray) and value.dtype == np.uint8 and
+                (value.ndim == 2 or (value.ndim == 3 and value.shape[2] in (1, 3)))):
+            return
+        ok, encoded = cv2.imencode('.jpg', value, [int(cv2.IMWRITE_JPEG_QUALITY), self.jpeg_quality])
+        if not ok:
+            return
+        encoded = encoded.tobytes()
+        if len(encoded) > self.compressed_max_bytes:
+            return
+        while self.compressed_size + len(encoded) > self.compressed_max_bytes and self.compressed:
+            _, (old_encoded, _) = self.compressed.popitem(last=False)
+            self.compressed_size -= len(old_encoded)
+            self.compressed_evictions += 1
+        self.compressed[key] = (encoded, value.shape)
+        self.compressed_size += len(encoded)
     
     def _estimate_size(self, value: Any) -> int:
         """Estimate size of cached value in bytes"""
@@ -245,16 +329,29 @@ class FrameCache:
     
     def clear(self):
         """Clear cache"""
-        self.cache.clear()
-        self.access_order.clear()
-        self.current_size = 0
+        with self._lock:
+            self.cache.clear()
+            self._sizes.clear()
+            self.current_size = 0
+            self.compressed.clear()
+            self.compressed_size = 0
     
     def get_stats(self) -> Dict[str, Any]:
         """Get cache statistics"""
+        lookups = self.hits + self.compressed_hits + self.misses
         return {
             'size_mb': self.current_size / (1024 * 1024),
             'max_size_mb': self.max_size_bytes / (1024 * 1024),
             'items': len(self.cache),
-            'usage_percent': (self.current_size / self.max_size_bytes * 100) if self.max_size_bytes > 0 else 0
+            'usage_percent': (self.current_size / self.max_size_bytes * 100) if self.max_size_bytes > 0 else 0,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': (self.hits + self.compressed_hits) / lookups if lookups > 0 else 0.0,
+            'compressed_items': len(self.compressed),
+            'compressed_size_mb': self.compressed_size / (1024 * 1024),
+            'compressed_max_size_mb': self.compressed_max_bytes / (1024 * 1024),
+            'compressed_hits': self.compressed_hits,
+            'compressed_evictions': self.compressed_evictions
         }
 
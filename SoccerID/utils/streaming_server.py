@@ -18,6 +18,194 @@ from typing import Optional, Dict, List, Callable
 from pathlib import Path
 
 
+# Per-client stream tiers: clients pick one with /video?tier=<name>.
+# Each tier is encoded once per frame and shared by every client on it.
+DEFAULT_STREAM_TIERS = {
+    'full': {'max_width': None, 'quality': 85},
+    'medium': {'max_width': 1280, 'quality': 75},
+    'low': {'max_width': 640, 'quality': 60},
+}
+
+
+class MJPEGBroadcaster:
+    """
+    Encode-once fan-out of the latest frame to all MJPEG clients
+    
+    A single capture thread polls frame_provider (only while clients are connected), encodes
+    each new frame once per subscribed tier and publishes the JPEG bytes under a sequence
+    number. Client threads wait on a condition for a sequence number newer than the last one
+    they sent, so slow clients skip stale frames instead of queueing them.
+    """
+    
+    def __init__(self, frame_provider: Callable, tiers: Optional[Dict[str, Dict]] = None,
+                 default_tier: str = 'full', target_fps: float = 30.0):
+        """
+        Args:
+            frame_provider: Callable that returns latest frame (numpy array) or None
+            tiers: Tier name -> {'max_width': int or None, 'quality': int}
+            default_tier: Tier used when a client doesn't request one (or requests an unknown one)
+            target_fps: Maximum rate at which frame_provider is polled
+        """
+        self.frame_provider = frame_provider
+        self.tiers = dict(tiers or DEFAULT_STREAM_TIERS)
+        self.default_tier = default_tier if default_tier in self.tiers else next(iter(self.tiers))
+        self.frame_interval = 1.0 / max(target_fps, 1.0)
+        
+        self._condition = threading.Condition()
+        self._latest = {}  # tier -> (sequence number, jpeg bytes)
+        self._subscribers = {}  # tier -> connected client count
+        self._sequence = 0
+        self._last_frame = None
+        self._thread = None
+        self._stopped = False
+        
+        # Counters
+        self.frames_published = 0
+        self.encodes = 0
+    
+    @property
+    def stopped(self) -> bool:
+        """True after stop() until the next client subscribes"""
+        return self._stopped
+    
+    def resolve_tier(self, tier: Optional[str]) -> str:
+        """Map a requested tier name to a configured one"""
+        return tier if tier in self.tiers else self.default_tier
+    
+    def subscribe(self, tier: str):
+        """Register a client on a tier (starts the capture thread if needed)"""
+        with self._condition:
+            self._subscribers[tier] = self._subscribers.get(tier, 0) + 1
+            self._stopped = False
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._capture_loop, daemon=True)
+                self._thread.start()
+    
+    def unsubscribe(self, tier: str):
+        """Unregister a client (the capture thread exits when no clients remain)"""
+        with self._condition:
+            count = self._subscribers.get(tier, 0) - 1
+            if count > 0:
+                self._subscribers[tier] = count
+            else:
+                self._subscribers.pop(tier, None)
+                self._latest.pop(tier, None)
+    
+    def publish_frame(self, frame: np.ndarray) -> bool:
+        """
+        Encode a frame once for every subscribed tier and wake waiting clients
+        
+        Can also be called directly by producers that push frames.
+        
+        Returns:
+            True if at least one tier was published
+        """
+        if frame is None:
+            return False
+        with self._condition:
+            tiers = list(self._subscribers.keys())
+        
+        # Encode outside the lock so clients keep sending the previous frame meanwhile
+        encoded = {}
+        for tier in tiers:
+            jpeg = self._encode(frame, self.tiers[tier])
+            if jpeg is not None:
+                encoded[tier] = jpeg
+        if not encoded:
+            return False
+        
+        with self._condition:
+            self._sequence += 1
+            for tier, jpeg in encoded.items():
+                if tier in self._subscribers:
+                    self._latest[tier] = (self._sequence, jpeg)
+            self.frames_published += 1
+            self._condition.notify_all()
+        return True
+    
+    def wait_for_frame(self, tier: str, last_sequence: int, timeout: float = 1.0):
+        """
+        Block until a frame newer than last_sequence is available on tier
+        
+        Returns:
+            (sequence, jpeg bytes) of the latest frame, or None on timeout / stop
+        """
+        def has_new_frame():
+            latest = self._latest.get(tier)
+            return self._stopped or (latest is not None and latest[0] > last_sequence)
+        
+        with self._condition:
+            self._condition.wait_for(has_new_frame, timeout=timeout)
+            latest = self._latest.get(tier)
+            if self._stopped or latest is None or latest[0] <= last_sequence:
+                return None
+            return latest
+    
+    def _encode(self, frame: np.ndarray, tier_config: Dict) -> Optional[bytes]:
+        """Resize (if the tier caps the width) and JPEG-encode a frame"""
+        max_width = tier_config.get('max_width')
+        if max_width and frame.shape[1] > max_width:
+            scale = max_width / frame.shape[1]
+            frame = cv2.resize(frame, (max_width, max(1, int(round(frame.shape[0] * scale)))),
+                               interpolation=cv2.INTER_AREA)
+        ret, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, int(tier_config.get('quality', 85))])
+        if not ret:
+            return None
+        self.encodes += 1
+        return jpeg.tobytes()
+    
+    def _capture_loop(self):
+        """Poll frame_provider at target_fps while clients are connected"""
+        consecutive_none_frames = 0
+        while True:
+            with self._condition:
+                if self._stopped or not self._subscribers:
+                    self._thread = None
+                    return
+            
+            loop_start = time.time()
+            try:
+                frame = self.frame_provider()
+            except Exception as e:
+                print(f"⚠ Error getting frame: {e}")
+                frame = None
+            
+            if frame is None:
+                consecutive_none_frames += 1
+                # Log if we're waiting for frames (but not spam)
+                if consecutive_none_frames == 1:
+                    print("⚠ Streaming server waiting for frames...")
+                elif consecutive_none_frames % 100 == 0:  # Every ~3 seconds
+                    print(f"⚠ Streaming server still waiting for frames ({consecutive_none_frames} attempts, {self.frames_published} frames published so far)")
+            elif frame is not self._last_frame:  # Same object pushed again - nothing new to encode
+                if consecutive_none_frames > 0:
+                    print(f"✓ Streaming server received frame: {frame.shape} (after {consecutive_none_frames} None frames)")
+                    consecutive_none_frames = 0
+                self._last_frame = frame
+                self.publish_frame(frame)
+            
+            remaining = self.frame_interval - (time.time() - loop_start)
+            if remaining > 0:
+                time.sleep(remaining)
+    
+    def stop(self):
+        """Stop the capture thread and release waiting clients"""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+    
+    def get_stats(self) -> Dict:
+        """Broadcast statistics"""
+        with self._condition:
+            return {
+                'clients': sum(self._subscribers.values()),
+                'clients_by_tier': dict(self._subscribers),
+                'frames_published': self.frames_published,
+                'encodes': self.encodes,
+                'sequence': self._sequence,
+            }
+
+
 class StreamingHandler(BaseHTTPRequestHandler):
     """Enhanced HTTP request handler with API endpoints"""
     
@@ -107,6 +295,14 @@ class StreamingHandler(BaseHTTPRequestHandler):
         self.end_headers()
         self.wfile.write(json.dumps(data).encode('utf-8'))
     
+    def _get_broadcaster(self) -> MJPEGBroadcaster:
+        """Shared broadcaster for this server (created on first use)"""
+        broadcaster = getattr(self.server, 'broadcaster', None)
+        if broadcaster is None:
+            broadcaster = MJPEGBroadcaster(self.frame_provider)
+            self.server.broadcaster = broadcaster
+        return broadcaster
+    
     def _serve_mjpeg_stream(self):
         """Serve MJPEG video stream"""
         print(f"📡 MJPEG stream request received from {self.client_address}")
@@ -122,77 +318,56 @@ class StreamingHandler(BaseHTTPRequestHandler):
             print(f"⚠ Error sending headers: {e}")
             return
         
+        # PERFORMANCE: Frames are encoded once per tier by the shared broadcaster;
+        # this thread only waits for the newest sequence number and sends its bytes
+        from urllib.parse import urlparse, parse_qs
+        query = parse_qs(urlparse(self.path).query)
+        broadcaster = self._get_broadcaster()
+        tier = broadcaster.resolve_tier(query.get('tier', [None])[0])
+        broadcaster.subscribe(tier)
+        
         try:
-            consecutive_none_frames = 0
+            last_sequence = 0
             frames_sent = 0
+            frames_skipped = 0
             consecutive_errors = 0
             while True:
-                try:
-                    frame = self.frame_provider()
-                    if frame is None:
-                        consecutive_none_frames += 1
-                        consecutive_errors = 0  # Reset error count on None frames
-                        # Log if we're waiting for frames (but not spam)
-                        if consecutive_none_frames == 1:
-                            print("⚠ Streaming server waiting for frames...")
-                        elif consecutive_none_frames % 100 == 0:  # Every ~3 seconds
-                            print(f"⚠ Streaming server still waiting for frames ({consecutive_none_frames} attempts, {frames_sent} frames sent so far)")
-                        time.sleep(0.033)  # ~30 FPS
-                        continue
-                    
-                    # Reset counter when we get a frame
-                    if consecutive_none_frames > 0:
-                        print(f"✓ Streaming server received frame: {frame.shape} (after {consecutive_none_frames} None frames)")
-                        consecutive_none_frames = 0
-                        consecutive_errors = 0
-                
-                    # Encode frame as JPEG
-                    ret, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
-                    if not ret:
-                        consecutive_errors += 1
-                        if consecutive_errors < 5:
-                            print(f"⚠ Failed to encode frame as JPEG")
-                        continue
-                    
-                    # Send frame
-                    try:
-                        self.wfile.write(b'--jpgboundary\r\n')
-                        self.send_header('Content-Type', 'image/jpeg')
-                        self.send_header('Content-Length', str(len(jpeg)))
-                        self.end_headers()
-                        self.wfile.write(jpeg.tobytes())
-                        self.wfile.write(b'\r\n')
-                        self.wfile.flush()  # Ensure data is sent immediately
-                        
-                        frames_sent += 1
-                        consecutive_errors = 0
-                        if frames_sent == 1:
-                            print(f"✓ Streaming server sent first frame: {frame.shape}")
-                        elif frames_sent % 300 == 0:  # Every 10 seconds at 30fps
-                            print(f"📡 Streaming server: {frames_sent} frames sent")
-                    except (ConnectionResetError, BrokenPipeError, OSError) as send_err:
-                        # Client disconnected or connection error
-                        print(f"📡 Client disconnected: {send_err}")
+                latest = broadcaster.wait_for_frame(tier, last_sequence, timeout=1.0)
+                if latest is None:
+                    if broadcaster.stopped:
                         break
-                    except Exception as send_err:
-                        consecutive_errors += 1
-                        if consecutive_errors < 5:
-                            print(f"⚠ Error sending frame: {send_err}")
-                        if consecutive_errors > 10:
-                            print(f"⚠ Too many send errors, closing connection")
-                            break
-                        time.sleep(0.1)  # Brief pause on error
-                        continue
+                    continue
+                sequence, jpeg = latest
+                if last_sequence > 0:
+                    frames_skipped += sequence - last_sequence - 1  # Stale frames not sent to this client
+                last_sequence = sequence
+                
+                # Send frame
+                try:
+                    self.wfile.write(b'--jpgboundary\r\n')
+                    self.send_header('Content-Type', 'image/jpeg')
+                    self.send_header('Content-Length', str(len(jpeg)))
+                    self.end_headers()
+                    self.wfile.write(jpeg)
+                    self.wfile.write(b'\r\n')
+                    self.wfile.flush()  # Ensure data is sent immediately
                     
-                    time.sleep(0.033)  # ~30 FPS
-                except Exception as frame_err:
+                    frames_sent += 1
+                    consecutive_errors = 0
+                    if frames_sent == 1:
+                        print(f"✓ Streaming server sent first frame ({tier} tier, {len(jpeg)} bytes)")
+                    elif frames_sent % 300 == 0:  # Every 10 seconds at 30fps
+                        print(f"📡 Streaming server: {frames_sent} frames sent ({frames_skipped} stale frames skipped)")
+                except (ConnectionResetError, BrokenPipeError, OSError) as send_err:
+                    # Client disconnected or connection error
+                    print(f"📡 Client disconnected: {send_err}")
+                    break
+                except Exception as send_err:
                     consecutive_errors += 1
                     if consecutive_errors < 5:
-                        print(f"⚠ Error getting frame: {frame_err}")
-                        import traceback
-                        traceback.print_exc()
+                        print(f"⚠ Error sending frame: {send_err}")
                     if consecutive_errors > 10:
-                        print(f"⚠ Too many frame errors, closing connection")
+                        print(f"⚠ Too many send errors, closing connection")
                         break
                     time.sleep(0.1)  # Brief pause on error
                     continue
@@ -203,6 +378,8 @@ class StreamingHandler(BaseHTTPRequestHandler):
             print(f"❌ Streaming server error: {e}")
             import traceback
             traceback.print_exc()
+        finally:
+            broadcaster.unsubscribe(tier)
     
     def _serve_single_frame(self):
         """Serve a single JPEG frame (for browsers that don't support MJPEG streams)"""
@@ -1901,7 +2078,7 @@ class StreamingServer:
     
     def __init__(self, port=8081, frame_provider=None, stats_provider=None,
                  events_provider=None, tracks_provider=None, tactical_provider=None,
-                 video_paths_provider=None):
+                 video_paths_provider=None, stream_tiers=None, stream_fps=30.0):
         """
         Initialize enhanced streaming server
         
@@ -1913,6 +2090,8 @@ class StreamingServer:
             tracks_provider: Callable that returns tracks dict
             tactical_provider: Callable that returns tactical data dict
             video_paths_provider: Callable that returns list of video file paths
+            stream_tiers: MJPEG tiers (name -> {'max_width', 'quality'}), default DEFAULT_STREAM_TIERS
+            stream_fps: Maximum MJPEG frame rate
         """
         self.port = port
         self.frame_provider = frame_provider or (lambda: None)
@@ -1921,6 +2100,7 @@ class StreamingServer:
         self.tracks_provider = tracks_provider or (lambda: {})
         self.tactical_provider = tactical_provider or (lambda: {})
         self.video_paths_provider = video_paths_provider or (lambda: [])
+        self.broadcaster = MJPEGBroadcaster(self.frame_provider, tiers=stream_tiers, target_fps=stream_fps)
         self.server = None
         self.server_thread = None
         self.is_running = False
@@ -1944,6 +2124,7 @@ class StreamingServer:
                 )
             
             self.server = ThreadingHTTPServer(('0.0.0.0', self.port), handler_factory)
+            self.server.broadcaster = self.broadcaster
             self.is_running = True
             
             # Start server in separate thread
@@ -1959,7 +2140,7 @@ class StreamingServer:
             url = self.get_url()
             print(f"🌐 Enhanced streaming server started on port {self.port}")
             print(f"   Web Dashboard: {url}/")
-            print(f"   MJPEG stream: {url}/video")
+            print(f"   MJPEG stream: {url}/video (tiers: {', '.join('?tier=' + t for t in self.broadcaster.tiers)})")
             print(f"   API endpoints: {url}/api/stats, /api/events, /api/tracks, /api/tactical")
             return True
         except Exception as e:
@@ -1973,11 +2154,16 @@ class StreamingServer:
             return
         
         self.is_running = False
+        self.broadcaster.stop()
         if self.server:
             self.server.shutdown()
             self.server.server_close()
             print("⏹️  Streaming server stopped")
     
+    def publish_frame(self, frame):
+        """Push a frame to MJPEG clients (alternative to polling frame_provider)"""
+        return self.broadcaster.publish_frame(frame)
+    
     def get_url(self):
         """Get the base URL for the server"""
         import socket
@@ -12,6 +12,8 @@ import numpy as np
 from typing import Tuple, Optional, Dict, List
 from collections import defaultdict
 
+import box_ops
+
 
 def harmonic_mean(a: float, b: float) -> float:
     """
@@ -61,68 +63,11 @@ def calculate_expansion_iou(
     Returns:
         Expansion IOU value (0.0 to 1.0)
     """
-    x1_1, y1_1, x2_1, y2_1 = box1
-    x1_2, y1_2, x2_2, y2_2 = box2
-    
-    # Calculate center and size
-    cx1 = (x1_1 + x2_1) / 2.0
-    cy1 = (y1_1 + y2_1) / 2.0
-    w1 = x2_1 - x1_1
-    h1 = y2_1 - y1_1
-    
-    cx2 = (x1_2 + x2_2) / 2.0
-    cy2 = (y1_2 + y2_2) / 2.0
-    w2 = x2_2 - x1_2
-    h2 = y2_2 - y1_2
-    
-    # Predict future positions based on velocity
-    if velocity1 is not None:
-        vx1, vy1 = velocity1
-        # Predict center position after time_delta
-        cx1_pred = cx1 + vx1 * time_delta
-        cy1_pred = cy1 + vy1 * time_delta
-        # Expand box based on motion magnitude
-        motion_mag1 = np.sqrt(vx1**2 + vy1**2)
-        expansion1 = motion_mag1 * expansion_factor * time_delta
-        w1_expanded = w1 + expansion1
-        h1_expanded = h1 + expansion1
-    else:
-        cx1_pred = cx1
-        cy1_pred = cy1
-        w1_expanded = w1
-        h1_expanded = h1
-    
-    if velocity2 is not None:
-        vx2, vy2 = velocity2
-        cx2_pred = cx2 + vx2 * time_delta
-        cy2_pred = cy2 + vy2 * time_delta
-        motion_mag2 = np.sqrt(vx2**2 + vy2**2)
-        expansion2 = motion_mag2 * expansion_factor * time_delta
-        w2_expanded = w2 + expansion2
-        h2_expanded = h2 + expansion2
-    else:
-        cx2_pred = cx2
-        cy2_pred = cy2
-        w2_expanded = w2
-        h2_expanded = h2
-    
-    # Create expanded boxes
-    box1_expanded = (
-        cx1_pred - w1_expanded / 2.0,
-        cy1_pred - h1_expanded / 2.0,
-        cx1_pred + w1_expanded / 2.0,
-        cy1_pred + h1_expanded / 2.0
-    )
-    
-    box2_expanded = (
-        cx2_pred - w2_expanded / 2.0,
-        cy2_pred - h2_expanded / 2.0,
-        cx2_pred + w2_expanded / 2.0,
-        cy2_pred + h2_expanded / 2.0
-    )
-    
-    # Calculate standard IOU on expanded boxes
-    return calculate_iou(box1_expanded, box2_expanded)
+    v1 = [velocity1] if velocity1 is not None else None
+    v2 = [velocity2] if velocity2 is not None else None
+    return float(box_ops.expansion_iou_matrix([box1], [box2], v1, v2,
+                                              expansion_factor=expansion_factor,
+                                              time_delta=time_delta)[0, 0])
 
 
 def calculate_iou(
@@ -139,26 +84,7 @@ def calculate_iou(
     Returns:
         IoU value (0.0 to 1.0)
     """
-    x1_1, y1_1, x2_1, y2_1 = box1
-    x1_2, y1_2, x2_2, y2_2 = box2
-    
-    # Calculate intersection
-    x1_i = max(x1_1, x1_2)
-    y1_i = max(y1_1, y1_2)
-    x2_i = min(x2_1, x2_2)
-    y2_i = min(y2_1, y2_2)
-    
-    if x2_i <= x1_i or y2_i <= y1_i:
-        return 0.0
-    
-    intersection = (x2_i - x1_i) * (y2_i - y1_i)
-    
-    # Calculate union
-    area1 = (x2_1 - x1_1) * (y2_1 - y1_1)
-    area2 = (x2_2 - x1_2) * (y2_2 - y1_2)
-    union = area1 + area2 - intersection
-    
-    return intersection / union if union > 0 else 0.0
+    return box_ops.iou(box1, box2)
 
 
 def harmonic_mean_association(
@@ -374,25 +300,32 @@ def match_tracks_with_harmonic_mean(
         List of (detection_idx, track_id, match_score) tuples
     """
     matches = []
+    if len(detections) == 0 or len(tracks) == 0:
+        return matches
+    
+    # PERFORMANCE: All detection/track IoUs in one broadcasted step
+    det_boxes = [det['bbox'] for det in detections]
+    track_boxes = [track['bbox'] for track in tracks]
+    iou_table = box_ops.iou_matrix(det_boxes, track_boxes)
+    if use_expansion_iou and track_velocities:
+        velocities = np.array([track_velocities.get(track['track_id'], (np.nan, np.nan)) for track in tracks],
+                              dtype=np.float64)
+        has_velocity = ~np.isnan(velocities).any(axis=1)
+        if has_velocity.any():
+            # Calculate IOU with expansion for tracks with a known velocity
+            expanded = box_ops.expansion_iou_matrix(det_boxes, track_boxes, velocities2=velocities)
+            iou_table[:, has_velocity] = expanded[:, has_velocity]
     
     for det_idx, det in enumerate(detections):
         best_score = 0.0
         best_track_id = None
         
-        det_bbox = det['bbox']
         det_conf = det.get('confidence', 1.0)
         det_reid = det.get('reid_similarity', 0.0)
         
-        for track in tracks:
+        for track_idx, track in enumerate(tracks):
             track_id = track['track_id']
-            track_bbox = track['bbox']
-            
-            # Calculate IOU (with expansion if enabled)
-            if use_expansion_iou and track_velocities and track_id in track_velocities:
-                velocity = track_velocities[track_id]
-                iou = calculate_expansion_iou(det_bbox, track_bbox, velocity2=velocity)
-            else:
-                iou = calculate_iou(det_bbox, track_bbox)
+            iou = float(iou_table[det_idx, track_idx])
             
             # Get Re-ID similarity if available
             track_reid = track.get('reid_similarity', 0.0)
@@ -0,0 +1,344 @@
+"""
+Analysis Checkpoints
+Periodic snapshots of a long analysis run so it can resume after a crash, OOM or stop
+
+A checkpoint directory next to the output (<output>_checkpoint/) holds:
+    checkpoint.json      resume position, output byte offsets, video segments, run signature
+    state_<frame>.pkl    pickled loop state (tracker, Re-ID track store, name mappings,
+                         analytics accumulators, ...), one entry per variable
+    video_NNNN.mp4       completed output video segments (see SegmentedVideoWriter)
+
+checkpoint.json is replaced atomically and written after the state file it points to,
+so a crash while checkpointing leaves the previous checkpoint intact.
+
+Append-only outputs are rolled back to the checkpoint on resume:
+- CSV: truncated to the byte offset recorded at the checkpoint (truncate_output)
+- Overlay store (.ovl): reopened in append mode at its recorded offset
+- Video: cv2.VideoWriter cannot append, so the video is written as segments that are
+  cut at every checkpoint and joined (FFmpeg stream copy) when the run completes
+"""
+
+import json
+import os
+import pickle
+import shutil
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import cv2
+
+try:
+    from ffmpeg_tools import concat_files, ffmpeg_available
+    FFMPEG_TOOLS_AVAILABLE = True
+except ImportError:
+    FFMPEG_TOOLS_AVAILABLE = False
+
+CHECKPOINT_VERSION = 1
+CHECKPOINT_SUFFIX = '_checkpoint'
+
+
+def checkpoint_dir_for(output_path: str) -> str:
+    """Checkpoint directory used for an analysis output path"""
+    return os.path.splitext(output_path)[0] + CHECKPOINT_SUFFIX
+
+
+def _input_signature(input_path: str) -> Dict[str, Any]:
+    try:
+        stat = os.stat(input_path)
+        return {'path': os.path.abspath(input_path), 'size': stat.st_size, 'mtime': int(stat.st_mtime)}
+    except OSError:
+        return {'path': os.path.abspath(input_path)}
+
+
+class AnalysisCheckpoint:
+    """
+    Save / load checkpoints of one analysis run
+
+    Args:
+        output_path: Analysis output video path (checkpoint directory is derived from it)
+        input_path: Source video (a checkpoint is only resumed for the same file)
+        interval_frames: Frames between checkpoints (0 = only explicit saves)
+        settings: Settings that must match for a checkpoint to be resumed
+                  (e.g. fps, total frames, tracker type); JSON-serializable values
+    """
+
+    def __init__(self, output_path: str, input_path: str, interval_frames: int = 5000,
+                 settings: Optional[Dict[str, Any]] = None):
+        self.directory = checkpoint_dir_for(output_path)
+        self.meta_path = os.path.join(self.directory, 'checkpoint.json')
+        self.interval_frames = max(0, int(interval_frames or 0))
+        self.signature = {'input': _input_signature(input_path), 'settings': settings or {}}
+        self.last_saved_frame = 0
+        self.video_segments: Dict[str, List[str]] = {}  # writer name -> completed segment paths
+
+    def exists(self) -> bool:
+        return os.path.exists(self.meta_path)
+
+    def due(self, frame_count: int) -> bool:
+        """Whether the periodic interval has elapsed since the last checkpoint"""
+        return self.interval_frames > 0 and frame_count - self.last_saved_frame >= self.interval_frames
+
+    def segment_dir(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    # ------------------------------------------------------------------
+    # Save
+    # ------------------------------------------------------------------
+
+    def save(self, frame_count: int, state: Dict[str, Any], outputs: Optional[Dict[str, int]] = None) -> bool:
+        """
+        Write a checkpoint
+
+        Args:
+            frame_count: Frames fully processed and written (resume reads frame frame_count next)
+            state: Loop state; entries that cannot be pickled are skipped (and reported)
+            outputs: Byte offsets of append-only outputs, e.g. {'csv': 1234, 'overlay': 5678}
+
+        Returns:
+            True if the checkpoint was written
+        """
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            blobs = {}
+            skipped = []
+            for name, value in state.items():
+                try:
+                    blobs[name] = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+                except Exception:
+                    skipped.append(name)
+
+            state_file = f"state_{frame_count:09d}.pkl"
+            state_path = os.path.join(self.directory, state_file)
+            with open(state_path + '.tmp', 'wb') as f:
+                pickle.dump(blobs, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(state_path + '.tmp', state_path)
+
+            meta = {
+                'version': CHECKPOINT_VERSION,
+                'created_at': time.time(),
+                'frame_count': int(frame_count),
+                'state_file': state_file,
+                'outputs': {k: int(v) for k, v in (outputs or {}).items()},
+                'video_segments': self.video_segments,
+                'skipped_state': skipped,
+                'signature': self.signature,
+            }
+            with open(self.meta_path + '.tmp', 'w') as f:
+                json.dump(meta, f, indent=2)
+            os.replace(self.meta_path + '.tmp', self.meta_path)
+        except Exception as e:
+            print(f"⚠ Could not write checkpoint at frame {frame_count}: {e}")
+            return False
+
+        # Older state files are no longer referenced
+        for filename in os.listdir(self.directory):
+            if filename.startswith('state_') and filename.endswith('.pkl') and filename != state_file:
+                try:
+                    os.remove(os.path.join(self.directory, filename))
+                except OSError:
+                    pass
+        self.last_saved_frame = frame_count
+        if skipped:
+            print(f"ℹ Checkpoint at frame {frame_count}: not picklable, will be rebuilt on resume: {', '.join(skipped)}")
+        return True
+
+    # ------------------------------------------------------------------
+    # Load
+    # ------------------------------------------------------------------
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        """
+        Latest checkpoint for this run, or None if there is none / it does not match
+
+        Returns:
+            {'frame_count', 'outputs', 'video_segments', 'state', 'skipped_state'}
+        """
+        if not self.exists():
+            return None
+        try:
+            with open(self.meta_path, 'r') as f:
+                meta = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠ Could not read checkpoint {self.meta_path}: {e}")
+            return None
+
+        if meta.get('version') != CHECKPOINT_VERSION:
+            print(f"⚠ Ignoring checkpoint with unsupported version {meta.get('version')}")
+            return None
+        saved = meta.get('signature', {})
+        if saved.get('input') != self.signature['input']:
+            print("⚠ Ignoring checkpoint: it was written for a different input video")
+            return None
+        mismatched = sorted(k for k in set(saved.get('settings', {})) | set(self.signature['settings'])
+                            if saved.get('settings', {}).get(k) != self.signature['settings'].get(k))
+        if mismatched:
+            print(f"⚠ Ignoring checkpoint: settings changed since it was written ({', '.join(mismatched)})")
+            return None
+
+        try:
+            with open(os.path.join(self.directory, meta['state_file']), 'rb') as f:
+                blobs = pickle.load(f)
+        except Exception as e:
+            print(f"⚠ Could not read checkpoint state: {e}")
+            return None
+
+        state = {}
+        skipped = list(meta.get('skipped_state', []))
+        for name, blob in blobs.items():
+            try:
+                state[name] = pickle.loads(blob)
+            except Exception:
+                skipped.append(name)
+
+        self.last_saved_frame = meta['frame_count']
+        self.video_segments = {name: [p for p in paths if os.path.exists(p)]
+                               for name, paths in meta.get('video_segments', {}).items()}
+        return {
+            'frame_count': meta['frame_count'],
+            'outputs': meta.get('outputs', {}),
+            'video_segments': self.video_segments,
+            'state': state,
+            'skipped_state': skipped,
+        }
+
+    def clear(self):
+        """Remove the checkpoint directory (run completed)"""
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+# ----------------------------------------------------------------------
+# Restoring state / outputs
+# ----------------------------------------------------------------------
+
+def restore_in_place(target: Any, saved: Any) -> bool:
+    """
+    Replace the contents of a mutable container with a saved copy, keeping the object
+    identity (so closures and other references keep seeing it)
+
+    Returns:
+        False if target and saved are not compatible containers
+    """
+    if isinstance(target, dict) and isinstance(saved, dict):
+        target.clear()
+        target.update(saved)
+    elif isinstance(target, deque) and isinstance(saved, (deque, list)):
+        target.clear()
+        target.extend(saved)
+    elif isinstance(target, list) and isinstance(saved, list):
+        target[:] = saved
+    elif isinstance(target, set) and isinstance(saved, set):
+        target.clear()
+        target.update(saved)
+    else:
+        return False
+    return True
+
+
+def output_offset(file_obj) -> int:
+    """Bytes of an open append-only output file that are on disk (flushes first)"""
+    file_obj.flush()
+    return os.fstat(file_obj.fileno()).st_size
+
+
+def truncate_output(path: str, offset: int) -> bool:
+    """Cut an append-only output back to a checkpoint offset (drops rows written after it)"""
+    try:
+        if not os.path.exists(path) or os.path.getsize(path) < offset:
+            print(f"⚠ {path} is shorter than its checkpoint offset - cannot resume it")
+            return False
+        with open(path, 'r+b') as f:
+            f.truncate(offset)
+        return True
+    except OSError as e:
+        print(f"⚠ Could not roll back {path}: {e}")
+        return False
+
+
+# ----------------------------------------------------------------------
+# Video output
+# ----------------------------------------------------------------------
+
+class SegmentedVideoWriter:
+    """
+    cv2.VideoWriter stand-in that writes the output as segments
+
+    cut() closes the current segment (at a checkpoint, so it is a complete playable
+    file) and starts the next one; join() concatenates all segments into output_path.
+    A crash only loses the open segment, which is re-rendered on resume.
+    """
+
+    def __init__(self, output_path: str, fourcc: int, fps: float, frame_size: Tuple[int, int],
+                 segment_dir: str, segments: Optional[Sequence[str]] = None):
+        self.output_path = output_path
+        self.fourcc = fourcc
+        self.fps = fps
+        self.frame_size = frame_size
+        self.segment_dir = segment_dir
+        self.segments: List[str] = list(segments or [])
+        self.extension = os.path.splitext(output_path)[1] or '.mp4'
+        os.makedirs(segment_dir, exist_ok=True)
+        self._writer = None
+        self._frames_in_segment = 0
+        self._open_segment()
+
+    def _segment_path(self, index: int) -> str:
+        return os.path.join(self.segment_dir, f"video_{index:04d}{self.extension}")
+
+    def _open_segment(self):
+        self._current_path = self._segment_path(len(self.segments))
+        self._writer = cv2.VideoWriter(self._current_path, self.fourcc, self.fps, self.frame_size)
+        self._frames_in_segment = 0
+
+    def isOpened(self) -> bool:
+        return self._writer is not None and self._writer.isOpened()
+
+    def write(self, frame):
+        self._writer.write(frame)
+        self._frames_in_segment += 1
+
+    def cut(self) -> List[str]:
+        """Finish the current segment and start a new one; returns the completed segments"""
+        if self._writer is not None and self._frames_in_segment > 0:
+            self._writer.release()
+            self.segments.append(self._current_path)
+            self._open_segment()
+        return list(self.segments)
+
+    def release(self):
+        """Close the open segment (cv2.VideoWriter API; call join() to build the output)"""
+        if self._writer is not None:
+            self._writer.release()
+            self._writer = None
+            if self._frames_in_segment > 0:
+                self.segments.append(self._current_path)
+            elif os.path.exists(self._current_path):
+                os.remove(self._current_path)
+
+    def join(self) -> bool:
+        """Concatenate all segments into output_path"""
+        self.release()
+        if not self.segments:
+            return False
+        if len(self.segments) == 1:
+            shutil.move(self.segments[0], self.output_path)
+            return True
+        if FFMPEG_TOOLS_AVAILABLE and ffmpeg_available() and concat_files(self.segments, self.output_path):
+            return True
+
+        # No FFmpeg: re-encode the segments into one file with OpenCV
+        print(f"ℹ Joining {len(self.segments)} video segments with OpenCV (install FFmpeg for a lossless join)")
+        writer = cv2.VideoWriter(self.output_path, self.fourcc, self.fps, self.frame_size)
+        if not writer.isOpened():
+            print(f"⚠ Could not open {self.output_path} to join video segments (kept in {self.segment_dir})")
+            return False
+        for path in self.segments:
+            cap = cv2.VideoCapture(path)
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                writer.write(frame)
+            cap.release()
+        writer.release()
+        return True
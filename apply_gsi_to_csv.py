@@ -14,7 +14,7 @@ import sys
 from pathlib import Path
 
 try:
-    from gsi_smoothing import apply_gsi_to_csv, SKLEARN_AVAILABLE
+    from gsi_smoothing import apply_gsi_to_csv, GSI_AVAILABLE
 except ImportError:
     print("❌ Error: Could not import gsi_smoothing module")
     print("   Make sure gsi_smoothing.py is in the same directory")
@@ -56,10 +56,9 @@ Parameters:
     
     args = parser.parse_args()
     
-    # Check if sklearn is available
-    if not SKLEARN_AVAILABLE:
-        print("❌ Error: sklearn is not available")
-        print("   Install with: pip install scikit-learn")
+    # Check if GSI smoothing is available
+    if not GSI_AVAILABLE:
+        print("❌ Error: GSI smoothing is not available")
         sys.exit(1)
     
     # Check if input file exists
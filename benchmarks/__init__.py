@@ -0,0 +1 @@
+"""Pipeline benchmarks on synthetic fixtures (see run_benchmarks.py)"""
@@ -0,0 +1,302 @@
+"""
+Synthetic Benchmark Fixtures
+Deterministic inputs for the pipeline benchmarks (same seed -> same bytes)
+
+- SyntheticScene: players moving on a pitch (two teams) and a ball passed between them
+- render_frame() / write_video(): rendered pitch video with player blobs, jerseys and ball
+- write_tracking_csv(): tracking CSV in the legacy combined_analysis_optimized layout
+- make_gallery() / make_query_features(): player gallery with N players and noisy queries
+- make_overlay_metadata(): overlay metadata for OverlayRenderer
+"""
+
+import csv
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+# Jersey / ball colours in HSV (OpenCV ranges), chosen inside the ranges of team_colors_config()
+# and the default ball colour config, so colour-based stages do real work on the fixtures
+TEAM_JERSEY_HSV = ((0, 200, 200), (19, 150, 240))
+BALL_HSV = (125, 80, 240)
+PITCH_BGR = (40, 120, 40)
+LINE_BGR = (235, 235, 235)
+
+PLAYER_BOX_SIZE = (40, 90)  # (width, height) in pixels at 1080p
+BALL_RADIUS = 7
+
+
+def hsv_to_bgr(hsv: Tuple[int, int, int]) -> Tuple[int, int, int]:
+    """Single HSV colour (OpenCV ranges) to a BGR tuple"""
+    bgr = cv2.cvtColor(np.uint8([[hsv]]), cv2.COLOR_HSV2BGR)[0, 0]
+    return tuple(int(c) for c in bgr)
+
+
+@dataclass
+class SyntheticScene:
+    """Ground truth of a synthetic match clip"""
+    width: int
+    height: int
+    fps: float
+    player_centers: np.ndarray  # (n_frames, n_players, 2) float, pixel centers
+    player_teams: np.ndarray  # (n_players,) int, 0 or 1
+    ball_centers: np.ndarray  # (n_frames, 2) float
+    possessor: np.ndarray  # (n_frames,) int, player with the ball (-1 while a pass is in flight)
+    box_size: Tuple[int, int]
+
+    @property
+    def n_frames(self) -> int:
+        return self.player_centers.shape[0]
+
+    @property
+    def n_players(self) -> int:
+        return self.player_centers.shape[1]
+
+    def player_boxes(self, frame_num: int) -> np.ndarray:
+        """(n_players, 4) x1, y1, x2, y2 boxes for one frame"""
+        centers = self.player_centers[frame_num]
+        half = np.array(self.box_size, dtype=float) / 2.0
+        return np.hstack([centers - half, centers + half])
+
+
+def make_scene(n_frames: int = 300, n_players: int = 22, width: int = 1920, height: int = 1080,
+               fps: float = 30.0, seed: int = 0) -> SyntheticScene:
+    """
+    Simulate players and ball
+
+    Players follow smoothed random walks inside the pitch. The ball stays at the feet of
+    its possessor and is passed to another player every 1-2 seconds (0.5 s in flight).
+    """
+    rng = np.random.default_rng(seed)
+    scale = height / 1080.0
+    box_size = (max(8, int(PLAYER_BOX_SIZE[0] * scale)), max(16, int(PLAYER_BOX_SIZE[1] * scale)))
+    margin = np.array([box_size[0], box_size[1]], dtype=float)
+    low, high = margin, np.array([width, height], dtype=float) - margin
+
+    # Smoothed random walk (velocity is an AR(1) process)
+    positions = rng.uniform(low, high, size=(n_players, 2))
+    velocity = np.zeros((n_players, 2))
+    player_centers = np.empty((n_frames, n_players, 2))
+    max_speed = 6.0 * scale
+    for f in range(n_frames):
+        velocity = 0.9 * velocity + rng.normal(0.0, 0.6 * scale, size=(n_players, 2))
+        velocity = np.clip(velocity, -max_speed, max_speed)
+        positions = positions + velocity
+        bounced = (positions < low) | (positions > high)
+        velocity[bounced] *= -1
+        positions = np.clip(positions, low, high)
+        player_centers[f] = positions
+
+    player_teams = np.arange(n_players) % 2
+
+    # Ball: possession spells and passes
+    ball_centers = np.empty((n_frames, 2))
+    possessor = np.full(n_frames, -1, dtype=np.int64)
+    foot_offset = np.array([0.0, box_size[1] / 2.0 - BALL_RADIUS])
+    holder = 0
+    f = 0
+    flight = max(1, int(0.5 * fps))
+    while f < n_frames:
+        hold = int(rng.uniform(1.0, 2.0) * fps)
+        end = min(n_frames, f + hold)
+        ball_centers[f:end] = player_centers[f:end, holder] + foot_offset
+        possessor[f:end] = holder
+        f = end
+        if f >= n_frames:
+            break
+        receiver = int(rng.integers(0, n_players - 1)) if n_players > 1 else holder
+        if receiver >= holder and n_players > 1:
+            receiver += 1
+        end = min(n_frames, f + flight)
+        start_pos = ball_centers[f - 1]
+        for k in range(f, end):
+            t = (k - f + 1) / flight
+            ball_centers[k] = (1 - t) * start_pos + t * (player_centers[k, receiver] + foot_offset)
+        f = end
+        holder = receiver
+
+    return SyntheticScene(width, height, fps, player_centers, player_teams, ball_centers,
+                          possessor, box_size)
+
+
+def _pitch_background(width: int, height: int) -> np.ndarray:
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    frame[:] = PITCH_BGR
+    # Alternating mowing stripes
+    stripe = max(1, width // 16)
+    for x in range(0, width, 2 * stripe):
+        frame[:, x:x + stripe] = (45, 130, 45)
+    thickness = max(1, height // 270)
+    cv2.rectangle(frame, (width // 20, height // 20), (width - width // 20, height - height // 20),
+                  LINE_BGR, thickness)
+    cv2.line(frame, (width // 2, height // 20), (width // 2, height - height // 20), LINE_BGR, thickness)
+    cv2.circle(frame, (width // 2, height // 2), height // 8, LINE_BGR, thickness)
+    return frame
+
+
+def render_frame(scene: SyntheticScene, frame_num: int, background: Optional[np.ndarray] = None) -> np.ndarray:
+    """Render one frame: pitch, players (shorts + jersey blobs) and ball"""
+    frame = (background if background is not None else _pitch_background(scene.width, scene.height)).copy()
+    jersey_bgr = [hsv_to_bgr(hsv) for hsv in TEAM_JERSEY_HSV]
+    w, h = scene.box_size
+    for p, (cx, cy) in enumerate(scene.player_centers[frame_num]):
+        x1, y1 = int(cx - w / 2), int(cy - h / 2)
+        # Head, jersey, shorts, legs
+        cv2.circle(frame, (int(cx), y1 + h // 10), max(2, h // 12), (140, 170, 210), -1)
+        cv2.rectangle(frame, (x1, y1 + h // 5), (x1 + w, y1 + h // 2), jersey_bgr[scene.player_teams[p]], -1)
+        cv2.rectangle(frame, (x1 + w // 8, y1 + h // 2), (x1 + w - w // 8, y1 + 2 * h // 3), (30, 30, 30), -1)
+        cv2.rectangle(frame, (x1 + w // 4, y1 + 2 * h // 3), (x1 + 3 * w // 4, y1 + h), (200, 200, 200), -1)
+    bx, by = scene.ball_centers[frame_num]
+    radius = max(2, int(BALL_RADIUS * scene.height / 1080.0))
+    cv2.circle(frame, (int(bx), int(by)), radius, hsv_to_bgr(BALL_HSV), -1)
+    return frame
+
+
+def render_frames(scene: SyntheticScene, n_frames: Optional[int] = None) -> List[np.ndarray]:
+    """Render the first n_frames frames in memory"""
+    background = _pitch_background(scene.width, scene.height)
+    count = scene.n_frames if n_frames is None else min(n_frames, scene.n_frames)
+    return [render_frame(scene, f, background) for f in range(count)]
+
+
+def write_video(scene: SyntheticScene, path: str, codec: str = 'mp4v') -> str:
+    """Render the whole scene to a video file"""
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*codec), scene.fps, (scene.width, scene.height))
+    if not writer.isOpened():
+        raise RuntimeError(f"Could not open video writer for {path}")
+    background = _pitch_background(scene.width, scene.height)
+    for f in range(scene.n_frames):
+        writer.write(render_frame(scene, f, background))
+    writer.release()
+    return path
+
+
+def read_frames(path: str, max_frames: Optional[int] = None) -> List[np.ndarray]:
+    """Decode frames of a video (so stages see real codec artifacts)"""
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while max_frames is None or len(frames) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def team_colors_config() -> Dict:
+    """Team colour configuration (team_color_config.json layout) matching the rendered jerseys"""
+    return {
+        "team_colors": {
+            "team1": {
+                "name": "Team 1",
+                "hsv_ranges": {"lower1": [0, 128, 57], "upper1": [10, 255, 255],
+                               "lower2": [170, 128, 57], "upper2": [180, 255, 255]},
+                "tracker_color_bgr": [0, 0, 255]
+            },
+            "team2": {
+                "name": "Team 2",
+                "hsv_ranges": {"lower": [9, 42, 224], "upper": [29, 255, 255]},
+                "tracker_color_bgr": [0, 165, 255]
+            }
+        }
+    }
+
+
+def player_name(p: int) -> str:
+    return f"Player {p + 1:02d}"
+
+
+def write_tracking_csv(scene: SyntheticScene, path: str) -> str:
+    """
+    Write the scene as a tracking CSV (legacy layout: one row per player per frame,
+    ball columns repeated, metadata comment lines after the header)
+    """
+    w, h = scene.box_size
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['frame', 'timestamp', 'ball_x', 'ball_y', 'ball_detected',
+                         'player_id', 'player_name', 'player_x', 'player_y',
+                         'possession_player_id', 'team', 'confidence', 'x1', 'y1', 'x2', 'y2'])
+        f.write(f"# Video Resolution: {scene.width}x{scene.height} pixels\n")
+        f.write(f"# Video FPS: {scene.fps:.3f}\n")
+        for frame_num in range(scene.n_frames):
+            bx, by = scene.ball_centers[frame_num]
+            holder = int(scene.possessor[frame_num])
+            timestamp = frame_num / scene.fps
+            rows = []
+            for p, (px, py) in enumerate(scene.player_centers[frame_num]):
+                rows.append([frame_num, f"{timestamp:.3f}", f"{bx:.1f}", f"{by:.1f}", True,
+                             p + 1, player_name(p), f"{px:.1f}", f"{py:.1f}",
+                             holder + 1 if holder >= 0 else '', f"team{scene.player_teams[p] + 1}", 0.9,
+                             f"{px - w / 2:.1f}", f"{py - h / 2:.1f}", f"{px + w / 2:.1f}", f"{py + h / 2:.1f}"])
+            writer.writerows(rows)
+    return path
+
+
+def tracking_array(scene: SyntheticScene, dropout: float = 0.05, seed: int = 0) -> np.ndarray:
+    """[frame, track_id, x, y, w, h] rows (GSI input layout) with a fraction of rows dropped"""
+    rng = np.random.default_rng(seed)
+    frames, players = np.meshgrid(np.arange(scene.n_frames), np.arange(scene.n_players), indexing='ij')
+    centers = scene.player_centers.reshape(-1, 2) + rng.normal(0, 2.0, size=(frames.size, 2))
+    w, h = scene.box_size
+    data = np.column_stack([frames.ravel(), players.ravel() + 1,
+                            centers[:, 0] - w / 2, centers[:, 1] - h / 2,
+                            np.full(frames.size, w, dtype=float), np.full(frames.size, h, dtype=float)])
+    return data[rng.random(len(data)) >= dropout]
+
+
+def make_embeddings(n: int, dim: int = 512, seed: int = 0) -> np.ndarray:
+    """(n, dim) float32 L2-normalized random embeddings"""
+    rng = np.random.default_rng(seed)
+    emb = rng.normal(size=(n, dim)).astype(np.float32)
+    return emb / np.linalg.norm(emb, axis=1, keepdims=True)
+
+
+def make_query_features(gallery_embeddings: np.ndarray, n_queries: int, noise: float = 0.3,
+                        seed: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+    """Noisy copies of gallery embeddings -> (queries (n, dim), true gallery index (n,))"""
+    rng = np.random.default_rng(seed)
+    targets = rng.integers(0, len(gallery_embeddings), size=n_queries)
+    queries = gallery_embeddings[targets] + rng.normal(0, noise / np.sqrt(gallery_embeddings.shape[1]),
+                                                       size=(n_queries, gallery_embeddings.shape[1]))
+    queries = queries.astype(np.float32)
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True), targets
+
+
+def make_gallery(gallery_path: str, n_players: int, dim: int = 512, seed: int = 0):
+    """PlayerGallery at gallery_path with n_players synthetic players -> (gallery, embeddings)"""
+    from player_gallery import PlayerGallery
+
+    embeddings = make_embeddings(n_players, dim, seed)
+    gallery = PlayerGallery(gallery_path=gallery_path)
+    for p in range(n_players):
+        gallery.add_player(player_name(p), embeddings[p], jersey_number=str(p + 1),
+                           team=f"team{p % 2 + 1}")
+    return gallery, embeddings
+
+
+def make_overlay_metadata(scene: SyntheticScene, video_path: str = "synthetic.mp4"):
+    """OverlayMetadata with player boxes and ball for every frame of the scene"""
+    from overlay_metadata import OverlayMetadata
+
+    metadata = OverlayMetadata(video_path, scene.fps, scene.n_frames)
+    colors = [list(hsv_to_bgr(hsv)) for hsv in TEAM_JERSEY_HSV]
+    for frame_num in range(scene.n_frames):
+        boxes = scene.player_boxes(frame_num)
+        players = []
+        for p, box in enumerate(boxes):
+            cx, cy = scene.player_centers[frame_num, p]
+            players.append({
+                "track_id": p + 1,
+                "bbox": [float(v) for v in box],
+                "center": (float(cx), float(cy)),
+                "color": colors[scene.player_teams[p]],
+                "player_name": player_name(p),
+                "team": f"team{scene.player_teams[p] + 1}",
+                "has_ball": int(scene.possessor[frame_num]) == p,
+            })
+        bx, by = scene.ball_centers[frame_num]
+        metadata.add_frame_overlay(frame_num, players, ball={"center": (float(bx), float(by)), "detected": True})
+    return metadata
@@ -0,0 +1,485 @@
+"""
+Pipeline Benchmark Runner
+Times the hot stages of the analysis pipeline in isolation on synthetic fixtures
+
+Usage:
+    python -m benchmarks.run_benchmarks --output bench_results.json
+    python -m benchmarks.run_benchmarks --stages gaussian_smooth,match_player --players 22
+    python -m benchmarks.run_benchmarks --output new.json --compare baseline.json --threshold 0.15
+
+Every stage gets identical inputs for identical settings (fixtures are seeded), runs
+one warm-up pass and then --repeats timed passes. Results (per-pass times, median,
+per-unit cost, environment and git commit) are written as JSON; with --compare, stages
+whose median got slower than --threshold are reported and the exit code is 1.
+
+Stages whose module cannot be imported in the current environment (e.g. no torch for
+ReIDTracker) are recorded as "skipped" with the reason instead of failing the run.
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from benchmarks import fixtures  # noqa: E402
+
+RESULTS_SCHEMA_VERSION = 1
+
+
+class StageSkipped(Exception):
+    """Stage cannot run in this environment (missing optional dependency)"""
+
+
+@contextlib.contextmanager
+def _quiet():
+    """Silence the pipeline's progress prints (they would dominate small stages)"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+class BenchmarkContext:
+    """Shared, lazily built fixtures for one benchmark run"""
+
+    def __init__(self, args, work_dir: str):
+        self.args = args
+        self.work_dir = work_dir
+        self._cache: Dict[str, Any] = {}
+
+    def _cached(self, key: str, build: Callable[[], Any]) -> Any:
+        if key not in self._cache:
+            self._cache[key] = build()
+        return self._cache[key]
+
+    @property
+    def scene(self) -> fixtures.SyntheticScene:
+        """Short clip at full resolution (frame-level stages)"""
+        a = self.args
+        return self._cached('scene', lambda: fixtures.make_scene(
+            a.frames, a.players, a.width, a.height, a.fps, a.seed))
+
+    @property
+    def long_scene(self) -> fixtures.SyntheticScene:
+        """Long clip (CSV / smoothing / event stages; positions only, never rendered)"""
+        a = self.args
+        return self._cached('long_scene', lambda: fixtures.make_scene(
+            a.csv_frames, a.players, a.width, a.height, a.fps, a.seed))
+
+    @property
+    def video_path(self) -> str:
+        return self._cached('video', lambda: fixtures.write_video(
+            self.scene, os.path.join(self.work_dir, 'synthetic_pitch.mp4')))
+
+    @property
+    def frames(self) -> List[np.ndarray]:
+        return self._cached('frames', lambda: fixtures.read_frames(self.video_path, self.args.frames))
+
+    @property
+    def tracking_csv(self) -> str:
+        return self._cached('tracking_csv', lambda: fixtures.write_tracking_csv(
+            self.long_scene, os.path.join(self.work_dir, 'synthetic_tracking_data.csv')))
+
+
+# ----------------------------------------------------------------------
+# Stages: setup(ctx) -> (run, units, unit); run() performs one timed pass
+# ----------------------------------------------------------------------
+
+def _import_or_skip(module: str, attr: Optional[str] = None):
+    try:
+        with _quiet():
+            mod = __import__(module, fromlist=[attr] if attr else [])
+    except Exception as e:  # SyntaxError / missing deps in optional modules
+        raise StageSkipped(f"cannot import {module}: {type(e).__name__}: {e}")
+    if attr is None:
+        return mod
+    if not hasattr(mod, attr):
+        raise StageSkipped(f"{module} has no attribute {attr}")
+    return getattr(mod, attr)
+
+
+def stage_track_ball_in_frame(ctx: BenchmarkContext):
+    track_ball_in_frame = _import_or_skip('combined_analysis_optimized', 'track_ball_in_frame')
+    frames = ctx.frames
+
+    def run():
+        pts = deque(maxlen=64)
+        for frame_num, frame in enumerate(frames):
+            track_ball_in_frame(frame, pts, fps=ctx.args.fps, frame_num=frame_num,
+                                field_calibration={}, show_trail=False)
+
+    return run, len(frames), 'frame'
+
+
+def stage_classify_player_team(ctx: BenchmarkContext):
+    classify_player_team = _import_or_skip('combined_analysis_optimized', 'classify_player_team')
+    frames = ctx.frames
+    boxes = [ctx.scene.player_boxes(f).astype(int).tolist() for f in range(len(frames))]
+    team_colors = fixtures.team_colors_config()
+
+    def run():
+        for frame, frame_boxes in zip(frames, boxes):
+            for bbox in frame_boxes:
+                classify_player_team(frame, bbox, team_colors)
+
+    return run, sum(len(b) for b in boxes), 'player'
+
+
+def stage_match_player(ctx: BenchmarkContext):
+    _import_or_skip('player_gallery', 'PlayerGallery')
+    with _quiet():
+        gallery, embeddings = fixtures.make_gallery(os.path.join(ctx.work_dir, 'bench_gallery.json'),
+                                                    ctx.args.gallery_size, ctx.args.feature_dim, ctx.args.seed)
+    queries, _ = fixtures.make_query_features(embeddings, ctx.args.queries, seed=ctx.args.seed + 1)
+
+    def run():
+        for query in queries:
+            gallery.match_player(query, suppress_diagnostics=True)
+
+    return run, len(queries), 'query'
+
+
+def stage_reid_update_tracks(ctx: BenchmarkContext):
+    ReIDTracker = _import_or_skip('reid_tracker', 'ReIDTracker')
+    scene = ctx.scene
+    dim = ctx.args.feature_dim
+    base = fixtures.make_embeddings(scene.n_players, dim, ctx.args.seed)
+    rng = np.random.default_rng(ctx.args.seed + 2)
+    features = [(base + rng.normal(0, 0.05, size=base.shape)).astype(np.float32) for _ in range(scene.n_frames)]
+    track_ids = list(range(1, scene.n_players + 1))
+
+    def run():
+        with _quiet():
+            tracker = ReIDTracker(feature_dim=dim, use_torchreid=False, use_boxmot_backend=False, device='cpu')
+        for frame_num in range(scene.n_frames):
+            tracker.update_tracks(track_ids, features[frame_num], frame_num=frame_num,
+                                  confidences=np.full(scene.n_players, 0.9),
+                                  positions=scene.player_centers[frame_num])
+
+    return run, scene.n_frames, 'frame'
+
+
+def _load_csv_exporter():
+    """
+    CSVExporter loaded straight from csv_exporter.py. Importing it through the SoccerID /
+    soccer_analysis packages runs their __init__s, which pull in analyzer modules that do
+    not import cleanly. Those packages (and the legacy combined_analysis_optimized fallback)
+    are hidden while the module runs, so it falls back to its built-in unit conversions.
+    """
+    blocked = ('SoccerID', 'soccer_analysis', 'combined_analysis_optimized')
+    last_error = None
+    for package in ('SoccerID', 'soccer_analysis'):
+        path = os.path.join(REPO_ROOT, package, 'analysis', 'output', 'csv_exporter.py')
+        if not os.path.exists(path):
+            continue
+        saved = {name: sys.modules[name] for name in blocked if name in sys.modules}
+        sys.modules.update({name: None for name in blocked})  # None makes the import raise ImportError
+        try:
+            spec = importlib.util.spec_from_file_location(f'bench_{package.lower()}_csv_exporter', path)
+            module = importlib.util.module_from_spec(spec)
+            with _quiet():
+                spec.loader.exec_module(module)
+            return module.CSVExporter
+        except Exception as e:
+            last_error = e
+        finally:
+            for name in blocked:
+                sys.modules.pop(name, None)
+            sys.modules.update(saved)
+    raise StageSkipped(f"cannot load CSVExporter: {type(last_error).__name__}: {last_error}")
+
+
+def stage_csv_write_frame_data(ctx: BenchmarkContext):
+    CSVExporter = _load_csv_exporter()
+    scene = ctx.long_scene
+    names = {str(p + 1): fixtures.player_name(p) for p in range(scene.n_players)}
+    analytics = {name: {'player_speed_mps': 3.2, 'distance_traveled_m': 120.0} for name in names.values()}
+    centers = [{p + 1: (float(x), float(y)) for p, (x, y) in enumerate(scene.player_centers[f])}
+               for f in range(scene.n_frames)]
+    output_path = os.path.join(ctx.work_dir, 'bench_export.csv')
+
+    def run():
+        exporter = CSVExporter(write_columnar=False)
+        with _quiet():
+            exporter.initialize_csv(output_path, metadata={'fps': scene.fps})
+            for frame_num in range(scene.n_frames):
+                bx, by = scene.ball_centers[frame_num]
+                exporter.write_frame_data(
+                    {'frame_num': frame_num, 'timestamp': frame_num / scene.fps,
+                     'ball_center': (float(bx), float(by)), 'ball_detected': True},
+                    centers[frame_num], names, analytics, {}, width=scene.width, height=scene.height)
+            exporter.close()
+
+    return run, scene.n_frames, 'frame'
+
+
+def _event_detector(ctx: BenchmarkContext):
+    EventDetector = _import_or_skip('event_detector', 'EventDetector')
+    detector = EventDetector(ctx.tracking_csv, fps=ctx.args.fps)
+    with _quiet():
+        if not detector.load_tracking_data():
+            raise StageSkipped("EventDetector could not load the synthetic CSV")
+    return EventDetector, detector
+
+
+def stage_event_load(ctx: BenchmarkContext):
+    EventDetector, _ = _event_detector(ctx)
+
+    def run():
+        with _quiet():
+            EventDetector(ctx.tracking_csv, fps=ctx.args.fps).load_tracking_data()
+
+    return run, ctx.long_scene.n_frames, 'frame'
+
+
+def stage_event_detect_passes(ctx: BenchmarkContext):
+    _, detector = _event_detector(ctx)
+
+    def run():
+        detector.events = []
+        with _quiet():
+            detector.detect_passes()
+
+    return run, ctx.long_scene.n_frames, 'frame'
+
+
+def stage_event_detect_shots(ctx: BenchmarkContext):
+    _, detector = _event_detector(ctx)
+
+    def run():
+        detector.events = []
+        with _quiet():
+            detector.detect_shots(goal_area_x=(0.0, 0.1), goal_area_y=(0.35, 0.65))
+
+    return run, ctx.long_scene.n_frames, 'frame'
+
+
+def stage_gaussian_smooth(ctx: BenchmarkContext):
+    gaussian_smooth = _import_or_skip('gsi_smoothing', 'gaussian_smooth')
+    data = fixtures.tracking_array(ctx.long_scene, seed=ctx.args.seed)
+
+    def run():
+        gaussian_smooth(data, tau=10, workers=1)
+
+    return run, len(data), 'row'
+
+
+def stage_overlay_render_frame(ctx: BenchmarkContext):
+    OverlayRenderer = _import_or_skip('overlay_renderer', 'OverlayRenderer')
+    _import_or_skip('overlay_metadata', 'OverlayMetadata')
+    metadata = fixtures.make_overlay_metadata(ctx.scene)
+    with _quiet():
+        renderer = OverlayRenderer(metadata)
+    frames = ctx.frames
+
+    def run():
+        with _quiet():
+            for frame_num, frame in enumerate(frames):
+                renderer.render_frame(frame, frame_num)
+
+    return run, len(frames), 'frame'
+
+
+STAGES: Dict[str, Callable] = {
+    'track_ball_in_frame': stage_track_ball_in_frame,
+    'classify_player_team': stage_classify_player_team,
+    'match_player': stage_match_player,
+    'reid_update_tracks': stage_reid_update_tracks,
+    'csv_write_frame_data': stage_csv_write_frame_data,
+    'event_load': stage_event_load,
+    'event_detect_passes': stage_event_detect_passes,
+    'event_detect_shots': stage_event_detect_shots,
+    'gaussian_smooth': stage_gaussian_smooth,
+    'overlay_render_frame': stage_overlay_render_frame,
+}
+
+
+# ----------------------------------------------------------------------
+# Running / reporting
+# ----------------------------------------------------------------------
+
+def run_stage(name: str, ctx: BenchmarkContext, repeats: int, warmup: int = 1) -> Dict[str, Any]:
+    """Set up and time one stage -> result dict"""
+    result: Dict[str, Any] = {'name': name}
+    try:
+        run, units, unit = STAGES[name](ctx)
+        for _ in range(warmup):
+            run()
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            run()
+            times.append(time.perf_counter() - start)
+    except StageSkipped as e:
+        result.update(status='skipped', reason=str(e))
+        return result
+    except Exception as e:
+        result.update(status='error', reason=f"{type(e).__name__}: {e}")
+        return result
+
+    median = statistics.median(times)
+    result.update(
+        status='ok',
+        units=units,
+        unit=unit,
+        repeats=repeats,
+        times_s=times,
+        min_s=min(times),
+        median_s=median,
+        mean_s=statistics.fmean(times),
+        per_unit_ms=(median / units * 1000.0) if units else None,
+        throughput_per_s=(units / median) if median > 0 else None,
+    )
+    return result
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO_ROOT, capture_output=True,
+                             text=True, timeout=10)
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def _environment() -> Dict[str, Any]:
+    import cv2
+    env = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'opencv': cv2.__version__,
+    }
+    for module in ('pandas', 'scipy', 'torch', 'pyarrow'):
+        try:
+            env[module] = __import__(module).__version__
+        except Exception:
+            env[module] = None
+    return env
+
+
+def compare_results(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """Per-stage median ratio current/baseline for stages that ran in both"""
+    rows = []
+    for name, cur in current['results'].items():
+        base = baseline.get('results', {}).get(name)
+        if not base or cur.get('status') != 'ok' or base.get('status') != 'ok':
+            continue
+        if cur.get('units') != base.get('units'):
+            rows.append({'name': name, 'ratio': None, 'regression': False,
+                         'note': 'different workload size - not compared'})
+            continue
+        ratio = cur['median_s'] / base['median_s'] if base['median_s'] > 0 else None
+        rows.append({'name': name, 'ratio': ratio, 'regression': ratio is not None and ratio > 1.0 + threshold,
+                     'baseline_median_s': base['median_s'], 'median_s': cur['median_s']})
+    return rows
+
+
+def _print_results(results: Dict[str, Dict[str, Any]]):
+    print(f"{'stage':<24} {'status':<8} {'median':>10} {'per unit':>14} {'throughput':>16}")
+    for name, r in results.items():
+        if r['status'] != 'ok':
+            print(f"{name:<24} {r['status']:<8} {r.get('reason', '')}")
+            continue
+        per_unit = f"{r['per_unit_ms']:.3f} ms/{r['unit']}" if r['per_unit_ms'] is not None else '-'
+        throughput = f"{r['throughput_per_s']:.1f} {r['unit']}/s" if r['throughput_per_s'] else '-'
+        print(f"{name:<24} {'ok':<8} {r['median_s']:>9.3f}s {per_unit:>14} {throughput:>16}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the analysis pipeline's hot stages on synthetic data")
+    parser.add_argument('--stages', default='all', help=f"Comma-separated stages or 'all' ({', '.join(STAGES)})")
+    parser.add_argument('--frames', type=int, default=120, help='Rendered video frames (frame-level stages)')
+    parser.add_argument('--csv-frames', type=int, default=3000, help='Frames in the synthetic tracking CSV')
+    parser.add_argument('--players', type=int, default=22, help='Players on the pitch')
+    parser.add_argument('--gallery-size', type=int, default=50, help='Players in the synthetic gallery')
+    parser.add_argument('--queries', type=int, default=500, help='Gallery match queries per pass')
+    parser.add_argument('--feature-dim', type=int, default=512, help='Re-ID embedding dimension')
+    parser.add_argument('--width', type=int, default=1920)
+    parser.add_argument('--height', type=int, default=1080)
+    parser.add_argument('--fps', type=float, default=30.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeats', type=int, default=3, help='Timed passes per stage')
+    parser.add_argument('--output', default='bench_results.json', help='Results JSON path')
+    parser.add_argument('--compare', help='Baseline results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.15,
+                        help='Relative median slowdown reported as a regression (default 0.15 = 15%%)')
+    parser.add_argument('--work-dir', help='Keep generated fixtures here (default: temporary directory)')
+    args = parser.parse_args(argv)
+
+    names = list(STAGES) if args.stages == 'all' else [s.strip() for s in args.stages.split(',') if s.strip()]
+    unknown = [n for n in names if n not in STAGES]
+    if unknown:
+        parser.error(f"Unknown stages: {unknown} (available: {', '.join(STAGES)})")
+
+    config = {k: v for k, v in vars(args).items() if k not in ('output', 'compare', 'work_dir', 'stages')}
+    with contextlib.ExitStack() as stack:
+        if args.work_dir:
+            os.makedirs(args.work_dir, exist_ok=True)
+            work_dir = args.work_dir
+        else:
+            work_dir = stack.enter_context(tempfile.TemporaryDirectory(prefix='soccer_bench_'))
+        # Stages read config files relative to the working directory - run from the repo root
+        cwd = os.getcwd()
+        os.chdir(REPO_ROOT)
+        try:
+            ctx = BenchmarkContext(args, work_dir)
+            results = {}
+            for name in names:
+                print(f"→ {name}...", flush=True)
+                results[name] = run_stage(name, ctx, args.repeats)
+        finally:
+            os.chdir(cwd)
+
+    report = {
+        'schema_version': RESULTS_SCHEMA_VERSION,
+        'created_at': datetime.now().isoformat(),
+        'git_commit': _git_commit(),
+        'environment': _environment(),
+        'config': config,
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print()
+    _print_results(results)
+    print(f"\n✓ Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        rows = compare_results(report, baseline, args.threshold)
+        regressions = [r for r in rows if r['regression']]
+        print(f"\nComparison with {args.compare} (commit {baseline.get('git_commit', '?')}):")
+        for r in rows:
+            if r['ratio'] is None:
+                print(f"  {r['name']:<24} {r.get('note', 'n/a')}")
+            else:
+                flag = '  ⚠ REGRESSION' if r['regression'] else ''
+                print(f"  {r['name']:<24} {r['ratio']:.2f}x baseline median{flag}")
+        if regressions:
+            print(f"\n⚠ {len(regressions)} stage(s) slower than baseline by more than {args.threshold:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,243 @@
+"""
+Box Operations
+Shared, vectorized bounding-box geometry for trackers, post-processing and evaluators
+
+All matrix functions take boxes as (N, 4) and (M, 4) arrays in (x1, y1, x2, y2) order
+(lists/tuples are accepted) and return (N, M) float64 matrices, so association code can
+compute every detection/track pair in one broadcasted step instead of nested Python loops.
+
+Conventions (shared by every tracker/evaluator in this repo):
+- Boxes that do not overlap (including boxes that only touch) have IoU 0
+- A pair with zero (or negative) union has IoU 0
+"""
+
+import math
+from typing import Sequence, Tuple
+
+import numpy as np
+
+
+def as_boxes(boxes) -> np.ndarray:
+    """Return boxes as a float64 (N, 4) array (extra columns such as scores are dropped)"""
+    arr = np.asarray(boxes, dtype=np.float64)
+    if arr.size == 0:
+        return np.zeros((0, 4), dtype=np.float64)
+    if arr.ndim == 1:
+        arr = arr.reshape(1, -1)
+    return arr[:, :4]
+
+
+def box_area(boxes) -> np.ndarray:
+    """Areas of (N, 4) boxes"""
+    b = as_boxes(boxes)
+    return (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+
+
+def box_centers(boxes) -> np.ndarray:
+    """Centers (N, 2) of (N, 4) boxes"""
+    b = as_boxes(boxes)
+    return np.stack(((b[:, 0] + b[:, 2]) / 2.0, (b[:, 1] + b[:, 3]) / 2.0), axis=1)
+
+
+def _intersection(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    iw = np.minimum(a[:, None, 2], b[None, :, 2]) - np.maximum(a[:, None, 0], b[None, :, 0])
+    ih = np.minimum(a[:, None, 3], b[None, :, 3]) - np.maximum(a[:, None, 1], b[None, :, 1])
+    return np.clip(iw, 0.0, None) * np.clip(ih, 0.0, None)
+
+
+def iou_matrix(boxes1, boxes2) -> np.ndarray:
+    """
+    Pairwise Intersection over Union.
+
+    Args:
+        boxes1: (N, 4) boxes (x1, y1, x2, y2)
+        boxes2: (M, 4) boxes (x1, y1, x2, y2)
+
+    Returns:
+        (N, M) IoU matrix
+    """
+    a = as_boxes(boxes1)
+    b = as_boxes(boxes2)
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)), dtype=np.float64)
+    inter = _intersection(a, b)
+    union = box_area(a)[:, None] + box_area(b)[None, :] - inter
+    with np.errstate(divide='ignore', invalid='ignore'):
+        iou = np.where((union > 0) & (inter > 0), inter / union, 0.0)
+    return iou
+
+
+def iou_pairs(boxes1, boxes2) -> np.ndarray:
+    """
+    Elementwise IoU of aligned pairs (boxes1[i] vs boxes2[i]).
+
+    Args:
+        boxes1, boxes2: (N, 4) boxes
+
+    Returns:
+        (N,) IoU values
+    """
+    a = as_boxes(boxes1)
+    b = as_boxes(boxes2)
+    iw = np.clip(np.minimum(a[:, 2], b[:, 2]) - np.maximum(a[:, 0], b[:, 0]), 0.0, None)
+    ih = np.clip(np.minimum(a[:, 3], b[:, 3]) - np.maximum(a[:, 1], b[:, 1]), 0.0, None)
+    inter = iw * ih
+    union = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1]) + (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1]) - inter
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where((union > 0) & (inter > 0), inter / union, 0.0)
+
+
+def iou(box1: Sequence[float], box2: Sequence[float]) -> float:
+    """
+    IoU of a single pair of boxes (x1, y1, x2, y2).
+
+    Scalar fast path for callers that compare one pair at a time; same result as
+    iou_matrix([box1], [box2])[0, 0].
+    """
+    x1_1, y1_1, x2_1, y2_1 = float(box1[0]), float(box1[1]), float(box1[2]), float(box1[3])
+    x1_2, y1_2, x2_2, y2_2 = float(box2[0]), float(box2[1]), float(box2[2]), float(box2[3])
+
+    inter_w = min(x2_1, x2_2) - max(x1_1, x1_2)
+    inter_h = min(y2_1, y2_2) - max(y1_1, y1_2)
+    if inter_w <= 0 or inter_h <= 0:
+        return 0.0
+
+    intersection = inter_w * inter_h
+    union = (x2_1 - x1_1) * (y2_1 - y1_1) + (x2_2 - x1_2) * (y2_2 - y1_2) - intersection
+    return intersection / union if union > 0 else 0.0
+
+
+def expand_boxes(boxes, velocities=None, expansion_factor: float = 0.1, time_delta: float = 1.0) -> np.ndarray:
+    """
+    Move boxes along their velocity and grow them with the motion magnitude (Expansion IoU).
+
+    Args:
+        boxes: (N, 4) boxes
+        velocities: Optional (N, 2) velocities (vx, vy) in pixels per frame; rows of NaN
+                    mean "no velocity" (box is left unchanged)
+        expansion_factor: Growth per pixel of motion
+        time_delta: Frames to predict ahead
+
+    Returns:
+        (N, 4) predicted/expanded boxes
+    """
+    b = as_boxes(boxes)
+    if velocities is None or len(b) == 0:
+        return b.copy()
+    v = np.asarray(velocities, dtype=np.float64).reshape(-1, 2)
+    has_v = ~np.isnan(v).any(axis=1)
+    v = np.where(has_v[:, None], v, 0.0)
+
+    cx = (b[:, 0] + b[:, 2]) / 2.0 + v[:, 0] * time_delta
+    cy = (b[:, 1] + b[:, 3]) / 2.0 + v[:, 1] * time_delta
+    expansion = np.sqrt(v[:, 0] ** 2 + v[:, 1] ** 2) * expansion_factor * time_delta
+    w = (b[:, 2] - b[:, 0]) + expansion
+    h = (b[:, 3] - b[:, 1]) + expansion
+    return np.stack((cx - w / 2.0, cy - h / 2.0, cx + w / 2.0, cy + h / 2.0), axis=1)
+
+
+def expansion_iou_matrix(boxes1, boxes2, velocities1=None, velocities2=None,
+                         expansion_factor: float = 0.1, time_delta: float = 1.0) -> np.ndarray:
+    """
+    Pairwise Expansion IoU (Deep HM-SORT): IoU of motion-predicted, motion-expanded boxes.
+
+    Args:
+        boxes1, boxes2: (N, 4) and (M, 4) boxes
+        velocities1, velocities2: Optional (N, 2) / (M, 2) velocities (NaN rows = no velocity)
+        expansion_factor: Growth per pixel of motion
+        time_delta: Frames to predict ahead
+
+    Returns:
+        (N, M) Expansion IoU matrix
+    """
+    return iou_matrix(expand_boxes(boxes1, velocities1, expansion_factor, time_delta),
+                      expand_boxes(boxes2, velocities2, expansion_factor, time_delta))
+
+
+def giou_matrix(boxes1, boxes2) -> np.ndarray:
+    """
+    Pairwise Generalized IoU (IoU minus the enclosing-box area not covered by the union).
+
+    Returns:
+        (N, M) GIoU matrix in [-1, 1]
+    """
+    a = as_boxes(boxes1)
+    b = as_boxes(boxes2)
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)), dtype=np.float64)
+    inter = _intersection(a, b)
+    union = box_area(a)[:, None] + box_area(b)[None, :] - inter
+    enclose_w = np.maximum(a[:, None, 2], b[None, :, 2]) - np.minimum(a[:, None, 0], b[None, :, 0])
+    enclose_h = np.maximum(a[:, None, 3], b[None, :, 3]) - np.minimum(a[:, None, 1], b[None, :, 1])
+    enclose = np.clip(enclose_w, 0.0, None) * np.clip(enclose_h, 0.0, None)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        iou = np.where(union > 0, inter / union, 0.0)
+        giou = iou - np.where(enclose > 0, (enclose - union) / enclose, 0.0)
+    return giou
+
+
+def center_distance_matrix(boxes1, boxes2) -> np.ndarray:
+    """Pairwise Euclidean distance between box centers (N, M)"""
+    c1 = box_centers(boxes1)
+    c2 = box_centers(boxes2)
+    if len(c1) == 0 or len(c2) == 0:
+        return np.zeros((len(c1), len(c2)), dtype=np.float64)
+    diff = c1[:, None, :] - c2[None, :, :]
+    return np.sqrt((diff ** 2).sum(axis=2))
+
+
+def box_diagonals(boxes) -> np.ndarray:
+    """Diagonal length of (N, 4) boxes"""
+    b = as_boxes(boxes)
+    return np.sqrt((b[:, 2] - b[:, 0]) ** 2 + (b[:, 3] - b[:, 1]) ** 2)
+
+
+def nms(boxes, scores, iou_threshold: float = 0.5) -> np.ndarray:
+    """
+    Greedy non-maximum suppression.
+
+    Args:
+        boxes: (N, 4) boxes
+        scores: (N,) scores (higher is kept first; ties keep the lower index)
+        iou_threshold: Boxes overlapping a kept box by more than this IoU are suppressed
+
+    Returns:
+        Indices of kept boxes, in descending score order
+    """
+    b = as_boxes(boxes)
+    if len(b) == 0:
+        return np.zeros(0, dtype=np.int64)
+    order = np.argsort(-np.asarray(scores, dtype=np.float64), kind='stable')
+    overlaps = iou_matrix(b, b)
+    suppressed = np.zeros(len(b), dtype=bool)
+    keep = []
+    for idx in order:
+        if suppressed[idx]:
+            continue
+        keep.append(idx)
+        suppressed |= overlaps[idx] > iou_threshold
+    return np.asarray(keep, dtype=np.int64)
+
+
+def greedy_match(score_matrix: np.ndarray, threshold: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Repeatedly pair the highest remaining score (row-major first on ties) until none is >= threshold.
+
+    Returns:
+        (rows, cols) of the matched pairs in match order
+    """
+    scores = np.array(score_matrix, dtype=np.float64, copy=True)
+    rows, cols = [], []
+    if scores.size == 0:
+        return np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64)
+    scores[~(scores >= threshold)] = -np.inf
+    while True:
+        flat = int(np.argmax(scores))
+        r, c = divmod(flat, scores.shape[1])
+        if not math.isfinite(scores[r, c]):
+            break
+        rows.append(r)
+        cols.append(c)
+        scores[r, :] = -np.inf
+        scores[:, c] = -np.inf
+    return np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64)
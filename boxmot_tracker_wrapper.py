@@ -12,6 +12,8 @@ import numpy as np
 import cv2
 from typing import Optional, Tuple, List
 
+import box_ops
+
 # Try to import BoxMOT
 try:
     import warnings
@@ -507,41 +509,14 @@ class BoxMOTTrackerWrapper:
                     detections.tracker_id = matched_detections
                     return detections
                 
-                for i in range(len(detections)):
-                    try:
-                        # Get detection box - ensure it has 4 elements
-                        if i >= det_xyxy.shape[0]:
-                            continue  # Skip if index out of range
-                        
-                        det_box = det_xyxy[i, :4]  # Explicitly take first 4 elements
-                        
-                        # Ensure det_box is a 1D array with 4 elements
-                        det_box = np.asarray(det_box).flatten()
-                        if len(det_box) < 4:
-                            continue  # Skip if box is invalid
-                        
-                        best_iou = 0.0
-                        best_track_idx = -1
-                        
-                        for j in range(len(track_boxes)):
-                            try:
-                                track_box = track_boxes[j, :4]  # Explicitly take first 4 elements
-                                track_box = np.asarray(track_box).flatten()
-                                if len(track_box) < 4:
-                                    continue  # Skip if box is invalid
-                                
-                                iou = self._calculate_iou(det_box, track_box)
-                                if iou > best_iou and iou > 0.3:  # Minimum IoU threshold
-                                    best_iou = iou
-                                    best_track_idx = j
-                            except (IndexError, ValueError, TypeError) as e:
-                                continue  # Skip this track box
-                        
-                        if best_track_idx >= 0:
-                            matched_detections[i] = track_ids[best_track_idx]
-                    except (IndexError, ValueError, TypeError) as e:
-                        # Skip this detection if there's an error
-                        continue
+                # PERFORMANCE: IoU of every detection against every track in one step
+                num_dets = min(len(detections), det_xyxy.shape[0])  # Skip indices out of range
+                iou_table = box_ops.iou_matrix(det_xyxy[:num_dets, :4], track_boxes[:, :4])
+                iou_table[iou_table <= 0.3] = 0.0  # Minimum IoU threshold
+                if iou_table.size > 0:
+                    best_track_idx = np.argmax(iou_table, axis=1)
+                    has_match = iou_table[np.arange(num_dets), best_track_idx] > 0.0
+                    matched_detections[:num_dets][has_match] = track_ids[best_track_idx[has_match]]
             except (IndexError, ValueError, TypeError, AttributeError) as e:
                 print(f"  [WARN] Error matching tracks to detections: {e}")
                 print(f"  [WARN] detections type: {type(detections)}, len: {len(detections) if hasattr(detections, '__len__') else 'N/A'}")
@@ -565,31 +540,9 @@ class BoxMOTTrackerWrapper:
             if box1.shape[0] < 4 or box2.shape[0] < 4:
                 return 0.0
             
-            x1_1, y1_1, x2_1, y2_1 = box1[:4]
-            x1_2, y1_2, x2_2, y2_2 = box2[:4]
+            return box_ops.iou(box1[:4], box2[:4])
         except (ValueError, IndexError, TypeError):
             return 0.0
-        
-        # Calculate intersection
-        inter_x1 = max(x1_1, x1_2)
-        inter_y1 = max(y1_1, y1_2)
-        inter_x2 = min(x2_1, x2_2)
-        inter_y2 = min(y2_1, y2_2)
-        
-        if inter_x2 <= inter_x1 or inter_y2 <= inter_y1:
-            return 0.0
-        
-        inter_area = (inter_x2 - inter_x1) * (inter_y2 - inter_y1)
-        
-        # Calculate union
-        box1_area = (x2_1 - x1_1) * (y2_1 - y1_1)
-        box2_area = (x2_2 - x1_2) * (y2_2 - y1_2)
-        union_area = box1_area + box2_area - inter_area
-        
-        if union_area == 0:
-            return 0.0
-        
-        return inter_area / union_area
     
     def reset(self):
         """Reset tracker state (for new video)."""
@@ -44,6 +44,13 @@ except ImportError:
     YOLO_AVAILABLE = False
     logger.warning("YOLO dependencies not available. Player tracking will be skipped.")
 
+# Background decode/preprocess/detection pipeline
+try:
+    from frame_pipeline import DetectionBatch, DetectionStage, FramePipeline
+    FRAME_PIPELINE_AVAILABLE = True
+except ImportError:
+    FRAME_PIPELINE_AVAILABLE = False
+
 # Re-ID tracker import
 try:
     from reid_tracker import ReIDTracker  # type: ignore
@@ -55,10 +62,31 @@ except ImportError as e:
     logger.debug(f"Re-ID tracker import error: {e}")
 
 try:
-    from gsi_smoothing import apply_gsi_realtime, SKLEARN_AVAILABLE as GSI_AVAILABLE  # type: ignore
+    from gsi_smoothing import apply_gsi_realtime, GSI_AVAILABLE  # type: ignore
 except ImportError:
     GSI_AVAILABLE = False
-    logger.warning("GSI smoothing not available. Install sklearn: pip install scikit-learn")
+    logger.warning("GSI smoothing not available (gsi_smoothing.py not found)")
+
+# Typed columnar sidecar for the tracking CSV + shared loader (pyarrow optional)
+try:
+    from tracking_data_io import write_sidecar, load_tracking_data, PYARROW_AVAILABLE as TRACKING_SIDECAR_AVAILABLE  # type: ignore
+    TRACKING_DATA_IO_AVAILABLE = True
+except ImportError:
+    TRACKING_DATA_IO_AVAILABLE = False
+    TRACKING_SIDECAR_AVAILABLE = False
+
+# Per-stage timing / memory instrumentation (no-op unless a run enables it)
+from perf_instrumentation import get_instrumentation
+
+# Periodic checkpoints / --resume for long runs
+from analysis_checkpoint import (AnalysisCheckpoint, SegmentedVideoWriter, output_offset,
+                                 restore_in_place, truncate_output)
+
+# Re-ID features exported by segment-parallel workers for cross-segment stitching
+from segment_parallel import accumulate_stitch_features, save_stitch_features
+
+# Persistent YOLO detections for reruns on the same footage
+from detection_cache import BALL, CachedDetections, DetectionCache, default_cache_root, yolo_imgsz
 
 # Advanced recognition modules
 try:
@@ -3605,6 +3633,156 @@ def is_point_in_field(
         return True
 
 
+class BallFrameDetector:
+    """
+    Per-video state for color-based ball detection (track_ball_in_frame).
+    
+    The ball color config and field calibration are loaded once and only reloaded when
+    their files change on disk (checked at most every check_interval seconds), so live
+    edits from the ball color helper still apply mid-run. HSV bounds are converted to
+    arrays once, and the HSV image, color masks and edge exclusion mask reuse buffers
+    instead of being reallocated every frame.
+    """
+    
+    BALL_COLOR_CONFIG_FILES = ("ball_color_config.json",)
+    FIELD_CALIBRATION_FILES = ("field_calibration.json", "calibration.npy",
+                               "calibration_metadata.npy", "field_dimensions.npy")
+    
+    # Default: red and white ball (white parts, then red in two ranges wrapping around 0/180)
+    DEFAULT_COLOR_GROUPS = [
+        [(np.array([0, 0, 200], dtype=np.uint8), np.array([180, 30, 255], dtype=np.uint8))],
+        [(np.array([0, 50, 50], dtype=np.uint8), np.array([10, 255, 255], dtype=np.uint8)),
+         (np.array([170, 50, 50], dtype=np.uint8), np.array([180, 255, 255], dtype=np.uint8))],
+    ]
+    
+    def __init__(self, check_interval=1.0):
+        self.check_interval = check_interval
+        self._kernel = np.ones((3, 3), np.uint8)
+        self._config_stamp = None
+        self._calibration_stamp = None
+        self._last_check = 0.0
+        self._calibration = None
+        self._color_groups = self.DEFAULT_COLOR_GROUPS
+        self._apply_morphology = True
+        self._hsv = None
+        self._mask = None
+        self._scratch = None
+        self._edge_mask = None
+        self._edge_key = None
+        self._refresh(force=True)
+    
+    @staticmethod
+    def _file_stamp(paths):
+        stamp = []
+        for path in paths:
+            try:
+                st = os.stat(path)
+                stamp.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                stamp.append(None)
+        return tuple(stamp)
+    
+    def _refresh(self, force=False):
+        """Reload config/calibration if their files changed since the last check"""
+        now = time.monotonic()
+        if not force and now - self._last_check < self.check_interval:
+            return
+        self._last_check = now
+        
+        config_stamp = self._file_stamp(self.BALL_COLOR_CONFIG_FILES)
+        if force or config_stamp != self._config_stamp:
+            self._config_stamp = config_stamp
+            self._set_color_config(load_ball_color_config())
+        
+        calibration_stamp = self._file_stamp(self.FIELD_CALIBRATION_FILES)
+        if force or calibration_stamp != self._calibration_stamp:
+            self._calibration_stamp = calibration_stamp
+            self._calibration = load_field_calibration()
+    
+    def _set_color_config(self, config):
+        if not (config and "hsv_ranges" in config):
+            self._color_groups = self.DEFAULT_COLOR_GROUPS
+            self._apply_morphology = True
+            return
+        
+        def bounds(lower, upper):
+            return (np.array(lower, dtype=np.uint8), np.array(upper, dtype=np.uint8))
+        
+        hsv_ranges = config["hsv_ranges"]
+        groups = []
+        # Color 1
+        if "color1" in hsv_ranges and hsv_ranges["color1"]:
+            r1 = hsv_ranges["color1"]
+            groups.append([bounds(r1["lower"], r1["upper"])])
+        # Color 2 (may have two ranges for red)
+        if "color2" in hsv_ranges and hsv_ranges["color2"]:
+            r2 = hsv_ranges["color2"]
+            if "lower2" in r2:
+                groups.append([bounds(r2["lower1"], r2["upper1"]), bounds(r2["lower2"], r2["upper2"])])
+            else:
+                groups.append([bounds(r2["lower"], r2["upper"])])
+        self._color_groups = groups
+        self._apply_morphology = False  # Custom colors are used without erode/dilate
+    
+    def field_calibration(self):
+        """Cached field calibration (None if no calibration files exist)"""
+        self._refresh()
+        return self._calibration
+    
+    def _get_edge_mask(self, height, width, edge_margin):
+        key = (height, width, edge_margin)
+        if self._edge_key != key:
+            # Exclude detections near walls/edges
+            edge_mask = np.full((height, width), 255, dtype=np.uint8)
+            if edge_margin > 0:
+                edge_mask[:edge_margin, :] = 0  # Top edge
+                edge_mask[-edge_margin:, :] = 0  # Bottom edge
+                edge_mask[:, :edge_margin] = 0  # Left edge
+                edge_mask[:, -edge_margin:] = 0  # Right edge
+            self._edge_mask = edge_mask
+            self._edge_key = key
+        return self._edge_mask
+    
+    def color_mask(self, frame, edge_margin=50):
+        """
+        Ball color mask for a BGR frame (edge exclusion applied).
+        
+        Returns a reused buffer - it is overwritten by the next call.
+        """
+        self._refresh()
+        height, width = frame.shape[:2]
+        if self._mask is None or self._mask.shape != (height, width):
+            self._hsv = np.empty((height, width, 3), dtype=np.uint8)
+            self._mask = np.empty((height, width), dtype=np.uint8)
+            self._scratch = np.empty((height, width), dtype=np.uint8)
+        
+        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV, dst=self._hsv)
+        mask = self._mask
+        mask[:] = 0
+        for ranges in self._color_groups:
+            for lower, upper in ranges:
+                cv2.inRange(hsv, lower, upper, dst=self._scratch)
+                cv2.bitwise_or(mask, self._scratch, dst=mask)
+        
+        if self._apply_morphology:
+            cv2.erode(mask, self._kernel, dst=self._scratch, iterations=2)
+            cv2.dilate(self._scratch, self._kernel, dst=mask, iterations=2)
+        
+        cv2.bitwise_and(mask, self._get_edge_mask(height, width, edge_margin), dst=mask)
+        return mask
+
+
+_ball_frame_detector = None
+
+
+def get_ball_frame_detector():
+    """Shared BallFrameDetector (created on first use)"""
+    global _ball_frame_detector
+    if _ball_frame_detector is None:
+        _ball_frame_detector = BallFrameDetector()
+    return _ball_frame_detector
+
+
 def track_ball_in_frame(
         frame,
         pts,
@@ -3639,90 +3817,19 @@ def track_ball_in_frame(
         ball_history: Dict of {frame_num: (x, y)} for long-term ball tracking (out-of-bounds recovery)
         ball_last_seen_frame: Last frame where ball was detected (for recovery)
     """
-    hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
     height, width = frame.shape[:2]
+    detector = get_ball_frame_detector()
 
     # Load field calibration if not provided
     if field_calibration is None:
-        field_calibration = load_field_calibration()
-
-    # Try to load custom ball color config
-    config = load_ball_color_config()
-
-    if config and "hsv_ranges" in config:
-        # Use custom HSV ranges from config
-        hsv_ranges = config["hsv_ranges"]
-        mask = None
-
-        # Color 1
-        if "color1" in hsv_ranges and hsv_ranges["color1"]:
-            r1 = hsv_ranges["color1"]
-            lower1 = np.array(r1["lower"])
-            upper1 = np.array(r1["upper"])
-            mask_color1 = cv2.inRange(hsv, lower1, upper1)
-            mask = mask_color1 if mask is None else cv2.bitwise_or(
-                mask, mask_color1)
-
-        # Color 2 (may have two ranges for red)
-        if "color2" in hsv_ranges and hsv_ranges["color2"]:
-            r2 = hsv_ranges["color2"]
-            if "lower2" in r2:  # Red has two ranges
-                lower2_1 = np.array(r2["lower1"])
-                upper2_1 = np.array(r2["upper1"])
-                lower2_2 = np.array(r2["lower2"])
-                upper2_2 = np.array(r2["upper2"])
-                mask_color2_1 = cv2.inRange(hsv, lower2_1, upper2_1)
-                mask_color2_2 = cv2.inRange(hsv, lower2_2, upper2_2)
-                mask_color2 = cv2.bitwise_or(mask_color2_1, mask_color2_2)
-            else:
-                lower2 = np.array(r2["lower"])
-                upper2 = np.array(r2["upper"])
-                mask_color2 = cv2.inRange(hsv, lower2, upper2)
-            mask = mask_color2 if mask is None else cv2.bitwise_or(
-                mask, mask_color2)
-    else:
-        # Default: red and white ball
-        # HSV range for white parts of ball
-        lower_white = np.array([0, 0, 200])
-        upper_white = np.array([180, 30, 255])
-        mask_white = cv2.inRange(hsv, lower_white, upper_white)
-
-        # HSV range for red parts of ball
-        # Red in HSV has two ranges (wraps around 0/180)
-        # Range 1: 0-10 (red)
-        lower_red1 = np.array([0, 50, 50])
-        upper_red1 = np.array([10, 255, 255])
-        mask_red1 = cv2.inRange(hsv, lower_red1, upper_red1)
-
-        # Range 2: 170-180 (red)
-        lower_red2 = np.array([170, 50, 50])
-        upper_red2 = np.array([180, 255, 255])
-        mask_red2 = cv2.inRange(hsv, lower_red2, upper_red2)
-
-        # Combine red masks
-        mask_red = cv2.bitwise_or(mask_red1, mask_red2)
-
-        # Combine white and red masks
-        mask = cv2.bitwise_or(mask_white, mask_red)
-        kernel = np.ones((3, 3), np.uint8)
-        mask = cv2.erode(mask, kernel, iterations=2)
-        mask = cv2.dilate(mask, kernel, iterations=2)
-
-        # Create edge exclusion mask (exclude near walls/edges)
-        edge_mask = np.ones((height, width), dtype=np.uint8) * 255
-        edge_mask[:edge_margin, :] = 0  # Top edge
-    edge_mask[-edge_margin:, :] = 0  # Bottom edge
-    edge_mask[:, :edge_margin] = 0  # Left edge
-    edge_mask[:, -edge_margin:] = 0  # Right edge
-
-    # Apply edge exclusion to ball mask if both masks are valid
-    if mask is not None and edge_mask is not None:
-        mask = cv2.bitwise_and(mask, edge_mask)
-    # If mask is None, skip masking as edge exclusion is meaningless
+        field_calibration = detector.field_calibration()
 
+    # PERFORMANCE: Color config, HSV bounds, edge mask and mask buffers are cached by the
+    # detector (config files are re-read only when their mtime changes)
+    mask = detector.color_mask(frame, edge_margin)
 
     cnts = cv2.findContours(
-        mask.copy() if mask is not None else np.zeros((height, width), dtype=np.uint8),
+        mask,
         cv2.RETR_EXTERNAL,
         cv2.CHAIN_APPROX_SIMPLE)
     if YOLO_AVAILABLE:
@@ -4518,7 +4625,12 @@ def load_previous_tracking_data(input_path=None):
                 
                 import pandas as pd
                 # Skip comment lines (starting with '#') - these contain metadata
-                df = pd.read_csv(csv_file, comment='#')
+                # PERFORMANCE: Shared loader reads the typed sidecar (when current) instead of parsing the CSV
+                if TRACKING_DATA_IO_AVAILABLE:
+                    df = load_tracking_data(csv_file, columns=['frame', 'track_id', 'center_x', 'center_y', 'x', 'y',
+                                                               'player_name', 'name', 'player', 'tag'])
+                else:
+                    df = pd.read_csv(csv_file, comment='#')
                 
                 # Check if DataFrame is empty
                 if df.empty:
@@ -5769,7 +5881,18 @@ def combined_analysis_optimized(input_path, output_path,
                                 video_type="practice",  # "practice" or "game" - controls team locking behavior (practice: flexible, game: strict)
                                 viz_settings_override=None,  # Optional dict of visualization settings to override metadata settings (e.g., statistics panel customization)
                                 explicit_anchor_file=None,  # Optional explicit path to PlayerTagsSeed file to load (if None, auto-selects newest)
-                                seed_frame_interval=None):  # Force gallery mapping every N frames (None = disabled, 0 = every 100 frames)
+                                seed_frame_interval=None,  # Force gallery mapping every N frames (None = disabled, 0 = every 100 frames)
+                                profile_output=None,  # Write <profile_output>_perf_summary.json / _perf_trace.json stage timings (None = disabled)
+                                checkpoint_interval=0,  # Write a resumable checkpoint every N frames (0 = disabled)
+                                resume=False,  # Resume from the latest checkpoint of this output (appends to existing outputs)
+                                frame_range=None,  # (start, end) - only analyse frames start..end-1 (segment-parallel workers)
+                                gallery_read_only=False,  # Use the player gallery without writing it back (segment-parallel workers)
+                                stitch_windows=None,  # [(start, end), ...] frame windows whose per-track Re-ID features are exported
+                                stitch_features_output=None,  # .npz path for the stitch_windows features (see segment_parallel.py)
+                                use_detection_cache=True,  # Reuse YOLO detections of earlier runs with the same video / model / thresholds
+                                detection_cache_dir=None,  # Detection cache directory (None = detection_cache/ next to the output)
+                                gallery_binary_store=False,  # Keep the player gallery in the binary store (migrates player_gallery.json once)
+                                shared_config_read_only=False):  # Never rewrite team_color_config.json (segment-parallel workers)
     """
     Optimized combined analysis with batch processing for better GPU utilization.
 
@@ -5832,8 +5955,38 @@ def combined_analysis_optimized(input_path, output_path,
         reid_confidence_threshold: Skip Re-ID checks if track confidence above this threshold (default: 0.75).
                                   Lower = check more tracks = better but slower.
                            Note: Requires video file path, not applicable to frame-by-frame processing.
+        profile_output: Path prefix for per-stage instrumentation output (default: None = disabled).
+                        Writes <profile_output>_perf_summary.json and <profile_output>_perf_trace.json
+                        (Chrome trace, open in chrome://tracing or ui.perfetto.dev).
+        checkpoint_interval: Frames between checkpoints (default: 0 = disabled). A checkpoint holds the
+                             resume position, tracker / Re-ID / name state, analytics accumulators and
+                             the CSV / overlay byte offsets in <output>_checkpoint/.
+        resume: Continue from the latest checkpoint of output_path instead of starting over. Outputs
+                are rolled back to the checkpoint and appended to (no reprocessed or duplicate rows).
+        frame_range: Optional (start, end) frame range to analyse (default: None = whole video). Frame
+                     numbers in the outputs stay absolute. Used by segment_parallel.analyze_video_parallel.
+        gallery_read_only: Load the player gallery but never save it (default: False), so parallel
+                           segment workers can share one gallery file.
+        stitch_windows / stitch_features_output: Mean Re-ID feature per track inside each window is
+                           written to stitch_features_output (.npz) for cross-segment track stitching.
+        use_detection_cache: Save per-frame YOLO boxes / confidences / classes (players and ball) and
+                             replay them on reruns with the same video content, model weights, imgsz,
+                             confidence and ROI settings instead of running inference (default: True).
+        detection_cache_dir: Where detection caches are kept (default: None = detection_cache/ next to
+                             the output video). See detection_cache.py.
+        gallery_binary_store: Keep the player gallery in the binary columnar store (player_gallery.store/,
+                              incremental per-player saves) instead of rewriting player_gallery.json on
+                              every save (default: False; an existing store is always used). The JSON
+                              is regenerated once at the end of the run. See gallery_store.py.
+        shared_config_read_only: Keep learned team colors in memory instead of saving them to
+                                 team_color_config.json (default: False), so parallel segment workers
+                                 do not overwrite each other's copy of the shared file mid-run.
     """
     
+    # Stage timings (decode, YOLO, tracker, Re-ID, gallery, team, ball, overlay, encode, CSV)
+    perf = get_instrumentation()
+    perf.start_run(enabled=profile_output is not None, input_path=input_path, output_path=output_path)
+    
     # NOTE: Many variables below are flagged as "unused" by static analyzers, but they ARE used
     # throughout the function. Static analyzers can't track variables through complex control flow,
     # conditional branches, or when passed to functions. These warnings are false positives.
@@ -5860,6 +6013,13 @@ def combined_analysis_optimized(input_path, output_path,
     else:
         print(f"Total frames: {total_frames}")
 
+    # SEGMENT-PARALLEL: Analyse only [start, end) of the video (frame numbers stay absolute)
+    range_start = 0
+    if frame_range is not None:
+        range_start = max(0, int(frame_range[0]))
+        total_frames = min(total_frames, int(frame_range[1]))
+        print(f"Segment: frames {range_start}-{total_frames - 1}")
+
     # Get FPS from video or use manual override
     detected_fps = cap.get(cv2.CAP_PROP_FPS)  # Keep as float for calculations
     if video_fps is not None and video_fps > 0:
@@ -6398,7 +6558,8 @@ def combined_analysis_optimized(input_path, output_path,
         if use_reid and GALLERY_AVAILABLE and reid_tracker is not None:
             try:
                 print("   Attempting to load Player Gallery...")
-                player_gallery = PlayerGallery()
+                player_gallery = PlayerGallery(use_binary_store=True if gallery_binary_store else None,
+                                               read_only=gallery_read_only)
                 stats = player_gallery.get_stats()
                 if stats['total_players'] > 0:
                     print(f"✓ Player Gallery loaded: {stats['total_players']} players (cross-video ID enabled)")
@@ -7126,6 +7287,41 @@ def combined_analysis_optimized(input_path, output_path,
         else:
             print(f"   ✓ FPS matches input - video should play at correct speed")
 
+    # CHECKPOINT / RESUME: Periodic snapshots of the loop state so a long run can continue
+    # after a crash or stop. The video is written in segments (cut at every checkpoint)
+    # because cv2.VideoWriter cannot append to an existing file.
+    analysis_checkpoint = None
+    resume_checkpoint = None
+    if (checkpoint_interval or resume) and watch_only:
+        print("ℹ Checkpoints skipped in watch-only mode (no outputs to resume)")
+    elif checkpoint_interval or resume:
+        analysis_checkpoint = AnalysisCheckpoint(
+            output_path, input_path, interval_frames=checkpoint_interval or 5000,
+            settings={'fps': round(float(fps), 3), 'total_frames': total_frames, 'frame_size': [width, height],
+                      'output_fps': round(float(output_fps_value), 3), 'tracker_type': tracker_type,
+                      'process_every_nth_frame': process_every_nth_frame,
+                      'export_csv': bool(export_csv), 'export_overlay_metadata': bool(export_overlay_metadata),
+                      'enable_video_encoding': bool(enable_video_encoding)})
+        if resume:
+            resume_checkpoint = analysis_checkpoint.load()
+            if resume_checkpoint is None:
+                print("ℹ No usable checkpoint found - analysing from the first frame")
+            else:
+                print(f"✓ Resuming from checkpoint at frame {resume_checkpoint['frame_count']}/{total_frames}")
+                if resume_checkpoint['skipped_state']:
+                    print(f"   → Rebuilt from scratch: {', '.join(resume_checkpoint['skipped_state'])}")
+        if out is not None:
+            # Replace the probe writer with a segmented one using the selected codec
+            out.release()
+            if os.path.exists(output_path):
+                os.remove(output_path)
+            out = SegmentedVideoWriter(
+                output_path, fourcc, output_fps_value, (width, height),
+                analysis_checkpoint.segment_dir('video'),
+                segments=resume_checkpoint['video_segments'].get('video') if resume_checkpoint else None)
+        print(f"✓ Checkpoints every {analysis_checkpoint.interval_frames} frames: {analysis_checkpoint.directory}")
+    resume_outputs = resume_checkpoint['outputs'] if resume_checkpoint else {}
+
     # Tracking data storage
     # Ball tracking: short-term trail (for visualization) and long-term history (for out-of-bounds recovery)
     # ENHANCED: Use GUI-specified trail buffer (default: 20 points for shorter trails)
@@ -7215,6 +7411,15 @@ def combined_analysis_optimized(input_path, output_path,
                 viz_settings.update(viz_settings_override)
             
             overlay_metadata.set_visualization_settings(viz_settings)
+            # PERFORMANCE: Stream overlays to a chunked frame-indexed store as frames are analyzed
+            # (bounded memory, lazy random access in the viewers, survives a crash mid-run)
+            try:
+                overlay_store_path = overlay_metadata.enable_incremental_save(
+                    os.path.splitext(output_path)[0] + '_overlay_metadata.ovl',
+                    resume='overlay' in resume_outputs, resume_offset=resume_outputs.get('overlay'))
+                print(f"✓ Overlay metadata streaming to: {overlay_store_path}")
+            except Exception as e:
+                print(f"⚠ Incremental overlay store unavailable, keeping overlays in memory: {e}")
             # Initialize trajectory tracking (keep last 30 positions per player)
             # Note: deque is already imported at the top of the file
             print("✓ Overlay metadata system initialized (with trajectory tracking)")
@@ -7236,6 +7441,12 @@ def combined_analysis_optimized(input_path, output_path,
             # Use same codec settings as main video
             fourcc = cv2.VideoWriter_fourcc(*'mp4v')
             base_video_writer = cv2.VideoWriter(base_video_path, fourcc, output_fps_value, (width, height))
+            if base_video_writer.isOpened() and analysis_checkpoint is not None:
+                base_video_writer.release()
+                base_video_writer = SegmentedVideoWriter(
+                    base_video_path, fourcc, output_fps_value, (width, height),
+                    analysis_checkpoint.segment_dir('base'),
+                    segments=resume_checkpoint['video_segments'].get('base') if resume_checkpoint else None)
             if base_video_writer.isOpened():
                 print(f"✓ Base video writer initialized: {base_video_path}")
                 print(f"   ℹ Note: Original video at {input_path} is already the base video")
@@ -7286,32 +7497,35 @@ def combined_analysis_optimized(input_path, output_path,
         
         # Open CSV with buffering to reduce write operations
         # Use line buffering (1) to flush after each write, preventing buffer buildup
-        csv_file = open(csv_filename, 'w', newline='', buffering=1)
+        # RESUME: Roll the CSV back to the checkpoint offset and append (header already written)
+        csv_resumed = 'csv' in resume_outputs and truncate_output(csv_filename, resume_outputs['csv'])
+        csv_file = open(csv_filename, 'a' if csv_resumed else 'w', newline='', buffering=1)
         csv_writer = csv.writer(csv_file)
         # Determine unit labels based on conversion setting
         dist_unit = 'ft' if use_imperial_units else 'm'
         speed_unit = 'mph' if use_imperial_units else 'mps'
         accel_unit = 'fts2' if use_imperial_units else 'mps2'
         
-        csv_writer.writerow(['frame', 'timestamp', 'ball_x', 'ball_y', 'ball_detected',
-                            f'ball_x_{dist_unit}', f'ball_y_{dist_unit}', 'ball_trajectory_angle', f'ball_speed_{speed_unit}',
-                             'player_id', 'player_name', 'player_x', 'player_y', f'player_x_{dist_unit}', f'player_y_{dist_unit}',
-                             f'player_speed_{speed_unit}', f'player_acceleration_{accel_unit}', 'player_movement_angle', 
-                             f'distance_to_ball_px', f'distance_traveled_{dist_unit}', f'max_speed_{speed_unit}', 'sprint_count',
-                             'possession_time_s', f'distance_from_center_{dist_unit}', f'distance_from_goal_{dist_unit}',
-                             'field_zone', 'field_position_x_pct', 'field_position_y_pct',
-                             'direction_changes', f'avg_speed_{speed_unit}', f'distance_walking_{dist_unit}', f'distance_jogging_{dist_unit}',
-                             f'distance_running_{dist_unit}', f'distance_sprinting_{dist_unit}', 'time_stationary_s',
-                             'acceleration_events', f'nearest_teammate_dist_{dist_unit}', f'nearest_opponent_dist_{dist_unit}',
-                             'confidence', 'possession_player_id', 'team', 'is_anchor', 'x1', 'y1', 'x2', 'y2'])
+        if not csv_resumed:
+            csv_writer.writerow(['frame', 'timestamp', 'ball_x', 'ball_y', 'ball_detected',
+                                f'ball_x_{dist_unit}', f'ball_y_{dist_unit}', 'ball_trajectory_angle', f'ball_speed_{speed_unit}',
+                                 'player_id', 'player_name', 'player_x', 'player_y', f'player_x_{dist_unit}', f'player_y_{dist_unit}',
+                                 f'player_speed_{speed_unit}', f'player_acceleration_{accel_unit}', 'player_movement_angle', 
+                                 f'distance_to_ball_px', f'distance_traveled_{dist_unit}', f'max_speed_{speed_unit}', 'sprint_count',
+                                 'possession_time_s', f'distance_from_center_{dist_unit}', f'distance_from_goal_{dist_unit}',
+                                 'field_zone', 'field_position_x_pct', 'field_position_y_pct',
+                                 'direction_changes', f'avg_speed_{speed_unit}', f'distance_walking_{dist_unit}', f'distance_jogging_{dist_unit}',
+                                 f'distance_running_{dist_unit}', f'distance_sprinting_{dist_unit}', 'time_stationary_s',
+                                 'acceleration_events', f'nearest_teammate_dist_{dist_unit}', f'nearest_opponent_dist_{dist_unit}',
+                                 'confidence', 'possession_player_id', 'team', 'is_anchor', 'x1', 'y1', 'x2', 'y2'])
         
-        # CRITICAL: Write video resolution metadata as a comment at the top of CSV
-        # This ensures we can validate that anchor frames match the video resolution
-        csv_file.write(f"# Video Resolution: {width}x{height} pixels\n")
-        csv_file.write(f"# YOLO Resolution: {yolo_resolution} ({yolo_width}x{yolo_height})\n")
-        csv_file.write(f"# YOLO Scale Factor: {yolo_scale_factor:.6f}\n")
-        csv_file.write(f"# Video FPS: {fps:.3f}\n")
-        csv_file.write(f"# All bbox coordinates (x1, y1, x2, y2) are in video native resolution ({width}x{height})\n")
+            # CRITICAL: Write video resolution metadata as a comment at the top of CSV
+            # This ensures we can validate that anchor frames match the video resolution
+            csv_file.write(f"# Video Resolution: {width}x{height} pixels\n")
+            csv_file.write(f"# YOLO Resolution: {yolo_resolution} ({yolo_width}x{yolo_height})\n")
+            csv_file.write(f"# YOLO Scale Factor: {yolo_scale_factor:.6f}\n")
+            csv_file.write(f"# Video FPS: {fps:.3f}\n")
+            csv_file.write(f"# All bbox coordinates (x1, y1, x2, y2) are in video native resolution ({width}x{height})\n")
         
         print(f"✓ CSV export enabled: {csv_filename}")
         print(f"   → Video resolution: {width}x{height} (locked)")
@@ -7428,7 +7642,33 @@ def combined_analysis_optimized(input_path, output_path,
     elif track_players_flag:
         print("⚠ ROI cropping unavailable: No field calibration found")
         print("   → Processing full frame (slower but more reliable)")
-    
+
+    # DETECTION CACHE: Replay YOLO results of an earlier run on the same footage with the
+    # same model / imgsz / thresholds / ROI, so tracker, Re-ID or smoothing tuning reruns
+    # skip inference. The key covers everything that changes what YOLO sees or returns.
+    detection_cache = None
+    if use_detection_cache and model is not None and YOLO_AVAILABLE:
+        yolo_input_width, yolo_input_height = yolo_width, yolo_height
+        if roi_bounds is not None:
+            yolo_input_width = min(roi_bounds[2], yolo_width) - max(roi_bounds[0], 0)
+            yolo_input_height = min(roi_bounds[3], yolo_height) - max(roi_bounds[1], 0)
+        detection_cache = DetectionCache.open(
+            detection_cache_dir or default_cache_root(output_path), input_path, model,
+            {'imgsz': yolo_imgsz(yolo_input_width, yolo_input_height),
+             'yolo_size': [yolo_width, yolo_height],
+             'roi': [int(v) for v in roi_bounds] if roi_bounds is not None else None,
+             'conf': float(track_thresh), 'adaptive_confidence': bool(adaptive_confidence),
+             'max_det': max(30, max_players + 10) if device == 'cuda' else 25,
+             'half': device == 'cuda', 'pose': bool(foot_based_tracking),
+             'dewarp': bool(dewarp), 'remove_net': bool(remove_net),
+             'process_every_nth_frame': process_every_nth_frame})
+        if detection_cache is not None:
+            if len(detection_cache) > 0:
+                print(f"✓ Detection cache: {len(detection_cache)} frames cached - YOLO runs only for the rest")
+            else:
+                print(f"✓ Detection cache: new (detections will be saved for reruns)")
+            print(f"   → {detection_cache.directory}")
+
     # VELOCITY CONSTRAINTS: Estimate pixels per meter for velocity validation
     pixels_per_meter = None
     if enable_velocity_constraints and field_calibration:
@@ -8138,7 +8378,8 @@ def combined_analysis_optimized(input_path, output_path,
     if dewarp or remove_net:
         print(
             f"🚀 Using {num_workers} parallel workers for frame preprocessing")
-        preprocess_executor = ThreadPoolExecutor(max_workers=num_workers)
+        # PERFORMANCE: FramePipeline owns the preprocessing pool when available
+        preprocess_executor = None if FRAME_PIPELINE_AVAILABLE else ThreadPoolExecutor(max_workers=num_workers)
     else:
         preprocess_executor = None
 
@@ -8149,21 +8390,22 @@ def combined_analysis_optimized(input_path, output_path,
 
     def preprocess_frame_sync(frame, frame_num):
         """Synchronous preprocessing function (fallback or direct call)"""
-        # Apply dewarping if requested
-        if dewarp and dewarp_maps is not None:
-            map1, map2 = dewarp_maps
-            frame = cv2.remap(
-                frame,
-                map1,
-                map2,
-                interpolation=cv2.INTER_LINEAR,
-                borderMode=cv2.BORDER_CONSTANT)
-
-        # Remove net if requested - using improved battle-tested algorithm
-        # NOTE: Store original frame for learning (Re-ID and gallery need sharp images)
-        original_frame = frame.copy()
-        if remove_net:
-            frame = remove_net_pattern(frame, kernel_size=21, sigma=7)
+        with perf.span("preprocess"):
+            # Apply dewarping if requested
+            if dewarp and dewarp_maps is not None:
+                map1, map2 = dewarp_maps
+                frame = cv2.remap(
+                    frame,
+                    map1,
+                    map2,
+                    interpolation=cv2.INTER_LINEAR,
+                    borderMode=cv2.BORDER_CONSTANT)
+
+            # Remove net if requested - using improved battle-tested algorithm
+            # NOTE: Store original frame for learning (Re-ID and gallery need sharp images)
+            original_frame = frame.copy()
+            if remove_net:
+                frame = remove_net_pattern(frame, kernel_size=21, sigma=7)
         
         # Store original frame in frame_data for Re-ID and gallery learning
         return frame, original_frame
@@ -8222,7 +8464,105 @@ def combined_analysis_optimized(input_path, output_path,
     
     # Initialize processing flag (prevents gallery match messages after loop ends)
     is_processing = True
-    
+
+    def checkpoint_state():
+        """Loop state saved in a checkpoint (tracker, Re-ID, player names, analytics accumulators)"""
+        return {
+            # Ball tracking
+            'ball_pts': ball_pts, 'ball_history': ball_history, 'ball_last_seen_frame': ball_last_seen_frame,
+            'last_ball_velocity': last_ball_velocity, 'prev_ball_pos_m': prev_ball_pos_m,
+            'prev_ball_frame': prev_ball_frame, 'heatmap_data': heatmap_data,
+            # Trackers and identity
+            'tracker': tracker if track_players_flag and YOLO_AVAILABLE else None,
+            'identity_tracker': identity_tracker,
+            'reid_track_state': reid_tracker.get_track_state() if reid_tracker is not None else None,
+            'player_names': player_names, 'last_player_names_reload': last_player_names_reload,
+            'jersey_to_track_global': jersey_to_track_global, 'player_to_team_global': player_to_team_global,
+            'player_to_track_global': player_to_track_global, 'track_to_team_global': track_to_team_global,
+            'global_merged_tracks': global_merged_tracks, 'track_name_confidence': track_name_confidence,
+            'track_last_reid_check': track_last_reid_check, 'track_reid_breadcrumbs': track_reid_breadcrumbs,
+            'track_anchor_protection': track_anchor_protection, 'player_anchor_protection': player_anchor_protection,
+            'track_high_confidence_history': track_high_confidence_history,
+            'track_anchor_assigned': track_anchor_assigned, 'track_confirmed_identity': track_confirmed_identity,
+            'track_jersey_signatures': track_jersey_signatures, 'track_reid_embeddings': track_reid_embeddings,
+            'track_merge_cooldown': track_merge_cooldown, 'track_match_consensus': track_match_consensus,
+            'disappeared_tagged_players': disappeared_tagged_players, 'player_uniqueness_grace': player_uniqueness_grace,
+            'auto_created_players': auto_created_players, 'unmatched_track_frames': unmatched_track_frames,
+            'learned_colors_by_team': learned_colors_by_team, 'anchor_learning_stats': anchor_learning_stats,
+            'untagged_player_stats': untagged_player_stats, 'untagged_learning_stats': untagged_learning_stats,
+            # Per-track motion / smoothing history
+            'frame_detections': frame_detections, 'temporal_player_history': temporal_player_history,
+            'track_state': track_state, 'track_last_seen': track_last_seen, 'track_first_seen': track_first_seen,
+            'track_drift_count': track_drift_count, 'track_drift_frames': track_drift_frames,
+            'track_drift_bypass': track_drift_bypass, 'track_previous_positions': track_previous_positions,
+            'track_velocities': track_velocities, 'track_positions_history': track_positions_history,
+            'previous_frame_tracks': previous_frame_tracks, 'gsi_track_history': gsi_track_history,
+            'track_movement_history': track_movement_history, 'track_previous_bbox': track_previous_bbox,
+            'track_previous_velocity': track_previous_velocity, 'track_previous_frame': track_previous_frame,
+            'enhanced_kalman_filters': enhanced_kalman_filters, 'ema_smoothers': ema_smoothers,
+            'confidence_history': confidence_history, 'label_position_history': label_position_history,
+            'label_side_history': label_side_history, 'player_trajectories': player_trajectories,
+            'player_position_history': player_position_history, 'player_velocity_cache': player_velocity_cache,
+            # Analytics accumulators
+            'csv_export_stats': csv_export_stats, 'player_position_history_m': player_position_history_m,
+            'player_last_pos_m': player_last_pos_m, 'player_distance_traveled_m': player_distance_traveled_m,
+            'player_max_speed_mps': player_max_speed_mps, 'player_prev_speed_mps': player_prev_speed_mps,
+            'player_prev_acceleration_mps2': player_prev_acceleration_mps2, 'player_sprint_count': player_sprint_count,
+            'player_possession_time': player_possession_time, 'player_prev_movement_angle': player_prev_movement_angle,
+            'player_direction_changes': player_direction_changes, 'player_speed_history': player_speed_history,
+            'player_speed_zone_distances': player_speed_zone_distances, 'player_stationary_time': player_stationary_time,
+            'player_acceleration_events': player_acceleration_events,
+        }
+
+    def save_checkpoint():
+        """Checkpoint after the last fully written frame (frame batch must be flushed)"""
+        outputs = {}
+        if csv_file is not None:
+            outputs['csv'] = output_offset(csv_file)
+        if overlay_metadata is not None:
+            overlay_offset = overlay_metadata.flush()
+            if overlay_offset is not None:
+                outputs['overlay'] = overlay_offset
+        segments = {}
+        if isinstance(out, SegmentedVideoWriter):
+            segments['video'] = out.cut()
+        if isinstance(base_video_writer, SegmentedVideoWriter):
+            segments['base'] = base_video_writer.cut()
+        analysis_checkpoint.video_segments = segments
+        with perf.span("checkpoint"):
+            if analysis_checkpoint.save(frame_count, checkpoint_state(), outputs):
+                print(f"💾 Checkpoint saved at frame {frame_count}/{total_frames}")
+
+    # RESUME: Restore loop state and seek past the frames already analysed
+    if resume_checkpoint is not None:
+        saved_state = resume_checkpoint['state']
+        current_state = checkpoint_state()
+        for name, value in saved_state.items():
+            if name == 'tracker' and value is not None:
+                tracker = value
+            elif name == 'identity_tracker' and value is not None:
+                identity_tracker = value
+            elif name == 'reid_track_state' and value is not None and reid_tracker is not None:
+                reid_tracker.load_track_state(value)
+            elif name in current_state:
+                restore_in_place(current_state[name], value)
+        ball_last_seen_frame = saved_state.get('ball_last_seen_frame', ball_last_seen_frame)
+        last_ball_velocity = saved_state.get('last_ball_velocity', last_ball_velocity)
+        prev_ball_pos_m = saved_state.get('prev_ball_pos_m', prev_ball_pos_m)
+        prev_ball_frame = saved_state.get('prev_ball_frame', prev_ball_frame)
+        last_player_names_reload = saved_state.get('last_player_names_reload', last_player_names_reload)
+        frame_count = resume_checkpoint['frame_count']
+        last_frame_in_batch = frame_count
+        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_count)
+        print(f"✓ Restored analysis state - continuing at frame {frame_count}")
+    elif range_start > 0:
+        frame_count = range_start
+        last_frame_in_batch = frame_count
+        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_count)
+    
+    # SEGMENT-PARALLEL: (window, track_id) -> [Re-ID feature sum, count] for cross-segment stitching
+    stitch_feature_sums = {}
+
     # Progress update: Starting frame processing
     try:
         import shared_state
@@ -8236,6 +8576,138 @@ def combined_analysis_optimized(input_path, output_path,
     except (ImportError, Exception):
         pass
     
+    # PERFORMANCE: Decode and preprocess (dewarp / net removal) frames ahead of the main loop
+    # in background threads so they overlap with YOLO, tracking and Re-ID.
+    # Batching stays on this thread: YOLO input depends on the ball trail drawn on the frame,
+    # and batch post-processing depends on loop state (frame order matters).
+    frame_pipeline = None
+    if FRAME_PIPELINE_AVAILABLE:
+        frame_pipeline = FramePipeline(
+            cap,
+            preprocess_fn=preprocess_frame_sync if (dewarp or remove_net) else None,
+            num_workers=num_workers,
+            max_queued_frames=max(16, num_workers * 4),
+            # Watch-only without viewer skips odd frames - don't preprocess them
+            should_preprocess=(lambda n: n % 2 == 0) if (watch_only and not show_live_viewer) else None)
+        frame_pipeline.start()
+    
+    # PERFORMANCE: Detect player batches on a worker thread, chunk by chunk, so tracking and
+    # Re-ID of the first frames of a batch overlap with YOLO on the rest of the batch
+    detection_stage = None
+    if FRAME_PIPELINE_AVAILABLE and track_players_flag and model is not None:
+        def detect_players(frames, **kwargs):
+            """YOLO call for one chunk (runs on the detection stage thread)"""
+            if device == 'cuda' and cuda_device_id is not None:
+                # CUDA device context is per thread
+                with torch.cuda.device(cuda_device_id):
+                    return model(frames, **kwargs)
+            return model(frames, **kwargs)
+        detection_stage = DetectionStage(detect_players, chunk_size=max(2, batch_size // 4))
+    
+    def run_player_detection(frames, **kwargs):
+        """Batched player detection: a DetectionBatch filled in the background, or the model's results"""
+        if detection_stage is not None:
+            return detection_stage.submit(frames, **kwargs)
+        with perf.span("yolo", frame=frame_count, batch=len(frames)):
+            return model(frames, **kwargs)
+    
+    def reid_frame_for(batch_frame, frame_data):
+        """Frame Re-ID crops are taken from: the original (sharp) frame, not the net-removed one"""
+        original_frame = frame_data.get('original_frame_for_learning', None)
+        if original_frame is not None:
+            return original_frame
+        if roi_bounds is not None and frame_data.get('full_frame', None) is not None:
+            return frame_data['full_frame']
+        return batch_frame
+    
+    def reid_candidate_detections(result, frame_data):
+        """
+        A frame's YOLO boxes in the coordinates the per-frame Re-ID pass crops with (None if none).
+        Same arithmetic as the per-frame path - ROI translation, the scale-back (applied twice
+        there: while creating detections and again after) and the division by scale_factor for
+        Re-ID - so boxes that come through tracking unchanged give identical crops.
+        """
+        if isinstance(result, CachedDetections):
+            xyxy, confidence = result.xyxy.copy(), result.confidence
+        else:
+            boxes = getattr(result, 'boxes', None)
+            if boxes is None or len(boxes) == 0:
+                return None
+            # Copy: on CPU the array shares memory with the result the per-frame pass reads
+            xyxy, confidence = boxes.xyxy.cpu().numpy().copy(), boxes.conf.cpu().numpy()
+        if len(xyxy) == 0:
+            return None
+        if roi_bounds is not None:
+            xyxy[:, [0, 2]] += roi_bounds[0]
+            xyxy[:, [1, 3]] += roi_bounds[1]
+        scale_factor = frame_data.get('scale_factor', 1.0)
+        if scale_factor != 1.0:
+            xyxy = xyxy * scale_factor
+            xyxy = xyxy * scale_factor
+            xyxy = xyxy / scale_factor
+        return sv.Detections(xyxy=xyxy, confidence=confidence)
+    
+    def embed_reid_batches(results, frames, frame_datas, reid_batch):
+        """
+        Yield detection results in order, first embedding the YOLO boxes of each group of frames
+        with one Re-ID forward pass (the whole batch, or each chunk as the detection stage
+        delivers it). Fills reid_batch: batch index -> (candidate detections, features).
+        """
+        if detection_stage is not None and isinstance(results, DetectionBatch):
+            groups = results.chunks()
+        else:
+            groups = [results]
+        offset = 0
+        for group in groups:
+            group = list(group)
+            indices, reid_frames, candidates = [], [], []
+            for batch_idx in range(offset, min(offset + len(group), len(frame_datas))):
+                frame_data = frame_datas[batch_idx]
+                # Watch-only mode only extracts Re-ID on even frames
+                if watch_only and frame_data.get('frame_num', 0) % 2 != 0:
+                    continue
+                try:
+                    candidate = reid_candidate_detections(group[batch_idx - offset], frame_data)
+                except Exception:
+                    candidate = None
+                if candidate is not None:
+                    indices.append(batch_idx)
+                    reid_frames.append(reid_frame_for(frames[batch_idx], frame_data))
+                    candidates.append(candidate)
+            if candidates:
+                try:
+                    with perf.span("reid_batch_extraction", frames=len(candidates)):
+                        batch_features = reid_tracker.extract_features_batch(reid_frames, candidates)
+                    for batch_idx, candidate, features in zip(indices, candidates, batch_features):
+                        reid_batch[batch_idx] = (candidate, features)
+                except Exception as e:
+                    # The per-frame pass embeds everything itself
+                    print(f"⚠ Batched Re-ID extraction failed: {e}")
+            offset += len(group)
+            yield from group
+    
+    def read_next_frame():
+        """Next decoded frame: (ret, frame, preprocessed result or None)"""
+        if frame_pipeline is not None:
+            return frame_pipeline.read()
+        with perf.span("decode"):
+            ret, frame = cap.read()
+        return ret, frame, None
+    
+    def export_instrumentation():
+        """Write the stage timing summary and Chrome trace (only when profile_output is set)"""
+        if not perf.enabled:
+            return
+        try:
+            paths = perf.export(profile_output)
+            perf.print_summary()
+            print(f"✓ Stage timings saved: {', '.join(paths.values())}")
+        except Exception as e:
+            print(f"⚠ Could not write stage timings: {e}")
+    
+    preprocessed_result = None
+    reid_batch_prepass = True  # Embed each batch up front while most frames need Re-ID
+    
     while cap.isOpened():
         # STOP REQUEST: Check if analysis should stop gracefully
         try:
@@ -8248,6 +8720,7 @@ def combined_analysis_optimized(input_path, output_path,
                 if player_gallery:
                     try:
                         player_gallery.save_gallery()
+                        player_gallery.sync_json()
                         gallery_logger.info(f"Saved player gallery (checkpoint at frame {frame_count})")
                     except Exception as e:
                         gallery_logger.error(f"Could not save gallery at frame {frame_count}: {e}", exc_info=True)
@@ -8255,12 +8728,19 @@ def combined_analysis_optimized(input_path, output_path,
                 if team_colors and learned_colors_by_team:
                     try:
                         updated_colors = learn_team_colors_from_detections(team_colors, learned_colors_by_team)
-                        if updated_colors:
+                        if updated_colors and not shared_config_read_only:
                             save_team_color_config(updated_colors)
                             print(f"✓ Saved team colors (checkpoint at frame {frame_count})")
                     except Exception as e:
                         print(f"⚠ Could not save team colors: {e}")
+                # Checkpoint so the run can be continued with --resume
+                if analysis_checkpoint is not None and not frame_queue and not frames_to_write:
+                    save_checkpoint()
                 # Close video capture
+                if detection_stage is not None:
+                    detection_stage.stop()
+                if frame_pipeline is not None:
+                    frame_pipeline.stop()
                 if cap:
                     cap.release()
                 # Close video writer if open
@@ -8273,6 +8753,9 @@ def combined_analysis_optimized(input_path, output_path,
                     except:
                         pass
                 print("✓ Analysis stopped gracefully")
+                if detection_cache is not None:
+                    detection_cache.close()
+                export_instrumentation()
                 return  # Exit the function
         except ImportError:
             pass  # shared_state not available, continue normally
@@ -8282,7 +8765,7 @@ def combined_analysis_optimized(input_path, output_path,
         # PAUSE/RESUME: Check if processing should be paused
         if dynamic_settings and dynamic_settings.paused:
             # Keep reading frames but don't process them (maintain video position)
-            ret, frame = cap.read()
+            ret, frame, preprocessed_result = read_next_frame()
             if not ret:
                 break
             # Still update frame count to maintain position
@@ -8366,7 +8849,10 @@ def combined_analysis_optimized(input_path, output_path,
                         # Check if we need to jump to this frame (more than 30 frames away)
                         if abs(frame_count - target_frame) > 30:
                             # Jump to the target frame
-                            cap.set(cv2.CAP_PROP_POS_FRAMES, target_frame)
+                            if frame_pipeline is not None:
+                                frame_pipeline.seek(target_frame)
+                            else:
+                                cap.set(cv2.CAP_PROP_POS_FRAMES, target_frame)
                             frame_count = target_frame
                             track_jump_target_frame = target_frame
                             track_jump_target_id = track_id
@@ -8385,7 +8871,7 @@ def combined_analysis_optimized(input_path, output_path,
         if watch_only and not show_live_viewer:
             # Skip frames: only process every 2nd frame in watch-only mode (2x speedup)
             # Still read all frames to maintain position, but only process every other one
-            ret, frame = cap.read()
+            ret, frame, preprocessed_result = read_next_frame()
             if not ret:
                 break
             frame_count += 1
@@ -8397,7 +8883,7 @@ def combined_analysis_optimized(input_path, output_path,
                 continue  # Skip this frame, just read the next one
         else:
             # Normal mode: process every frame
-            ret, frame = cap.read()
+            ret, frame, preprocessed_result = read_next_frame()
             if not ret:
                 break
             frame_count += 1
@@ -8439,6 +8925,7 @@ def combined_analysis_optimized(input_path, output_path,
                     if player_gallery:
                         try:
                             player_gallery.save_gallery()
+                            player_gallery.sync_json()
                             gallery_logger.info(f"Saved player gallery (checkpoint at frame {frame_count})")
                         except Exception as e:
                             gallery_logger.error(f"Could not save gallery at frame {frame_count}: {e}", exc_info=True)
@@ -8446,12 +8933,16 @@ def combined_analysis_optimized(input_path, output_path,
                     if team_colors and learned_colors_by_team:
                         try:
                             updated_colors = learn_team_colors_from_detections(team_colors, learned_colors_by_team)
-                            if updated_colors:
+                            if updated_colors and not shared_config_read_only:
                                 save_team_color_config(updated_colors)
                                 print(f"✓ Saved team colors (checkpoint at frame {frame_count})")
                         except Exception as e:
                             print(f"⚠ Could not save team colors: {e}")
                     # Close video capture
+                    if detection_stage is not None:
+                        detection_stage.stop()
+                    if frame_pipeline is not None:
+                        frame_pipeline.stop()
                     if cap:
                         cap.release()
                     # Close video writer if open
@@ -8464,6 +8955,9 @@ def combined_analysis_optimized(input_path, output_path,
                         except:
                             pass
                     print("✓ Analysis stopped gracefully")
+                    if detection_cache is not None:
+                        detection_cache.close()
+                    export_instrumentation()
                     return  # Exit the function
             except ImportError:
                 pass  # shared_state not available, continue normally
@@ -8479,7 +8973,14 @@ def combined_analysis_optimized(input_path, output_path,
         # Preprocess frame in parallel (submit and wait immediately for current frame)
         # This allows multiple frames to be preprocessed concurrently during
         # batch processing
-        if preprocess_executor is not None:
+        if frame_pipeline is not None and (dewarp or remove_net):
+            # Already preprocessed in the background by FramePipeline
+            # (preprocess synchronously if it was skipped or failed)
+            result = preprocessed_result
+            if result is None or isinstance(result, Exception):
+                result = preprocess_frame_sync(frame.copy(), frame_count)
+            frame, original_frame_for_learning = result
+        elif preprocess_executor is not None:
             # Submit for parallel preprocessing
             future = preprocess_executor.submit(
                 preprocess_frame_sync, frame.copy(), frame_count)
@@ -8533,21 +9034,32 @@ def combined_analysis_optimized(input_path, output_path,
                 # Use adaptive confidence if available, otherwise use default
                 ball_conf_thresh = max(0.15, (adaptive_conf_thresh * 0.5) if 'adaptive_conf_thresh' in locals() else 0.15)  # Lower threshold for ball
                 
-                # Run YOLO detection for ball (class 32)
+                # Run YOLO detection for ball (class 32) - or replay it from the detection cache
                 # Note: This is a separate call - we can't mix classes in one call easily
-                ball_results = model(
-                    frame,
-                    classes=[32],  # Ball class in COCO dataset
-                    conf=ball_conf_thresh,
-                    verbose=False,
-                    imgsz=imgsz if 'imgsz' in locals() else None,
-                    half=use_half if 'use_half' in locals() else False,
-                    max_det=5  # Only expect 1 ball, but allow a few for false positives
-                )
-                
+                cached_ball = detection_cache.get(frame_count, BALL) if detection_cache is not None else None
+                if cached_ball is not None:
+                    ball_results = [cached_ball]
+                    ball_detections = sv.Detections(xyxy=cached_ball.xyxy, confidence=cached_ball.confidence,
+                                                    class_id=cached_ball.class_id) if len(cached_ball) > 0 else sv.Detections.empty()
+                else:
+                    with perf.span("yolo_ball", frame=frame_count):
+                        ball_results = model(
+                            frame,
+                            classes=[32],  # Ball class in COCO dataset
+                            conf=ball_conf_thresh,
+                            verbose=False,
+                            imgsz=imgsz if 'imgsz' in locals() else None,
+                            half=use_half if 'use_half' in locals() else False,
+                            max_det=5  # Only expect 1 ball, but allow a few for false positives
+                        )
+                    if ball_results and len(ball_results) > 0:
+                        ball_detections = sv.Detections.from_ultralytics(ball_results[0])
+                        if detection_cache is not None:
+                            detection_cache.put(frame_count, ball_detections.xyxy, ball_detections.confidence,
+                                                ball_detections.class_id, kind=BALL)
+
                 # Extract ball detections
                 if ball_results and len(ball_results) > 0:
-                    ball_detections = sv.Detections.from_ultralytics(ball_results[0])
                     if len(ball_detections) > 0:
                         # Use the highest confidence ball detection
                         best_ball_idx = np.argmax(ball_detections.confidence) if ball_detections.confidence is not None else 0
@@ -8570,15 +9082,16 @@ def combined_analysis_optimized(input_path, output_path,
         
         # Color-based ball tracking (fallback or primary method)
         if current_track_ball and ball_pts is not None:
-            frame, ball_center, ball_detected, last_ball_velocity = track_ball_in_frame(
-                frame, ball_pts, buffer, current_ball_min_radius, current_ball_max_radius,
-                edge_margin=50, show_trail=current_show_ball_trail, ball_velocity=last_ball_velocity,
-                fps=fps, field_calibration=field_calibration, frame_num=frame_count,
-                seed_ball_positions=seed_ball_positions,
-                ball_history=ball_history, ball_last_seen_frame=ball_last_seen_frame,
-                homography_matrix=homography_matrix, homography_inv=homography_inv,
-                trail_length=current_trail_length  # Pass trail length from GUI
-            )
+            with perf.span("ball_tracking"):
+                frame, ball_center, ball_detected, last_ball_velocity = track_ball_in_frame(
+                    frame, ball_pts, buffer, current_ball_min_radius, current_ball_max_radius,
+                    edge_margin=50, show_trail=current_show_ball_trail, ball_velocity=last_ball_velocity,
+                    fps=fps, field_calibration=field_calibration, frame_num=frame_count,
+                    seed_ball_positions=seed_ball_positions,
+                    ball_history=ball_history, ball_last_seen_frame=ball_last_seen_frame,
+                    homography_matrix=homography_matrix, homography_inv=homography_inv,
+                    trail_length=current_trail_length  # Pass trail length from GUI
+                )
             
             # 🎯 HYBRID BALL DETECTION: Prefer YOLO if available, fallback to color-based
             if yolo_ball_detected and yolo_ball_center is not None:
@@ -8716,10 +9229,22 @@ def combined_analysis_optimized(input_path, output_path,
 
             if len(frame_queue) >= effective_batch_size or (
                     frame_count == total_frames - 1 and len(frame_queue) > 0):
+                # DETECTION CACHE: Skip inference when an earlier run detected every frame of the batch
+                cached_results = detection_cache.lookup(
+                    [fd['frame_num'] for fd in frame_data_queue]) if detection_cache is not None else None
+                if cached_results is not None:
+                    results = cached_results
+                    # Same values inference would have set (the ball detection reuses them)
+                    adaptive_conf_thresh = get_adaptive_confidence_threshold(
+                        frame_queue[0], base_thresh=track_thresh, adaptive_confidence=adaptive_confidence
+                    ) if len(frame_queue) > 0 else track_thresh
+                    imgsz = yolo_imgsz(frame_queue[0].shape[1], frame_queue[0].shape[0]) if len(frame_queue) > 0 else None
+                    use_half = device == 'cuda' and torch.cuda.is_available()
+                    perf.count("detection_cache_hits", len(cached_results))
                 # Process batch with YOLO (better GPU utilization)
                 # Model is already on the correct device (set during initialization)
                 # Ensure we're using the NVIDIA GPU (not Intel integrated)
-                if device == 'cuda' and cuda_device_id is not None:
+                elif device == 'cuda' and cuda_device_id is not None:
                     # Set CUDA device context to ensure NVIDIA GPU is used
                     with torch.cuda.device(cuda_device_id):
                         # Optimize GPU inference for maximum throughput
@@ -8744,15 +9269,16 @@ def combined_analysis_optimized(input_path, output_path,
                                     # Round to nearest multiple of 32 (YOLO stride requirement)
                                     max_dim = max(frame_w, frame_h)
                                     warmup_imgsz = int(round(max_dim / 32) * 32)
-                                _ = model(
-                                    warmup_frames, 
-                                    classes=[0], 
-                                    conf=adaptive_conf_thresh, 
-                                    verbose=False,
-                                    imgsz=warmup_imgsz,
-                                    half=warmup_half,
-                                    max_det=25
-                                )
+                                with perf.span("yolo_warmup"):
+                                    _ = model(
+                                        warmup_frames, 
+                                        classes=[0], 
+                                        conf=adaptive_conf_thresh, 
+                                        verbose=False,
+                                        imgsz=warmup_imgsz,
+                                        half=warmup_half,
+                                        max_det=25
+                                    )
 
                             # Main batch inference - YOLO handles GPU transfer automatically
                             # Don't use synchronize() here as it blocks - let GPU pipeline work
@@ -8780,16 +9306,8 @@ def combined_analysis_optimized(input_path, output_path,
                             # NOTE: Batch processing with frame arrays doesn't use streaming mode
                             # Streaming mode (stream=True) is for direct video file processing, not frame arrays
                             # Batch processing provides better GPU utilization for frame arrays
-                            
-                            results = model(
-                                frame_queue,
-                                classes=[0],
-                                conf=adaptive_conf_thresh,  # QUICK WIN #3: Use adaptive confidence
-                                verbose=False,
-                                imgsz=imgsz,  # Explicit image size for optimization
-                                half=use_half,  # FP16 inference for faster GPU processing (20-30% speedup)
-                                max_det=max(30, max_players + 10)  # Allow more detections than max_players to account for false positives and filtering
-                            )
+                            # The batch itself is detected once, below (the results of a second
+                            # max_det=max(30, max_players + 10) pass here were always overwritten)
 
                             # Optional: Log GPU memory usage periodically for
                             # diagnostics
@@ -8823,7 +9341,7 @@ def combined_analysis_optimized(input_path, output_path,
                             imgsz = int(round(max_dim / 32) * 32)
                             use_half = device == 'cuda' and torch.cuda.is_available()
                         
-                        results = model(
+                        results = run_player_detection(
                             frame_queue, 
                             classes=[0], 
                             conf=adaptive_conf_thresh, 
@@ -8846,7 +9364,7 @@ def combined_analysis_optimized(input_path, output_path,
                         max_dim = max(frame_w, frame_h)
                         imgsz = int(round(max_dim / 32) * 32)
                     
-                    results = model(
+                    results = run_player_detection(
                         frame_queue, 
                         classes=[0], 
                         conf=adaptive_conf_thresh, 
@@ -8865,9 +9383,12 @@ def combined_analysis_optimized(input_path, output_path,
                     continue
 
                 # Ensure results is iterable (convert to list if it's a single
-                # result)
+                # result). A DetectionBatch is consumed lazily as its chunks are detected.
                 try:
-                    results_list = list(results) if results is not None else []
+                    if detection_stage is not None and isinstance(results, DetectionBatch):
+                        results_list = results
+                    else:
+                        results_list = list(results) if results is not None else []
                 except (TypeError, AttributeError):
                     print(
                         f"⚠ YOLO results is not iterable at frame {frame_count}, skipping batch")
@@ -8894,9 +9415,21 @@ def combined_analysis_optimized(input_path, output_path,
                 frame_numbers_in_batch = [fd['frame_num']
                                           for fd in frame_data_queue]
 
+                # RE-ID BATCHING: Embed the YOLO boxes of the batch with one backbone pass up front.
+                # Each frame's final boxes are only known after tracking it (which depends on the
+                # naming state left by the previous frame), so the per-frame pass below reuses a row
+                # wherever a tracked box gives the same crop and embeds only the rest.
+                reid_batch = {}
+                reid_frames_extracted = 0
+                if reid_tracker is not None and reid_batch_prepass:
+                    results_list = embed_reid_batches(results_list, frame_queue, frame_data_queue, reid_batch)
+
                 # Process each frame in batch sequentially for tracking
                 for batch_idx, (batch_frame, result, frame_data) in enumerate(
                         zip(frame_queue, results_list, frame_data_queue)):
+                    # Save fresh detections for later runs on the same footage
+                    if detection_cache is not None and cached_results is None:
+                        detection_cache.put_result(frame_data['frame_num'], result)
                     try:
                         # Get current frame number early for use throughout frame processing
                         current_frame_num = frame_data.get('frame_num', 0)
@@ -8906,7 +9439,17 @@ def combined_analysis_optimized(input_path, output_path,
                             # For pose models, we need to handle the result structure differently
                             # Pose models still have boxes, but from_ultralytics might not handle them correctly
                             # When foot_based_tracking is enabled, we're using a pose model, so always use manual extraction
-                            if foot_based_tracking:
+                            if isinstance(result, CachedDetections):
+                                # Replayed from the detection cache (numpy arrays, YOLO input coordinates)
+                                if len(result) > 0:
+                                    detections = sv.Detections(
+                                        xyxy=result.xyxy.copy(),
+                                        confidence=result.confidence.copy(),
+                                        class_id=result.class_id.copy()
+                                    )
+                                else:
+                                    detections = sv.Detections.empty()
+                            elif foot_based_tracking:
                                 # Pose model: extract boxes manually since from_ultralytics fails with pose models
                                 if hasattr(result, 'boxes') and result.boxes is not None:
                                     boxes = result.boxes
@@ -10060,26 +10603,16 @@ def combined_analysis_optimized(input_path, output_path,
                                 
                                 # CRITICAL FIX: Use original (sharp) frame for Re-ID extraction, not net-removed frame
                                 # Net removal blurs the image, which hurts Re-ID feature quality
-                                # Use original_frame_for_learning if available, otherwise fall back to full_frame
-                                frame_for_reid = batch_frame
-                                original_frame = frame_data.get('original_frame_for_learning', None)
-                                if original_frame is not None:
-                                    # Use original sharp frame for Re-ID (better feature quality)
-                                    frame_for_reid = original_frame
-                                elif roi_bounds is not None:
-                                    # Get full frame from frame_data (stored when frame was queued)
-                                    full_frame = frame_data.get('full_frame', None)
-                                    if full_frame is not None:
-                                        frame_for_reid = full_frame
-                                    else:
-                                        # Fallback: if full frame not stored, use batch_frame
-                                        # This shouldn't happen, but handle gracefully
-                                        frame_for_reid = batch_frame
+                                frame_for_reid = reid_frame_for(batch_frame, frame_data)
                                 
                                 # Extract Re-ID features (extract_reid_this_frame already includes seed frame logic)
                                 if reid_tracker is not None:
-                                    reid_features = reid_tracker.extract_features(
-                                        frame_for_reid, detections_for_reid, team_colors, ball_colors)
+                                    reid_frames_extracted += 1
+                                    with perf.span("reid_extraction", detections=len(detections_for_reid)):
+                                        # Boxes embedded by the batch pass above are not embedded again
+                                        reid_features = reid_tracker.extract_features(
+                                            frame_for_reid, detections_for_reid, team_colors, ball_colors,
+                                            reuse=reid_batch.get(batch_idx))
                                     # Extract color features (team and ball colors) - SKIP in watch-only mode
                                     if extract_color_features:
                                         reid_color_features = reid_tracker.extract_color_features(
@@ -11960,6 +12493,7 @@ def combined_analysis_optimized(input_path, output_path,
                                     # Normal mode: classify teams for filtering
                                     # Use ThreadPoolExecutor to parallelize CPU-bound operations (OpenCV releases GIL)
                                     num_detections = len(detections)
+                                    team_start = time.perf_counter()
                                     if num_detections > 0:
                                         # Create a thread pool for parallel team classification (only if we have multiple detections)
                                         # For small batches, overhead isn't worth it
@@ -12039,6 +12573,7 @@ def combined_analysis_optimized(input_path, output_path,
                                                 # Extract uniform colors (jersey, shorts, socks) for uniform-based matching
                                                 uniform_info = extract_uniform_colors(frame_for_uniform, bbox)
                                                 uniform_info_list.append(uniform_info if uniform_info else {})
+                                    perf.record("team_classification", time.perf_counter() - team_start, start=team_start, detections=num_detections)
                                 
                                 # Convert to appropriate formats for match_against_gallery
                                 # teams: List of strings (team names)
@@ -12122,20 +12657,21 @@ def combined_analysis_optimized(input_path, output_path,
                                 
                                 # Only perform gallery matching if we have Re-ID features (or forced seed frame with features extracted)
                                 if reid_features is not None and len(reid_features) > 0:
-                                    gallery_matches = reid_tracker.match_against_gallery(
-                                        features=reid_features,
-                                        gallery=player_gallery,
-                                        dominant_colors=dominant_colors_array,
-                                        teams=teams_list,
-                                        jersey_numbers=jersey_numbers_list if jersey_numbers_list else None,  # Pass jersey numbers for search/boost
-                                        similarity_threshold=gallery_similarity_threshold,  # Use GUI parameter
-                                        current_frame_num=frame_data.get('frame_num', None),  # Only boost if detection is also from early frames
-                                        track_ids=track_ids_for_breadcrumbs,  # BREADCRUMBS: Pass track IDs for breadcrumb matching
-                                        uniform_info_list=uniform_info_list if uniform_info_list else None,  # UNIFORM VARIANTS: Pass uniform info for uniform-based matching
-                                        exclude_players=players_in_anchor_frames_set,  # EXCLUDE anchor players from matching (they're already identified)
-                                        # OPTIMIZATION: Only match against active/focused players for faster processing
-                                        include_only_players=include_only_players_set  # Match against active players only (faster Re-ID)
-                                        )
+                                    with perf.span("gallery_match", detections=len(reid_features)):
+                                        gallery_matches = reid_tracker.match_against_gallery(
+                                            features=reid_features,
+                                            gallery=player_gallery,
+                                            dominant_colors=dominant_colors_array,
+                                            teams=teams_list,
+                                            jersey_numbers=jersey_numbers_list if jersey_numbers_list else None,  # Pass jersey numbers for search/boost
+                                            similarity_threshold=gallery_similarity_threshold,  # Use GUI parameter
+                                            current_frame_num=frame_data.get('frame_num', None),  # Only boost if detection is also from early frames
+                                            track_ids=track_ids_for_breadcrumbs,  # BREADCRUMBS: Pass track IDs for breadcrumb matching
+                                            uniform_info_list=uniform_info_list if uniform_info_list else None,  # UNIFORM VARIANTS: Pass uniform info for uniform-based matching
+                                            exclude_players=players_in_anchor_frames_set,  # EXCLUDE anchor players from matching (they're already identified)
+                                            # OPTIMIZATION: Only match against active/focused players for faster processing
+                                            include_only_players=include_only_players_set  # Match against active players only (faster Re-ID)
+                                            )
                                     
                                     # SEED FRAME: Log when forced gallery learning is active
                                     if should_force_gallery_learning_only:
@@ -12313,6 +12849,31 @@ def combined_analysis_optimized(input_path, output_path,
                                                     # Get alternative matches with reasonable threshold (lower than primary to get more candidates, but still quality-filtered)
                                                     # Use 0.30 threshold to get viable alternatives while filtering out obviously bad matches
                                                     alternative_threshold = max(0.30, gallery_similarity_threshold - 0.20)  # At least 0.30, or 0.20 below primary threshold
+                                                    with perf.span("gallery_match_alternatives"):
+                                                        all_candidate_matches = player_gallery.match_player(
+                                                            features=detection_feature,
+                                                            similarity_threshold=alternative_threshold,  # Quality threshold for alternative matches
+                                                            dominant_color=detection_color,
+                                                            team=detection_team,
+                                                            jersey_number=detection_jersey,  # Use jersey number for search/boost
+                                                            return_all=True,  # Return all similarities
+                                                            early_frame_range=(0, early_frame_threshold_adaptive),  # Boost players tagged in first 30 seconds
+                                                            early_frame_boost=0.10,  # 10% proportional boost for early-frame tags (only if similarity >= 0.5)
+                                                            current_frame_num=frame_data.get('frame_num', None),  # Only boost if detection is also from early frames
+                                                            filter_module=reid_tracker.filter_module if reid_tracker and hasattr(reid_tracker, 'filter_module') else None,  # Pass filter module for quality checks
+                                                            suppress_diagnostics=True,  # Suppress diagnostic output for alternative matching
+                                                            exclude_players=players_in_anchor_frames_set,  # EXCLUDE anchor players (they're already identified)
+                                                            # CRITICAL: Set include_only_players to None to allow matching against ALL gallery players
+                                                            # This enables Re-ID to identify untagged players (e.g., 5 players in video, 3 tagged, Re-ID finds the other 2)
+                                                            # We exclude anchor-protected players to prevent overwriting their identities
+                                                            include_only_players=include_only_players_set  # OPTIMIZATION: Only match against active/focused players
+                                                        )
+                                            else:
+                                                # ENHANCED: Normal gallery matching with hard negative mining integration
+                                                # Get alternative matches with reasonable threshold (lower than primary to get more candidates, but still quality-filtered)
+                                                # Use 0.30 threshold to get viable alternatives while filtering out obviously bad matches
+                                                alternative_threshold = max(0.30, gallery_similarity_threshold - 0.20)  # At least 0.30, or 0.20 below primary threshold
+                                                with perf.span("gallery_match_alternatives"):
                                                     all_candidate_matches = player_gallery.match_player(
                                                         features=detection_feature,
                                                         similarity_threshold=alternative_threshold,  # Quality threshold for alternative matches
@@ -12323,39 +12884,16 @@ def combined_analysis_optimized(input_path, output_path,
                                                         early_frame_range=(0, early_frame_threshold_adaptive),  # Boost players tagged in first 30 seconds
                                                         early_frame_boost=0.10,  # 10% proportional boost for early-frame tags (only if similarity >= 0.5)
                                                         current_frame_num=frame_data.get('frame_num', None),  # Only boost if detection is also from early frames
+                                                        hard_negative_miner=hard_negative_miner,  # Pass hard negative miner for similarity adjustment
+                                                        track_id=track_id_int,  # Pass track ID for hard negative mining
                                                         filter_module=reid_tracker.filter_module if reid_tracker and hasattr(reid_tracker, 'filter_module') else None,  # Pass filter module for quality checks
                                                         suppress_diagnostics=True,  # Suppress diagnostic output for alternative matching
-                                                        exclude_players=players_in_anchor_frames_set,  # EXCLUDE anchor players (they're already identified)
+                                                        exclude_players=players_in_anchor_frames_set,  # EXCLUDE anchor players from matching
                                                         # CRITICAL: Set include_only_players to None to allow matching against ALL gallery players
                                                         # This enables Re-ID to identify untagged players (e.g., 5 players in video, 3 tagged, Re-ID finds the other 2)
                                                         # We exclude anchor-protected players to prevent overwriting their identities
-                                                        include_only_players=include_only_players_set  # OPTIMIZATION: Only match against active/focused players
+                                                        include_only_players=None  # Allow matching against all gallery players (not just those in anchor frames)
                                                     )
-                                            else:
-                                                # ENHANCED: Normal gallery matching with hard negative mining integration
-                                                # Get alternative matches with reasonable threshold (lower than primary to get more candidates, but still quality-filtered)
-                                                # Use 0.30 threshold to get viable alternatives while filtering out obviously bad matches
-                                                alternative_threshold = max(0.30, gallery_similarity_threshold - 0.20)  # At least 0.30, or 0.20 below primary threshold
-                                                all_candidate_matches = player_gallery.match_player(
-                                                    features=detection_feature,
-                                                    similarity_threshold=alternative_threshold,  # Quality threshold for alternative matches
-                                                    dominant_color=detection_color,
-                                                    team=detection_team,
-                                                    jersey_number=detection_jersey,  # Use jersey number for search/boost
-                                                    return_all=True,  # Return all similarities
-                                                    early_frame_range=(0, early_frame_threshold_adaptive),  # Boost players tagged in first 30 seconds
-                                                    early_frame_boost=0.10,  # 10% proportional boost for early-frame tags (only if similarity >= 0.5)
-                                                    current_frame_num=frame_data.get('frame_num', None),  # Only boost if detection is also from early frames
-                                                    hard_negative_miner=hard_negative_miner,  # Pass hard negative miner for similarity adjustment
-                                                    track_id=track_id_int,  # Pass track ID for hard negative mining
-                                                    filter_module=reid_tracker.filter_module if reid_tracker and hasattr(reid_tracker, 'filter_module') else None,  # Pass filter module for quality checks
-                                                    suppress_diagnostics=True,  # Suppress diagnostic output for alternative matching
-                                                    exclude_players=players_in_anchor_frames_set,  # EXCLUDE anchor players from matching
-                                                    # CRITICAL: Set include_only_players to None to allow matching against ALL gallery players
-                                                    # This enables Re-ID to identify untagged players (e.g., 5 players in video, 3 tagged, Re-ID finds the other 2)
-                                                    # We exclude anchor-protected players to prevent overwriting their identities
-                                                    include_only_players=None  # Allow matching against all gallery players (not just those in anchor frames)
-                                                )
                                             
                                             # ===== ADVANCED RECOGNITION: Adjust similarity with hard negatives =====
                                             if hard_negative_miner is not None and all_candidate_matches and player_gallery:
@@ -12646,14 +13184,15 @@ def combined_analysis_optimized(input_path, output_path,
                                 
                                 try:
                                     # Update tracker (BoxMOT wrapper handles both update() and update_with_detections())
-                                    if hasattr(tracker, 'update') and not isinstance(tracker, type):  # Check if it's a method, not a class
-                                        # BoxMOT wrapper needs frame for appearance features
-                                        if hasattr(tracker, '__class__') and 'BoxMOT' in tracker.__class__.__name__:
-                                            detections = tracker.update(detections, batch_frame)
+                                    with perf.span("tracker_update", frame=current_frame_num):
+                                        if hasattr(tracker, 'update') and not isinstance(tracker, type):  # Check if it's a method, not a class
+                                            # BoxMOT wrapper needs frame for appearance features
+                                            if hasattr(tracker, '__class__') and 'BoxMOT' in tracker.__class__.__name__:
+                                                detections = tracker.update(detections, batch_frame)
+                                            else:
+                                                detections = tracker.update(detections)
                                         else:
                                             detections = tracker.update(detections)
-                                    else:
-                                        detections = tracker.update(detections)
                                     
                                     # Debug logging AFTER tracker update for OC-SORT
                                     if current_frame_num <= 10:
@@ -13051,12 +13590,13 @@ def combined_analysis_optimized(input_path, output_path,
                                     conf_before = f"conf={detections.confidence.min():.3f}-{detections.confidence.max():.3f}" if detections is not None and detections.confidence is not None and len(detections.confidence) > 0 else "no conf"
                                     print(f"🔍 Frame {current_frame_num}: Before ByteTrack tracker.update(): {detections_before_tracker} detections, {conf_before}")
                                 
-                                if hasattr(tracker, '__class__') and 'BoxMOT' in tracker.__class__.__name__:
-                                    detections = tracker.update(detections, batch_frame)
-                                elif hasattr(tracker, 'update_with_detections'):
-                                    detections = tracker.update_with_detections(detections)
-                                else:
-                                    detections = tracker.update(detections)
+                                with perf.span("tracker_update", frame=current_frame_num):
+                                    if hasattr(tracker, '__class__') and 'BoxMOT' in tracker.__class__.__name__:
+                                        detections = tracker.update(detections, batch_frame)
+                                    elif hasattr(tracker, 'update_with_detections'):
+                                        detections = tracker.update_with_detections(detections)
+                                    else:
+                                        detections = tracker.update(detections)
                             
                                 # Debug logging AFTER tracker update for ByteTrack
                                 if current_frame_num <= 10:
@@ -17443,6 +17983,10 @@ def combined_analysis_optimized(input_path, output_path,
                                 # features)
                                 reid_tracker.update_tracks(
                                     detections.tracker_id, reid_features, reid_color_features)
+                                if stitch_windows:
+                                    accumulate_stitch_features(stitch_feature_sums, stitch_windows,
+                                                               frame_data.get('frame_num', frame_count),
+                                                               detections.tracker_id, reid_features)
 
                                 # For detections without IDs (new or lost), try
                                 # to match using Re-ID
@@ -19777,6 +20321,7 @@ def combined_analysis_optimized(input_path, output_path,
                                     prev_ball_frame = None
 
                         # Export to CSV
+                        csv_start = time.perf_counter()
                         if export_csv and csv_writer is not None:
                             current_frame = frame_data.get('frame_num', 0)
                             # DIAGNOSTIC: Always log first few frames and then every 1000 frames to debug CSV export issues
@@ -20082,6 +20627,7 @@ def combined_analysis_optimized(input_path, output_path,
                                         raise  # Re-raise to stop processing
                                     else:
                                         raise  # Re-raise other OSErrors
+                        perf.record("csv_write", time.perf_counter() - csv_start, start=csv_start)
 
                         # CRITICAL FIX: Update track state for smooth interpolation/extrapolation
                         # This keeps boxes visible even on unprocessed frames,
@@ -20333,6 +20879,16 @@ def combined_analysis_optimized(input_path, output_path,
                 else:
                     last_frame_in_batch = frame_count
 
+                # Keep batching Re-ID while at least half the frames it could cover actually used it
+                reid_prepass_frames = sum(1 for fd in frame_data_queue
+                                          if not watch_only or fd.get('frame_num', 0) % 2 == 0)
+                reid_batch_prepass = reid_frames_extracted * 2 >= reid_prepass_frames
+                del reid_batch
+
+                # Detection thread must be idle before this thread calls the model again (ball detection)
+                if detection_stage is not None and isinstance(results, DetectionBatch):
+                    results.close()
+
                 # Explicitly delete all frame copies
                 for f in frame_queue:
                     del f
@@ -20470,6 +21026,7 @@ def combined_analysis_optimized(input_path, output_path,
             else:
                 use_frame = None
                 
+            overlay_start = time.perf_counter()
             if use_frame is not None and use_frame in frame_detections and frame_to_write is not None:
                 # This frame (or a recent frame) was processed - get detections
                 det_data = frame_detections[use_frame]  # Use the most recent processed frame
@@ -21668,6 +22225,7 @@ def combined_analysis_optimized(input_path, output_path,
                         frame_to_write = frame.copy()  # Copy to ensure consistent drawing (includes ball annotations)
                 else:
                     frame_to_write = None
+            perf.record("overlay_render", time.perf_counter() - overlay_start, start=overlay_start)
             
             # LIVE VIEWER: Display frame if enabled (works in both watch-only and normal mode)
             # OPTIMIZATION: Skip display if no frame to write (watch-only without viewer)
@@ -21885,6 +22443,7 @@ def combined_analysis_optimized(input_path, output_path,
             # Export overlay metadata (before writing frames)
             # CRITICAL FIX: Create overlay metadata for ALL frames, not just frames with detections
             # This ensures 100% coverage for consistent rendering in playback viewer
+            overlay_start = time.perf_counter()
             if overlay_metadata is not None:
                 # Use frame_count directly (all frames should have metadata, even if empty)
                 actual_frame_num = frame_count
@@ -22164,6 +22723,7 @@ def combined_analysis_optimized(input_path, output_path,
                         }
                     except:
                         pass  # If this also fails, skip this frame
+            perf.record("overlay_metadata", time.perf_counter() - overlay_start, start=overlay_start)
             
             # Write base video (clean, no overlays) if enabled
             if base_video_writer is not None and base_video_writer.isOpened():
@@ -22176,6 +22736,7 @@ def combined_analysis_optimized(input_path, output_path,
             # Write frames at output frame rate (downsample if needed)
             # CRITICAL FIX: Write frames immediately when no downsampling for smooth playback
             # Ensure every frame is written in order to prevent choppy playback
+            encode_start = time.perf_counter()
             if not watch_only and enable_video_encoding and out is not None:  # Skip writing if encoding disabled
                 # CRITICAL FIX: Ensure frame_to_write is not None before writing
                 # If frame_to_write is None, create a copy of the original frame (ball annotations should already be on it)
@@ -22202,6 +22763,7 @@ def combined_analysis_optimized(input_path, output_path,
                         # This ensures frames are always written even if there are no player detections
                         frame_to_write = frame.copy()  # Copy includes ball annotations from track_ball_in_frame
                         out.write(frame_to_write)
+            perf.record("encode", time.perf_counter() - encode_start, start=encode_start)
         else:
             # No player tracking - write frame directly
             # LIVE VIEWER: Display frame in watch-only mode if enabled
@@ -22252,6 +22814,7 @@ def combined_analysis_optimized(input_path, output_path,
                     if "window" not in str(e).lower():
                         pass
             
+            encode_start = time.perf_counter()
             if not watch_only:  # Skip writing in watch-only mode
                 # CRITICAL FIX: Copy frame to avoid modifying original
                 frame_copy = frame.copy()
@@ -22268,6 +22831,7 @@ def combined_analysis_optimized(input_path, output_path,
                     # No downsampling: write each frame immediately for smooth playback
                     out.write(frame_copy)
                     frames_to_write = []  # Clear queue since we wrote immediately
+            perf.record("encode", time.perf_counter() - encode_start, start=encode_start)
         
         if False:  # Legacy code path - not used when player tracking is enabled
             # No player tracking, process normally
@@ -22424,6 +22988,19 @@ def combined_analysis_optimized(input_path, output_path,
         if frame_count >= total_frames:
             break
         
+        # INSTRUMENTATION: Frame counter, batch queue depth and memory (RSS / GPU) samples
+        if perf.enabled:
+            perf.count("frames")
+            if track_players_flag and model is not None:
+                perf.gauge("yolo_batch_queue", len(frame_queue))
+            if frame_count % 100 == 0:
+                perf.sample_memory()
+        
+        # CHECKPOINT: Only between batches, once every frame read so far has been written
+        if analysis_checkpoint is not None and not frame_queue and not frames_to_write and \
+                analysis_checkpoint.due(frame_count):
+            save_checkpoint()
+        
         # AUTOMATIC LEARNING: Periodically update team colors from learned samples
         # OPTIMIZATION: Reduce update frequency once we have enough samples
         if len(learned_colors_by_team) > 0:
@@ -22441,7 +23018,10 @@ def combined_analysis_optimized(input_path, output_path,
             
             if frame_count % update_interval == 0:
                 updated_config = learn_team_colors_from_detections(team_colors, learned_colors_by_team, min_samples=10, max_samples=50)
-                if updated_config:
+                if updated_config and shared_config_read_only:
+                    # Shared config is read-only - use the learned ranges in this run only
+                    team_colors = updated_config
+                elif updated_config:
                     if save_team_color_config(updated_config):
                         logger.info("Saved learned team colors to team_color_config.json")
                         # Reload team colors to use updated ranges IMMEDIATELY
@@ -22645,6 +23225,24 @@ def combined_analysis_optimized(input_path, output_path,
     if preprocess_executor is not None:
         preprocess_executor.shutdown(wait=True)
     
+    # Stop background detection stage
+    if detection_stage is not None:
+        detection_stage_stats = detection_stage.stats()
+        detection_stage.stop()
+        logger.info(f"Detection stage: {detection_stage_stats['frames_detected']} frames detected "
+                    f"({detection_stage_stats['detect_fps']:.1f} detect fps), "
+                    f"main loop waited {detection_stage_stats['consumer_wait_seconds']:.1f}s for detections")
+    
+    # Stop background decode/preprocess pipeline (before releasing the capture it reads from)
+    if frame_pipeline is not None:
+        pipeline_stats = frame_pipeline.stats()
+        frame_pipeline.stop()
+        logger.info(f"Frame pipeline: {pipeline_stats['frames_decoded']} frames decoded "
+                    f"({pipeline_stats['decode_fps']:.1f} decode fps), "
+                    f"{pipeline_stats['frames_preprocessed']} preprocessed, "
+                    f"main loop waited {pipeline_stats['consumer_wait_seconds']:.1f}s for frames, "
+                    f"max queue depth {pipeline_stats['max_queue_depth']}")
+    
     # PERFORMANCE: Cleanup CPU operations executor (team classification, uniform extraction)
     if 'cpu_ops_executor' in locals() and cpu_ops_executor is not None:
         cpu_ops_executor.shutdown(wait=True)
@@ -22653,8 +23251,11 @@ def combined_analysis_optimized(input_path, output_path,
     
     if not watch_only:
         # Release base video writer
+        checkpoint_outputs_complete = True
         if base_video_writer is not None:
             base_video_writer.release()
+            if isinstance(base_video_writer, SegmentedVideoWriter):
+                checkpoint_outputs_complete &= base_video_writer.join()
             if base_video_path:
                 print(f"✓ Base video saved: {base_video_path}")
                 print(f"   ℹ Original video ({input_path}) is also available as the base video")
@@ -22667,12 +23268,19 @@ def combined_analysis_optimized(input_path, output_path,
                 saved_path = overlay_metadata.save(overlay_metadata_path, use_pickle=True)
                 print(f"✓ Overlay metadata saved: {saved_path}")
                 print(f"   → {len(overlay_metadata.overlays)} frames with overlay data")
-                print(f"   → Format: {'Pickle (fast)' if saved_path.endswith('.pkl') else 'JSON (portable)'}")
+                if saved_path.endswith('.ovl'):
+                    saved_format = 'Chunked store (lazy)'
+                else:
+                    saved_format = 'Pickle (fast)' if saved_path.endswith('.pkl') else 'JSON (portable)'
+                print(f"   → Format: {saved_format}")
             except Exception as e:
                 print(f"⚠ Could not save overlay metadata: {e}")
         
         if out is not None:
             out.release()
+            if isinstance(out, SegmentedVideoWriter):
+                # Join the per-checkpoint segments into the final video
+                checkpoint_outputs_complete &= out.join()
             if enable_video_encoding:
                 print(f"✓ Video output saved: {output_path}")
             else:
@@ -22695,6 +23303,17 @@ def combined_analysis_optimized(input_path, output_path,
             csv_filename = csv_file.name
             csv_file.close()
             print(f"✓ Tracking data exported to: {csv_filename}")
+            # PERFORMANCE: Typed, frame-sorted Parquet sidecar (FPS/resolution kept as file metadata)
+            # so post-analysis tools load only the columns they need instead of re-parsing the CSV
+            if TRACKING_SIDECAR_AVAILABLE:
+                sidecar_file = write_sidecar(csv_filename, metadata={
+                    'fps': float(fps), 'width': int(width), 'height': int(height),
+                    'yolo_width': int(yolo_width), 'yolo_height': int(yolo_height),
+                    'yolo_scale_factor': float(yolo_scale_factor),
+                    'units': 'imperial' if use_imperial_units else 'metric'
+                })
+                if sidecar_file:
+                    print(f"   → Columnar sidecar: {sidecar_file}")
             # Show CSV export statistics
             if csv_export_stats['total_player_rows'] > 0:
                 print(f"   → CSV contains {csv_export_stats['total_player_rows']} player data row(s) from {csv_export_stats['frames_with_players']} frame(s)")
@@ -22731,6 +23350,16 @@ def combined_analysis_optimized(input_path, output_path,
         elif export_csv:
             print(f"⚠ WARNING: CSV export was requested but file was not created")
         
+        if stitch_features_output:
+            save_stitch_features(stitch_features_output, stitch_feature_sums)
+        
+        # Run completed - checkpoints are no longer needed (kept if video segments could not be joined)
+        if analysis_checkpoint is not None:
+            if checkpoint_outputs_complete:
+                analysis_checkpoint.clear()
+            else:
+                print(f"⚠ Keeping checkpoint directory with the video segments: {analysis_checkpoint.directory}")
+        
         # Merge audio from original video if available
         # NOTE: Audio merge only works if video encoding was enabled (need a video file to merge into)
         if preserve_audio and enable_video_encoding:
@@ -22806,7 +23435,7 @@ def combined_analysis_optimized(input_path, output_path,
         for team_name, colors in learned_colors_by_team.items():
             print(f"   • {team_name}: {len(colors)} color samples collected")
         updated_config = learn_team_colors_from_detections(team_colors, learned_colors_by_team, min_samples=5)  # Lower threshold for final save
-        if updated_config:
+        if updated_config and not shared_config_read_only:
             if save_team_color_config(updated_config):
                 print(f"   💾 Saved learned team colors to team_color_config.json")
     else:
@@ -23046,6 +23675,7 @@ def combined_analysis_optimized(input_path, output_path,
                 print(f"   → Total: {total_ref_frames_all} reference frames across {players_with_refs} players")
             
             player_gallery.save_gallery()
+            player_gallery.sync_json()  # Binary store: regenerate player_gallery.json once per run
             if frame_count > 0:
                 total_players = len(player_gallery.players)
                 gallery_logger.info(f"Saved {total_players} players to gallery: player_gallery.json")
@@ -23248,6 +23878,13 @@ def combined_analysis_optimized(input_path, output_path,
         print(f"Analysis complete! Output saved: {output_path}")
         print(f"Total processing time: {total_time/60:.1f} minutes")
         print(f"Average processing rate: {total_frames/total_time:.1f} fps")
+    
+    if detection_cache is not None:
+        detection_cache.close()
+        if detection_cache.hits or detection_cache.written:
+            print(f"✓ Detection cache: {detection_cache.hits} detection results replayed, {detection_cache.written} saved ({detection_cache.directory})")
+    
+    export_instrumentation()
 
 
 if __name__ == "__main__":
@@ -23283,9 +23920,32 @@ if __name__ == "__main__":
     parser.add_argument("--seed-frame", type=int, default=None, help="Force gallery mapping every N frames (default: None, 0 = every 100 frames)")
     parser.add_argument("--gui", action="store_true", help="Launch GUI instead of CLI mode")
     parser.add_argument("--visualize", action="store_true", help="Enable visualization overlays (default: always enabled, this flag is for clarity)")
+    parser.add_argument("--profile", nargs="?", const="", default=None, metavar="PREFIX",
+                        help="Record per-stage timings: writes PREFIX_perf_summary.json and PREFIX_perf_trace.json "
+                             "(default prefix: output path without extension)")
+    parser.add_argument("--checkpoint-every", type=int, default=0, metavar="N",
+                        help="Write a resumable checkpoint every N frames (default: 0 = disabled, 5000 with --resume)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue from the latest checkpoint of this output instead of starting over")
+    parser.add_argument("--parallel-segments", type=int, default=None, metavar="N",
+                        help="Analyse N overlapping time segments in parallel processes and stitch the tracks "
+                             "(0 = one per 2 CPU cores; CSV + overlay metadata only, no video)")
+    parser.add_argument("--no-detection-cache", action="store_true",
+                        help="Always run YOLO instead of reusing detections of earlier runs on the same video")
+    parser.add_argument("--detection-cache-dir", type=str, default=None, metavar="DIR",
+                        help="Detection cache directory (default: detection_cache/ next to the output)")
+    parser.add_argument("--gallery-binary-store", action="store_true",
+                        help="Keep the player gallery in the binary store (player_gallery.store/, incremental "
+                             "saves); player_gallery.json is migrated once and kept in sync")
     args = parser.parse_args()
     
-    combined_analysis_optimized(
+    analyze = combined_analysis_optimized
+    if args.parallel_segments is not None:
+        from segment_parallel import analyze_video_parallel
+        analyze = lambda input_path, output_path, **kwargs: analyze_video_parallel(
+            input_path, output_path, num_segments=args.parallel_segments or None, analysis_kwargs=kwargs)
+    
+    analyze(
         args.input, args.output,
         dewarp=args.dewarp,
         output_fps=args.output_fps,
@@ -23316,5 +23976,11 @@ if __name__ == "__main__":
         watch_only=args.watch_only,
         show_live_viewer=args.show_live_viewer,
         viewer_downscale=args.viewer_downscale,
-        viewer_threaded=args.viewer_threaded
+        viewer_threaded=args.viewer_threaded,
+        profile_output=(args.profile or os.path.splitext(args.output)[0]) if args.profile is not None else None,
+        checkpoint_interval=args.checkpoint_every,
+        resume=args.resume,
+        use_detection_cache=not args.no_detection_cache,
+        detection_cache_dir=args.detection_cache_dir,
+        gallery_binary_store=args.gallery_binary_store
     )
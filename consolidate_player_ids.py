@@ -28,6 +28,12 @@ try:
 except ImportError:
     YOLO_AVAILABLE = False
 
+try:
+    from tracking_data_io import load_tracking_data
+    TRACKING_DATA_IO_AVAILABLE = True
+except ImportError:
+    TRACKING_DATA_IO_AVAILABLE = False
+
 
 def load_team_color_config():
     """Load team color configuration"""
@@ -44,6 +50,8 @@ def analyze_id_sequences(df):
     """
     Analyze player ID sequences to find potential duplicates
     Returns: dict of {player_id: {'frames': list, 'positions': list, 'time_ranges': list}}
+    
+    PERFORMANCE: Column-wise (no iterrows) - one stable sort groups rows by player ID
     """
     player_data = defaultdict(lambda: {
         'frames': [],
@@ -52,46 +60,233 @@ def analyze_id_sequences(df):
         'total_frames': 0
     })
     
-    # Group by player ID
-    for _, row in df.iterrows():
-        if pd.notna(row.get('player_id')):
-            pid = int(row['player_id'])
-            # FIX: Convert frame_num to int to prevent string subtraction error
-            frame_num = int(row['frame']) if pd.notna(row.get('frame')) else 0
-            timestamp = row.get('timestamp', 0)
-            
-            player_data[pid]['frames'].append(frame_num)
-            player_data[pid]['total_frames'] += 1
-            
-            if pd.notna(row.get('player_x')) and pd.notna(row.get('player_y')):
-                player_data[pid]['positions'].append((row['player_x'], row['player_y'], frame_num))
+    if 'player_id' not in df.columns or len(df) == 0:
+        return player_data
     
-    # Find time ranges (continuous sequences)
-    for pid in player_data:
-        frames = sorted(player_data[pid]['frames'])
-        if not frames:
-            continue
-        
-        # Find gaps in frame sequence (gaps > 10 frames = new sequence)
-        sequences = []
-        current_seq = [frames[0]]
-        
-        for i in range(1, len(frames)):
-            gap = frames[i] - frames[i-1]
-            if gap <= 30:  # Small gap - same sequence
-                current_seq.append(frames[i])
-            else:  # Large gap - new sequence
-                sequences.append((current_seq[0], current_seq[-1]))
-                current_seq = [frames[i]]
-        
-        if current_seq:
-            sequences.append((current_seq[0], current_seq[-1]))
-        
-        player_data[pid]['time_ranges'] = sequences
+    valid = df['player_id'].notna().to_numpy()
+    if not valid.any():
+        return player_data
+    
+    pids = pd.to_numeric(df['player_id'][valid]).to_numpy().astype(np.int64)
+    # FIX: Convert frame_num to int to prevent string subtraction error
+    if 'frame' in df.columns:
+        frames = pd.to_numeric(df['frame'][valid]).fillna(0).to_numpy().astype(np.int64)
+    else:
+        frames = np.zeros(len(pids), dtype=np.int64)
+    if 'player_x' in df.columns and 'player_y' in df.columns:
+        has_pos = (df['player_x'][valid].notna() & df['player_y'][valid].notna()).to_numpy()
+        xs = df['player_x'][valid].to_numpy()
+        ys = df['player_y'][valid].to_numpy()
+    else:
+        has_pos = np.zeros(len(pids), dtype=bool)
+        xs = ys = None
+    
+    # Group rows by player ID (stable: file order within each ID), IDs in order of first appearance
+    order = np.argsort(pids, kind='stable')
+    unique_ids, group_starts, counts = np.unique(pids[order], return_index=True, return_counts=True)
+    first_row = order[group_starts]
+    
+    for g in np.argsort(first_row, kind='stable'):
+        pid = int(unique_ids[g])
+        rows = order[group_starts[g]:group_starts[g] + counts[g]]
+        data = player_data[pid]
+        data['frames'] = frames[rows].tolist()
+        data['total_frames'] = int(counts[g])
+        pos_rows = rows[has_pos[rows]]
+        if len(pos_rows):
+            data['positions'] = list(zip(xs[pos_rows].tolist(), ys[pos_rows].tolist(), frames[pos_rows].tolist()))
+        
+        # Find time ranges (continuous sequences)
+        # Find gaps in frame sequence (gaps > 30 frames = new sequence)
+        sorted_frames = np.sort(frames[rows])
+        breaks = np.flatnonzero(np.diff(sorted_frames) > 30)
+        starts = np.concatenate(([sorted_frames[0]], sorted_frames[breaks + 1]))
+        ends = np.concatenate((sorted_frames[breaks], [sorted_frames[-1]]))
+        data['time_ranges'] = list(zip(starts.tolist(), ends.tolist()))
     
     return player_data
 
 
+def _range_gap(ranges1, ranges2):
+    """
+    Temporal relation of two tracks' time ranges.
+    
+    Returns:
+        (has_overlap, min_gap) - min_gap is 0 if any ranges overlap, else the smallest gap in frames
+    """
+    min_gap = float('inf')
+    has_overlap = False
+    for r1 in ranges1:
+        for r2 in ranges2:
+            if not (r1[1] < r2[0] or r2[1] < r1[0]):
+                has_overlap = True
+                min_gap = 0
+            else:
+                gap = min(abs(r1[1] - r2[0]), abs(r2[1] - r1[0]))
+                min_gap = min(min_gap, gap)
+    return has_overlap, min_gap
+
+
+def _intersect_ranges(ranges1, ranges2):
+    """Intersection of two sorted, disjoint lists of inclusive (start, end) frame ranges"""
+    result = []
+    i = j = 0
+    while i < len(ranges1) and j < len(ranges2):
+        start = max(ranges1[i][0], ranges2[j][0])
+        end = min(ranges1[i][1], ranges2[j][1])
+        if start <= end:
+            result.append((start, end))
+        if ranges1[i][1] < ranges2[j][1]:
+            i += 1
+        else:
+            j += 1
+    return result
+
+
+def _in_ranges(frames, ranges):
+    """Mask of frames that fall inside any of the sorted, disjoint inclusive ranges"""
+    starts = np.array([r[0] for r in ranges])
+    ends = np.array([r[1] for r in ranges])
+    idx = np.searchsorted(starts, frames, side='right') - 1
+    return (idx >= 0) & (frames <= ends[np.clip(idx, 0, None)])
+
+
+class _PointGrid:
+    """
+    Uniform grid over 2D points for fixed-radius neighbour queries.
+    
+    Every point within cell_size of a query lies in the query's cell or one of its 8 neighbours,
+    so candidate lookups touch only nearby tracks instead of all of them.
+    """
+    
+    def __init__(self, cell_size):
+        self.cell_size = float(cell_size)
+        self.cells = defaultdict(list)
+    
+    def _cell(self, x, y):
+        return (int(np.floor(x / self.cell_size)), int(np.floor(y / self.cell_size)))
+    
+    def add(self, key, x, y):
+        self.cells[self._cell(x, y)].append(key)
+    
+    def near(self, x, y):
+        """Keys of every point in the 3x3 block of cells around (x, y)"""
+        cx, cy = self._cell(x, y)
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                yield from self.cells.get((cx + dx, cy + dy), ())
+
+
+def _track_summaries(sorted_players):
+    """
+    Per-track summary used by the merge candidate search (entry k = k-th track of sorted_players)
+    
+    Positions are converted to arrays once here instead of being rebuilt for every pair.
+    """
+    summaries = []
+    for pid, data in sorted_players:
+        positions = data['positions']
+        ranges = [(int(s), int(e)) for s, e in data['time_ranges']]
+        s = {
+            'pid': pid,
+            'data': data,
+            'total_frames': data['total_frames'],
+            'ranges': ranges,
+            'has_pos': bool(positions),
+        }
+        if positions:
+            pos = np.asarray(positions, dtype=np.float64)
+            s['pos_x'] = pos[:, 0]
+            s['pos_y'] = pos[:, 1]
+            s['pos_frames'] = np.array([int(p[2]) for p in positions], dtype=np.int64)
+            s['mean_x'] = np.mean(s['pos_x'])
+            s['mean_y'] = np.mean(s['pos_y'])
+            s['first_pos'] = positions[0]
+            s['last_pos'] = positions[-1]
+            s['last_seq_end'] = max([seq[1] for seq in data['time_ranges']]) if data['time_ranges'] else positions[-1][2]
+        if ranges:
+            s['span'] = (ranges[0][0], ranges[-1][1])
+        summaries.append(s)
+    return summaries
+
+
+def _direct_candidates(summaries, max_gap):
+    """
+    Pairs (i, j), i < j, where track j's first position follows track i's last sequence end by
+    0..max_gap frames and starts within 150 px of track i's last position.
+    
+    Interval index: tracks bucketed on a 150 px grid by last position, each bucket sorted by
+    last sequence end, so each query is a bisect over nearby tracks only.
+    """
+    from bisect import bisect_left, bisect_right
+    
+    eligible = [k for k, s in enumerate(summaries) if s['total_frames'] >= 10 and s['has_pos']]
+    buckets = defaultdict(list)
+    grid = _PointGrid(150.0)
+    for k in eligible:
+        last_pos = summaries[k]['last_pos']
+        buckets[grid._cell(last_pos[0], last_pos[1])].append((summaries[k]['last_seq_end'], k))
+    for bucket in buckets.values():
+        bucket.sort()
+    bucket_ends = {cell: [e for e, _ in bucket] for cell, bucket in buckets.items()}
+    
+    pairs = []
+    if max_gap < 0:
+        return pairs
+    for j in eligible:
+        first_pos = summaries[j]['first_pos']
+        first_frame = first_pos[2]
+        cx, cy = grid._cell(first_pos[0], first_pos[1])
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                cell = (cx + dx, cy + dy)
+                if cell not in buckets:
+                    continue
+                ends = bucket_ends[cell]
+                lo = bisect_left(ends, first_frame - max_gap)
+                hi = bisect_right(ends, first_frame)
+                pairs.extend((i, j) for _, i in buckets[cell][lo:hi] if i < j)
+    pairs.sort()
+    return pairs
+
+
+def _span_candidates(summaries, margin):
+    """
+    Pairs (i, j), i < j, whose overall frame spans overlap or are at most `margin` frames apart
+    (sweep line over span starts with a heap of active span ends).
+    """
+    import heapq
+    
+    eligible = [k for k, s in enumerate(summaries) if s['has_pos'] and s['ranges']]
+    eligible.sort(key=lambda k: summaries[k]['span'][0])
+    active = []  # (span_end, k)
+    pairs = []
+    for k in eligible:
+        start, end = summaries[k]['span']
+        while active and active[0][0] + margin < start:
+            heapq.heappop(active)
+        for _, other in active:
+            pairs.append((min(k, other), max(k, other)))
+        heapq.heappush(active, (end, k))
+    pairs.sort()
+    return pairs
+
+
+def _mean_position_candidates(summaries, min_frames, radius):
+    """Pairs (i, j), i < j, of tracks with >= min_frames whose mean positions are within radius"""
+    eligible = [k for k, s in enumerate(summaries) if s['total_frames'] >= min_frames and s['has_pos']]
+    grid = _PointGrid(radius)
+    for k in eligible:
+        grid.add(k, summaries[k]['mean_x'], summaries[k]['mean_y'])
+    pairs = []
+    for j in eligible:
+        for i in grid.near(summaries[j]['mean_x'], summaries[j]['mean_y']):
+            if i < j:
+                pairs.append((i, j))
+    pairs.sort()
+    return pairs
+
+
 def find_potential_merges(df, player_data, max_gap_frames=300, max_distance=200, target_player_count=None, max_total_merges=None, player_name_assignments=None):
     """
     Find player IDs that are likely the same player
@@ -162,16 +357,7 @@ def find_potential_merges(df, player_data, max_gap_frames=300, max_distance=200,
                             target_ranges = target_data['time_ranges']
                             source_ranges = source_data['time_ranges']
                             
-                            min_gap = float('inf')
-                            has_overlap = False
-                            for tr in target_ranges:
-                                for sr in source_ranges:
-                                    if not (tr[1] < sr[0] or sr[1] < tr[0]):
-                                        has_overlap = True
-                                        min_gap = 0
-                                    else:
-                                        gap = min(abs(tr[1] - sr[0]), abs(sr[1] - tr[0]))
-                                        min_gap = min(min_gap, gap)
+                            has_overlap, min_gap = _range_gap(target_ranges, source_ranges)
                             
                             # Only merge if overlap or reasonable gap (within 300 frames)
                             if has_overlap or min_gap <= 300:
@@ -190,278 +376,207 @@ def find_potential_merges(df, player_data, max_gap_frames=300, max_distance=200,
     # Sort players by total frames (most active first)
     sorted_players = sorted(player_data.items(), key=lambda x: x[1]['total_frames'], reverse=True)
     
+    # PERFORMANCE: Candidate pairs come from interval/spatial indexes instead of comparing every pair
+    # of tracks (O(n^2) with per-pair frame-set rebuilds). Each phase only scores pairs that can pass
+    # its gap/distance limits, in the same (i, j) order as before, so results are unchanged.
+    summaries = _track_summaries(sorted_players)
+    
     # Phase 1: Find direct connections (ID ends, another starts nearby)
     # IMPROVED: More strict criteria for direct merges
     direct_merges = []
-    for i, (pid1, data1) in enumerate(sorted_players):
-        if data1['total_frames'] < 10:  # Increased threshold - need more frames for reliable merge
+    # IMPROVED: Require smaller gap for better accuracy (was max_gap_frames, now 150)
+    for i, j in _direct_candidates(summaries, min(max_gap_frames, 150)):
+        s1, s2 = summaries[i], summaries[j]
+        pid1, data1 = s1['pid'], s1['data']
+        pid2, data2 = s2['pid'], s2['data']
+        
+        last_pos1 = s1['last_pos']  # (x, y, frame)
+        first_pos2 = s2['first_pos']  # (x, y, frame)
+        gap = first_pos2[2] - s1['last_seq_end']
+        
+        # Check if positions are close (player reappeared nearby)
+        distance = np.sqrt((last_pos1[0] - first_pos2[0])**2 + (last_pos1[1] - first_pos2[1])**2)
+        # IMPROVED: More strict distance requirement (was max_distance, now 150)
+        if distance > 150:
             continue
         
-        if not data1['positions']:
+        # Calculate average position overlap
+        avg_distance = np.sqrt((s1['mean_x'] - s2['mean_x'])**2 + (s1['mean_y'] - s2['mean_y'])**2)
+        
+        # IMPROVED: Require similar average positions (within 100 pixels)
+        if avg_distance > 100:
             continue
         
-        last_pos1 = data1['positions'][-1]  # (x, y, frame)
-        last_frame1 = last_pos1[2]
-        last_seq_end = max([seq[1] for seq in data1['time_ranges']]) if data1['time_ranges'] else last_frame1
+        # IMPROVED: Better scoring that penalizes large gaps and distances
+        # Higher score = better match
+        gap_score = 1.0 / (1.0 + gap / 10.0)  # Penalize gaps more
+        distance_score = 1.0 / (1.0 + distance / 20.0)  # Penalize distance more
+        avg_distance_score = 1.0 / (1.0 + avg_distance / 30.0)  # Penalize avg distance
+        frame_ratio = min(data1['total_frames'], data2['total_frames']) / max(data1['total_frames'], data2['total_frames'])
         
-        # Look for other IDs that start shortly after
-        for j, (pid2, data2) in enumerate(sorted_players[i+1:], start=i+1):
-            if data2['total_frames'] < 10:  # Increased threshold
-                continue
-            
-            if not data2['positions']:
-                continue
-            
-            first_pos2 = data2['positions'][0]  # (x, y, frame)
-            first_frame2 = first_pos2[2]
-            
-            # Check if pid2 starts shortly after pid1 ends
-            gap = first_frame2 - last_seq_end
-            if gap < 0 or gap > max_gap_frames:
-                continue
-            
-            # IMPROVED: Require smaller gap for better accuracy (was max_gap_frames, now 150)
-            if gap > 150:  # More strict: only merge if gap is reasonable
-                continue
-            
-            # Check if positions are close (player reappeared nearby)
-            distance = np.sqrt((last_pos1[0] - first_pos2[0])**2 + (last_pos1[1] - first_pos2[1])**2)
-            # IMPROVED: More strict distance requirement (was max_distance, now 150)
-            if distance > 150:
-                continue
-            
-            # Calculate average position overlap
-            pos1_range_x = [p[0] for p in data1['positions']]
-            pos1_range_y = [p[1] for p in data1['positions']]
-            pos2_range_x = [p[0] for p in data2['positions']]
-            pos2_range_y = [p[1] for p in data2['positions']]
-            
-            avg_x1, avg_y1 = np.mean(pos1_range_x), np.mean(pos1_range_y)
-            avg_x2, avg_y2 = np.mean(pos2_range_x), np.mean(pos2_range_y)
-            avg_distance = np.sqrt((avg_x1 - avg_x2)**2 + (avg_y1 - avg_y2)**2)
-            
-            # IMPROVED: Require similar average positions (within 100 pixels)
-            if avg_distance > 100:
-                continue
-            
-            # IMPROVED: Better scoring that penalizes large gaps and distances
-            # Higher score = better match
-            gap_score = 1.0 / (1.0 + gap / 10.0)  # Penalize gaps more
-            distance_score = 1.0 / (1.0 + distance / 20.0)  # Penalize distance more
-            avg_distance_score = 1.0 / (1.0 + avg_distance / 30.0)  # Penalize avg distance
-            frame_ratio = min(data1['total_frames'], data2['total_frames']) / max(data1['total_frames'], data2['total_frames'])
-            
-            score = gap_score * distance_score * avg_distance_score * frame_ratio
-            
-            # IMPROVED: Minimum score threshold to filter low-quality merges
-            if score < 0.01:  # Only keep high-quality merges
-                continue
-            
-            direct_merges.append({
-                'from_id': pid2,
-                'to_id': pid1,  # Merge into the longer track
-                'gap_frames': gap,
-                'distance': distance,
-                'avg_distance': avg_distance,
-                'score': score,
-                'from_frames': data2['total_frames'],
-                'to_frames': data1['total_frames'],
-                'merge_type': 'direct'
-            })
+        score = gap_score * distance_score * avg_distance_score * frame_ratio
+        
+        # IMPROVED: Minimum score threshold to filter low-quality merges
+        if score < 0.01:  # Only keep high-quality merges
+            continue
+        
+        direct_merges.append({
+            'from_id': pid2,
+            'to_id': pid1,  # Merge into the longer track
+            'gap_frames': gap,
+            'distance': distance,
+            'avg_distance': avg_distance,
+            'score': score,
+            'from_frames': data2['total_frames'],
+            'to_frames': data1['total_frames'],
+            'merge_type': 'direct'
+        })
     
     # Phase 1.5: Find consecutive/overlapping frame merges (CRITICAL for short tracks)
     # This handles tracks that appear in consecutive frames or overlap temporally
+    # Only tracks whose spans overlap or are within 3 frames (gap of 0-2 frames) can qualify
     consecutive_merges = []
-    for i, (pid1, data1) in enumerate(sorted_players):
-        if not data1['positions'] or not data1['time_ranges']:
-            continue
-        
-        # Get frame range for this track
-        frames1 = set()
-        for start_frame, end_frame in data1['time_ranges']:
-            frames1.update(range(int(start_frame), int(end_frame) + 1))
+    for i, j in _span_candidates(summaries, 3):
+        s1, s2 = summaries[i], summaries[j]
+        pid1, data1 = s1['pid'], s1['data']
+        pid2, data2 = s2['pid'], s2['data']
+        
+        # Check for overlap of the frames covered by both tracks' time ranges
+        overlap = _intersect_ranges(s1['ranges'], s2['ranges'])
+        gap = 0
+        if not overlap:
+            # Check if frames are consecutive (within 1-2 frames)
+            min_frame1, max_frame1 = s1['span']
+            min_frame2, max_frame2 = s2['span']
+            
+            if max_frame1 < min_frame2:
+                gap = min_frame2 - max_frame1 - 1
+            elif max_frame2 < min_frame1:
+                gap = min_frame1 - max_frame2 - 1
+            else:
+                gap = 0  # Overlapping
+            
+            # Only merge if gap is very small (0-2 frames) or overlapping
+            if gap > 2:
+                continue
         
-        # Look for other tracks that overlap or are consecutive
-        for j, (pid2, data2) in enumerate(sorted_players[i+1:], start=i+1):
-            if not data2['positions'] or not data2['time_ranges']:
+        # Check if positions are close (within reasonable distance)
+        # Use last position of pid1 and first position of pid2, or average if overlapping
+        avg_distance = None
+        if overlap:
+            # If overlapping, check if positions are similar during overlap
+            in1 = _in_ranges(s1['pos_frames'], overlap)
+            in2 = _in_ranges(s2['pos_frames'], overlap)
+            if not in1.any() or not in2.any():
                 continue
-            
-            # Get frame range for this track
-            frames2 = set()
-            for start_frame, end_frame in data2['time_ranges']:
-                frames2.update(range(int(start_frame), int(end_frame) + 1))
-            
-            # Check for overlap or consecutive frames
-            overlap = frames1 & frames2
-            gap = 0
-            if not overlap:
-                # Check if frames are consecutive (within 1-2 frames)
-                min_frame1 = min(frames1) if frames1 else 0
-                max_frame1 = max(frames1) if frames1 else 0
-                min_frame2 = min(frames2) if frames2 else 0
-                max_frame2 = max(frames2) if frames2 else 0
-                
-                if max_frame1 < min_frame2:
-                    gap = min_frame2 - max_frame1 - 1
-                elif max_frame2 < min_frame1:
-                    gap = min_frame1 - max_frame2 - 1
-                else:
-                    gap = 0  # Overlapping
-                
-                # Only merge if gap is very small (0-2 frames) or overlapping
-                if gap > 2:
-                    continue
-            
-            # Check if positions are close (within reasonable distance)
-            # Use last position of pid1 and first position of pid2, or average if overlapping
-            avg_distance = None
-            if overlap:
-                # If overlapping, check if positions are similar during overlap
-                overlap_frames_list = sorted(list(overlap))
-                if len(overlap_frames_list) > 0:
-                    # Get positions during overlap
-                    pos1_overlap = [p for p in data1['positions'] if int(p[2]) in overlap]
-                    pos2_overlap = [p for p in data2['positions'] if int(p[2]) in overlap]
-                    
-                    if pos1_overlap and pos2_overlap:
-                        # Calculate average distance during overlap
-                        distances = []
-                        for p1 in pos1_overlap:
-                            for p2 in pos2_overlap:
-                                if abs(p1[2] - p2[2]) <= 1:  # Same or adjacent frame
-                                    dist = np.sqrt((p1[0] - p2[0])**2 + (p1[1] - p2[1])**2)
-                                    distances.append(dist)
-                        
-                        if distances:
-                            avg_distance = np.mean(distances)
-                            if avg_distance > 100:  # Too far apart during overlap
-                                continue
-                        else:
-                            # No matching frames, use average positions
-                            avg_x1 = np.mean([p[0] for p in pos1_overlap])
-                            avg_y1 = np.mean([p[1] for p in pos1_overlap])
-                            avg_x2 = np.mean([p[0] for p in pos2_overlap])
-                            avg_y2 = np.mean([p[1] for p in pos2_overlap])
-                            avg_distance = np.sqrt((avg_x1 - avg_x2)**2 + (avg_y1 - avg_y2)**2)
-                            if avg_distance > 100:
-                                continue
-                    else:
-                        continue
-                else:
+            x1, y1, f1 = s1['pos_x'][in1], s1['pos_y'][in1], s1['pos_frames'][in1]
+            x2, y2, f2 = s2['pos_x'][in2], s2['pos_y'][in2], s2['pos_frames'][in2]
+            
+            # Calculate average distance during overlap over position pairs in the same or
+            # adjacent frame (pid1 positions outer, pid2 positions inner - original order)
+            order2 = np.argsort(f2, kind='stable')
+            lo = np.searchsorted(f2[order2], f1 - 1, side='left')
+            hi = np.searchsorted(f2[order2], f1 + 1, side='right')
+            counts = hi - lo
+            if counts.sum() > 0:
+                idx1 = np.repeat(np.arange(len(f1)), counts)
+                idx2 = order2[np.concatenate([np.arange(a, b) for a, b in zip(lo, hi) if b > a])]
+                pair_order = np.lexsort((idx2, idx1))
+                idx1, idx2 = idx1[pair_order], idx2[pair_order]
+                distances = np.sqrt((x1[idx1] - x2[idx2])**2 + (y1[idx1] - y2[idx2])**2)
+                avg_distance = np.mean(distances)
+                if avg_distance > 100:  # Too far apart during overlap
                     continue
             else:
-                # Consecutive frames - check if positions are close
-                last_pos1 = data1['positions'][-1]  # Last position of pid1
-                first_pos2 = data2['positions'][0]    # First position of pid2
-                distance = np.sqrt((last_pos1[0] - first_pos2[0])**2 + (last_pos1[1] - first_pos2[1])**2)
-                if distance > 150:  # Too far apart
+                # No matching frames, use average positions
+                avg_distance = np.sqrt((np.mean(x1) - np.mean(x2))**2 + (np.mean(y1) - np.mean(y2))**2)
+                if avg_distance > 100:
                     continue
-                avg_distance = distance
-            
-            if avg_distance is None:
-                continue
-            
-            # High confidence score for overlapping/consecutive tracks
-            overlap_bonus = 2.0 if overlap else 1.5
-            gap_penalty = 1.0 / (1.0 + gap) if gap > 0 else 1.0
-            frame_ratio = min(data1['total_frames'], data2['total_frames']) / max(data1['total_frames'], data2['total_frames']) if max(data1['total_frames'], data2['total_frames']) > 0 else 0.5
-            
-            score = overlap_bonus * gap_penalty * frame_ratio
-            
-            # Lower threshold for consecutive/overlapping merges (these are high confidence)
-            if score < 0.3:
+        else:
+            # Consecutive frames - check if positions are close
+            last_pos1 = s1['last_pos']  # Last position of pid1
+            first_pos2 = s2['first_pos']    # First position of pid2
+            distance = np.sqrt((last_pos1[0] - first_pos2[0])**2 + (last_pos1[1] - first_pos2[1])**2)
+            if distance > 150:  # Too far apart
                 continue
-            
-            consecutive_merges.append({
-                'from_id': pid2 if data2['total_frames'] < data1['total_frames'] else pid1,
-                'to_id': pid1 if data2['total_frames'] < data1['total_frames'] else pid2,
-                'gap_frames': gap,
-                'distance': avg_distance if overlap else distance,
-                'avg_distance': avg_distance if overlap else distance,
-                'score': score,
-                'from_frames': min(data1['total_frames'], data2['total_frames']),
-                'to_frames': max(data1['total_frames'], data2['total_frames']),
-                'merge_type': 'consecutive' if gap <= 2 else 'overlapping'
-            })
+            avg_distance = distance
+        
+        if avg_distance is None:
+            continue
+        
+        # High confidence score for overlapping/consecutive tracks
+        overlap_bonus = 2.0 if overlap else 1.5
+        gap_penalty = 1.0 / (1.0 + gap) if gap > 0 else 1.0
+        frame_ratio = min(data1['total_frames'], data2['total_frames']) / max(data1['total_frames'], data2['total_frames']) if max(data1['total_frames'], data2['total_frames']) > 0 else 0.5
+        
+        score = overlap_bonus * gap_penalty * frame_ratio
+        
+        # Lower threshold for consecutive/overlapping merges (these are high confidence)
+        if score < 0.3:
+            continue
+        
+        consecutive_merges.append({
+            'from_id': pid2 if data2['total_frames'] < data1['total_frames'] else pid1,
+            'to_id': pid1 if data2['total_frames'] < data1['total_frames'] else pid2,
+            'gap_frames': gap,
+            'distance': avg_distance if overlap else distance,
+            'avg_distance': avg_distance if overlap else distance,
+            'score': score,
+            'from_frames': min(data1['total_frames'], data2['total_frames']),
+            'to_frames': max(data1['total_frames'], data2['total_frames']),
+            'merge_type': 'consecutive' if gap <= 2 else 'overlapping'
+        })
     
     # Phase 2: Find position-based merges (similar average positions)
     # IMPROVED: Much more conservative - only merge if very strong evidence
     position_merges = []
-    for i, (pid1, data1) in enumerate(sorted_players):
-        if data1['total_frames'] < 20:  # Increased threshold - need substantial data
+    # Increased threshold - need substantial data (20 frames); mean positions within 80 px
+    for i, j in _mean_position_candidates(summaries, 20, 80.0):
+        s1, s2 = summaries[i], summaries[j]
+        pid1, data1 = s1['pid'], s1['data']
+        pid2, data2 = s2['pid'], s2['data']
+        
+        # IMPROVED: Much stricter position similarity requirement
+        avg_distance = np.sqrt((s1['mean_x'] - s2['mean_x'])**2 + (s1['mean_y'] - s2['mean_y'])**2)
+        if avg_distance > 80:  # Much more strict (was max_distance * 0.5 = 100)
             continue
         
-        if not data1['positions']:
+        # IMPROVED: Require temporal overlap or very close timing
+        ranges1 = data1['time_ranges']
+        ranges2 = data2['time_ranges']
+        if not ranges1 or not ranges2:
             continue
         
-        pos1_x = [p[0] for p in data1['positions']]
-        pos1_y = [p[1] for p in data1['positions']]
-        avg_x1, avg_y1 = np.mean(pos1_x), np.mean(pos1_y)
-        std_x1, std_y1 = np.std(pos1_x), np.std(pos1_y)
+        # Check if there's any time overlap or small gap
+        has_overlap, min_gap = _range_gap(ranges1, ranges2)
         
-        # Look for other IDs with similar average positions
-        for j, (pid2, data2) in enumerate(sorted_players[i+1:], start=i+1):
-            if data2['total_frames'] < 20:  # Increased threshold
-                continue
-            
-            if not data2['positions']:
-                continue
-            
-            pos2_x = [p[0] for p in data2['positions']]
-            pos2_y = [p[1] for p in data2['positions']]
-            avg_x2, avg_y2 = np.mean(pos2_x), np.mean(pos2_y)
-            
-            # IMPROVED: Much stricter position similarity requirement
-            avg_distance = np.sqrt((avg_x1 - avg_x2)**2 + (avg_y1 - avg_y2)**2)
-            if avg_distance > 80:  # Much more strict (was max_distance * 0.5 = 100)
-                continue
-            
-            # IMPROVED: Require temporal overlap or very close timing
-            ranges1 = data1['time_ranges']
-            ranges2 = data2['time_ranges']
-            if not ranges1 or not ranges2:
-                continue
-            
-            # Check if there's any time overlap or small gap
-            min_gap = float('inf')
-            has_overlap = False
-            for r1 in ranges1:
-                for r2 in ranges2:
-                    # Check for overlap
-                    if not (r1[1] < r2[0] or r2[1] < r1[0]):
-                        has_overlap = True
-                        min_gap = 0
-                    else:
-                        gap = min(abs(r1[1] - r2[0]), abs(r2[1] - r1[0]))
-                        min_gap = min(min_gap, gap)
-            
-            # IMPROVED: Require overlap or very small gap (was max_gap_frames * 2)
-            if not has_overlap and min_gap > 200:  # Much more strict
-                continue
-            
-            # IMPROVED: Better scoring with multiple factors
-            frame_ratio = min(data1['total_frames'], data2['total_frames']) / max(data1['total_frames'], data2['total_frames'])
-            position_score = 1.0 / (1.0 + avg_distance / 20.0)  # Penalize distance
-            gap_score = 1.0 / (1.0 + min_gap / 50.0) if min_gap > 0 else 1.0  # Penalize gaps
-            overlap_bonus = 1.5 if has_overlap else 1.0  # Bonus for temporal overlap
-            
-            score = position_score * gap_score * frame_ratio * overlap_bonus
-            
-            # IMPROVED: Higher minimum score threshold
-            if score < 0.05:  # Only keep high-quality merges
-                continue
-            
-            position_merges.append({
-                'from_id': pid2,
-                'to_id': pid1,
-                'gap_frames': min_gap,
-                'distance': avg_distance,
-                'avg_distance': avg_distance,
-                'score': score,
-                'from_frames': data2['total_frames'],
-                'to_frames': data1['total_frames'],
-                'merge_type': 'position'
-            })
+        # IMPROVED: Require overlap or very small gap (was max_gap_frames * 2)
+        if not has_overlap and min_gap > 200:  # Much more strict
+            continue
+        
+        # IMPROVED: Better scoring with multiple factors
+        frame_ratio = min(data1['total_frames'], data2['total_frames']) / max(data1['total_frames'], data2['total_frames'])
+        position_score = 1.0 / (1.0 + avg_distance / 20.0)  # Penalize distance
+        gap_score = 1.0 / (1.0 + min_gap / 50.0) if min_gap > 0 else 1.0  # Penalize gaps
+        overlap_bonus = 1.5 if has_overlap else 1.0  # Bonus for temporal overlap
+        
+        score = position_score * gap_score * frame_ratio * overlap_bonus
+        
+        # IMPROVED: Higher minimum score threshold
+        if score < 0.05:  # Only keep high-quality merges
+            continue
+        
+        position_merges.append({
+            'from_id': pid2,
+            'to_id': pid1,
+            'gap_frames': min_gap,
+            'distance': avg_distance,
+            'avg_distance': avg_distance,
+            'score': score,
+            'from_frames': data2['total_frames'],
+            'to_frames': data1['total_frames'],
+            'merge_type': 'position'
+        })
     
     # Combine all merges (prioritize player name merges, then consecutive/overlapping, then others)
     all_merges = player_name_merges + consecutive_merges + direct_merges + position_merges
@@ -475,6 +590,7 @@ def find_potential_merges(df, player_data, max_gap_frames=300, max_distance=200,
     final_merges = []
     used_ids = set()
     used_to_ids = set()  # Track which IDs are being merged into (to avoid circular merges)
+    merge_by_from_id = {}  # from_id -> its accepted merge (each from_id is accepted at most once)
     
     for merge in all_merges:
         from_id = merge['from_id']
@@ -487,15 +603,17 @@ def find_potential_merges(df, player_data, max_gap_frames=300, max_distance=200,
         # IMPROVED: Skip if to_id is itself being merged (avoid chains during initial phase)
         if to_id in used_ids and to_id != from_id:
             # Check if this is a better merge (higher score) than the existing one
-            existing_merge = next((m for m in final_merges if m['from_id'] == to_id), None)
+            existing_merge = merge_by_from_id.get(to_id)
             if existing_merge and merge['score'] > existing_merge['score']:
                 # Replace the lower-scored merge
                 final_merges.remove(existing_merge)
+                del merge_by_from_id[to_id]
                 used_ids.remove(to_id)
             else:
                 continue
         
         final_merges.append(merge)
+        merge_by_from_id[from_id] = merge
         used_ids.add(from_id)
         used_to_ids.add(to_id)
     
@@ -521,31 +639,33 @@ def find_potential_merges(df, player_data, max_gap_frames=300, max_distance=200,
             # Group by position clusters (similar average positions = same player)
             # This helps merge IDs that are in the same area of the field
             # BUT: Only merge if we still need to reduce count, and be more conservative
+            mean_positions = {s['pid']: (s['mean_x'], s['mean_y']) for s in summaries if s['has_pos']}
             position_clusters = {}
+            cluster_radius = max_distance * 0.08  # IMPROVED: Even more conservative - require very close positions (was 0.10)
+            # PERFORMANCE: Cluster centers indexed on a grid - only nearby clusters are checked
+            cluster_grid = _PointGrid(cluster_radius) if cluster_radius > 0 else None
             for pid, frames in remaining_with_frames:
-                if pid not in player_data or not player_data[pid]['positions']:
+                if pid not in mean_positions:
                     continue
                 
-                pos_x = [p[0] for p in player_data[pid]['positions']]
-                pos_y = [p[1] for p in player_data[pid]['positions']]
-                avg_x, avg_y = np.mean(pos_x), np.mean(pos_y)
+                avg_x, avg_y = mean_positions[pid]
                 
-                # Find closest existing cluster
+                # Find the first (oldest) existing cluster within the radius
                 cluster_key = None
-                min_cluster_dist = max_distance * 0.08  # IMPROVED: Even more conservative - require very close positions (was 0.10)
-                
-                for key, cluster_data in position_clusters.items():
-                    cluster_x, cluster_y, cluster_ids = cluster_data
-                    dist = np.sqrt((avg_x - cluster_x)**2 + (avg_y - cluster_y)**2)
-                    if dist < min_cluster_dist:
-                        cluster_key = key
-                        min_cluster_dist = dist
-                        break
+                if cluster_grid is not None:
+                    for key in sorted(cluster_grid.near(avg_x, avg_y)):
+                        cluster_x, cluster_y, cluster_ids = position_clusters[key]
+                        dist = np.sqrt((avg_x - cluster_x)**2 + (avg_y - cluster_y)**2)
+                        if dist < cluster_radius:
+                            cluster_key = key
+                            break
                 
                 if cluster_key is None:
                     # Create new cluster
                     cluster_key = len(position_clusters)
                     position_clusters[cluster_key] = [avg_x, avg_y, []]
+                    if cluster_grid is not None:
+                        cluster_grid.add(cluster_key, avg_x, avg_y)
                 
                 position_clusters[cluster_key][2].append(pid)
             
@@ -581,12 +701,8 @@ def find_potential_merges(df, player_data, max_gap_frames=300, max_distance=200,
                             break
                         
                         # IMPROVED: Only merge if positions are actually very close
-                        pos1_x = [p[0] for p in player_data[small_pid]['positions']]
-                        pos1_y = [p[1] for p in player_data[small_pid]['positions']]
-                        pos2_x = [p[0] for p in player_data[largest_pid]['positions']]
-                        pos2_y = [p[1] for p in player_data[largest_pid]['positions']]
-                        avg_x1, avg_y1 = np.mean(pos1_x), np.mean(pos1_y)
-                        avg_x2, avg_y2 = np.mean(pos2_x), np.mean(pos2_y)
+                        avg_x1, avg_y1 = mean_positions[small_pid]
+                        avg_x2, avg_y2 = mean_positions[largest_pid]
                         cluster_distance = np.sqrt((avg_x1 - avg_x2)**2 + (avg_y1 - avg_y2)**2)
                         
                         # IMPROVED: Only merge if positions are very close (within 50 pixels, was 60)
@@ -651,26 +767,29 @@ def find_potential_merges(df, player_data, max_gap_frames=300, max_distance=200,
                 # Group remaining IDs by position to merge within groups first
                 # This prevents creating one giant chain
                 position_groups = {}
+                group_radius = max_distance * 0.12  # IMPROVED: Even more conservative (was 0.15)
+                group_grid = _PointGrid(group_radius) if group_radius > 0 else None
                 for pid, frames in remaining_with_frames:
-                    if pid not in player_data or not player_data[pid]['positions']:
+                    if pid not in mean_positions:
                         continue
-                    pos_x = [p[0] for p in player_data[pid]['positions']]
-                    pos_y = [p[1] for p in player_data[pid]['positions']]
-                    avg_x, avg_y = np.mean(pos_x), np.mean(pos_y)
+                    avg_x, avg_y = mean_positions[pid]
                     
-                    # Find closest group (much more conservative threshold)
+                    # Find closest group (much more conservative threshold); ties keep the oldest group
                     group_key = None
-                    min_dist = max_distance * 0.12  # IMPROVED: Even more conservative (was 0.15)
-                    for key, group_data in position_groups.items():
-                        gx, gy, gids = group_data
-                        dist = np.sqrt((avg_x - gx)**2 + (avg_y - gy)**2)
-                        if dist < min_dist:
-                            group_key = key
-                            min_dist = dist
+                    min_dist = group_radius
+                    if group_grid is not None:
+                        for key in sorted(group_grid.near(avg_x, avg_y)):
+                            gx, gy, gids = position_groups[key]
+                            dist = np.sqrt((avg_x - gx)**2 + (avg_y - gy)**2)
+                            if dist < min_dist:
+                                group_key = key
+                                min_dist = dist
                     
                     if group_key is None:
                         group_key = len(position_groups)
                         position_groups[group_key] = [avg_x, avg_y, []]
+                        if group_grid is not None:
+                            group_grid.add(group_key, avg_x, avg_y)
                     
                     position_groups[group_key][2].append(pid)
                 
@@ -704,12 +823,8 @@ def find_potential_merges(df, player_data, max_gap_frames=300, max_distance=200,
                             break
                         
                         # IMPROVED: Only merge if positions are actually close
-                        pos1_x = [p[0] for p in player_data[small_pid]['positions']]
-                        pos1_y = [p[1] for p in player_data[small_pid]['positions']]
-                        pos2_x = [p[0] for p in player_data[largest_pid]['positions']]
-                        pos2_y = [p[1] for p in player_data[largest_pid]['positions']]
-                        avg_x1, avg_y1 = np.mean(pos1_x), np.mean(pos1_y)
-                        avg_x2, avg_y2 = np.mean(pos2_x), np.mean(pos2_y)
+                        avg_x1, avg_y1 = mean_positions[small_pid]
+                        avg_x2, avg_y2 = mean_positions[largest_pid]
                         group_distance = np.sqrt((avg_x1 - avg_x2)**2 + (avg_y1 - avg_y2)**2)
                         
                         # IMPROVED: Only merge if positions are close (within 70 pixels, was 80)
@@ -761,12 +876,8 @@ def find_potential_merges(df, player_data, max_gap_frames=300, max_distance=200,
                         break
                     
                     # IMPROVED: Only merge if positions are reasonably close (even for forced merges)
-                    pos1_x = [p[0] for p in player_data[small_pid]['positions']]
-                    pos1_y = [p[1] for p in player_data[small_pid]['positions']]
-                    pos2_x = [p[0] for p in player_data[large_pid]['positions']]
-                    pos2_y = [p[1] for p in player_data[large_pid]['positions']]
-                    avg_x1, avg_y1 = np.mean(pos1_x), np.mean(pos1_y)
-                    avg_x2, avg_y2 = np.mean(pos2_x), np.mean(pos2_y)
+                    avg_x1, avg_y1 = mean_positions.get(small_pid, (np.nan, np.nan))
+                    avg_x2, avg_y2 = mean_positions.get(large_pid, (np.nan, np.nan))
                     forced_distance = np.sqrt((avg_x1 - avg_x2)**2 + (avg_y1 - avg_y2)**2)
                     
                     # IMPROVED: Require positions to be within 90 pixels even for forced merges (was 100)
@@ -1211,7 +1322,10 @@ class IDConsolidationGUI:
         
         try:
             self.log(f"Loading CSV: {csv_file}")
-            self.df = pd.read_csv(csv_file)
+            if TRACKING_DATA_IO_AVAILABLE:
+                self.df = load_tracking_data(csv_file)
+            else:
+                self.df = pd.read_csv(csv_file, comment='#')
             
             if 'player_id' not in self.df.columns:
                 messagebox.showerror("Error", "CSV file must contain 'player_id' column")
@@ -0,0 +1,430 @@
+"""
+Detection Cache
+Persistent per-frame YOLO results so reruns on the same footage skip inference
+
+Tuning the tracker, Re-ID or smoothing settings does not change what YOLO sees, so the
+detections of an earlier run can be replayed. Entries are keyed by everything that does:
+
+    video        content hash of the input (size + sampled blocks, see video_content_hash)
+    model        hash of the weights file
+    imgsz        YOLO input size
+    thresholds   confidence / adaptive confidence / max detections / FP16
+    roi          field ROI crop and YOLO resolution
+    preprocess   dewarp / net removal
+
+    cache = DetectionCache.open(cache_root, input_path, model, key_settings)
+    hit = cache.lookup(frame_numbers)                 # [CachedDetections, ...] or None
+    cache.put_result(frame_num, ultralytics_result)   # after inference on a miss
+    cache.close()
+
+Layout: <cache_root>/<video stem>_<key>/ holds key.json (the key in readable form) and
+one append-only shard per writing process (part_<time ms>_<pid>.det), so segment-parallel
+workers can fill the same cache concurrently. A shard is a sequence of records:
+
+    header  frame (int64), kind (uint8: 0 players / 1 ball), detections (uint32),
+            keypoints per detection (uint8)
+    xyxy    float32 (n, 4)        confidence float32 (n)        class int16 (n)
+    kpts    float32 (n, k, 3)     ankle keypoints of pose models (x, y, confidence)
+
+Coordinates are in YOLO input space (before ROI translation / rescaling), exactly as the
+model returned them. A record cut short by a crash is ignored when the shard is read.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+CACHE_VERSION = 1
+DEFAULT_CACHE_DIRNAME = 'detection_cache'
+
+PLAYERS = 0
+BALL = 1
+
+# Only the ankles are used (foot-based tracking), so only they are stored
+POSE_KEYPOINTS = 17
+ANKLE_KEYPOINTS = (15, 16)
+
+_RECORD_HEADER = struct.Struct('<qBIB')
+_SHARD_MAGIC = b'DETC\x01\x00\x00\x00'
+
+# Video hash: file size plus this many evenly spaced blocks
+_HASH_BLOCKS = 16
+_HASH_BLOCK_SIZE = 1 << 20
+
+_model_hashes: Dict[str, str] = {}
+
+
+def default_cache_root(output_path: str) -> str:
+    """Cache directory used when none is given: detection_cache/ next to the analysis output"""
+    return os.path.join(os.path.dirname(os.path.abspath(output_path)), DEFAULT_CACHE_DIRNAME)
+
+
+def video_content_hash(path: str) -> str:
+    """
+    Content hash of a video file
+
+    Hashes the size and 16 evenly spaced 1 MB blocks instead of the whole file, so a
+    multi-GB match is identified in milliseconds; re-encoded or trimmed copies differ.
+    """
+    size = os.path.getsize(path)
+    digest = hashlib.sha1(str(size).encode())
+    with open(path, 'rb') as f:
+        if size <= _HASH_BLOCKS * _HASH_BLOCK_SIZE:
+            digest.update(f.read())
+        else:
+            step = (size - _HASH_BLOCK_SIZE) // (_HASH_BLOCKS - 1)
+            for i in range(_HASH_BLOCKS):
+                f.seek(i * step)
+                digest.update(f.read(_HASH_BLOCK_SIZE))
+    return digest.hexdigest()
+
+
+def model_file_hash(model) -> Optional[str]:
+    """
+    Hash of the weights a YOLO model was loaded from (a model object or a path)
+
+    Returns:
+        Hex digest, or None if the weights file cannot be found
+    """
+    path = model if isinstance(model, str) else (getattr(model, 'ckpt_path', None)
+                                                 or getattr(model, 'model_name', None))
+    if not path or not os.path.isfile(str(path)):
+        return None
+    path = os.path.abspath(str(path))
+    if path not in _model_hashes:
+        digest = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(_HASH_BLOCK_SIZE), b''):
+                digest.update(block)
+        _model_hashes[path] = digest.hexdigest()
+    return _model_hashes[path]
+
+
+def yolo_imgsz(width: int, height: int) -> int:
+    """YOLO input size used by the analysis for a frame (larger side rounded to the stride)"""
+    return int(round(max(width, height) / 32) * 32)
+
+
+def _to_numpy(value) -> np.ndarray:
+    if hasattr(value, 'cpu'):
+        value = value.cpu()
+    if hasattr(value, 'numpy'):
+        value = value.numpy()
+    return np.asarray(value)
+
+
+class _Boxes:
+    """Numpy stand-in for ultralytics Boxes (xyxy / conf / cls)"""
+    __slots__ = ('xyxy', 'conf', 'cls')
+
+    def __init__(self, xyxy: np.ndarray, conf: np.ndarray, cls: np.ndarray):
+        self.xyxy = xyxy
+        self.conf = conf
+        self.cls = cls
+
+    def __len__(self):
+        return len(self.xyxy)
+
+
+class _Keypoints:
+    """Numpy stand-in for ultralytics Keypoints; data is (n, 17, 3) with only the ankles set"""
+    __slots__ = ('data',)
+
+    def __init__(self, data: np.ndarray):
+        self.data = data
+
+
+class CachedDetections:
+    """
+    Detections of one frame replayed from the cache
+
+    Exposes the parts of an ultralytics Results object the analysis reads
+    (boxes.xyxy / conf / cls, keypoints.data) as numpy arrays.
+    """
+    __slots__ = ('xyxy', 'confidence', 'class_id', 'boxes', 'keypoints')
+
+    def __init__(self, xyxy: np.ndarray, confidence: np.ndarray, class_id: np.ndarray,
+                 ankles: Optional[np.ndarray] = None):
+        self.xyxy = xyxy
+        self.confidence = confidence
+        self.class_id = class_id
+        self.boxes = _Boxes(xyxy, confidence, class_id)
+        self.keypoints = None
+        if ankles is not None:
+            data = np.zeros((len(xyxy), POSE_KEYPOINTS, 3), dtype=np.float32)
+            data[:, list(ANKLE_KEYPOINTS)] = ankles
+            self.keypoints = _Keypoints(data)
+
+    def __len__(self):
+        return len(self.xyxy)
+
+
+def _normalize(frame_num: int, xyxy, confidence, class_id, keypoints=None):
+    """Detection arrays in their stored dtypes; keypoints reduced to the ankles (or None)"""
+    xyxy = np.asarray(xyxy, dtype=np.float32).reshape(-1, 4)
+    n = len(xyxy)
+    confidence = (np.ones(n) if confidence is None else np.asarray(confidence)).astype(np.float32).reshape(-1)
+    class_id = (np.zeros(n) if class_id is None else np.asarray(class_id)).astype(np.int16).reshape(-1)
+    if len(confidence) != n or len(class_id) != n:
+        raise ValueError(f"Detection arrays of frame {frame_num} have different lengths")
+    ankles = None
+    if keypoints is not None:
+        keypoints = np.asarray(keypoints, dtype=np.float32)
+        if keypoints.ndim == 3 and len(keypoints) == n and keypoints.shape[1] > max(ANKLE_KEYPOINTS):
+            ankles = np.ascontiguousarray(keypoints[:, list(ANKLE_KEYPOINTS), :3])
+    return xyxy, confidence, class_id, ankles
+
+
+def _encode(frame_num: int, kind: int, xyxy, confidence, class_id, ankles) -> bytes:
+    k = 0 if ankles is None else ankles.shape[1]
+    header = _RECORD_HEADER.pack(int(frame_num), kind, len(xyxy), k)
+    return b''.join([header, xyxy.tobytes(), confidence.tobytes(), class_id.tobytes(),
+                     b'' if ankles is None else ankles.tobytes()])
+
+
+def _record_size(n: int, k: int) -> int:
+    return _RECORD_HEADER.size + n * (16 + 4 + 2) + n * k * 12
+
+
+def _scan_shard(buffer) -> Tuple[List[int], List[int]]:
+    """Keys (frame * 2 + kind) and offsets of all complete records in a shard"""
+    keys, offsets = [], []
+    if buffer[:len(_SHARD_MAGIC)] != _SHARD_MAGIC:
+        return keys, offsets
+    pos = len(_SHARD_MAGIC)
+    size = len(buffer)
+    while pos + _RECORD_HEADER.size <= size:
+        frame_num, kind, n, k = _RECORD_HEADER.unpack_from(buffer, pos)
+        record_size = _record_size(n, k)
+        if pos + record_size > size:
+            break  # Cut short by a crash
+        keys.append(frame_num * 2 + kind)
+        offsets.append(pos)
+        pos += record_size
+    return keys, offsets
+
+
+def _decode(buffer, pos: int) -> CachedDetections:
+    """Record at pos (arrays are copied out of the shard buffer)"""
+    _, _, n, k = _RECORD_HEADER.unpack_from(buffer, pos)
+    start = pos + _RECORD_HEADER.size
+    xyxy = np.frombuffer(buffer, np.float32, n * 4, start).reshape(n, 4).copy()
+    start += n * 16
+    confidence = np.frombuffer(buffer, np.float32, n, start).copy()
+    start += n * 4
+    class_id = np.frombuffer(buffer, np.int16, n, start).astype(int)
+    start += n * 2
+    ankles = np.frombuffer(buffer, np.float32, n * k * 3, start).reshape(n, k, 3) if k else None
+    return CachedDetections(xyxy, confidence, class_id, ankles)
+
+
+class DetectionCache:
+    """
+    Frame-indexed store of YOLO detections for one cache key
+
+    Opening a cache only scans the record headers of its shards into a sorted
+    (frame, kind) -> (shard, offset) index; shards are memory-mapped and a frame's
+    arrays are decoded when it is looked up, so a full match is not held in memory.
+    Records this process writes are only kept until they are flushed (each frame is
+    detected once per run; later runs find them through the index).
+
+    Args:
+        directory: Key directory (see open())
+        key: Key settings, written to key.json
+        flush_every: Records buffered before they are appended to this process' shard
+    """
+
+    def __init__(self, directory: str, key: Dict[str, Any], flush_every: int = 256):
+        self.directory = directory
+        self.key = key
+        self.flush_every = max(1, int(flush_every))
+        self._pending: List[bytes] = []
+        self._pending_entries: Dict[tuple, CachedDetections] = {}
+        self._shards: List[mmap.mmap] = []
+        self._files = []
+        self._shard_path = None
+        self.hits = 0
+        self.misses = 0
+        self.written = 0
+
+        os.makedirs(directory, exist_ok=True)
+        key_path = os.path.join(directory, 'key.json')
+        if not os.path.exists(key_path):
+            with open(key_path + f'.{os.getpid()}.tmp', 'w') as f:
+                json.dump(key, f, indent=2, sort_keys=True)
+            os.replace(key_path + f'.{os.getpid()}.tmp', key_path)
+        self._load_index()
+
+    def _load_index(self):
+        keys, shard_ids, offsets = [], [], []
+        filenames = [name for name in os.listdir(self.directory) if name.endswith('.det')]
+        for filename in sorted(filenames, key=self._shard_order):
+            path = os.path.join(self.directory, filename)
+            try:
+                if os.path.getsize(path) <= len(_SHARD_MAGIC):
+                    continue
+                f = open(path, 'rb')
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError) as e:
+                print(f"⚠ Could not read detection cache shard {filename}: {e}")
+                continue
+            shard_keys, shard_offsets = _scan_shard(buffer)
+            keys.extend(shard_keys)
+            offsets.extend(shard_offsets)
+            shard_ids.extend([len(self._shards)] * len(shard_keys))
+            self._files.append(f)
+            self._shards.append(buffer)
+
+        keys = np.asarray(keys, dtype=np.int64)
+        # Later shards win when a frame was cached twice
+        _, last = np.unique(keys[::-1], return_index=True)
+        order = len(keys) - 1 - last
+        self._keys = keys[order]
+        self._shard_ids = np.asarray(shard_ids, dtype=np.int32)[order]
+        self._offsets = np.asarray(offsets, dtype=np.int64)[order]
+
+    def _shard_order(self, filename: str) -> Tuple[int, int]:
+        """Sort key (creation time in ms, pid) from a shard name; file mtime if it does not parse"""
+        parts = filename[:-len('.det')].split('_')
+        if len(parts) == 3 and parts[0] == 'part' and parts[1].isdigit() and parts[2].isdigit():
+            if len(parts[1]) == 13:
+                return int(parts[1]), int(parts[2])  # part_<ms>_<pid>
+            if len(parts[2]) == 13:
+                return int(parts[2]), int(parts[1])  # Earlier part_<pid>_<ms> naming
+        try:
+            return int(os.path.getmtime(os.path.join(self.directory, filename)) * 1000), 0
+        except OSError:
+            return 0, 0
+
+    @classmethod
+    def open(cls, cache_root: str, input_path: str, model, settings: Dict[str, Any]) -> Optional['DetectionCache']:
+        """
+        Cache for an input video, model and detection settings
+
+        Args:
+            cache_root: Directory holding the caches of all keys
+            input_path: Source video
+            model: YOLO model (or weights path)
+            settings: imgsz, thresholds, ROI and preprocessing settings (JSON-serializable)
+
+        Returns:
+            The cache, or None if the video / model weights cannot be hashed or the
+            cache directory cannot be created
+        """
+        try:
+            model_hash = model_file_hash(model)
+            if model_hash is None:
+                print("⚠ Detection cache disabled: model weights file not found (cannot key the cache)")
+                return None
+            key = {'version': CACHE_VERSION, 'video': video_content_hash(input_path),
+                   'model': model_hash, **settings}
+            key_id = hashlib.sha1(json.dumps(key, sort_keys=True, default=str).encode()).hexdigest()[:16]
+            stem = os.path.splitext(os.path.basename(input_path))[0]
+            return cls(os.path.join(cache_root, f"{stem}_{key_id}"), key)
+        except OSError as e:
+            print(f"⚠ Detection cache disabled: {e}")
+            return None
+
+    def __len__(self):
+        """Frames with cached player detections"""
+        return int(np.count_nonzero(self._keys % 2 == PLAYERS))
+
+    def _entry(self, frame_num: int, kind: int) -> Optional[CachedDetections]:
+        entry = self._pending_entries.get((frame_num, kind))
+        if entry is not None:
+            return entry
+        key = frame_num * 2 + kind
+        i = int(np.searchsorted(self._keys, key))
+        if i >= len(self._keys) or self._keys[i] != key:
+            return None
+        return _decode(self._shards[self._shard_ids[i]], int(self._offsets[i]))
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    def get(self, frame_num: int, kind: int = PLAYERS) -> Optional[CachedDetections]:
+        entry = self._entry(int(frame_num), kind)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def lookup(self, frame_numbers: Sequence[int], kind: int = PLAYERS) -> Optional[List[CachedDetections]]:
+        """Cached detections of every frame in a batch, or None unless all of them are cached"""
+        entries = []
+        for n in frame_numbers:
+            entry = self._entry(int(n), kind)
+            if entry is None:
+                self.misses += len(frame_numbers)
+                return None
+            entries.append(entry)
+        self.hits += len(entries)
+        return entries
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+
+    def put(self, frame_num: int, xyxy, confidence=None, class_id=None, keypoints=None, kind: int = PLAYERS):
+        """Store the detections of one frame (YOLO input coordinates)"""
+        xyxy, confidence, class_id, ankles = _normalize(frame_num, xyxy, confidence, class_id, keypoints)
+        self._pending_entries[(int(frame_num), kind)] = CachedDetections(xyxy, confidence, class_id.astype(int), ankles)
+        self._pending.append(_encode(frame_num, kind, xyxy, confidence, class_id, ankles))
+        if len(self._pending) >= self.flush_every:
+            self.flush()
+
+    def put_result(self, frame_num: int, result, kind: int = PLAYERS) -> bool:
+        """
+        Store an ultralytics Results object
+
+        Returns:
+            False if the result has no readable boxes (nothing is cached for the frame)
+        """
+        boxes = getattr(result, 'boxes', None)
+        if boxes is None or getattr(boxes, 'xyxy', None) is None:
+            return False
+        try:
+            xyxy = _to_numpy(boxes.xyxy).reshape(-1, 4)
+            confidence = _to_numpy(boxes.conf) if getattr(boxes, 'conf', None) is not None else None
+            class_id = _to_numpy(boxes.cls) if getattr(boxes, 'cls', None) is not None else None
+            keypoints = getattr(result, 'keypoints', None)
+            keypoints = _to_numpy(keypoints.data) if keypoints is not None and getattr(keypoints, 'data', None) is not None else None
+            self.put(frame_num, xyxy, confidence, class_id, keypoints, kind=kind)
+        except (ValueError, TypeError) as e:
+            print(f"⚠ Detection cache: could not store frame {frame_num}: {e}")
+            return False
+        return True
+
+    def flush(self):
+        """Append buffered records to this process' shard"""
+        if not self._pending:
+            return
+        try:
+            if self._shard_path is None:
+                self._shard_path = os.path.join(
+                    self.directory, f"part_{int(time.time() * 1000):013d}_{os.getpid()}.det")
+                with open(self._shard_path, 'wb') as f:
+                    f.write(_SHARD_MAGIC)
+            with open(self._shard_path, 'ab') as f:
+                f.write(b''.join(self._pending))
+            self.written += len(self._pending)
+        except OSError as e:
+            print(f"⚠ Could not write detection cache: {e}")
+        self._pending.clear()
+        self._pending_entries.clear()
+
+    def close(self):
+        self.flush()
+        for buffer in self._shards:
+            buffer.close()
+        for f in self._files:
+            f.close()
+        self._shards, self._files = [], []
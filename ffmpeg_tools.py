@@ -0,0 +1,308 @@
+"""
+FFmpeg Tools
+Keyframe-aware cutting helpers shared by the video splicer and clip export
+
+Cutting a long recording with OpenCV decodes and re-encodes every frame. FFmpeg can
+instead copy the compressed packets (no re-encode, audio preserved) as long as each
+piece starts on a keyframe:
+- stream_copy_segment(): pure stream copy, start snapped to the keyframe at or before it
+- smart_cut_segment(): frame-accurate cut that re-encodes only the partial GOPs at the
+  two boundaries and stream-copies everything in between
+- probe_keyframes(): keyframe timestamps read from the packet index (no decoding)
+
+FFmpeg is optional - ffmpeg_available() returns False when it cannot be found, and
+callers keep their OpenCV path as the fallback.
+"""
+
+import os
+import shutil
+import subprocess
+import tempfile
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence
+
+# Re-encoders for the partial GOPs of a smart cut (must match the copied stream's codec)
+_ENCODERS = {
+    'h264': 'libx264',
+    'hevc': 'libx265',
+    'mpeg4': 'mpeg4',
+    'vp9': 'libvpx-vp9',
+    'mjpeg': 'mjpeg',
+}
+# Seek slightly past a keyframe so rounding in `-ss` never lands on the previous one
+_SEEK_EPSILON = 0.001
+
+
+def _find_tool(name: str) -> Optional[str]:
+    """Locate an FFmpeg binary (in PATH, WinGet Links, or next to this script)"""
+    found = shutil.which(name)
+    if found:
+        return found
+
+    # Check WinGet installation location (common for winget installs)
+    winget_tool = os.path.join(os.environ.get('LOCALAPPDATA', ''),
+                               'Microsoft', 'WinGet', 'Links', f'{name}.exe')
+    if os.path.exists(winget_tool):
+        return winget_tool
+
+    # Check in current directory
+    local_tool = os.path.join(os.path.dirname(os.path.abspath(__file__)), f'{name}.exe')
+    if os.path.exists(local_tool):
+        return local_tool
+
+    return None
+
+
+@lru_cache(maxsize=None)
+def find_ffmpeg() -> Optional[str]:
+    """Path of the ffmpeg binary, or None if not installed"""
+    return _find_tool('ffmpeg')
+
+
+@lru_cache(maxsize=None)
+def find_ffprobe() -> Optional[str]:
+    """Path of the ffprobe binary, or None if not installed"""
+    return _find_tool('ffprobe')
+
+
+def ffmpeg_available() -> bool:
+    """True if both ffmpeg and ffprobe can be found"""
+    return find_ffmpeg() is not None and find_ffprobe() is not None
+
+
+def _run(cmd: List[str]) -> bool:
+    """Run an FFmpeg command, printing its stderr on failure"""
+    try:
+        subprocess.run(cmd, capture_output=True, text=True, check=True)
+        return True
+    except subprocess.CalledProcessError as e:
+        print("Error: FFmpeg failed")
+        print(f"Command: {' '.join(cmd)}")
+        print(f"Error output: {e.stderr[-2000:] if e.stderr else ''}")
+        return False
+    except OSError as e:
+        print(f"Error: could not run FFmpeg: {e}")
+        return False
+
+
+def probe_video_stream(video_path: str) -> Optional[Dict]:
+    """
+    Codec parameters of the first video stream (and whether the file has audio)
+
+    Returns:
+        {'codec_name', 'profile', 'pix_fmt', 'width', 'height', 'has_audio'} or None on failure
+    """
+    ffprobe = find_ffprobe()
+    if not ffprobe:
+        return None
+    try:
+        result = subprocess.run(
+            [ffprobe, '-v', 'error',
+             '-show_entries', 'stream=codec_type,codec_name,profile,pix_fmt,width,height',
+             '-of', 'default=noprint_wrappers=0', video_path],
+            capture_output=True, text=True, check=True)
+    except (subprocess.CalledProcessError, OSError) as e:
+        print(f"Error probing video streams: {e}")
+        return None
+
+    streams = []
+    current = None
+    for line in result.stdout.splitlines():
+        line = line.strip()
+        if line == '[STREAM]':
+            current = {}
+        elif line == '[/STREAM]':
+            if current is not None:
+                streams.append(current)
+            current = None
+        elif current is not None and '=' in line:
+            key, value = line.split('=', 1)
+            current[key] = value
+
+    video = next((s for s in streams if s.get('codec_type') == 'video'), None)
+    if video is None:
+        return None
+    return {
+        'codec_name': video.get('codec_name', ''),
+        'profile': video.get('profile', ''),
+        'pix_fmt': video.get('pix_fmt', ''),
+        'width': int(video.get('width') or 0),
+        'height': int(video.get('height') or 0),
+        'has_audio': any(s.get('codec_type') == 'audio' for s in streams),
+    }
+
+
+def probe_keyframes(video_path: str) -> List[float]:
+    """
+    Sorted keyframe timestamps (seconds) of the first video stream
+
+    Reads packet flags only, so a 2-hour recording is indexed without decoding a frame.
+    """
+    ffprobe = find_ffprobe()
+    if not ffprobe:
+        return []
+    try:
+        result = subprocess.run(
+            [ffprobe, '-v', 'error', '-select_streams', 'v:0',
+             '-show_entries', 'packet=pts_time,flags', '-of', 'csv=p=0', video_path],
+            capture_output=True, text=True, check=True)
+    except (subprocess.CalledProcessError, OSError) as e:
+        print(f"Error probing keyframes: {e}")
+        return []
+
+    keyframes = []
+    for line in result.stdout.splitlines():
+        parts = line.strip().split(',')
+        if len(parts) < 2 or 'K' not in parts[1]:
+            continue
+        try:
+            keyframes.append(float(parts[0]))
+        except ValueError:
+            continue  # pts_time=N/A
+    keyframes.sort()
+    return keyframes
+
+
+def keyframe_at_or_before(keyframes: Sequence[float], t: float) -> float:
+    """Latest keyframe time <= t (0.0 if t precedes every keyframe)"""
+    idx = bisect_right(keyframes, t + _SEEK_EPSILON) - 1
+    return keyframes[idx] if idx >= 0 else 0.0
+
+
+def keyframe_at_or_after(keyframes: Sequence[float], t: float) -> Optional[float]:
+    """Earliest keyframe time >= t (None if t follows every keyframe)"""
+    idx = bisect_left(keyframes, t - _SEEK_EPSILON)
+    return keyframes[idx] if idx < len(keyframes) else None
+
+
+def stream_copy_segment(video_path: str, output_path: str, start_time: float,
+                        end_time: Optional[float], include_audio: bool = True) -> bool:
+    """
+    Copy [start_time, end_time) without re-encoding
+
+    The input seek lands on the keyframe at or before start_time, so pass keyframe
+    times (keyframe_at_or_before) to get exactly the requested range.
+    """
+    ffmpeg = find_ffmpeg()
+    if not ffmpeg:
+        return False
+    cmd = [ffmpeg, '-v', 'error', '-y',
+           '-ss', f"{start_time + _SEEK_EPSILON if start_time > 0 else 0:.6f}",
+           '-i', video_path]
+    if end_time is not None:
+        cmd += ['-t', f"{max(end_time - start_time, 0.0):.6f}"]
+    cmd += ['-map', '0:v:0']
+    if include_audio:
+        cmd += ['-map', '0:a?']
+    cmd += ['-c', 'copy', '-avoid_negative_ts', 'make_zero', output_path]
+    return _run(cmd)
+
+
+def encode_segment(video_path: str, output_path: str, start_time: float, end_time: float,
+                   stream_info: Optional[Dict] = None, include_audio: bool = False) -> bool:
+    """
+    Re-encode [start_time, end_time) frame-accurately
+
+    With stream_info (probe_video_stream) the encoder, profile and pixel format match the
+    source so the result can be concatenated with stream-copied pieces.
+    """
+    ffmpeg = find_ffmpeg()
+    if not ffmpeg:
+        return False
+    cmd = [ffmpeg, '-v', 'error', '-y', '-ss', f"{start_time:.6f}", '-i', video_path,
+           '-t', f"{max(end_time - start_time, 0.0):.6f}", '-map', '0:v:0']
+    if include_audio:
+        cmd += ['-map', '0:a?', '-c:a', 'aac']
+    else:
+        cmd += ['-an']
+    encoder = _ENCODERS.get((stream_info or {}).get('codec_name', ''), 'libx264')
+    cmd += ['-c:v', encoder]
+    if encoder in ('libx264', 'libx265'):
+        cmd += ['-preset', 'veryfast', '-crf', '16']
+        profile = (stream_info or {}).get('profile', '').lower()
+        if encoder == 'libx264' and profile in ('baseline', 'main', 'high'):
+            cmd += ['-profile:v', profile]
+    if stream_info and stream_info.get('pix_fmt'):
+        cmd += ['-pix_fmt', stream_info['pix_fmt']]
+    cmd.append(output_path)
+    return _run(cmd)
+
+
+def _write_concat_list(paths: Sequence[str], list_path: str):
+    """Input list for the concat demuxer"""
+    with open(list_path, 'w', encoding='utf-8') as f:
+        for path in paths:
+            escaped = os.path.abspath(path).replace('\\', '/').replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+
+
+def concat_files(paths: Sequence[str], output_path: str) -> bool:
+    """
+    Join files with identical codec parameters (e.g. pieces written by the same
+    VideoWriter settings) into output_path without re-encoding
+    """
+    ffmpeg = find_ffmpeg()
+    if not ffmpeg or not paths:
+        return False
+    with tempfile.TemporaryDirectory(prefix='concat_',
+                                     dir=os.path.dirname(os.path.abspath(output_path))) as tmp_dir:
+        list_path = os.path.join(tmp_dir, 'pieces.txt')
+        _write_concat_list(paths, list_path)
+        return _run([ffmpeg, '-v', 'error', '-y', '-f', 'concat', '-safe', '0', '-i', list_path,
+                     '-map', '0', '-c', 'copy', output_path])
+
+
+def smart_cut_segment(video_path: str, output_path: str, start_time: float, end_time: float,
+                      keyframes: Sequence[float], stream_info: Optional[Dict] = None,
+                      include_audio: bool = True) -> bool:
+    """
+    Frame-accurate cut of [start_time, end_time) that re-encodes only the boundary GOPs
+
+    Layout: [start, first keyframe) re-encoded + [first keyframe, last keyframe) copied +
+    [last keyframe, end) re-encoded, joined with the concat demuxer. Audio (if any) is
+    copied from the source over the whole range.
+    """
+    ffmpeg = find_ffmpeg()
+    if not ffmpeg:
+        return False
+
+    inner_start = keyframe_at_or_after(keyframes, start_time)
+    inner_end = keyframe_at_or_before(keyframes, end_time)
+    if inner_start is None or inner_end <= inner_start:
+        # No complete GOP inside the range - re-encode all of it
+        return encode_segment(video_path, output_path, start_time, end_time, stream_info,
+                              include_audio=include_audio)
+
+    ext = os.path.splitext(output_path)[1] or '.mp4'
+    with tempfile.TemporaryDirectory(prefix='smart_cut_',
+                                     dir=os.path.dirname(os.path.abspath(output_path))) as tmp_dir:
+        pieces = []
+        if inner_start - start_time > _SEEK_EPSILON:
+            head = os.path.join(tmp_dir, f"head{ext}")
+            if not encode_segment(video_path, head, start_time, inner_start, stream_info):
+                return False
+            pieces.append(head)
+
+        middle = os.path.join(tmp_dir, f"middle{ext}")
+        if not stream_copy_segment(video_path, middle, inner_start, inner_end, include_audio=False):
+            return False
+        pieces.append(middle)
+
+        if end_time - inner_end > _SEEK_EPSILON:
+            tail = os.path.join(tmp_dir, f"tail{ext}")
+            if not encode_segment(video_path, tail, inner_end, end_time, stream_info):
+                return False
+            pieces.append(tail)
+
+        list_path = os.path.join(tmp_dir, 'pieces.txt')
+        _write_concat_list(pieces, list_path)
+
+        cmd = [ffmpeg, '-v', 'error', '-y', '-f', 'concat', '-safe', '0', '-i', list_path]
+        if include_audio and (stream_info is None or stream_info.get('has_audio')):
+            cmd += ['-ss', f"{start_time:.6f}", '-t', f"{end_time - start_time:.6f}",
+                    '-i', video_path, '-map', '0:v:0', '-map', '1:a?']
+        else:
+            cmd += ['-map', '0:v:0']
+        cmd += ['-c', 'copy', output_path]
+        return _run(cmd)
@@ -0,0 +1,384 @@
+"""
+Frame Pipeline
+Background decode -> preprocess -> detection stages for the analysis loop.
+
+The analysis loop in combined_analysis_optimized used to call cap.read() and then
+block on the preprocessing future for the same frame, so decoding and dewarping /
+net removal never overlapped with YOLO, tracking or Re-ID. FramePipeline runs:
+
+    decoder thread  ->  preprocessing pool  ->  bounded in-order queue  ->  analysis loop
+
+- The decoder thread is the only thread touching the VideoCapture
+- Preprocessing reuses the loop's own preprocess function (preprocess_frame_sync)
+- The bounded queue provides back-pressure: decoding pauses when the loop falls
+  behind, so memory stays at max_queued_frames frames
+- Frames are always delivered in decode order, so the loop sees exactly the same
+  frames (and preprocessing results) as before
+- seek() supports the loop's track-jump requests (cap.set(CAP_PROP_POS_FRAMES))
+
+DetectionStage moves the loop's batched YOLO call onto a worker thread. The batch is
+detected in chunks and handed back as each chunk completes, so the loop tracks (and runs
+Re-ID on) the first frames of a batch while the GPU is still detecting the rest:
+
+    detection thread:  [detect 0][detect 1][detect 2][detect 3]
+    analysis loop:               [track 0 ][track 1 ][track 2 ][track 3 ]
+
+Tracking still sees every frame in order and a batch is finished before the loop moves
+on, so annotations and exports stay frame-for-frame identical to the serial loop.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import cv2
+
+from perf_instrumentation import get_instrumentation
+
+_END_OF_STREAM = object()
+_END_OF_BATCH = object()
+
+
+class FramePipeline:
+    """
+    Decode and preprocess frames ahead of the consumer.
+
+    Usage:
+        pipeline = FramePipeline(cap, preprocess_fn=preprocess_frame_sync)
+        pipeline.start()
+        while True:
+            ret, frame, preprocessed = pipeline.read()
+            if not ret:
+                break
+        pipeline.stop()
+    """
+
+    def __init__(self,
+                 cap: cv2.VideoCapture,
+                 preprocess_fn: Optional[Callable[[Any, int], Any]] = None,
+                 num_workers: int = 2,
+                 max_queued_frames: int = 16,
+                 should_preprocess: Optional[Callable[[int], bool]] = None):
+        """
+        Args:
+            cap: Opened VideoCapture (owned by the decoder thread until stop())
+            preprocess_fn: Optional fn(frame, frame_number) run in the preprocessing pool
+            num_workers: Preprocessing pool size
+            max_queued_frames: Maximum decoded frames waiting for the consumer (back-pressure)
+            should_preprocess: Optional fn(frame_number) -> bool to skip preprocessing frames
+                               the consumer will not analyze. frame_number is 1-based like the
+                               loop's frame_count after a read.
+        """
+        self.cap = cap
+        self.preprocess_fn = preprocess_fn
+        self.should_preprocess = should_preprocess
+        self.max_queued_frames = max(1, max_queued_frames)
+        self._executor = ThreadPoolExecutor(max_workers=max(1, num_workers)) if preprocess_fn is not None else None
+        self._queue: "queue.Queue" = queue.Queue(maxsize=self.max_queued_frames)
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._generation = 0  # Bumped on every seek; stale queued frames are dropped
+        self._seek_target: Optional[int] = None
+        self._next_frame_number = int(cap.get(cv2.CAP_PROP_POS_FRAMES) or 0) + 1
+
+        # Counters
+        self.frames_decoded = 0
+        self.frames_preprocessed = 0
+        self.frames_delivered = 0
+        self.decode_seconds = 0.0
+        self.consumer_wait_seconds = 0.0
+        self.max_queue_depth = 0
+
+    # ------------------------------------------------------------------
+    # Producer side
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """Start the decoder thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._decode_loop, name="FramePipelineDecoder", daemon=True)
+            self._thread.start()
+        return self
+
+    def _put(self, item) -> bool:
+        """Blocking put that gives up on stop or seek (returns False if the item was dropped)"""
+        generation = item[0] if isinstance(item, tuple) else None
+        while not self._stop_event.is_set():
+            if generation is not None and generation != self._generation:
+                return False
+            try:
+                self._queue.put(item, timeout=0.1)
+                depth = self._queue.qsize()
+                if depth > self.max_queue_depth:
+                    self.max_queue_depth = depth
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _decode_loop(self):
+        while not self._stop_event.is_set():
+            with self._lock:
+                generation = self._generation
+                seek_target = self._seek_target
+                self._seek_target = None
+            if seek_target is not None:
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, seek_target)
+                self._next_frame_number = seek_target + 1
+
+            decode_start = time.perf_counter()
+            ret, frame = self.cap.read()
+            decode_time = time.perf_counter() - decode_start
+            self.decode_seconds += decode_time
+            get_instrumentation().record("decode", decode_time, start=decode_start)
+
+            if not ret:
+                # End of stream (wait here in case the consumer seeks back)
+                if self._put((generation, _END_OF_STREAM, None, None)):
+                    while not self._stop_event.is_set() and generation == self._generation:
+                        time.sleep(0.01)
+                continue
+
+            self.frames_decoded += 1
+            frame_number = self._next_frame_number
+            self._next_frame_number += 1
+
+            preprocessed = None
+            if self._executor is not None and (self.should_preprocess is None or self.should_preprocess(frame_number)):
+                preprocessed = self._executor.submit(self._run_preprocess, frame, frame_number)
+            self._put((generation, frame_number, frame, preprocessed))
+
+    def _run_preprocess(self, frame, frame_number):
+        result = self.preprocess_fn(frame, frame_number)
+        self.frames_preprocessed += 1
+        return result
+
+    # ------------------------------------------------------------------
+    # Consumer side
+    # ------------------------------------------------------------------
+
+    def read(self) -> Tuple[bool, Any, Any]:
+        """
+        Next frame in decode order.
+
+        Returns:
+            (ret, frame, preprocessed) - preprocessed is the preprocess_fn result, None when
+            preprocessing was skipped, or the exception raised by preprocess_fn (so the
+            caller can fall back to synchronous preprocessing)
+        """
+        if self._thread is None:
+            self.start()
+        wait_start = time.perf_counter()
+        while True:
+            try:
+                generation, frame_number, frame, preprocessed = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                if self._stop_event.is_set() or not self._thread.is_alive():
+                    return False, None, None
+                continue
+            if generation != self._generation:
+                continue  # Frame decoded before a seek
+            if frame_number is _END_OF_STREAM:
+                self.consumer_wait_seconds += time.perf_counter() - wait_start
+                return False, None, None
+            if isinstance(preprocessed, Future):
+                try:
+                    preprocessed = preprocessed.result()
+                except Exception as e:
+                    preprocessed = e
+            wait_time = time.perf_counter() - wait_start
+            self.consumer_wait_seconds += wait_time
+            self.frames_delivered += 1
+            perf = get_instrumentation()
+            if perf.enabled:
+                perf.record("decode_wait", wait_time, start=wait_start)
+                perf.gauge("frame_queue_depth", self._queue.qsize())
+            return True, frame, preprocessed
+
+    def seek(self, frame_index: int):
+        """Reposition the decoder (equivalent of cap.set(CAP_PROP_POS_FRAMES, frame_index))"""
+        with self._lock:
+            self._generation += 1
+            self._seek_target = int(frame_index)
+        # Drop frames decoded before the seek so the decoder is not blocked on a full queue
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+
+    def stop(self):
+        """Stop the decoder thread and preprocessing pool (call before cap.release())"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+    def stats(self) -> Dict[str, float]:
+        """Throughput and queue counters for progress/profiling output"""
+        return {
+            'frames_decoded': self.frames_decoded,
+            'frames_preprocessed': self.frames_preprocessed,
+            'frames_delivered': self.frames_delivered,
+            'decode_fps': self.frames_decoded / self.decode_seconds if self.decode_seconds > 0 else 0.0,
+            'consumer_wait_seconds': self.consumer_wait_seconds,
+            'queue_depth': self._queue.qsize(),
+            'max_queue_depth': self.max_queue_depth,
+        }
+
+
+class DetectionBatch:
+    """
+    Results of one DetectionStage.submit(), in frame order.
+
+    Iterate once (per result, or per chunk with chunks()); iteration blocks until the next
+    chunk has been detected and re-raises any exception from the detection function.
+    len() is the number of submitted frames.
+    """
+
+    def __init__(self, stage: "DetectionStage", num_frames: int):
+        self._stage = stage
+        self._num_frames = num_frames
+        self._queue: "queue.Queue" = queue.Queue(maxsize=stage.max_pending_chunks)
+        self._closed = threading.Event()
+        self._done = threading.Event()
+
+    def __len__(self) -> int:
+        return self._num_frames
+
+    def __iter__(self):
+        for chunk in self.chunks():
+            yield from chunk
+
+    def chunks(self):
+        """Detected chunks (lists of results) in frame order, each as soon as it completes"""
+        perf = get_instrumentation()
+        while True:
+            wait_start = time.perf_counter()
+            try:
+                item = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                if self._done.is_set() and self._queue.empty():
+                    raise RuntimeError("Detection stage stopped before the batch was complete")
+                continue
+            wait_time = time.perf_counter() - wait_start
+            self._stage.consumer_wait_seconds += wait_time
+            if perf.enabled:
+                perf.record("yolo_wait", wait_time, start=wait_start)
+            if item is _END_OF_BATCH:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+    def _put(self, item) -> bool:
+        """Blocking put that gives up when the batch is closed (returns False if dropped)"""
+        while not self._closed.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def close(self):
+        """Stop detecting this batch and wait until the detection thread is idle"""
+        self._closed.set()
+        while not self._done.wait(timeout=0.01):
+            try:
+                self._queue.get_nowait()  # Unblock a put waiting on a full queue
+            except queue.Empty:
+                pass
+
+
+class DetectionStage:
+    """
+    Run batched detection on a worker thread, one chunk at a time.
+
+    Usage:
+        stage = DetectionStage(lambda frames, **kwargs: model(frames, **kwargs), chunk_size=4)
+        results = stage.submit(frame_queue, classes=[0], conf=0.25, verbose=False)
+        for frame, result in zip(frame_queue, results):
+            ...  # Tracking overlaps with detection of the next chunk
+        results.close()
+        stage.stop()
+
+    Only one batch is in flight: submit() closes the previous batch first, so detect_fn
+    never runs concurrently with itself. Call close() on the batch before the consumer
+    uses the same model directly.
+    """
+
+    def __init__(self,
+                 detect_fn: Callable[..., Sequence[Any]],
+                 chunk_size: int = 4,
+                 max_pending_chunks: int = 2):
+        """
+        Args:
+            detect_fn: fn(frames, **kwargs) -> one result per frame (the model call)
+            chunk_size: Frames per detect_fn call
+            max_pending_chunks: Detected chunks waiting for the consumer (back-pressure)
+        """
+        self.detect_fn = detect_fn
+        self.chunk_size = max(1, chunk_size)
+        self.max_pending_chunks = max(1, max_pending_chunks)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="DetectionStage")
+        self._active: Optional[DetectionBatch] = None
+
+        # Counters
+        self.batches = 0
+        self.frames_detected = 0
+        self.detect_seconds = 0.0
+        self.consumer_wait_seconds = 0.0
+
+    def submit(self, frames: Sequence[Any], **kwargs) -> DetectionBatch:
+        """Start detecting frames (kwargs are passed to detect_fn unchanged)"""
+        if self._active is not None:
+            self._active.close()
+        batch = DetectionBatch(self, len(frames))
+        self._active = batch
+        self.batches += 1
+        self._executor.submit(self._detect_batch, batch, list(frames), kwargs)
+        return batch
+
+    def _detect_batch(self, batch: DetectionBatch, frames: List[Any], kwargs: Dict[str, Any]):
+        perf = get_instrumentation()
+        try:
+            for start in range(0, len(frames), self.chunk_size):
+                if batch._closed.is_set():
+                    return
+                chunk = frames[start:start + self.chunk_size]
+                detect_start = time.perf_counter()
+                results = list(self.detect_fn(chunk, **kwargs))
+                detect_time = time.perf_counter() - detect_start
+                self.detect_seconds += detect_time
+                self.frames_detected += len(chunk)
+                perf.record("yolo", detect_time, start=detect_start, batch=len(chunk))
+                if len(results) != len(chunk):
+                    raise RuntimeError(f"Detection returned {len(results)} results for {len(chunk)} frames")
+                if not batch._put(results):
+                    return
+            batch._put(_END_OF_BATCH)
+        except Exception as e:
+            batch._put(e)
+        finally:
+            batch._done.set()
+
+    def stop(self):
+        """Abandon the batch in flight and shut down the worker thread"""
+        if self._active is not None:
+            self._active.close()
+            self._active = None
+        self._executor.shutdown(wait=True)
+
+    def stats(self) -> Dict[str, float]:
+        """Throughput counters for progress/profiling output"""
+        return {
+            'batches': self.batches,
+            'frames_detected': self.frames_detected,
+            'detect_fps': self.frames_detected / self.detect_seconds if self.detect_seconds > 0 else 0.0,
+            'consumer_wait_seconds': self.consumer_wait_seconds,
+        }
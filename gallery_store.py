@@ -0,0 +1,502 @@
+"""
+Binary Gallery Store
+Columnar on-disk storage backend for the player gallery.
+
+Replaces whole-file JSON rewrites of player_gallery.json with:
+- Embeddings (features, body/jersey/foot features) in memory-mapped .npy
+  matrices, one row per player slot, updated in place
+- Profile metadata and reference frame lists in SQLite (WAL journal), written
+  per player and only when they actually changed
+- Lazy loading of reference frame lists (they are only read from disk when a
+  caller touches them)
+
+Layout of a store directory (e.g. player_gallery.store/):
+    gallery.sqlite              - players, embeddings and reference list tables
+    features.npy                - (capacity, dim) float32, one row per player slot
+    body_features.npy
+    jersey_features.npy
+    foot_features.npy
+
+The store is used by PlayerGallery when a store directory exists next to the
+gallery JSON (or when PlayerGallery is created with use_binary_store=True - the
+analysis --gallery-binary-store option - which migrates the existing JSON once).
+The migration leaves the JSON file untouched; PlayerGallery.sync_json() rewrites
+it at the end of an analysis run if the store changed (or after every save with
+mirror_json=True), so tools that read player_gallery.json directly see the
+run's result. GalleryStore.export_json() regenerates it on demand.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from dataclasses import fields
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    from logger_config import get_logger
+    logger = get_logger("gallery")
+except ImportError:
+    import logging
+    logger = logging.getLogger(__name__)
+
+
+# Profile fields stored as float32 rows in the memory-mapped embedding matrices
+EMBEDDING_FIELDS = ('features', 'body_features', 'jersey_features', 'foot_features')
+
+# Profile list fields stored separately and loaded lazily (largest part of a gallery)
+REFERENCE_FIELDS = ('reference_frames', 'foot_reference_frames',
+                    'body_image_quality_history', 'jersey_image_quality_history',
+                    'foot_image_quality_history')
+
+SCHEMA_VERSION = 1
+INITIAL_CAPACITY = 64
+
+
+def store_path_for(gallery_path: str) -> Path:
+    """Store directory used for a gallery JSON path (player_gallery.json -> player_gallery.store)"""
+    return Path(gallery_path).with_suffix('.store')
+
+
+def _json_default(obj):
+    """json.dumps fallback for numpy values inside profile metadata"""
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, (set, tuple)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, default=_json_default, ensure_ascii=False, separators=(',', ':'))
+
+
+class LazyReferenceList(list):
+    """
+    List of reference frame dicts that is read from the store on first use.
+
+    len() and truthiness are answered from the stored row count without loading.
+    Any other list operation loads the contents first, so callers can treat it as
+    a normal list. Copies and pickles are plain lists.
+
+    Note: json.dumps() of an unloaded instance would serialize an empty list
+    (the C encoder bypasses Python-level list methods) - call list(...) first.
+    """
+
+    def __init__(self, iterable: Iterable = (), loader: Optional[Callable[[], List[Dict]]] = None,
+                 count: int = 0, owner: Optional[Tuple[str, str]] = None):
+        super().__init__(iterable)  # dataclasses.asdict() rebuilds lists as type(obj)(items)
+        self._loader = loader
+        self._count = count
+        self.owner = owner  # (player_id, field) the contents were loaded from
+
+    @property
+    def loaded(self) -> bool:
+        return self._loader is None
+
+    def _load(self):
+        if self._loader is not None:
+            loader, self._loader = self._loader, None
+            list.extend(self, loader())
+
+    def __len__(self):
+        if self._loader is not None:
+            return self._count
+        return list.__len__(self)
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __reduce_ex__(self, protocol):
+        self._load()
+        return (list, (list(self),))
+
+
+def _loading(name: str):
+    method = getattr(list, name)
+
+    def wrapper(self, *args, **kwargs):
+        self._load()
+        return method(self, *args, **kwargs)
+    wrapper.__name__ = name
+    wrapper.__doc__ = method.__doc__
+    return wrapper
+
+
+for _name in ('__iter__', '__getitem__', '__setitem__', '__delitem__', '__contains__',
+              '__reversed__', '__eq__', '__ne__', '__add__', '__iadd__', '__mul__', '__repr__',
+              'append', 'extend', 'insert', 'pop', 'remove', 'clear', 'index', 'count',
+              'sort', 'reverse', 'copy'):
+    setattr(LazyReferenceList, _name, _loading(_name))
+
+
+class GalleryStore:
+    """
+    SQLite + memory-mapped .npy storage for player profiles.
+
+    Works on any dataclass profile (PlayerProfile): embedding fields go to the
+    .npy matrices, reference list fields to their own table, and every other
+    field to a per-player JSON metadata row.
+    """
+
+    def __init__(self, store_dir: str):
+        """
+        Open (or create) a gallery store
+
+        Args:
+            store_dir: Directory holding gallery.sqlite and the embedding .npy files
+        """
+        self.store_dir = Path(store_dir)
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(str(self.store_dir / "gallery.sqlite"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema()
+
+        # Memory-mapped embedding matrices (opened lazily per kind)
+        self._matrices: Dict[str, np.memmap] = {}
+
+        # What is currently on disk, so saves only write what changed
+        self._slots: Dict[str, int] = {}
+        self._metadata_hashes: Dict[str, int] = {}
+        self._embedding_hashes: Dict[Tuple[str, str], int] = {}
+        self._reference_hashes: Dict[Tuple[str, str], int] = {}
+        self._read_index()
+
+    @staticmethod
+    def exists(store_dir) -> bool:
+        """True if store_dir contains a gallery store"""
+        return (Path(store_dir) / "gallery.sqlite").exists()
+
+    def is_migrated(self) -> bool:
+        """True once a JSON gallery has been imported (so it is never imported twice)"""
+        return self._get_meta("migrated_from") is not None
+
+    def mark_migrated(self, source_path: str):
+        """Record that the JSON gallery at source_path has been imported"""
+        with self._lock, self._conn:
+            self._set_meta("migrated_from", str(source_path))
+
+    def close(self):
+        """Flush embedding matrices and close the database"""
+        with self._lock:
+            for matrix in self._matrices.values():
+                matrix.flush()
+            self._matrices.clear()
+            self._conn.close()
+
+    # ------------------------------------------------------------------
+    # Schema / index
+    # ------------------------------------------------------------------
+
+    def _create_schema(self):
+        with self._conn:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                );
+                CREATE TABLE IF NOT EXISTS players (
+                    player_id TEXT PRIMARY KEY,
+                    slot INTEGER NOT NULL UNIQUE,
+                    metadata TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    player_id TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    dim INTEGER NOT NULL,
+                    vector BLOB,  -- only used when dim differs from the kind's matrix
+                    PRIMARY KEY (player_id, kind)
+                );
+                CREATE TABLE IF NOT EXISTS reference_lists (
+                    player_id TEXT NOT NULL,
+                    field TEXT NOT NULL,
+                    item_count INTEGER NOT NULL,
+                    payload TEXT NOT NULL,
+                    PRIMARY KEY (player_id, field)
+                );
+            """)
+            self._conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('schema_version', ?)",
+                               (str(SCHEMA_VERSION),))
+
+    def _read_index(self):
+        """Load slot assignments and change-detection hashes for rows already on disk"""
+        for player_id, slot, metadata in self._conn.execute("SELECT player_id, slot, metadata FROM players"):
+            self._slots[player_id] = slot
+            self._metadata_hashes[player_id] = hash(metadata)
+
+    def _get_meta(self, key: str) -> Optional[str]:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: str):
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    # ------------------------------------------------------------------
+    # Embedding matrices
+    # ------------------------------------------------------------------
+
+    def _matrix_path(self, kind: str) -> Path:
+        return self.store_dir / f"{kind}.npy"
+
+    def _matrix_dim(self, kind: str) -> Optional[int]:
+        dim = self._get_meta(f"dim:{kind}")
+        return int(dim) if dim is not None else None
+
+    def _open_matrix(self, kind: str) -> Optional[np.memmap]:
+        matrix = self._matrices.get(kind)
+        if matrix is None and self._matrix_path(kind).exists():
+            matrix = np.lib.format.open_memmap(str(self._matrix_path(kind)), mode='r+')
+            self._matrices[kind] = matrix
+        return matrix
+
+    def _ensure_matrix(self, kind: str, dim: int, min_rows: int) -> np.memmap:
+        """Open the matrix for kind, creating it or doubling its capacity as needed"""
+        matrix = self._open_matrix(kind)
+        if matrix is not None and matrix.shape[0] >= min_rows:
+            return matrix
+
+        capacity = max(INITIAL_CAPACITY, matrix.shape[0] if matrix is not None else 0)
+        while capacity < min_rows:
+            capacity *= 2
+
+        # Grow by writing a larger file next to the old one and swapping it in
+        tmp_path = self._matrix_path(kind).with_suffix('.npy.tmp')
+        grown = np.lib.format.open_memmap(str(tmp_path), mode='w+', dtype=np.float32, shape=(capacity, dim))
+        if matrix is not None:
+            grown[:matrix.shape[0]] = matrix
+            matrix.flush()
+            del self._matrices[kind]
+            del matrix
+        grown.flush()
+        del grown
+        os.replace(tmp_path, self._matrix_path(kind))
+        self._set_meta(f"dim:{kind}", str(dim))
+        return self._open_matrix(kind)
+
+    # ------------------------------------------------------------------
+    # Load
+    # ------------------------------------------------------------------
+
+    def _load_reference_list(self, player_id: str, field: str) -> List[Dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT payload FROM reference_lists WHERE player_id = ? AND field = ?",
+                                     (player_id, field)).fetchone()
+        if row is None:
+            return []
+        self._reference_hashes[(player_id, field)] = hash(row[0])
+        return json.loads(row[0])
+
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Load all players as profile dicts (PlayerProfile.from_dict input).
+
+        Embeddings are read from the memory-mapped matrices; reference list fields
+        are LazyReferenceList instances that read their rows on first use.
+        """
+        with self._lock:
+            players: Dict[str, Dict[str, Any]] = {}
+            slots: Dict[str, int] = {}
+            for player_id, slot, metadata in self._conn.execute(
+                    "SELECT player_id, slot, metadata FROM players ORDER BY rowid"):
+                players[player_id] = json.loads(metadata)
+                slots[player_id] = slot
+
+            for player_id, kind, dim, blob in self._conn.execute(
+                    "SELECT player_id, kind, dim, vector FROM embeddings"):
+                if player_id not in players:
+                    continue
+                if blob is not None:
+                    vector = np.frombuffer(blob, dtype=np.float32)
+                else:
+                    matrix = self._open_matrix(kind)
+                    if matrix is None or slots[player_id] >= matrix.shape[0]:
+                        logger.warning(f"Missing {kind} embedding row for {player_id} in gallery store")
+                        continue
+                    vector = np.array(matrix[slots[player_id]], dtype=np.float32)
+                self._embedding_hashes[(player_id, kind)] = hash(vector.tobytes())
+                players[player_id][kind] = vector.tolist()
+
+            for player_id, field, item_count in self._conn.execute(
+                    "SELECT player_id, field, item_count FROM reference_lists"):
+                if player_id not in players:
+                    continue
+                loader = (lambda pid=player_id, f=field: self._load_reference_list(pid, f))
+                players[player_id][field] = LazyReferenceList(loader=loader, count=item_count, owner=(player_id, field))
+
+        return players
+
+    # ------------------------------------------------------------------
+    # Save
+    # ------------------------------------------------------------------
+
+    def _allocate_slot(self) -> int:
+        used = set(self._slots.values())
+        slot = 0
+        while slot in used:
+            slot += 1
+        return slot
+
+    def _pick_dims(self, profiles: Iterable[Any]) -> Dict[str, int]:
+        """Matrix dim per kind: existing dim, or the most common embedding dim being saved"""
+        dims: Dict[str, int] = {}
+        for kind in EMBEDDING_FIELDS:
+            dim = self._matrix_dim(kind)
+            if dim is None:
+                counts: Dict[int, int] = {}
+                for profile in profiles:
+                    value = getattr(profile, kind, None)
+                    if value is not None:
+                        size = int(np.asarray(value).size)
+                        counts[size] = counts.get(size, 0) + 1
+                if counts:
+                    dim = max(counts, key=lambda size: counts[size])
+            if dim is not None:
+                dims[kind] = dim
+        return dims
+
+    def save(self, players: Dict[str, Any]) -> Dict[str, int]:
+        """
+        Write changed players to the store (incremental, per player).
+
+        Only metadata rows, embedding rows and reference lists whose content changed
+        since the last load/save are written. Unloaded LazyReferenceLists are
+        unchanged by definition and are never touched. Players missing from
+        `players` are deleted.
+
+        Args:
+            players: {player_id: PlayerProfile}
+
+        Returns:
+            Counters of what was written: {'players', 'embeddings', 'reference_lists', 'deleted'}
+        """
+        written = {'players': 0, 'embeddings': 0, 'reference_lists': 0, 'deleted': 0}
+        with self._lock:
+            dims = self._pick_dims(players.values())
+            matrices_touched = set()
+            try:
+                with self._conn:
+                    for player_id, profile in players.items():
+                        is_new = player_id not in self._slots
+                        if is_new:
+                            self._slots[player_id] = self._allocate_slot()
+                        slot = self._slots[player_id]
+
+                        # 1. Metadata (everything except embeddings and reference lists)
+                        metadata = {}
+                        for field in fields(profile):
+                            if field.name not in EMBEDDING_FIELDS and field.name not in REFERENCE_FIELDS:
+                                metadata[field.name] = getattr(profile, field.name)
+                        metadata_json = _dumps(metadata)
+                        metadata_hash = hash(metadata_json)
+                        if is_new or self._metadata_hashes.get(player_id) != metadata_hash:
+                            self._conn.execute(
+                                "INSERT INTO players (player_id, slot, metadata) VALUES (?, ?, ?) "
+                                "ON CONFLICT(player_id) DO UPDATE SET metadata = excluded.metadata",
+                                (player_id, slot, metadata_json))
+                            self._metadata_hashes[player_id] = metadata_hash
+                            written['players'] += 1
+
+                        # 2. Embeddings (in-place row writes into the memory-mapped matrices)
+                        for kind in EMBEDDING_FIELDS:
+                            key = (player_id, kind)
+                            value = getattr(profile, kind, None)
+                            if value is None:
+                                if key in self._embedding_hashes:
+                                    self._conn.execute("DELETE FROM embeddings WHERE player_id = ? AND kind = ?", key)
+                                    del self._embedding_hashes[key]
+                                    written['embeddings'] += 1
+                                continue
+                            vector = np.asarray(value, dtype=np.float32).flatten()
+                            vector_hash = hash(vector.tobytes())
+                            if self._embedding_hashes.get(key) == vector_hash:
+                                continue
+                            if vector.size == dims.get(kind):
+                                self._ensure_matrix(kind, vector.size, slot + 1)[slot] = vector
+                                matrices_touched.add(kind)
+                                blob = None
+                            else:
+                                blob = vector.tobytes()  # Unusual dimension - keep beside the matrix
+                            self._conn.execute(
+                                "INSERT OR REPLACE INTO embeddings (player_id, kind, dim, vector) VALUES (?, ?, ?, ?)",
+                                (player_id, kind, int(vector.size), blob))
+                            self._embedding_hashes[key] = vector_hash
+                            written['embeddings'] += 1
+
+                        # 3. Reference lists (skipped entirely while still unloaded)
+                        for field in REFERENCE_FIELDS:
+                            key = (player_id, field)
+                            value = getattr(profile, field, None)
+                            if isinstance(value, LazyReferenceList) and not value.loaded:
+                                if value.owner == key:
+                                    continue
+                                value._load()  # Renamed/moved list - copy it over
+                            if value is None:
+                                if not is_new:
+                                    deleted = self._conn.execute(
+                                        "DELETE FROM reference_lists WHERE player_id = ? AND field = ?", key).rowcount
+                                    written['reference_lists'] += deleted
+                                self._reference_hashes.pop(key, None)
+                                continue
+                            payload = _dumps(list(value))
+                            payload_hash = hash(payload)
+                            if self._reference_hashes.get(key) == payload_hash:
+                                continue
+                            self._conn.execute(
+                                "INSERT OR REPLACE INTO reference_lists (player_id, field, item_count, payload) "
+                                "VALUES (?, ?, ?, ?)", (player_id, field, len(value), payload))
+                            self._reference_hashes[key] = payload_hash
+                            if isinstance(value, LazyReferenceList):
+                                value.owner = key
+                            written['reference_lists'] += 1
+
+                    # 4. Players removed from the gallery
+                    for player_id in [pid for pid in self._slots if pid not in players]:
+                        for table in ("players", "embeddings", "reference_lists"):
+                            self._conn.execute(f"DELETE FROM {table} WHERE player_id = ?", (player_id,))
+                        del self._slots[player_id]
+                        self._metadata_hashes.pop(player_id, None)
+                        for key in [k for k in self._embedding_hashes if k[0] == player_id]:
+                            del self._embedding_hashes[key]
+                        for key in [k for k in self._reference_hashes if k[0] == player_id]:
+                            del self._reference_hashes[key]
+                        written['deleted'] += 1
+
+                    # Embedding rows must be on disk before the rows that point at them commit
+                    for kind in matrices_touched:
+                        self._matrices[kind].flush()
+            except Exception:
+                # Transaction was rolled back - re-read what is actually on disk
+                self._slots.clear()
+                self._metadata_hashes.clear()
+                self._embedding_hashes.clear()
+                self._reference_hashes.clear()
+                self._read_index()
+                raise
+        return written
+
+    # ------------------------------------------------------------------
+    # Migration / export
+    # ------------------------------------------------------------------
+
+    def export_json(self, json_path: str) -> int:
+        """
+        Write the store back out as a player_gallery.json-style file
+
+        Returns:
+            Number of players exported
+        """
+        players = self.load()
+        data = {}
+        for player_id, player_data in players.items():
+            data[player_id] = {key: (list(value) if isinstance(value, LazyReferenceList) else value)
+                               for key, value in player_data.items()}
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False, default=_json_default)
+        return len(data)
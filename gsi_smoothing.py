@@ -3,20 +3,38 @@ Gaussian Smoothed Interpolation (GSI) for track smoothing
 Based on BoxMOT's GSI implementation, adapted for real-time and post-processing use
 """
 
+import os
 import numpy as np
 from typing import Dict, List, Tuple, Optional
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 import pandas as pd
 
+# PERFORMANCE: GSI used to fit a scikit-learn GaussianProcessRegressor per coordinate per track
+# (O(n^3) in track length). The same posterior mean is now computed in closed form with a banded
+# Cholesky solve of the fixed-length-scale RBF system - sklearn is no longer required.
 try:
-    from sklearn.gaussian_process import GaussianProcessRegressor as GPR
-    from sklearn.gaussian_process.kernels import RBF
-    SKLEARN_AVAILABLE = True
+    from scipy.linalg import solveh_banded
+    SCIPY_AVAILABLE = True
 except ImportError:
-    SKLEARN_AVAILABLE = False
-    print("⚠ sklearn not available. Install with: pip install scikit-learn")
-    print("  GSI smoothing will be disabled.")
+    SCIPY_AVAILABLE = False
+
+GSI_AVAILABLE = True  # numpy-only dense fallback when scipy is missing
+SKLEARN_AVAILABLE = GSI_AVAILABLE  # Kept for existing `from gsi_smoothing import SKLEARN_AVAILABLE`
+
+try:
+    from tracking_data_io import load_tracking_data
+    TRACKING_DATA_IO_AVAILABLE = True
+except ImportError:
+    TRACKING_DATA_IO_AVAILABLE = False
+
+# Noise level of the smoother (GaussianProcessRegressor's default alpha, so results match the GPR version)
+GSI_NOISE_ALPHA = 1e-10
+# Kernel values below this are treated as zero when building the banded system
+_KERNEL_CUTOFF = 1e-16
+# Only use a process pool for inputs with at least this many rows (pool startup costs more below)
+_POOL_MIN_ROWS = 200000
 
 
 def linear_interpolation(input_: np.ndarray, interval: int) -> np.ndarray:
@@ -35,88 +53,173 @@ def linear_interpolation(input_: np.ndarray, interval: int) -> np.ndarray:
     
     # Sort by track_id, then frame
     input_ = input_[np.lexsort((input_[:, 0], input_[:, 1]))]
-    output_ = input_.copy()
-    
-    id_pre, f_pre, row_pre = -1, -1, np.zeros((input_.shape[1],))
-    for row in input_:
-        f_curr, id_curr = int(row[0]), int(row[1])
-        if id_curr == id_pre and f_pre + 1 < f_curr < f_pre + interval:
-            # Interpolate missing frames
-            for i, f in enumerate(range(f_pre + 1, f_curr), start=1):
-                step = (row - row_pre) / (f_curr - f_pre) * i
-                row_new = row_pre + step
-                row_new[0] = f  # Ensure frame number is integer
-                row_new[1] = id_curr  # Ensure track_id is correct
-                output_ = np.vstack((output_, row_new))
-        id_pre, row_pre, f_pre = id_curr, row, f_curr
+    
+    # PERFORMANCE: Build all interpolated rows at once instead of one np.vstack per row
+    frames = input_[:, 0].astype(np.int64)
+    ids = input_[:, 1].astype(np.int64)
+    f_pre, f_curr = frames[:-1], frames[1:]
+    gaps = np.flatnonzero((ids[1:] == ids[:-1]) & (f_pre + 1 < f_curr) & (f_curr < f_pre + interval))
+    if len(gaps) == 0:
+        return input_
+    
+    missing = f_curr[gaps] - f_pre[gaps] - 1
+    gap_of_row = np.repeat(gaps, missing)
+    step_index = np.arange(len(gap_of_row)) - np.repeat(np.cumsum(missing) - missing, missing) + 1
+    
+    row_pre = input_[gap_of_row]
+    row_next = input_[gap_of_row + 1]
+    span = (frames[gap_of_row + 1] - frames[gap_of_row])[:, np.newaxis]
+    new_rows = row_pre + (row_next - row_pre) / span * step_index[:, np.newaxis]
+    new_rows[:, 0] = frames[gap_of_row] + step_index  # Ensure frame number is integer
+    new_rows[:, 1] = ids[gap_of_row]  # Ensure track_id is correct
+    
+    output_ = np.vstack((input_, new_rows))
     
     # Sort again after interpolation
     return output_[np.lexsort((output_[:, 0], output_[:, 1]))]
 
 
-def gaussian_smooth(input_: np.ndarray, tau: float) -> np.ndarray:
+def gsi_length_scale(tau: float, n: int) -> float:
+    """Adaptive RBF length scale based on track length (same schedule as BoxMOT's GSI)"""
+    return float(np.clip(tau * np.log(tau ** 3 / n), tau ** -1, tau ** 2))
+
+
+def _rbf(delta: np.ndarray, len_scale: float) -> np.ndarray:
+    return np.exp(-0.5 * (delta / len_scale) ** 2)
+
+
+def _dense_posterior_mean(t_train: np.ndarray, values: np.ndarray, t_query: np.ndarray,
+                          len_scale: float, alpha: float = GSI_NOISE_ALPHA) -> np.ndarray:
+    """K(query, train) (K(train, train) + alpha I)^-1 values via a dense Cholesky solve"""
+    K = _rbf(t_train[:, np.newaxis] - t_train[np.newaxis, :], len_scale)
+    K[np.diag_indices_from(K)] += alpha
+    L = np.linalg.cholesky(K)
+    coef = np.linalg.solve(L.T, np.linalg.solve(L, values))
+    return _rbf(t_query[:, np.newaxis] - t_train[np.newaxis, :], len_scale) @ coef
+
+
+def kernel_smooth(t: np.ndarray, values: np.ndarray, len_scale: float,
+                  alpha: float = GSI_NOISE_ALPHA) -> np.ndarray:
+    """
+    Closed-form fixed-length-scale GP smoother (posterior mean at the observed frames).
+    
+    Computes K (K + alpha I)^-1 Y for an RBF kernel - exactly what
+    GaussianProcessRegressor(RBF(len_scale, 'fixed')).fit(t, y).predict(t) returns - for all
+    columns of Y in one solve. Frames are sorted and distinct, so |t_i - t_j| >= |i - j| and
+    kernel entries more than ~8.6 * len_scale rows apart are below _KERNEL_CUTOFF: the system is
+    banded and is solved in O(n * bandwidth^2) instead of O(n^3).
+    
+    Args:
+        t: (n,) sorted, distinct frame numbers
+        values: (n, k) coordinates to smooth (e.g. x, y, w, h)
+        len_scale: RBF length scale in frames
+        alpha: Noise level added to the kernel diagonal
+    
+    Returns:
+        (n, k) smoothed coordinates
+    """
+    t = np.asarray(t, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    n = len(t)
+    bandwidth = min(n - 1, int(np.ceil(len_scale * np.sqrt(2.0 * np.log(1.0 / _KERNEL_CUTOFF)))))
+    
+    if not SCIPY_AVAILABLE or np.any(np.diff(t) < 1.0):
+        # Duplicate frames break the banded structure - solve the full system
+        return _dense_posterior_mean(t, values, t, len_scale, alpha)
+    
+    # Upper banded storage: ab[bandwidth - k, k:] holds the k-th superdiagonal K[i, i + k]
+    ab = np.empty((bandwidth + 1, n))
+    for k in range(1, bandwidth + 1):
+        ab[bandwidth - k, :k] = 0.0
+        ab[bandwidth - k, k:] = _rbf(t[k:] - t[:-k], len_scale)
+    ab[bandwidth, :] = 1.0 + alpha
+    
+    coef = solveh_banded(ab, values, lower=False, check_finite=False)
+    
+    # Posterior mean K @ coef using the same diagonals (K has a unit diagonal)
+    smoothed = coef.copy()
+    for k in range(1, bandwidth + 1):
+        diag = ab[bandwidth - k, k:][:, np.newaxis]
+        smoothed[:-k] += diag * coef[k:]
+        smoothed[k:] += diag * coef[:-k]
+    return smoothed
+
+
+def _smooth_track(track: np.ndarray, tau: float) -> np.ndarray:
+    """Smooth one track's [frame, track_id, x, y, w, h] rows (sorted by frame)"""
+    out = np.empty((len(track), 6))
+    out[:, 0] = track[:, 0]
+    out[:, 1] = track[:, 1]
+    out[:, 4] = 40.0  # Fill missing w, h with defaults if needed
+    out[:, 5] = 80.0
+    num_coords = min(6, track.shape[1]) - 2
+    coords = track[:, 2:2 + num_coords]
+    out[:, 2:2 + num_coords] = coords
+    
+    if len(track) < 2 or num_coords <= 0:
+        # Not enough data to smooth
+        return out
+    
+    len_scale = gsi_length_scale(tau, len(track))
+    # Columns with NaN/inf can't be smoothed - keep their original values (as the GPR fit did)
+    finite = np.isfinite(coords).all(axis=0)
+    if finite.any():
+        try:
+            out[:, 2:2 + num_coords][:, finite] = kernel_smooth(track[:, 0], coords[:, finite], len_scale)
+        except (np.linalg.LinAlgError, ValueError):
+            # If smoothing fails, use original data
+            pass
+    return out
+
+
+def _smooth_track_blocks(blocks: List[np.ndarray], tau: float) -> List[np.ndarray]:
+    """Process-pool worker: smooth a batch of tracks"""
+    return [_smooth_track(block, tau) for block in blocks]
+
+
+def gaussian_smooth(input_: np.ndarray, tau: float, workers: Optional[int] = None) -> np.ndarray:
     """
     Apply Gaussian smoothing to the input data.
     
     Args:
         input_: Input array with shape (n, m) where columns are [frame, track_id, x, y, w, h, ...]
         tau: Time constant for Gaussian smoothing (higher = more smoothing).
+        workers: Process pool size for large inputs (None = CPU count, 1 = no pool)
     
     Returns:
-        Smoothed array with the same shape as the input.
+        Smoothed array with columns [frame, track_id, x, y, w, h] (sorted by track_id, frame)
     """
-    if not SKLEARN_AVAILABLE or len(input_) == 0:
+    if len(input_) == 0:
         return input_
     
-    output_ = []
-    ids = set(int(id_) for id_ in input_[:, 1])
+    input_ = np.asarray(input_, dtype=float)
+    input_ = input_[np.lexsort((input_[:, 0], input_[:, 1]))]
+    ids = input_[:, 1].astype(np.int64)
+    bounds = np.flatnonzero(np.diff(ids)) + 1
+    blocks = np.split(input_, bounds)
+    
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(blocks))
+    
+    if workers > 1 and len(input_) >= _POOL_MIN_ROWS:
+        # Spread tracks across processes in batches of roughly equal row counts
+        batches = [[] for _ in range(workers * 4)]
+        batch_rows = [0] * len(batches)
+        for block in sorted(blocks, key=len, reverse=True):
+            target = int(np.argmin(batch_rows))
+            batches[target].append(block)
+            batch_rows[target] += len(block)
+        batches = [batch for batch in batches if batch]
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(_smooth_track_blocks, batches, [tau] * len(batches)))
+            smoothed = np.vstack([track for batch in results for track in batch])
+            return smoothed[np.lexsort((smoothed[:, 0], smoothed[:, 1]))]
+        except Exception as e:
+            print(f"⚠ GSI process pool failed ({e}), smoothing in this process")
     
-    for id_ in ids:
-        tracks = input_[input_[:, 1] == id_]
-        if len(tracks) < 2:
-            # Not enough data to smooth
-            output_.extend(tracks.tolist())
-            continue
-        
-        # Adaptive length scale based on track length
-        len_scale = np.clip(tau * np.log(tau ** 3 / len(tracks)), tau ** -1, tau ** 2)
-        t = tracks[:, 0].reshape(-1, 1)  # Frame numbers
-        
-        # Smooth x, y, w, h (columns 2-5)
-        smoothed_data = []
-        for i in range(2, min(6, tracks.shape[1])):
-            data = tracks[:, i].reshape(-1, 1)
-            try:
-                gpr = GPR(RBF(len_scale, 'fixed'))
-                gpr.fit(t, data)
-                smoothed = gpr.predict(t)
-                # gpr.predict may return (y_mean, y_std) tuple or an array;
-                # handle both cases:
-                if isinstance(smoothed, tuple):
-                    smoothed = smoothed[0]
-                smoothed = np.asarray(smoothed).reshape(-1, 1)
-                smoothed_data.append(smoothed)
-            except Exception as e:
-                # If smoothing fails, use original data
-                smoothed_data.append(data)
-        
-        # Reconstruct rows with smoothed coordinates
-        # Only keep core columns: [frame, track_id, x, y, w, h]
-        for j in range(len(t)):
-            row = [float(t[j, 0]), int(id_)]
-            # Add smoothed x, y, w, h
-            for data in smoothed_data:
-                row.append(float(data[j, 0]))
-            # Ensure we have exactly 6 columns (frame, track_id, x, y, w, h)
-            while len(row) < 6:
-                # Fill missing w, h with defaults if needed
-                if len(row) == 4:
-                    row.append(40.0)  # w
-                if len(row) == 5:
-                    row.append(80.0)  # h
-            output_.append(row[:6])  # Only keep first 6 columns
-    
-    return np.array(output_, dtype=float)
+    return np.vstack(_smooth_track_blocks(blocks, tau))
 
 
 def apply_gsi_to_tracks(track_history: Dict[int, List[Tuple[int, float, float, float, float]]], 
@@ -132,7 +235,7 @@ def apply_gsi_to_tracks(track_history: Dict[int, List[Tuple[int, float, float, f
     Returns:
         Smoothed track history dictionary
     """
-    if not SKLEARN_AVAILABLE or len(track_history) == 0:
+    if len(track_history) == 0:
         return track_history
     
     # Convert to numpy array format: [frame, track_id, x, y, w, h]
@@ -167,7 +270,7 @@ def apply_gsi_to_tracks(track_history: Dict[int, List[Tuple[int, float, float, f
 
 
 def apply_gsi_to_csv(csv_path: str, output_path: Optional[str] = None, 
-                     interval: int = 20, tau: float = 10.0) -> pd.DataFrame:
+                     interval: int = 20, tau: float = 10.0, workers: Optional[int] = None) -> pd.DataFrame:
     """
     Apply GSI to tracking CSV file.
     
@@ -176,16 +279,16 @@ def apply_gsi_to_csv(csv_path: str, output_path: Optional[str] = None,
         output_path: Optional path to save smoothed CSV (if None, overwrites input)
         interval: Maximum frame gap to interpolate
         tau: Time constant for Gaussian smoothing
+        workers: Process pool size for smoothing (None = CPU count, 1 = no pool)
     
     Returns:
         DataFrame with smoothed tracks
     """
-    if not SKLEARN_AVAILABLE:
-        print("⚠ sklearn not available. Cannot apply GSI.")
-        return pd.read_csv(csv_path)
-    
-    # Load CSV (skip comment lines starting with '#')
-    df = pd.read_csv(csv_path, comment='#')
+    # Load CSV (skip comment lines starting with '#'); the typed sidecar is used when current
+    if TRACKING_DATA_IO_AVAILABLE:
+        df = load_tracking_data(csv_path)
+    else:
+        df = pd.read_csv(csv_path, comment='#')
     
     if len(df) == 0:
         return df
@@ -237,62 +340,49 @@ def apply_gsi_to_csv(csv_path: str, output_path: Optional[str] = None,
     
     # Convert to numpy array format: [frame, track_id, x, y, w, h]
     # For CSV, we don't have w, h, so we'll use a default size or estimate
-    data_list = []
-    for _, row in df.iterrows():
-        frame = int(row[frame_col])
-        track_id = int(row[track_col])
-        x = float(row[x_col])
-        y_val = row[y_col]
-        y = float(y_val) if y_val is not None else 0.0
-        # Estimate w, h from bounding box if available, otherwise use defaults
-        if 'width' in df.columns:
-            width_val = row['width']
-            w = float(width_val) if width_val is not None else 40.0
-        else:
-            w = 40.0
-        if 'height' in df.columns:
-            height_val = row['height']
-            h = float(height_val) if height_val is not None else 80.0
-        else:
-            h = 80.0
-        data_list.append([frame, track_id, x, y, w, h])
-
-    if len(data_list) == 0:
+    # PERFORMANCE: Column-wise conversion instead of iterrows (millions of rows per game)
+    frames = pd.to_numeric(df[frame_col], errors='coerce')
+    track_ids = pd.to_numeric(df[track_col], errors='coerce')
+    has_key = frames.notna() & track_ids.notna()  # Rows without a frame/track ID are left as-is
+    if not has_key.any():
         return df
-
-    input_array = np.array(data_list)
+    
+    n_rows = int(has_key.sum())
+    widths = pd.to_numeric(df['width'], errors='coerce').fillna(40.0)[has_key] if 'width' in df.columns else np.full(n_rows, 40.0)
+    heights = pd.to_numeric(df['height'], errors='coerce').fillna(80.0)[has_key] if 'height' in df.columns else np.full(n_rows, 80.0)
+    input_array = np.column_stack([
+        frames[has_key].astype(np.int64).to_numpy(dtype=float),
+        track_ids[has_key].astype(np.int64).to_numpy(dtype=float),
+        pd.to_numeric(df[x_col], errors='coerce')[has_key].to_numpy(dtype=float),
+        pd.to_numeric(df[y_col], errors='coerce')[has_key].to_numpy(dtype=float),
+        np.asarray(widths, dtype=float),
+        np.asarray(heights, dtype=float),
+    ])
 
     interpolated = linear_interpolation(input_array, interval)
     
     # Apply Gaussian smoothing
-    smoothed = gaussian_smooth(interpolated, tau)
+    smoothed = gaussian_smooth(interpolated, tau, workers=workers)
     
     # Convert back to DataFrame - preserve all original columns
     # Map smoothed coordinates back to DataFrame by (frame, track_id) key
-    smoothed_dict = {}
-    for row in smoothed:
-        frame, track_id = int(row[0]), int(row[1])
-        x, y = row[2], row[3]
-        smoothed_dict[(frame, track_id)] = (x, y)
+    smoothed_xy = pd.DataFrame({
+        '_gsi_frame': smoothed[:, 0].astype(np.int64),
+        '_gsi_track': smoothed[:, 1].astype(np.int64),
+        '_gsi_x': smoothed[:, 2],
+        '_gsi_y': smoothed[:, 3],
+    }).drop_duplicates(subset=['_gsi_frame', '_gsi_track'], keep='last')
+    keys = pd.DataFrame({
+        '_gsi_frame': frames[has_key].astype(np.int64).to_numpy(),
+        '_gsi_track': track_ids[has_key].astype(np.int64).to_numpy(),
+    }, index=df.index[has_key])
+    mapped = keys.reset_index().merge(smoothed_xy, on=['_gsi_frame', '_gsi_track'], how='left').set_index('index')
+    mapped = mapped[mapped['_gsi_x'].notna() | mapped['_gsi_y'].notna()]
     
     # Create new DataFrame with smoothed coordinates
-    smoothed_rows = []
-    for idx, row in df.iterrows():
-        frame = int(row[frame_col])
-        track_id = int(row[track_col])
-        
-        # Create a copy of the row
-        new_row = row.copy()
-        
-        # Update with smoothed coordinates if available
-        if (frame, track_id) in smoothed_dict:
-            x, y = smoothed_dict[(frame, track_id)]
-            new_row[x_col] = x
-            new_row[y_col] = y
-        
-        smoothed_rows.append(new_row)
-    
-    smoothed_df = pd.DataFrame(smoothed_rows)
+    smoothed_df = df.copy()
+    smoothed_df.loc[mapped.index, x_col] = mapped['_gsi_x'].to_numpy()
+    smoothed_df.loc[mapped.index, y_col] = mapped['_gsi_y'].to_numpy()
     
     # Save if output path specified
     if output_path:
@@ -321,7 +411,7 @@ def apply_gsi_realtime(track_positions: Dict[int, Tuple[float, float]],
     Returns:
         Smoothed positions {track_id: (x, y)}
     """
-    if not SKLEARN_AVAILABLE or len(track_positions) == 0:
+    if len(track_positions) == 0:
         return track_positions
     
     smoothed_positions = {}
@@ -339,38 +429,18 @@ def apply_gsi_realtime(track_positions: Dict[int, Tuple[float, float]],
             continue
         
         # Prepare data for smoothing
-        frames = np.array([f for f, _, _ in recent_history] + [current_frame]).reshape(-1, 1)
-        x_vals = np.array([px for _, px, _ in recent_history] + [x]).reshape(-1, 1)
-        y_vals = np.array([py for _, _, py in recent_history] + [y]).reshape(-1, 1)
+        frames = np.array([f for f, _, _ in recent_history], dtype=float)
+        positions = np.array([(px, py) for _, px, py in recent_history], dtype=float)
         
         try:
-            # Adaptive length scale
-            len_scale = np.clip(tau * np.log(tau ** 3 / len(frames)), tau ** -1, tau ** 2)
+            # Adaptive length scale (history plus the current frame)
+            len_scale = gsi_length_scale(tau, len(frames) + 1)
             
-            # Smooth x coordinate
-            gpr_x = GPR(RBF(len_scale, 'fixed'))
-            gpr_x.fit(frames[:-1], x_vals[:-1])
-            pred_x = gpr_x.predict(frames[-1:])
-            # Handle tuple return or array
-            if isinstance(pred_x, tuple):
-                pred_x = pred_x[0]
-            pred_x = np.asarray(pred_x)
-            smoothed_x = float(pred_x.flat[0])
-
-            # Smooth y coordinate
-            gpr_y = GPR(RBF(len_scale, 'fixed'))
-            gpr_y.fit(frames[:-1], y_vals[:-1])
-            pred_y = gpr_y.predict(frames[-1:])
-            # Handle tuple return or array
-            if isinstance(pred_y, tuple):
-                pred_y = pred_y[0]
-            pred_y = np.asarray(pred_y)
-            smoothed_y = float(pred_y.flat[0])
-            
-            smoothed_positions[track_id] = (smoothed_x, smoothed_y)
+            # Posterior mean at the current frame from the history (x and y in one solve)
+            pred = _dense_posterior_mean(frames, positions, np.array([float(current_frame)]), len_scale)
+            smoothed_positions[track_id] = (float(pred[0, 0]), float(pred[0, 1]))
         except Exception as e:
             # If smoothing fails, use current position
             smoothed_positions[track_id] = (x, y)
     
     return smoothed_positions
-
@@ -1293,3 +1293,64 @@ class HDOverlayRenderer:
         
         return img
 
+    
+    def draw_heat_map(self, img: np.ndarray, density: np.ndarray,
+                      color_scheme: str = "hot", alpha: float = 0.4,
+                      min_density: float = 0.02) -> np.ndarray:
+        """
+        Blend a low-resolution density grid onto the frame as a heat map.
+        
+        The grid is colorized at its own resolution and only the region with
+        visible density is upsampled and blended, so the cost depends on the
+        grid size and the covered area rather than on how it was accumulated.
+        
+        Args:
+            img: Image to draw on (modified in place)
+            density: 2D float grid normalized to 0..1 covering the whole image
+            color_scheme: "hot", "cool" or "green"
+            alpha: Maximum overlay opacity (scaled by local density)
+            min_density: Densities below this are left transparent
+        
+        Returns:
+            Image with heat map blended in
+        """
+        if density is None or density.size == 0:
+            return img
+        
+        active = density >= min_density
+        if not active.any():
+            return img
+        
+        img_h, img_w = img.shape[:2]
+        grid_h, grid_w = density.shape[:2]
+        cell_x = img_w / grid_w
+        cell_y = img_h / grid_h
+        
+        # Restrict work to the bounding box of visible density (one cell of margin for interpolation)
+        rows = np.flatnonzero(active.any(axis=1))
+        cols = np.flatnonzero(active.any(axis=0))
+        r0, r1 = max(0, rows[0] - 1), min(grid_h, rows[-1] + 2)
+        c0, c1 = max(0, cols[0] - 1), min(grid_w, cols[-1] + 2)
+        y0, y1 = int(r0 * cell_y), min(img_h, int(math.ceil(r1 * cell_y)))
+        x0, x1 = int(c0 * cell_x), min(img_w, int(math.ceil(c1 * cell_x)))
+        if y1 <= y0 or x1 <= x0:
+            return img
+        
+        grid = np.clip(density[r0:r1, c0:c1], 0.0, 1.0).astype(np.float32)
+        grid[grid < min_density] = 0.0
+        levels = (grid * 255.0).astype(np.uint8)
+        if color_scheme == "green":
+            colored = np.zeros(levels.shape + (3,), dtype=np.uint8)
+            colored[..., 1] = levels
+            colored[..., 2] = (levels.astype(np.uint16) * 3 // 4).astype(np.uint8)
+        elif color_scheme == "cool":
+            colored = cv2.applyColorMap(levels, cv2.COLORMAP_COOL)
+        else:
+            colored = cv2.applyColorMap(levels, cv2.COLORMAP_HOT)
+        
+        roi = img[y0:y1, x0:x1]
+        size = (x1 - x0, y1 - y0)
+        colored = cv2.resize(colored, size, interpolation=cv2.INTER_LINEAR)
+        weight = cv2.resize(grid * float(alpha), size, interpolation=cv2.INTER_LINEAR)
+        roi[:] = cv2.blendLinear(colored, roi, weight, 1.0 - weight)
+        return img
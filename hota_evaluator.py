@@ -15,6 +15,21 @@ from typing import Dict, List, Tuple, Optional
 import os
 from collections import defaultdict
 
+import box_ops
+
+# Hungarian matching (optional - falls back to greedy highest-score matching)
+try:
+    from scipy.optimize import linear_sum_assignment
+    SCIPY_AVAILABLE = True
+except ImportError:
+    SCIPY_AVAILABLE = False
+
+
+# HOTA is averaged over these localization thresholds (0.05, 0.10, ..., 0.95)
+HOTA_ALPHAS = np.arange(0.05, 0.99, 0.05)
+_EPS = np.finfo('float').eps
+_PAIR_CHUNK = 1 << 21  # Candidate GT/pred pairs expanded per batch
+
 
 class HOTAEvaluator:
     """
@@ -22,16 +37,27 @@ class HOTAEvaluator:
     
     HOTA provides a more balanced evaluation than traditional metrics like MOTA,
     as it considers both detection and association accuracy simultaneously.
+    
+    Implementation follows the reference definition (Luiten et al., TrackEval):
+    - Per frame, GT and predicted boxes are matched with the Hungarian algorithm
+      (linear_sum_assignment) on IoU weighted by the global GT/pred ID alignment score
+    - A match is a TP at threshold alpha when its IoU >= alpha
+    - AssA is accumulated from TPA/FNA/FPA through the global (GT ID, pred ID) match counts
+    - Everything is reported as the mean over the 19 alpha thresholds, plus the full curve
     """
     
-    def __init__(self, alpha: float = 0.0):
+    def __init__(self, alpha: float = 0.0, gt_frames_only: bool = True):
         """
         Initialize HOTA evaluator.
         
         Args:
-            alpha: Alpha parameter for HOTA (0.0 = equal weight, higher = more weight on association)
+            alpha: Ignored; kept so existing HOTAEvaluator(alpha=...) calls still work. HOTA is
+                   always averaged over the 19 IoU thresholds (HOTA_ALPHAS).
+            gt_frames_only: Only evaluate frames that have ground truth (anchor frames are sparse;
+                            predictions in frames without GT are not counted as false positives)
         """
         self.alpha = alpha
+        self.gt_frames_only = gt_frames_only
         self.results = {}
     
     def calculate_hota(
@@ -49,7 +75,7 @@ class HOTAEvaluator:
             frame_range: Optional (start_frame, end_frame) to limit evaluation
         
         Returns:
-            Dictionary with HOTA metrics:
+            Dictionary with HOTA metrics (averaged over HOTA_ALPHAS):
             - HOTA: Overall HOTA score (0-1, higher is better)
             - DetA: Detection Accuracy (0-1)
             - AssA: Association Accuracy (0-1)
@@ -57,40 +83,55 @@ class HOTAEvaluator:
             - DetPr: Detection Precision
             - AssRe: Association Recall
             - AssPr: Association Precision
+            - LocA: Localization Accuracy (mean IoU of matches)
+            - HOTA(0), LocA(0), HOTALocA(0): Values at the lowest threshold
+            - DetTP/DetFP/DetFN, AssTP/AssFP/AssFN: Counts at alpha = 0.5
+            - HOTA_alphas, HOTA_curve, DetA_curve, AssA_curve, LocA_curve: Per-threshold values
         """
         if frame_range:
             start_frame, end_frame = frame_range
             pred_tracks = self._filter_frames(pred_tracks, start_frame, end_frame)
             gt_tracks = self._filter_frames(gt_tracks, start_frame, end_frame)
         
-        # Calculate detection accuracy
-        det_metrics = self._calculate_detection_accuracy(pred_tracks, gt_tracks)
-        
-        # Calculate association accuracy
-        ass_metrics = self._calculate_association_accuracy(pred_tracks, gt_tracks)
-        
-        # Calculate overall HOTA
-        deta = det_metrics['accuracy']
-        assa = ass_metrics['accuracy']
-        
-        # HOTA formula: sqrt(DetA * AssA)
-        hota = np.sqrt(deta * assa) if deta > 0 and assa > 0 else 0.0
-        
-        return {
-            'HOTA': float(hota),
-            'DetA': float(deta),
-            'AssA': float(assa),
-            'DetRe': float(det_metrics['recall']),
-            'DetPr': float(det_metrics['precision']),
-            'AssRe': float(ass_metrics['recall']),
-            'AssPr': float(ass_metrics['precision']),
-            'DetTP': int(det_metrics['tp']),
-            'DetFP': int(det_metrics['fp']),
-            'DetFN': int(det_metrics['fn']),
-            'AssTP': int(ass_metrics['tp']),
-            'AssFP': int(ass_metrics['fp']),
-            'AssFN': int(ass_metrics['fn']),
+        gt_frames, gt_ids, gt_boxes, num_gt_ids = self._tracks_to_arrays(gt_tracks)
+        pred_frames, pred_ids, pred_boxes, num_pred_ids = self._tracks_to_arrays(pred_tracks)
+        
+        if self.gt_frames_only and len(pred_frames) > 0:
+            in_gt_frames = np.isin(pred_frames, gt_frames)
+            pred_frames, pred_ids, pred_boxes = pred_frames[in_gt_frames], pred_ids[in_gt_frames], pred_boxes[in_gt_frames]
+        
+        curves = self._compute_hota_curves(
+            gt_frames, gt_ids, gt_boxes, num_gt_ids,
+            pred_frames, pred_ids, pred_boxes, num_pred_ids
+        )
+        
+        mid = int(np.argmin(np.abs(HOTA_ALPHAS - 0.5)))
+        results = {
+            'HOTA': float(np.mean(curves['HOTA'])),
+            'DetA': float(np.mean(curves['DetA'])),
+            'AssA': float(np.mean(curves['AssA'])),
+            'DetRe': float(np.mean(curves['DetRe'])),
+            'DetPr': float(np.mean(curves['DetPr'])),
+            'AssRe': float(np.mean(curves['AssRe'])),
+            'AssPr': float(np.mean(curves['AssPr'])),
+            'LocA': float(np.mean(curves['LocA'])),
+            'HOTA(0)': float(curves['HOTA'][0]),
+            'LocA(0)': float(curves['LocA'][0]),
+            'HOTALocA(0)': float(curves['HOTA'][0] * curves['LocA'][0]),
+            'DetTP': int(curves['DetTP'][mid]),
+            'DetFP': int(curves['DetFP'][mid]),
+            'DetFN': int(curves['DetFN'][mid]),
+            'AssTP': int(curves['AssTP'][mid]),
+            'AssFP': int(curves['AssFP'][mid]),
+            'AssFN': int(curves['AssFN'][mid]),
+            'HOTA_alphas': [float(a) for a in HOTA_ALPHAS],
+            'HOTA_curve': [float(v) for v in curves['HOTA']],
+            'DetA_curve': [float(v) for v in curves['DetA']],
+            'AssA_curve': [float(v) for v in curves['AssA']],
+            'LocA_curve': [float(v) for v in curves['LocA']],
         }
+        self.results = results
+        return results
     
     def _filter_frames(
         self,
@@ -109,159 +150,203 @@ class HOTAEvaluator:
                 filtered[track_id] = filtered_dets
         return filtered
     
-    def _calculate_detection_accuracy(
-        self,
-        pred_tracks: Dict[int, List[Tuple[int, float, float, float, float]]],
-        gt_tracks: Dict[int, List[Tuple[int, float, float, float, float]]]
-    ) -> Dict[str, float]:
-        """Calculate detection accuracy metrics."""
-        # Flatten all detections
-        pred_dets = []
-        for track_id, detections in pred_tracks.items():
-            for det in detections:
-                # Handle both 5-tuple (frame, x1, y1, x2, y2) and 6-tuple (frame, x1, y1, x2, y2, player_name)
-                # Extract only bbox coordinates (x1, y1, x2, y2) - first 4 elements after frame
-                if len(det) >= 5:
-                    frame = det[0]
-                    bbox = (det[1], det[2], det[3], det[4])  # Only take first 4 bbox coordinates
-                    pred_dets.append((frame, bbox))
-        
-        gt_dets = []
-        for track_id, detections in gt_tracks.items():
-            for det in detections:
-                # Handle both 5-tuple (frame, x1, y1, x2, y2) and 6-tuple (frame, x1, y1, x2, y2, player_name)
-                # Extract only bbox coordinates (x1, y1, x2, y2) - first 4 elements after frame
-                if len(det) >= 5:
-                    frame = det[0]
-                    bbox = (det[1], det[2], det[3], det[4])  # Only take first 4 bbox coordinates
-                    gt_dets.append((frame, bbox))
-        
-        # Group by frame
-        pred_by_frame = defaultdict(list)
-        gt_by_frame = defaultdict(list)
-        
-        for frame, bbox in pred_dets:
-            pred_by_frame[frame].append(bbox)
-        for frame, bbox in gt_dets:
-            gt_by_frame[frame].append(bbox)
-        
-        # Calculate IoU-based matching
-        all_frames = set(pred_by_frame.keys()) | set(gt_by_frame.keys())
-        tp = 0
-        fp = 0
-        fn = 0
-        
-        for frame in all_frames:
-            pred_boxes = pred_by_frame.get(frame, [])
-            gt_boxes = gt_by_frame.get(frame, [])
-            
-            # Match predictions to ground truth using IoU
-            matched_gt = set()
-            for pred_box in pred_boxes:
-                best_iou = 0.0
-                best_gt_idx = -1
-                for i, gt_box in enumerate(gt_boxes):
-                    if i in matched_gt:
-                        continue
-                    iou = self._calculate_iou(pred_box, gt_box)
-                    if iou > best_iou:
-                        best_iou = iou
-                        best_gt_idx = i
-                
-                if best_iou >= 0.5:  # IoU threshold for detection match
-                    tp += 1
-                    matched_gt.add(best_gt_idx)
-                else:
-                    fp += 1
-            
-            # Unmatched ground truth = false negatives
-            fn += len(gt_boxes) - len(matched_gt)
-        
-        # Calculate metrics
-        precision = tp / (tp + fp) if (tp + fp) > 0 else 0.0
-        recall = tp / (tp + fn) if (tp + fn) > 0 else 0.0
-        accuracy = 2 * precision * recall / (precision + recall) if (precision + recall) > 0 else 0.0
-        
-        return {
-            'tp': tp,
-            'fp': fp,
-            'fn': fn,
-            'precision': precision,
-            'recall': recall,
-            'accuracy': accuracy
-        }
-    
-    def _calculate_association_accuracy(
+    def _tracks_to_arrays(
         self,
-        pred_tracks: Dict[int, List[Tuple[int, float, float, float, float]]],
-        gt_tracks: Dict[int, List[Tuple[int, float, float, float, float]]]
-    ) -> Dict[str, float]:
-        """Calculate association accuracy metrics."""
-        # For association, we need to match tracks over time
-        # This is simplified - full HOTA uses more complex matching
+        tracks: Dict[int, List[Tuple[int, float, float, float, float]]]
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, int]:
+        """
+        Flatten tracks into frame-sorted arrays.
         
-        # Count track fragments (how many times a track is broken)
-        pred_fragments = sum(1 for track_id, detections in pred_tracks.items() if len(detections) > 0)
-        gt_fragments = len(gt_tracks)
+        Handles both 5-tuple (frame, x1, y1, x2, y2) and 6-tuple (frame, x1, y1, x2, y2, player_name)
+        detections - only the frame and the first 4 bbox coordinates are used.
         
-        # Count track switches (simplified - would need temporal matching)
-        # For now, use a simplified metric based on track persistence
-        pred_track_lengths = [len(dets) for dets in pred_tracks.values()]
-        gt_track_lengths = [len(dets) for dets in gt_tracks.values()]
+        Returns:
+            (frames, id_indices, boxes, num_ids) where id_indices are contiguous 0..num_ids-1
+        """
+        blocks = []
+        owners = []
+        for id_index, detections in enumerate(tracks.values()):
+            try:
+                block = np.asarray(detections, dtype=np.float64)  # All plain 5-tuples
+                if block.ndim != 2 or block.shape[1] != 5:
+                    raise ValueError
+            except (ValueError, TypeError):
+                rows = [det[:5] for det in detections if len(det) >= 5]
+                block = np.asarray(rows, dtype=np.float64).reshape(-1, 5)
+            if len(block):
+                blocks.append(block)
+                owners.append(np.full(len(block), id_index, dtype=np.int64))
+        
+        if not blocks:
+            return (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64),
+                    np.zeros((0, 4), dtype=np.float64), len(tracks))
+        
+        data = np.concatenate(blocks)
+        ids = np.concatenate(owners)
+        frames = data[:, 0].astype(np.int64)
+        order = np.argsort(frames, kind='stable')
+        return frames[order], ids[order], data[order, 1:5], len(tracks)
+    
+    def _overlapping_pairs(
+        self,
+        gt_boxes: np.ndarray, gt_lo: np.ndarray, gt_hi: np.ndarray,
+        pred_boxes: np.ndarray, pred_lo: np.ndarray, pred_hi: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        All (GT detection, pred detection) pairs with IoU > 0 in the given frames.
         
-        avg_pred_length = np.mean(pred_track_lengths) if pred_track_lengths else 0
-        avg_gt_length = np.mean(gt_track_lengths) if gt_track_lengths else 0
+        Frame k covers GT rows gt_lo[k]:gt_hi[k] and prediction rows pred_lo[k]:pred_hi[k].
+        Frames with the same (num GT, num pred) shape are stacked and evaluated as one
+        broadcasted (frames, GT, pred) IoU block.
         
-        # Simplified association accuracy based on track persistence
-        if avg_gt_length > 0:
-            persistence_ratio = min(avg_pred_length / avg_gt_length, 1.0)
-        else:
-            persistence_ratio = 0.0
-        
-        # Simplified metrics (full HOTA would use more complex temporal matching)
-        tp = int(sum(pred_track_lengths))
-        fp = int(sum(max(0, len(dets) - avg_gt_length) for dets in pred_tracks.values()))
-        fn = int(sum(max(0, avg_gt_length - len(dets)) for dets in pred_tracks.values()))
-        
-        precision = tp / (tp + fp) if (tp + fp) > 0 else 0.0
-        recall = tp / (tp + fn) if (tp + fn) > 0 else 0.0
-        accuracy = persistence_ratio  # Simplified association accuracy
-        
-        return {
-            'tp': tp,
-            'fp': fp,
-            'fn': fn,
-            'precision': precision,
-            'recall': recall,
-            'accuracy': accuracy
-        }
+        Returns:
+            (frame_k, gt_index, pred_index, iou) sorted by frame
+        """
+        gt_per_frame = gt_hi - gt_lo
+        pred_per_frame = pred_hi - pred_lo
+        shape_keys = gt_per_frame * (int(pred_per_frame.max(initial=0)) + 1) + pred_per_frame
+        
+        frame_k, gt_index, pred_index, similarity = [], [], [], []
+        for key in np.unique(shape_keys):
+            ks = np.flatnonzero(shape_keys == key)
+            n_gt = int(gt_per_frame[ks[0]])
+            n_pred = int(pred_per_frame[ks[0]])
+            if n_gt == 0 or n_pred == 0:
+                continue
+            # Bound memory: at most _PAIR_CHUNK candidate pairs per block
+            step = max(1, _PAIR_CHUNK // (n_gt * n_pred))
+            for start in range(0, len(ks), step):
+                block = ks[start:start + step]
+                g = gt_lo[block][:, np.newaxis] + np.arange(n_gt)       # (F, G)
+                p = pred_lo[block][:, np.newaxis] + np.arange(n_pred)   # (F, P)
+                a = gt_boxes[g][:, :, np.newaxis, :]                    # (F, G, 1, 4)
+                b = pred_boxes[p][:, np.newaxis, :, :]                  # (F, 1, P, 4)
+                iw = np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0])
+                ih = np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1])
+                inter = np.clip(iw, 0.0, None) * np.clip(ih, 0.0, None)
+                f, r, c = np.nonzero(inter > 0)
+                if len(f) == 0:
+                    continue
+                inter = inter[f, r, c]
+                area_a = (a[f, r, 0, 2] - a[f, r, 0, 0]) * (a[f, r, 0, 3] - a[f, r, 0, 1])
+                area_b = (b[f, 0, c, 2] - b[f, 0, c, 0]) * (b[f, 0, c, 3] - b[f, 0, c, 1])
+                union = area_a + area_b - inter
+                valid = union > 0
+                frame_k.append(block[f[valid]])
+                gt_index.append(g[f[valid], r[valid]])
+                pred_index.append(p[f[valid], c[valid]])
+                similarity.append(inter[valid] / union[valid])
+        
+        if not similarity:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, empty, np.zeros(0, dtype=np.float64)
+        frame_k = np.concatenate(frame_k)
+        order = np.argsort(frame_k, kind='stable')
+        return (frame_k[order], np.concatenate(gt_index)[order], np.concatenate(pred_index)[order],
+                np.concatenate(similarity)[order])
     
-    def _calculate_iou(
+    def _compute_hota_curves(
         self,
-        box1: Tuple[float, float, float, float],
-        box2: Tuple[float, float, float, float]
-    ) -> float:
-        """Calculate Intersection over Union (IoU) between two bounding boxes."""
-        x1_1, y1_1, x2_1, y2_1 = box1
-        x1_2, y1_2, x2_2, y2_2 = box2
-        
-        # Calculate intersection
-        x1_i = max(x1_1, x1_2)
-        y1_i = max(y1_1, y1_2)
-        x2_i = min(x2_1, x2_2)
-        y2_i = min(y2_1, y2_2)
-        
-        if x2_i <= x1_i or y2_i <= y1_i:
-            return 0.0
-        
-        intersection = (x2_i - x1_i) * (y2_i - y1_i)
-        
-        # Calculate union
-        area1 = (x2_1 - x1_1) * (y2_1 - y1_1)
-        area2 = (x2_2 - x1_2) * (y2_2 - y1_2)
-        union = area1 + area2 - intersection
-        
-        return intersection / union if union > 0 else 0.0
+        gt_frames: np.ndarray, gt_ids: np.ndarray, gt_boxes: np.ndarray, num_gt_ids: int,
+        pred_frames: np.ndarray, pred_ids: np.ndarray, pred_boxes: np.ndarray, num_pred_ids: int
+    ) -> Dict[str, np.ndarray]:
+        """Per-alpha HOTA sub-metrics from frame-sorted GT and prediction arrays."""
+        num_alphas = len(HOTA_ALPHAS)
+        total_gt = len(gt_frames)
+        total_pred = len(pred_frames)
+        
+        # Matching is only possible in frames with both GT and predictions
+        frames = np.intersect1d(gt_frames, pred_frames)
+        gt_lo = np.searchsorted(gt_frames, frames, side='left')
+        gt_hi = np.searchsorted(gt_frames, frames, side='right')
+        pred_lo = np.searchsorted(pred_frames, frames, side='left')
+        pred_hi = np.searchsorted(pred_frames, frames, side='right')
+        
+        gt_id_count = np.bincount(gt_ids, minlength=num_gt_ids).astype(np.float64)
+        pred_id_count = np.bincount(pred_ids, minlength=num_pred_ids).astype(np.float64)
+        
+        # Pass 1: IoU of every GT/pred pair sharing a frame, batched across frames.
+        # Only overlapping pairs are kept - everything else has zero similarity.
+        pair_k, pair_gt, pair_pred, pair_sim = self._overlapping_pairs(
+            gt_boxes, gt_lo, gt_hi, pred_boxes, pred_lo, pred_hi)
+        
+        # Global ID alignment score from per-frame Jaccard-normalized similarity
+        gt_sim_sum = np.bincount(pair_gt, weights=pair_sim, minlength=total_gt)
+        pred_sim_sum = np.bincount(pair_pred, weights=pair_sim, minlength=total_pred)
+        sim_iou = pair_sim / (gt_sim_sum[pair_gt] + pred_sim_sum[pair_pred] - pair_sim)
+        id_stride = max(num_pred_ids, 1)
+        id_pairs, id_pair_index = np.unique(gt_ids[pair_gt] * id_stride + pred_ids[pair_pred], return_inverse=True)
+        potential_matches = np.bincount(id_pair_index, weights=sim_iou, minlength=len(id_pairs))
+        global_alignment = potential_matches / (gt_id_count[id_pairs // id_stride]
+                                                + pred_id_count[id_pairs % id_stride] - potential_matches)
+        pair_score = global_alignment[id_pair_index] * pair_sim
+        
+        # Pass 2: Hungarian matching on alignment-weighted IoU.
+        # Frames where no detection overlaps more than one counterpart have a unique optimal
+        # assignment (every overlapping pair), so only contested frames need linear_sum_assignment.
+        contested = (np.bincount(pair_gt, minlength=total_gt)[pair_gt] > 1) | \
+                    (np.bincount(pair_pred, minlength=total_pred)[pair_pred] > 1)
+        contested_frames = np.unique(pair_k[contested])
+        in_contested = np.isin(pair_k, contested_frames)
+        matched_pairs = [np.flatnonzero(~in_contested)]
+        
+        local_rows = pair_gt - gt_lo[pair_k]
+        local_cols = pair_pred - pred_lo[pair_k]
+        seg_lo = np.searchsorted(pair_k, contested_frames, side='left')
+        seg_hi = np.searchsorted(pair_k, contested_frames, side='right')
+        for k, lo, hi in zip(contested_frames, seg_lo, seg_hi):
+            rows, cols = local_rows[lo:hi], local_cols[lo:hi]
+            shape = (gt_hi[k] - gt_lo[k], pred_hi[k] - pred_lo[k])
+            score = np.zeros(shape)
+            score[rows, cols] = pair_score[lo:hi]
+            lookup = np.full(shape, -1, dtype=np.int64)
+            lookup[rows, cols] = np.arange(lo, hi)
+            if SCIPY_AVAILABLE:
+                r, c = linear_sum_assignment(-score)
+            else:
+                r, c = box_ops.greedy_match(score, _EPS)
+            chosen = lookup[r, c]
+            matched_pairs.append(chosen[chosen >= 0])
+        
+        matched_pairs = np.concatenate(matched_pairs)
+        matched_pairs = matched_pairs[pair_sim[matched_pairs] >= HOTA_ALPHAS[0] - _EPS]
+        match_gt = gt_ids[pair_gt[matched_pairs]]
+        match_pred = pred_ids[pair_pred[matched_pairs]]
+        match_sim = pair_sim[matched_pairs]
+        
+        curves = {name: np.zeros(num_alphas) for name in (
+            'HOTA', 'DetA', 'AssA', 'DetRe', 'DetPr', 'AssRe', 'AssPr', 'LocA',
+            'DetTP', 'DetFP', 'DetFN', 'AssTP', 'AssFP', 'AssFN')}
+        
+        for a, alpha in enumerate(HOTA_ALPHAS):
+            matched = match_sim >= alpha - _EPS
+            tp = int(matched.sum())
+            fn = total_gt - tp
+            fp = total_pred - tp
+            
+            # Global (GT ID, pred ID) match counts - each TP's TPA is the count of its ID pair
+            pairs, counts = np.unique(match_gt[matched] * id_stride + match_pred[matched], return_counts=True)
+            counts = counts.astype(np.float64)
+            pair_gt_count = gt_id_count[pairs // id_stride]
+            pair_pred_count = pred_id_count[pairs % id_stride]
+            
+            ass_tp = float(np.sum(counts * counts))
+            ass_fn = float(np.sum(counts * (pair_gt_count - counts)))
+            ass_fp = float(np.sum(counts * (pair_pred_count - counts)))
+            
+            curves['DetTP'][a], curves['DetFN'][a], curves['DetFP'][a] = tp, fn, fp
+            curves['AssTP'][a], curves['AssFN'][a], curves['AssFP'][a] = ass_tp, ass_fn, ass_fp
+            curves['DetA'][a] = tp / max(1, tp + fn + fp)
+            curves['DetRe'][a] = tp / max(1, tp + fn)
+            curves['DetPr'][a] = tp / max(1, tp + fp)
+            curves['AssA'][a] = np.sum(counts * counts / np.maximum(1, pair_gt_count + pair_pred_count - counts)) / max(1, tp)
+            curves['AssRe'][a] = np.sum(counts * counts / np.maximum(1, pair_gt_count)) / max(1, tp)
+            curves['AssPr'][a] = np.sum(counts * counts / np.maximum(1, pair_pred_count)) / max(1, tp)
+            curves['LocA'][a] = max(_EPS, float(match_sim[matched].sum())) / max(_EPS, tp)
+        
+        # HOTA formula: sqrt(DetA * AssA)
+        curves['HOTA'] = np.sqrt(curves['DetA'] * curves['AssA'])
+        return curves
     
     def evaluate_from_csv(
         self,
@@ -308,27 +393,32 @@ class HOTAEvaluator:
             df = pd.read_csv(csv_path, comment='#')
             
             # Expected columns: frame, track_id, x1, y1, x2, y2 (or similar)
-            # Adjust based on your CSV format
-            tracks = defaultdict(list)
+            # PERFORMANCE: Column-wise conversion (a full match has millions of rows)
+            frame_col = 'frame' if 'frame' in df.columns else ('frame_num' if 'frame_num' in df.columns else None)
+            id_col = 'track_id' if 'track_id' in df.columns else ('player_id' if 'player_id' in df.columns else None)
+            frames = df[frame_col] if frame_col else pd.Series(0, index=df.index)
+            track_ids = df[id_col] if id_col else pd.Series(0, index=df.index)
             
-            for _, row in df.iterrows():
-                frame = int(row.get('frame', row.get('frame_num', 0)))
-                track_id = int(row.get('track_id', row.get('player_id', 0)))
-                
-                # Try different column name variations
-                if 'x1' in row and 'y1' in row and 'x2' in row and 'y2' in row:
-                    x1, y1, x2, y2 = row['x1'], row['y1'], row['x2'], row['y2']
-                elif 'x' in row and 'y' in row:
-                    # Assume center point and size
-                    x, y = row['x'], row['y']
-                    w = row.get('width', 50)
-                    h = row.get('height', 100)
-                    x1, y1 = x - w/2, y - h/2
-                    x2, y2 = x + w/2, y + h/2
-                else:
-                    continue
-                
-                tracks[track_id].append((frame, float(x1), float(y1), float(x2), float(y2)))
+            # Try different column name variations
+            if all(col in df.columns for col in ('x1', 'y1', 'x2', 'y2')):
+                x1, y1, x2, y2 = df['x1'], df['y1'], df['x2'], df['y2']
+            elif 'x' in df.columns and 'y' in df.columns:
+                # Assume center point and size
+                w = df['width'] if 'width' in df.columns else 50
+                h = df['height'] if 'height' in df.columns else 100
+                x1, y1 = df['x'] - w / 2, df['y'] - h / 2
+                x2, y2 = df['x'] + w / 2, df['y'] + h / 2
+            else:
+                return {}
+            
+            table = pd.DataFrame({'frame': frames, 'track_id': track_ids,
+                                  'x1': x1, 'y1': y1, 'x2': x2, 'y2': y2}).apply(pd.to_numeric, errors='coerce').dropna()
+            table = table.astype({'frame': np.int64, 'track_id': np.int64})
+            
+            tracks = defaultdict(list)
+            for track_id, group in table.groupby('track_id', sort=False):
+                tracks[int(track_id)] = list(zip(group['frame'].tolist(), group['x1'].tolist(), group['y1'].tolist(),
+                                                 group['x2'].tolist(), group['y2'].tolist()))
             
             return dict(tracks)
         except Exception as e:
@@ -381,6 +471,8 @@ if __name__ == "__main__":
     print(f"\nOverall HOTA Score: {results.get('HOTA', 0):.4f}")
     print(f"Detection Accuracy (DetA): {results.get('DetA', 0):.4f}")
     print(f"Association Accuracy (AssA): {results.get('AssA', 0):.4f}")
+    print(f"Localization Accuracy (LocA): {results.get('LocA', 0):.4f}")
+    print(f"HOTA(0): {results.get('HOTA(0)', 0):.4f}, LocA(0): {results.get('LocA(0)', 0):.4f}")
     print(f"\nDetection Metrics:")
     print(f"  Recall: {results.get('DetRe', 0):.4f}")
     print(f"  Precision: {results.get('DetPr', 0):.4f}")
@@ -389,5 +481,9 @@ if __name__ == "__main__":
     print(f"  Recall: {results.get('AssRe', 0):.4f}")
     print(f"  Precision: {results.get('AssPr', 0):.4f}")
     print(f"  TP: {results.get('AssTP', 0)}, FP: {results.get('AssFP', 0)}, FN: {results.get('AssFN', 0)}")
+    print(f"\nHOTA by alpha threshold:")
+    for alpha, hota, deta, assa in zip(results.get('HOTA_alphas', []), results.get('HOTA_curve', []),
+                                       results.get('DetA_curve', []), results.get('AssA_curve', [])):
+        print(f"  alpha={alpha:.2f}: HOTA={hota:.4f}, DetA={deta:.4f}, AssA={assa:.4f}")
     print("="*60)
 
@@ -7,6 +7,8 @@ import numpy as np
 from collections import deque
 from typing import Dict, Tuple, Optional, List
 
+import box_ops
+
 class IdentityTracker:
     """
     Tracks player identity across track ID changes using bbox position matching.
@@ -84,40 +86,34 @@ class IdentityTracker:
         if exclude_track_ids is None:
             exclude_track_ids = []
         
-        best_match = None
-        best_score = 0.0
-        
-        bbox_center_x = (bbox[0] + bbox[2]) / 2
-        bbox_center_y = (bbox[1] + bbox[3]) / 2
-        bbox_area = (bbox[2] - bbox[0]) * (bbox[3] - bbox[1])
-        
-        # Check all tracks with assigned identities
+        # Candidate tracks: assigned identity with a known most recent bbox
+        candidates = []
+        last_bboxes = []
         for track_id, (player_name, confidence, assign_frame, assign_bbox) in self.track_identity.items():
             if track_id in exclude_track_ids:
                 continue
-            
-            # Get most recent bbox for this track
             if track_id in self.track_bbox_history and len(self.track_bbox_history[track_id]) > 0:
                 last_frame, last_bbox = self.track_bbox_history[track_id][-1]
-                
-                # Calculate distance
-                last_center_x = (last_bbox[0] + last_bbox[2]) / 2
-                last_center_y = (last_bbox[1] + last_bbox[3]) / 2
-                distance = np.sqrt((bbox_center_x - last_center_x)**2 + (bbox_center_y - last_center_y)**2)
-                
-                # Calculate IoU
-                iou = self._calculate_iou(bbox, last_bbox)
-                
-                # Score based on distance and IoU
-                if distance < self.position_tolerance_px and iou > self.iou_threshold:
-                    # Weighted score: IoU is more important than distance
-                    score = iou * 0.7 + (1.0 - min(distance / self.position_tolerance_px, 1.0)) * 0.3
-                    
-                    if score > best_score:
-                        best_score = score
-                        best_match = (track_id, player_name, confidence)
-        
-        return best_match
+                candidates.append((track_id, player_name, confidence))
+                last_bboxes.append(last_bbox[:4])
+        
+        if not candidates:
+            return None
+        
+        # PERFORMANCE: Distance and IoU against every candidate track in one step
+        distances = box_ops.center_distance_matrix([bbox[:4]], last_bboxes)[0]
+        ious = box_ops.iou_matrix([bbox[:4]], last_bboxes)[0]
+        
+        # Score based on distance and IoU
+        # Weighted score: IoU is more important than distance
+        valid = (distances < self.position_tolerance_px) & (ious > self.iou_threshold)
+        scores = ious * 0.7 + (1.0 - np.minimum(distances / self.position_tolerance_px, 1.0)) * 0.3
+        scores = np.where(valid, scores, 0.0)
+        
+        best_idx = int(np.argmax(scores))
+        if scores[best_idx] <= 0.0:
+            return None
+        return candidates[best_idx]
     
     def get_identity(self, track_id: int) -> Optional[Tuple[str, float, int]]:
         """
@@ -156,27 +152,4 @@ class IdentityTracker:
     
     def _calculate_iou(self, bbox1: List[float], bbox2: List[float]) -> float:
         """Calculate Intersection over Union (IoU) between two bboxes."""
-        x1_1, y1_1, x2_1, y2_1 = bbox1
-        x1_2, y1_2, x2_2, y2_2 = bbox2
-        
-        # Calculate intersection
-        inter_x1 = max(x1_1, x1_2)
-        inter_y1 = max(y1_1, y1_2)
-        inter_x2 = min(x2_1, x2_2)
-        inter_y2 = min(y2_1, y2_2)
-        
-        if inter_x2 <= inter_x1 or inter_y2 <= inter_y1:
-            return 0.0
-        
-        inter_area = (inter_x2 - inter_x1) * (inter_y2 - inter_y1)
-        
-        # Calculate union
-        area1 = (x2_1 - x1_1) * (y2_1 - y1_1)
-        area2 = (x2_2 - x1_2) * (y2_2 - y1_2)
-        union_area = area1 + area2 - inter_area
-        
-        if union_area <= 0:
-            return 0.0
-        
-        return inter_area / union_area
-
+        return box_ops.iou(bbox1, bbox2)
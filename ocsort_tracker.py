@@ -15,6 +15,8 @@ from collections import defaultdict, deque
 from typing import Dict, List, Tuple, Optional
 import cv2
 
+import box_ops
+
 try:
     import supervision as sv
     SUPERVISION_AVAILABLE = True
@@ -237,36 +239,12 @@ class OCSortTracker:
         iou_matrix = self._calculate_iou_matrix(boxes, active_tracks)
         
         # Hungarian algorithm (simplified greedy matching)
-        matched_tracks = {}
-        matched_det_indices = set()
-        matched_track_ids = set()
-        
-        # Greedy matching: match highest IoU pairs first
-        while True:
-            max_iou = -1
-            best_det_idx = None
-            best_track_id = None
-            
-            for det_idx in range(len(boxes)):
-                if det_idx in matched_det_indices:
-                    continue
-                
-                for track_id in active_tracks.keys():
-                    if track_id in matched_track_ids:
-                        continue
-                    
-                    iou = iou_matrix[det_idx, list(active_tracks.keys()).index(track_id)]
-                    if iou > max_iou and iou >= self.minimum_matching_threshold:
-                        max_iou = iou
-                        best_det_idx = det_idx
-                        best_track_id = track_id
-            
-            if best_det_idx is None or best_track_id is None:
-                break
-            
-            matched_tracks[best_det_idx] = best_track_id
-            matched_det_indices.add(best_det_idx)
-            matched_track_ids.add(best_track_id)
+        # Greedy matching: match highest IoU pairs first (ties: lowest detection, then oldest track)
+        track_ids = list(active_tracks.keys())
+        det_rows, track_cols = box_ops.greedy_match(iou_matrix, self.minimum_matching_threshold)
+        matched_tracks = {int(r): track_ids[c] for r, c in zip(det_rows, track_cols)}
+        matched_det_indices = set(matched_tracks.keys())
+        matched_track_ids = set(matched_tracks.values())
         
         unmatched_dets = [i for i in range(len(boxes)) if i not in matched_det_indices]
         unmatched_tracks = [tid for tid in active_tracks.keys() if tid not in matched_track_ids]
@@ -275,46 +253,24 @@ class OCSortTracker:
     
     def _calculate_iou_matrix(self, boxes, tracks):
         """Calculate IoU matrix between detections and tracks"""
-        iou_matrix = np.zeros((len(boxes), len(tracks)))
-        
         track_list = list(tracks.keys())
-        for i, box in enumerate(boxes):
-            for j, track_id in enumerate(track_list):
-                # Safety check: ensure track_id exists in self.tracks before accessing
-                # Track might have been removed between active_tracks creation and this call
-                if track_id not in self.tracks:
-                    iou_matrix[i, j] = 0.0
-                    continue
-                track_box = self.tracks[track_id]['box']
-                iou_matrix[i, j] = self._calculate_iou(box, track_box)
-        
+        if len(boxes) == 0 or len(track_list) == 0:
+            return np.zeros((len(boxes), len(track_list)))
+        
+        # Safety check: track might have been removed between active_tracks creation and this call
+        present = np.array([track_id in self.tracks for track_id in track_list], dtype=bool)
+        track_boxes = np.zeros((len(track_list), 4))
+        for j, track_id in enumerate(track_list):
+            if present[j]:
+                track_boxes[j] = self.tracks[track_id]['box'][:4]
+        
+        iou_matrix = box_ops.iou_matrix(boxes, track_boxes)
+        iou_matrix[:, ~present] = 0.0
         return iou_matrix
     
     def _calculate_iou(self, box1, box2):
         """Calculate IoU between two boxes"""
-        x1_min, y1_min, x1_max, y1_max = box1
-        x2_min, y2_min, x2_max, y2_max = box2
-        
-        # Calculate intersection
-        inter_x_min = max(x1_min, x2_min)
-        inter_y_min = max(y1_min, y2_min)
-        inter_x_max = min(x1_max, x2_max)
-        inter_y_max = min(y1_max, y2_max)
-        
-        if inter_x_max < inter_x_min or inter_y_max < inter_y_min:
-            return 0.0
-        
-        inter_area = (inter_x_max - inter_x_min) * (inter_y_max - inter_y_min)
-        
-        # Calculate union
-        box1_area = (x1_max - x1_min) * (y1_max - y1_min)
-        box2_area = (x2_max - x2_min) * (y2_max - y2_min)
-        union_area = box1_area + box2_area - inter_area
-        
-        if union_area == 0:
-            return 0.0
-        
-        return inter_area / union_area
+        return box_ops.iou(box1, box2)
     
     def _observation_centric_recovery(self, boxes, scores):
         """
@@ -337,20 +293,18 @@ class OCSortTracker:
         if len(lost_tracks) == 0 or len(boxes) == 0:
             return recovered
         
+        # PERFORMANCE: IoU of every lost track's last known position against every detection
+        lost_ids = list(lost_tracks.keys())
+        recovery_iou = box_ops.iou_matrix([lost_tracks[tid]['box'][:4] for tid in lost_ids], boxes)
+        recovery_threshold = self.minimum_matching_threshold * 0.7  # More lenient for recovery
+        
         # Try to match detections to lost tracks using observation history
-        for track_id, track in lost_tracks.items():
-            # Get track's last known position
-            last_box = track['box']
-            
-            # Find best matching detection
-            best_iou = 0
-            best_det_idx = None
-            
-            for det_idx, box in enumerate(boxes):
-                iou = self._calculate_iou(box, last_box)
-                if iou > best_iou and iou >= self.minimum_matching_threshold * 0.7:  # More lenient for recovery
-                    best_iou = iou
-                    best_det_idx = det_idx
+        for row, track_id in enumerate(lost_ids):
+            # Find best matching detection (first detection wins ties)
+            ious = recovery_iou[row]
+            best_det_idx = int(np.argmax(ious)) if len(ious) > 0 else None
+            if best_det_idx is not None and not (ious[best_det_idx] > 0 and ious[best_det_idx] >= recovery_threshold):
+                best_det_idx = None
             
             if best_det_idx is not None:
                 # Recover this track - safety check: track might have been removed
@@ -546,6 +500,11 @@ class OCSortTracker:
         tracks_to_remove = set()
         track_ids_list = list(active_tracks.keys())
         
+        # PERFORMANCE: Pairwise IoU of each track's first box in one step
+        first_boxes = detections.xyxy[[active_tracks[tid][0] for tid in track_ids_list]] if track_ids_list else np.zeros((0, 4))
+        pair_iou = box_ops.iou_matrix(first_boxes, first_boxes)
+        track_pos = {tid: k for k, tid in enumerate(track_ids_list)}
+        
         for i, tid1 in enumerate(track_ids_list):
             if tid1 in tracks_to_remove:
                 continue
@@ -554,8 +513,6 @@ class OCSortTracker:
             if len(indices1) == 0:
                 continue
             
-            box1 = detections.xyxy[indices1[0]]
-            
             for tid2 in track_ids_list[i+1:]:
                 if tid2 in tracks_to_remove:
                     continue
@@ -564,10 +521,7 @@ class OCSortTracker:
                 if len(indices2) == 0:
                     continue
                 
-                box2 = detections.xyxy[indices2[0]]
-                
-                # Calculate IoU
-                iou = self._calculate_iou(box1, box2)
+                iou = pair_iou[i, track_pos[tid2]]
                 
                 # If IoU is very high (>0.9), they're likely the same player
                 if iou > 0.9:
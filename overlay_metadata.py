@@ -2,13 +2,19 @@
 Overlay Metadata System
 Stores and manages visualization overlays separately from base video
 OPTIMIZED: Supports both JSON and pickle formats for faster serialization
+OPTIMIZED: Chunked, frame-indexed .ovl store written incrementally and read lazily
 """
 
 import json
 import pickle
 import os
+import mmap
+import struct
+import threading
+import zlib
 from typing import Dict, List, Tuple, Optional
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
+from collections.abc import MutableMapping
 import numpy as np
 import math
 
@@ -76,6 +82,337 @@ class SafeJSONEncoder(json.JSONEncoder):
             return obj
 
 
+OVERLAY_STORE_EXTENSION = '.ovl'
+_STORE_MAGIC = b'OVLSTOR1'
+_TRAILER_MAGIC = b'OVLINDEX'
+_RECORD_HEADER = struct.Struct('<4sIQ')  # record tag, frame count, payload bytes
+_TRAILER = struct.Struct('<Q8s')  # index record offset, trailer magic
+_FLAG_OVERLAY = 1
+_FLAG_ANALYTICS = 2
+_MISSING = object()
+
+
+class OverlayFrameStore:
+    """
+    Chunked, frame-indexed on-disk overlay store.
+    
+    File layout (append-only, so overlays can be written while analysis is running):
+        magic | CHNK records ... | META record | INDX record | trailer
+    
+    CHNK: frame numbers (int64), presence flags (uint8) and a zlib-compressed pickle of
+          [(overlay, analytics), ...] for up to chunk_size frames
+    META: pickled dict (video path, fps, total frames, visualization settings)
+    INDX: frame -> chunk offset table written on close. If it is missing (analysis
+          stopped or crashed) the index is rebuilt by scanning record headers.
+    
+    Readers memory-map the file and decode only the chunk holding the requested frame
+    (recent chunks are cached), so frame N is available without loading the whole match.
+    """
+    
+    def __init__(self, path: str, mode: str = 'r', chunk_size: int = 64, chunk_cache_size: int = 8,
+                 truncate_at: Optional[int] = None):
+        """
+        Args:
+            path: Store file path (.ovl)
+            mode: 'r' read-only, 'w' create/overwrite, 'a' append to an existing store
+            chunk_size: Frames per chunk record
+            chunk_cache_size: Decoded chunks kept in memory for reads
+            truncate_at: ('a' only) Roll the store back to this size first - drops the
+                         records written after a checkpoint (see flush())
+        """
+        self.path = path
+        self.mode = mode
+        self.writable = mode in ('w', 'a')
+        self.chunk_size = max(1, int(chunk_size))
+        self.chunk_cache_size = max(1, int(chunk_cache_size))
+        self.meta = {}
+        self._index = {}  # frame -> (chunk offset, position in chunk, flags)
+        self._pending = {}  # frame -> [overlay, analytics] not written yet
+        self._chunk_cache = OrderedDict()
+        self._lock = threading.RLock()
+        self._mmap = None
+        self._file = None
+        
+        if mode == 'w' or (mode == 'a' and not os.path.exists(path)):
+            self._file = open(path, 'w+b')
+            self._file.write(_STORE_MAGIC)
+        elif mode == 'a':
+            self._file = open(path, 'r+b')
+            if truncate_at is not None:
+                self._file.truncate(max(int(truncate_at), len(_STORE_MAGIC)))
+                data_end = self._scan_records(self._file_size())
+            else:
+                data_end = self._load_index()
+            # Drop the old META/INDX/trailer - they are rewritten on close
+            self._file.truncate(data_end)
+        elif mode == 'r':
+            self._file = open(path, 'rb')
+            if os.path.getsize(path) > 0:
+                self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._load_index()
+        else:
+            raise ValueError(f"Invalid overlay store mode: {mode}")
+    
+    # ------------------------------------------------------------------
+    # File access
+    # ------------------------------------------------------------------
+    
+    def _read(self, offset: int, length: int) -> bytes:
+        if self._mmap is not None:
+            return self._mmap[offset:offset + length]
+        self._file.seek(offset)
+        return self._file.read(length)
+    
+    def _file_size(self) -> int:
+        if self._mmap is not None:
+            return len(self._mmap)
+        self._file.seek(0, os.SEEK_END)
+        return self._file.tell()
+    
+    def _append_record(self, tag: bytes, count: int, *parts: bytes) -> int:
+        """Append a record at the end of the file, returning its offset"""
+        self._file.seek(0, os.SEEK_END)
+        offset = self._file.tell()
+        self._file.write(_RECORD_HEADER.pack(tag, count, sum(len(part) for part in parts)))
+        for part in parts:
+            self._file.write(part)
+        return offset
+    
+    def _load_index(self) -> int:
+        """
+        Load the frame index (from INDX, or by scanning records if it is missing).
+        
+        Returns:
+            Offset where data records end
+        """
+        size = self._file_size()
+        if size < len(_STORE_MAGIC) or self._read(0, len(_STORE_MAGIC)) != _STORE_MAGIC:
+            raise ValueError(f"Not an overlay store: {self.path}")
+        
+        if size >= len(_STORE_MAGIC) + _TRAILER.size:
+            index_offset, magic = _TRAILER.unpack(self._read(size - _TRAILER.size, _TRAILER.size))
+            if magic == _TRAILER_MAGIC and index_offset < size:
+                tag, count, length = _RECORD_HEADER.unpack(self._read(index_offset, _RECORD_HEADER.size))
+                if tag == b'INDX':
+                    payload = self._read(index_offset + _RECORD_HEADER.size, length)
+                    frames = np.frombuffer(payload, dtype=np.int64, count=count, offset=0)
+                    offsets = np.frombuffer(payload, dtype=np.int64, count=count, offset=8 * count)
+                    positions = np.frombuffer(payload, dtype=np.uint32, count=count, offset=16 * count)
+                    flags = np.frombuffer(payload, dtype=np.uint8, count=count, offset=20 * count)
+                    meta_offset = struct.unpack_from('<q', payload, 21 * count)[0]
+                    self._index = dict(zip(frames.tolist(), zip(offsets.tolist(), positions.tolist(), flags.tolist())))
+                    data_end = index_offset
+                    if meta_offset >= 0:
+                        _, _, meta_length = _RECORD_HEADER.unpack(self._read(meta_offset, _RECORD_HEADER.size))
+                        self.meta = pickle.loads(self._read(meta_offset + _RECORD_HEADER.size, meta_length))
+                        data_end = meta_offset
+                    return data_end
+        
+        return self._scan_records(size)
+    
+    def _scan_records(self, size: int) -> int:
+        """Rebuild the frame index from record headers (store that was never closed)"""
+        self._index = {}
+        position = len(_STORE_MAGIC)
+        while position + _RECORD_HEADER.size <= size:
+            tag, count, length = _RECORD_HEADER.unpack(self._read(position, _RECORD_HEADER.size))
+            end = position + _RECORD_HEADER.size + length
+            if end > size or tag not in (b'CHNK', b'META'):
+                break  # Truncated record (interrupted write) or old index
+            if tag == b'CHNK':
+                header = self._read(position + _RECORD_HEADER.size, 9 * count)
+                frames = np.frombuffer(header, dtype=np.int64, count=count)
+                flags = np.frombuffer(header, dtype=np.uint8, count=count, offset=8 * count)
+                for i, (frame, flag) in enumerate(zip(frames.tolist(), flags.tolist())):
+                    self._index[frame] = (position, i, flag)
+            else:
+                self.meta = pickle.loads(self._read(position + _RECORD_HEADER.size, length))
+            position = end
+        return position
+    
+    def _read_chunk(self, offset: int) -> List:
+        entries = self._chunk_cache.get(offset)
+        if entries is not None:
+            self._chunk_cache.move_to_end(offset)
+            return entries
+        _, count, length = _RECORD_HEADER.unpack(self._read(offset, _RECORD_HEADER.size))
+        blob_start = offset + _RECORD_HEADER.size + 9 * count
+        entries = pickle.loads(zlib.decompress(self._read(blob_start, length - 9 * count)))
+        self._chunk_cache[offset] = entries
+        if len(self._chunk_cache) > self.chunk_cache_size:
+            self._chunk_cache.popitem(last=False)
+        return entries
+    
+    # ------------------------------------------------------------------
+    # Frame access
+    # ------------------------------------------------------------------
+    
+    def get(self, frame_num: int) -> Optional[Tuple]:
+        """(overlay, analytics) for a frame, or None"""
+        with self._lock:
+            entry = self._pending.get(frame_num)
+            if entry is not None:
+                return tuple(entry)
+            location = self._index.get(frame_num)
+            if location is None:
+                return None
+            return tuple(self._read_chunk(location[0])[location[1]])
+    
+    def has(self, frame_num: int, flag: int = _FLAG_OVERLAY) -> bool:
+        """Whether a frame has an overlay (or analytics with flag=_FLAG_ANALYTICS)"""
+        with self._lock:
+            entry = self._pending.get(frame_num)
+            if entry is not None:
+                return entry[0 if flag == _FLAG_OVERLAY else 1] is not None
+            location = self._index.get(frame_num)
+            return location is not None and bool(location[2] & flag)
+    
+    def frames(self, flag: int = _FLAG_OVERLAY) -> List[int]:
+        """Sorted frame numbers that have an overlay (or analytics)"""
+        with self._lock:
+            field = 0 if flag == _FLAG_OVERLAY else 1
+            frames = {frame for frame, location in self._index.items()
+                      if location[2] & flag and frame not in self._pending}
+            frames.update(frame for frame, entry in self._pending.items() if entry[field] is not None)
+            return sorted(frames)
+    
+    def count(self, flag: int = _FLAG_OVERLAY) -> int:
+        """Number of frames with an overlay (or analytics)"""
+        with self._lock:
+            if flag == _FLAG_OVERLAY and not self._pending:
+                if all(location[2] & _FLAG_OVERLAY for location in self._index.values()):
+                    return len(self._index)
+            return len(self.frames(flag))
+    
+    def put(self, frame_num: int, overlay=_MISSING, analytics=_MISSING):
+        """Set a frame's overlay and/or analytics (buffered until the chunk is full)"""
+        if not self.writable:
+            raise IOError(f"Overlay store opened read-only: {self.path}")
+        with self._lock:
+            frame_num = int(frame_num)
+            entry = self._pending.get(frame_num)
+            if entry is None:
+                existing = self.get(frame_num)
+                # Flush before adding a new frame, so analytics set right after the
+                # frame's overlay still land in the same chunk
+                if len(self._pending) >= self.chunk_size:
+                    self._flush_pending()
+                entry = list(existing) if existing is not None else [None, None]
+                self._pending[frame_num] = entry
+            if overlay is not _MISSING:
+                entry[0] = overlay
+            if analytics is not _MISSING:
+                entry[1] = analytics
+    
+    def delete(self, frame_num: int, flag: int = _FLAG_OVERLAY):
+        """Remove a frame's overlay (or analytics)"""
+        with self._lock:
+            if self.has(frame_num, flag):
+                self.put(frame_num, **({'overlay': None} if flag == _FLAG_OVERLAY else {'analytics': None}))
+    
+    def _flush_pending(self):
+        if not self._pending:
+            return
+        frames = sorted(self._pending)
+        entries = [tuple(self._pending[frame]) for frame in frames]
+        flags = np.array([(_FLAG_OVERLAY if overlay is not None else 0) |
+                          (_FLAG_ANALYTICS if analytics is not None else 0)
+                          for overlay, analytics in entries], dtype=np.uint8)
+        blob = zlib.compress(pickle.dumps(entries, protocol=pickle.HIGHEST_PROTOCOL), 1)
+        offset = self._append_record(b'CHNK', len(frames),
+                                     np.asarray(frames, dtype=np.int64).tobytes(), flags.tobytes(), blob)
+        for i, frame in enumerate(frames):
+            if flags[i]:
+                self._index[frame] = (offset, i, int(flags[i]))
+            else:
+                self._index.pop(frame, None)
+        self._pending.clear()
+    
+    def write_meta(self):
+        """Append a META record (keeps video info readable if the store is never closed)"""
+        with self._lock:
+            if self.writable:
+                self._append_record(b'META', 0, pickle.dumps(self.meta, protocol=pickle.HIGHEST_PROTOCOL))
+    
+    def flush(self) -> int:
+        """
+        Write buffered frames to disk (checkpoint)
+        
+        Returns:
+            Store size in bytes - pass it as truncate_at to resume from this point
+        """
+        with self._lock:
+            if self.writable:
+                self._flush_pending()
+                self._file.flush()
+            return self._file_size()
+    
+    def close(self):
+        """Write META + INDX (writable stores) and release the file"""
+        with self._lock:
+            if self._file is None:
+                return
+            if self.writable:
+                self._flush_pending()
+                meta_offset = self._append_record(
+                    b'META', 0, pickle.dumps(self.meta, protocol=pickle.HIGHEST_PROTOCOL))
+                frames = sorted(self._index)
+                locations = [self._index[frame] for frame in frames]
+                index_offset = self._append_record(
+                    b'INDX', len(frames),
+                    np.asarray(frames, dtype=np.int64).tobytes(),
+                    np.asarray([loc[0] for loc in locations], dtype=np.int64).tobytes(),
+                    np.asarray([loc[1] for loc in locations], dtype=np.uint32).tobytes(),
+                    np.asarray([loc[2] for loc in locations], dtype=np.uint8).tobytes(),
+                    struct.pack('<q', meta_offset))
+                self._file.write(_TRAILER.pack(index_offset, _TRAILER_MAGIC))
+                self._file.flush()
+            if self._mmap is not None:
+                self._mmap.close()
+                self._mmap = None
+            self._file.close()
+            self._file = None
+            self._chunk_cache.clear()
+
+
+class _OverlayStoreView(MutableMapping):
+    """dict-like view (frame_num -> data) of the overlays or analytics in an OverlayFrameStore"""
+    
+    def __init__(self, store: OverlayFrameStore, flag: int):
+        self._store = store
+        self._flag = flag
+        self._field = 0 if flag == _FLAG_OVERLAY else 1
+    
+    def __getitem__(self, frame_num):
+        entry = self._store.get(frame_num)
+        if entry is None or entry[self._field] is None:
+            raise KeyError(frame_num)
+        return entry[self._field]
+    
+    def __setitem__(self, frame_num, value):
+        if self._flag == _FLAG_OVERLAY:
+            self._store.put(frame_num, overlay=value)
+        else:
+            self._store.put(frame_num, analytics=value)
+    
+    def __delitem__(self, frame_num):
+        if not self._store.has(frame_num, self._flag):
+            raise KeyError(frame_num)
+        self._store.delete(frame_num, self._flag)
+    
+    def __contains__(self, frame_num):
+        try:
+            return self._store.has(frame_num, self._flag)
+        except TypeError:
+            return False
+    
+    def __iter__(self):
+        return iter(self._store.frames(self._flag))
+    
+    def __len__(self):
+        return self._store.count(self._flag)
+
+
 class OverlayMetadata:
     """Manages overlay metadata for video analysis."""
     
@@ -94,6 +431,7 @@ class OverlayMetadata:
         self.overlays = {}  # frame_num -> overlay data
         self.visualization_settings = {}
         self.analytics_data = {}  # frame_num -> {player_id: analytics}
+        self._store = None  # OverlayFrameStore backing overlays/analytics_data (chunked .ovl)
         
     def add_frame_overlay(self, frame_num: int, players: List[Dict], ball: Optional[Dict] = None,
                           analytics: Optional[Dict] = None, predicted_boxes: Optional[List[Dict]] = None,
@@ -127,6 +465,86 @@ class OverlayMetadata:
         """Set visualization settings."""
         self.visualization_settings = settings
     
+    def _attach_store(self, store: OverlayFrameStore):
+        """Serve overlays/analytics_data from a chunked store (dict-like views)"""
+        self._store = store
+        self.overlays = _OverlayStoreView(store, _FLAG_OVERLAY)
+        self.analytics_data = _OverlayStoreView(store, _FLAG_ANALYTICS)
+    
+    def _store_meta(self) -> Dict:
+        return {
+            "video_path": self.video_path,
+            "fps": self.fps,
+            "total_frames": self.total_frames,
+            "visualization_settings": self.visualization_settings
+        }
+    
+    def enable_incremental_save(self, store_path: str, chunk_size: int = 64, resume: bool = False,
+                                resume_offset: Optional[int] = None) -> str:
+        """
+        Write overlays to a chunked .ovl store as they are added instead of keeping every
+        frame in memory until save().
+        
+        Args:
+            store_path: Output path (extension is replaced with .ovl)
+            chunk_size: Frames per chunk record
+            resume: Append to an existing store instead of overwriting it
+            resume_offset: Store size returned by flush() at a checkpoint; frames written
+                           after it are dropped before appending
+            
+        Returns:
+            Path of the store file
+        """
+        store_path = os.path.splitext(store_path)[0] + OVERLAY_STORE_EXTENSION
+        store = OverlayFrameStore(store_path, mode='a' if resume else 'w', chunk_size=chunk_size,
+                                  truncate_at=resume_offset if resume else None)
+        for frame_num, overlay in self.overlays.items():
+            store.put(frame_num, overlay=overlay)
+        for frame_num, analytics in self.analytics_data.items():
+            store.put(frame_num, analytics=analytics)
+        store.meta = self._store_meta()
+        store.write_meta()
+        self._attach_store(store)
+        return store_path
+    
+    def flush(self) -> Optional[int]:
+        """
+        Write buffered overlay frames to the incremental store (no-op without one)
+        
+        Returns:
+            Store size in bytes (resume offset), or None without an incremental store
+        """
+        if self._store is not None and self._store.writable:
+            self._store.meta = self._store_meta()
+            self._store.write_meta()
+            return self._store.flush()
+        return None
+    
+    def close(self):
+        """Release the backing store file (finalizes incremental stores)"""
+        if self._store is not None:
+            if self._store.writable:
+                self._store.meta = self._store_meta()
+            self._store.close()
+    
+    def _save_store(self, store_path: str) -> str:
+        """Save everything to a chunked .ovl store"""
+        if self._store is not None and self._store.writable:
+            # Incremental store: flush the last chunk and write the index
+            store_path = self._store.path
+            self.close()
+            self._attach_store(OverlayFrameStore(store_path, mode='r'))
+            return store_path
+        
+        store = OverlayFrameStore(store_path, mode='w')
+        for frame_num, overlay in self.overlays.items():
+            store.put(frame_num, overlay=overlay)
+        for frame_num, analytics in self.analytics_data.items():
+            store.put(frame_num, analytics=analytics)
+        store.meta = self._store_meta()
+        store.close()
+        return store_path
+    
     def save(self, output_path: str, use_pickle: bool = True):
         """
         Save overlay metadata to file (pickle or JSON).
@@ -134,10 +552,16 @@ class OverlayMetadata:
         OPTIMIZATION: Pickle is faster for large metadata files (3-5x faster).
         JSON is more portable and human-readable but slower for large files.
         
+        OPTIMIZATION: With enable_incremental_save() (or an .ovl output_path) the chunked
+        store is finalized instead - frames were already written during analysis.
+        
         Args:
             output_path: Path to save file
             use_pickle: If True, use pickle format (.pkl), else use JSON (.json)
         """
+        if (self._store is not None and self._store.writable) or output_path.endswith(OVERLAY_STORE_EXTENSION):
+            return self._save_store(output_path)
+        
         # Determine format from extension or use_pickle flag
         if use_pickle or output_path.endswith('.pkl'):
             pickle_path = output_path.replace('.json', '.pkl') if output_path.endswith('.json') else output_path
@@ -148,8 +572,8 @@ class OverlayMetadata:
                     "video_path": self.video_path,
                     "fps": self.fps,
                     "total_frames": self.total_frames,
-                    "overlays": self.overlays,  # Keep as dict, pickle handles it natively
-                    "analytics": self.analytics_data,
+                    "overlays": dict(self.overlays),  # Keep as dict, pickle handles it natively
+                    "analytics": dict(self.analytics_data),
                     "visualization_settings": self.visualization_settings
                 }
                 with open(pickle_path, 'wb') as f:
@@ -199,16 +623,26 @@ class OverlayMetadata:
     @staticmethod
     def load(metadata_path: str) -> 'OverlayMetadata':
         """
-        Load overlay metadata from file (pickle or JSON).
+        Load overlay metadata from file (chunked store, pickle or JSON).
         
         OPTIMIZATION: Automatically detects format and uses pickle if available (3-5x faster).
+        OPTIMIZATION: A chunked .ovl store next to the path is opened lazily - frames are
+        decoded on access, so the first frame renders without loading the whole match.
         
         Args:
-            metadata_path: Path to metadata file (.pkl or .json)
+            metadata_path: Path to metadata file (.ovl, .pkl or .json)
             
         Returns:
             OverlayMetadata instance
         """
+        # Try chunked store first (lazy, memory-mapped)
+        store_path = os.path.splitext(metadata_path)[0] + OVERLAY_STORE_EXTENSION
+        if os.path.exists(store_path):
+            try:
+                return OverlayMetadata.open_store(store_path)
+            except Exception as e:
+                print(f"⚠ Overlay store load failed: {e}. Trying pickle...")
+        
         # Try pickle first (faster)
         pickle_path = metadata_path.replace('.json', '.pkl') if metadata_path.endswith('.json') else metadata_path
         if not pickle_path.endswith('.pkl'):
@@ -256,6 +690,28 @@ class OverlayMetadata:
         metadata.visualization_settings = data.get('visualization_settings', {})
         
         return metadata
+    
+    @staticmethod
+    def open_store(store_path: str) -> 'OverlayMetadata':
+        """
+        Open a chunked .ovl store read-only (frames are loaded on access).
+        
+        Args:
+            store_path: Path to .ovl file
+            
+        Returns:
+            OverlayMetadata instance backed by the store
+        """
+        store = OverlayFrameStore(store_path, mode='r')
+        meta = store.meta
+        metadata = OverlayMetadata(
+            meta.get('video_path', ''),
+            meta.get('fps', 30.0),
+            meta.get('total_frames', 0)
+        )
+        metadata.visualization_settings = meta.get('visualization_settings', {})
+        metadata._attach_store(store)
+        return metadata
 
 
 def create_player_overlay_data(track_id: int, bbox: Tuple[float, float, float, float],
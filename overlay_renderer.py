@@ -7,9 +7,119 @@ import cv2
 import numpy as np
 import time
 import math
+from collections import deque
 from typing import Dict, List, Tuple, Optional
 from overlay_metadata import OverlayMetadata
 from hd_overlay_renderer import HDOverlayRenderer
+from perf_instrumentation import get_instrumentation
+
+
+class HeatMapAccumulator:
+    """
+    Sliding-window player density grid for the heat map overlay.
+    
+    Sequential frames add the newest frame's player positions and subtract the
+    frame leaving the window, so the per-frame cost does not depend on the window
+    length. A backward seek or a long jump rebuilds the window once from metadata.
+    The grid is low resolution (cell_size source pixels per cell); it is blurred
+    once per frame and upsampled by HDOverlayRenderer.draw_heat_map.
+    """
+    
+    def __init__(self, window_frames: int = 300, cell_size: int = 8, blur_radius: float = 30.0):
+        """
+        Args:
+            window_frames: Number of previous frames included (plus the current one)
+            cell_size: Grid cell size in source video pixels
+            blur_radius: Gaussian blur radius in source video pixels
+        """
+        self.window_frames = window_frames
+        self.cell_size = max(1, int(cell_size))
+        self.blur_radius = blur_radius
+        self.grid_shape: Optional[Tuple[int, int]] = None
+        self.counts: Optional[np.ndarray] = None
+        self._window = deque()  # (frame_num, flat cell indices)
+        self._last_frame: Optional[int] = None
+        self._density: Optional[np.ndarray] = None  # Cached blurred/normalized grid for _last_frame
+    
+    def reset(self, grid_shape: Optional[Tuple[int, int]] = None):
+        self.grid_shape = grid_shape
+        self.counts = np.zeros(grid_shape[0] * grid_shape[1], dtype=np.int32) if grid_shape else None
+        self._window.clear()
+        self._last_frame = None
+        self._density = None
+    
+    def _cells(self, frame_data: Optional[Dict]) -> np.ndarray:
+        """Flat grid indices of the player centers in one frame's overlay data"""
+        if not frame_data or not frame_data.get("players"):
+            return np.empty(0, dtype=np.intp)
+        centers = [p.get("center") for p in frame_data["players"] if p.get("center")]
+        if not centers:
+            return np.empty(0, dtype=np.intp)
+        pts = np.asarray([(c[0], c[1]) for c in centers], dtype=np.float64)
+        grid_h, grid_w = self.grid_shape
+        # int() truncation like the old per-position list
+        gx = np.trunc(pts[:, 0]).astype(np.int64) // self.cell_size
+        gy = np.trunc(pts[:, 1]).astype(np.int64) // self.cell_size
+        valid = (gx >= 0) & (gx < grid_w) & (gy >= 0) & (gy < grid_h)
+        return (gy[valid] * grid_w + gx[valid]).astype(np.intp)
+    
+    def _add(self, frame_num: int, cells: np.ndarray):
+        self._window.append((frame_num, cells))
+        if cells.size:
+            np.add.at(self.counts, cells, 1)
+    
+    def _evict_before(self, first_frame: int):
+        while self._window and self._window[0][0] < first_frame:
+            _, cells = self._window.popleft()
+            if cells.size:
+                np.subtract.at(self.counts, cells, 1)
+    
+    def update(self, metadata: OverlayMetadata, frame_num: int, frame_data: Optional[Dict],
+               source_size: Tuple[int, int]):
+        """
+        Advance the window to frame_num.
+        
+        Args:
+            metadata: Overlay metadata (only read when the window must be rebuilt)
+            frame_num: Frame being rendered
+            frame_data: Overlay data for frame_num
+            source_size: (width, height) of the source video in pixels
+        """
+        grid_shape = (int(math.ceil(source_size[1] / self.cell_size)),
+                      int(math.ceil(source_size[0] / self.cell_size)))
+        if grid_shape != self.grid_shape:
+            self.reset(grid_shape)
+        if frame_num == self._last_frame:
+            return
+        
+        first_frame = max(0, frame_num - self.window_frames)
+        if self._last_frame is not None and 0 < frame_num - self._last_frame <= self.window_frames:
+            # Forward step (usually exactly one frame; skipped frames are read from metadata)
+            self._evict_before(first_frame)
+            for i in range(max(first_frame, self._last_frame + 1), frame_num):
+                self._add(i, self._cells(metadata.overlays.get(i)))
+            self._add(frame_num, self._cells(frame_data))
+        else:
+            # Seek or first frame: rebuild the window from metadata
+            self.reset(grid_shape)
+            for i in range(first_frame, frame_num):
+                self._add(i, self._cells(metadata.overlays.get(i)))
+            self._add(frame_num, self._cells(frame_data))
+        self._last_frame = frame_num
+        self._density = None
+    
+    def density(self) -> Optional[np.ndarray]:
+        """Blurred density grid normalized to 0..1 (None when the window is empty)"""
+        if self._density is None and self.counts is not None:
+            peak_count = self.counts.max() if self.counts.size else 0
+            if peak_count <= 0:
+                return None
+            grid = self.counts.reshape(self.grid_shape).astype(np.float32)
+            sigma = max(0.5, self.blur_radius / self.cell_size / 2.0)
+            grid = cv2.GaussianBlur(grid, (0, 0), sigmaX=sigma, sigmaY=sigma, borderType=cv2.BORDER_CONSTANT)
+            peak = float(grid.max())
+            self._density = grid / peak if peak > 0 else None
+        return self._density
 
 
 class OverlayRenderer:
@@ -87,6 +197,7 @@ class OverlayRenderer:
         self.advanced_viz_style = self.settings.get("advanced_viz_style", "none")
         self.profiling_enabled = enable_profiling
         self._reset_profile()
+        self._heat_map = HeatMapAccumulator(window_frames=300, cell_size=8, blur_radius=30)
 
     def _reset_profile(self):
         if not self.profiling_enabled:
@@ -102,6 +213,8 @@ class OverlayRenderer:
         }
 
     def _profile_step(self, key: str, duration: float):
+        # Sub-steps also report to the run-wide instrumentation (e.g. "overlay.players")
+        get_instrumentation().record(f"overlay.{key[:-5] if key.endswith('_time') else key}", duration)
         if not self.profiling_enabled:
             return
         if key not in self.last_profile:
@@ -1263,24 +1376,20 @@ class OverlayRenderer:
         if not self.use_hd or not self.hd_renderer:
             return
         
-        # Collect player positions from recent frames (last 300 frames = ~10 seconds at 30fps)
-        positions = []
-        lookback_frames = min(300, frame_num)
-        
-        for i in range(max(0, frame_num - lookback_frames), frame_num + 1):
-            frame_data = self.metadata.get_frame_data(i)
-            if frame_data and "players" in frame_data:
-                for player in frame_data["players"]:
-                    center = player.get("center")
-                    if center:
-                        positions.append((int(center[0]), int(center[1])))
+        # PERFORMANCE: Rolling density grid over the last 300 frames (~10 seconds at 30fps),
+        # updated incrementally instead of re-walking the window's metadata every frame
+        h, w = frame.shape[:2]
+        scale = self.hd_renderer.effective_scale or 1.0
+        source_size = (int(round(w / scale)), int(round(h / scale)))
+        self._heat_map.update(self.metadata, frame_num, overlay_data, source_size)
+        density = self._heat_map.density()
         
-        if len(positions) > 0:
+        if density is not None:
             heat_map_alpha = self.settings.get("heat_map_alpha", 0.4)
             heat_map_color_scheme = self.settings.get("heat_map_color_scheme", "hot")
             self.hd_renderer.draw_heat_map(
-                frame, positions, color_scheme=heat_map_color_scheme,
-                alpha=heat_map_alpha, blur_radius=30
+                frame, density, color_scheme=heat_map_color_scheme,
+                alpha=heat_map_alpha
             )
     
     def _render_yolo_boxes(self, frame: np.ndarray, raw_yolo_detections: Dict):
@@ -0,0 +1,336 @@
+"""
+Performance Instrumentation
+One place to see where an analysis run's time (and memory) went
+
+    from perf_instrumentation import get_instrumentation
+    perf = get_instrumentation()
+
+    with perf.span("yolo", frame=frame_num):
+        results = model(batch)
+    perf.count("detections", len(detections))
+    perf.gauge("pipeline_queue_depth", queue.qsize())
+    perf.sample_memory()                       # rss_mb (+ gpu_allocated_mb when torch is loaded)
+
+    perf.export_summary("run_perf_summary.json")      # per-stage count / total / mean / p50 / p95 / max
+    perf.export_chrome_trace("run_perf_trace.json")   # open in chrome://tracing or ui.perfetto.dev
+
+Instrumentation is disabled by default: span() then returns a shared no-op context
+manager and count()/gauge()/record() return after a single attribute check, so the
+calls can stay in the hot loop permanently. Enable it per run with start_run().
+
+Spans may be opened from any thread (the decoder thread of FramePipeline, the
+preprocessing pool, the DetectionStage worker, ...); each trace event carries its thread id.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from array import array
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+try:
+    import psutil  # type: ignore
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+# Chrome trace events kept per run (~100 bytes each); later events are counted but dropped
+DEFAULT_MAX_TRACE_EVENTS = 500_000
+
+
+class _NullSpan:
+    """No-op span returned while instrumentation is disabled"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ('_inst', '_name', '_args', '_start')
+
+    def __init__(self, inst: 'Instrumentation', name: str, args: Optional[Dict[str, Any]]):
+        self._inst = inst
+        self._name = name
+        self._args = args
+        self._start = 0.0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        self._inst._add(self._name, self._start, end - self._start, self._args)
+        return False
+
+
+class _StageStats:
+    """Durations of one stage (seconds); kept raw so percentiles are exact"""
+    __slots__ = ('durations', 'total')
+
+    def __init__(self):
+        self.durations = array('d')
+        self.total = 0.0
+
+    def add(self, duration: float):
+        self.durations.append(duration)
+        self.total += duration
+
+    def summary(self) -> Dict[str, float]:
+        values = np.frombuffer(self.durations, dtype=np.float64) if len(self.durations) else np.zeros(1)
+        p50, p95 = np.percentile(values, [50, 95])
+        count = len(self.durations)
+        return {
+            'count': count,
+            'total_s': self.total,
+            'mean_ms': (self.total / count * 1000.0) if count else 0.0,
+            'p50_ms': float(p50) * 1000.0,
+            'p95_ms': float(p95) * 1000.0,
+            'max_ms': float(values.max()) * 1000.0,
+        }
+
+
+class Instrumentation:
+    """
+    Spans, counters and gauges for one analysis run
+
+    Args:
+        enabled: Record anything at all (False = near-zero overhead no-ops)
+        trace: Keep individual events for the Chrome trace (aggregates are always kept)
+        max_trace_events: Cap on stored trace events
+    """
+
+    def __init__(self, enabled: bool = False, trace: bool = True,
+                 max_trace_events: int = DEFAULT_MAX_TRACE_EVENTS):
+        self.enabled = enabled
+        self.trace = trace
+        self.max_trace_events = max_trace_events
+        self._lock = threading.Lock()
+        self.reset()
+
+    # ------------------------------------------------------------------
+    # Run lifecycle
+    # ------------------------------------------------------------------
+
+    def reset(self):
+        """Drop everything recorded so far"""
+        with self._lock:
+            self._stages: Dict[str, _StageStats] = {}
+            self._counters: Dict[str, float] = {}
+            self._gauges: Dict[str, Dict[str, float]] = {}
+            self._events: List[tuple] = []
+            self._dropped_events = 0
+            self._thread_names: Dict[int, str] = {}
+            self._origin = time.perf_counter()
+            self._started_at = time.time()
+            self._metadata: Dict[str, Any] = {}
+
+    def start_run(self, enabled: bool = True, trace: bool = True, **metadata):
+        """Reset and (en/dis)able for a new run; metadata is copied into the summary"""
+        self.reset()
+        self.enabled = enabled
+        self.trace = trace
+        self._metadata.update(metadata)
+
+    # ------------------------------------------------------------------
+    # Recording
+    # ------------------------------------------------------------------
+
+    def span(self, name: str, **args):
+        """Context manager timing the enclosed block as stage `name`"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, args or None)
+
+    def record(self, name: str, duration: float, start: Optional[float] = None, **args):
+        """Add an already measured duration (seconds); start is a perf_counter() value"""
+        if not self.enabled:
+            return
+        if start is None:
+            start = time.perf_counter() - duration
+        self._add(name, start, duration, args or None)
+
+    def count(self, name: str, value: float = 1):
+        """Increment counter `name`"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def gauge(self, name: str, value: float):
+        """Record the current value of `name` (last / min / max / mean kept, plus a trace sample)"""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        value = float(value)
+        with self._lock:
+            g = self._gauges.get(name)
+            if g is None:
+                self._gauges[name] = {'last': value, 'min': value, 'max': value, 'sum': value, 'samples': 1}
+            else:
+                g['last'] = value
+                g['sum'] += value
+                g['samples'] += 1
+                if value < g['min']:
+                    g['min'] = value
+                if value > g['max']:
+                    g['max'] = value
+            self._append_event(('C', name, now, value, threading.get_ident()))
+
+    def sample_memory(self):
+        """Gauge process RSS (MB) and, if torch is already imported and CUDA is up, GPU memory"""
+        if not self.enabled:
+            return
+        rss_mb = _rss_mb()
+        if rss_mb is not None:
+            self.gauge('rss_mb', rss_mb)
+        torch = sys.modules.get('torch')
+        if torch is not None:
+            try:
+                if torch.cuda.is_available():
+                    self.gauge('gpu_allocated_mb', torch.cuda.memory_allocated() / (1024 ** 2))
+                    self.gauge('gpu_reserved_mb', torch.cuda.memory_reserved() / (1024 ** 2))
+            except Exception:
+                pass
+
+    @contextmanager
+    def suspended(self):
+        """Temporarily disable recording (e.g. around warm-up work)"""
+        previous = self.enabled
+        self.enabled = False
+        try:
+            yield
+        finally:
+            self.enabled = previous
+
+    def _add(self, name: str, start: float, duration: float, args: Optional[Dict[str, Any]]):
+        tid = threading.get_ident()
+        with self._lock:
+            stats = self._stages.get(name)
+            if stats is None:
+                stats = self._stages[name] = _StageStats()
+            stats.add(duration)
+            if tid not in self._thread_names:
+                self._thread_names[tid] = threading.current_thread().name
+            self._append_event(('X', name, start, duration, tid, args))
+
+    def _append_event(self, event: tuple):
+        # Caller holds the lock
+        if not self.trace:
+            return
+        if len(self._events) >= self.max_trace_events:
+            self._dropped_events += 1
+            return
+        self._events.append(event)
+
+    # ------------------------------------------------------------------
+    # Reporting
+    # ------------------------------------------------------------------
+
+    def summary(self) -> Dict[str, Any]:
+        """Per-stage aggregates, counters and gauges as a JSON-serializable dict"""
+        with self._lock:
+            wall = time.perf_counter() - self._origin
+            stages = {name: stats.summary() for name, stats in self._stages.items()}
+            counters = dict(self._counters)
+            gauges = {name: {'last': g['last'], 'min': g['min'], 'max': g['max'],
+                             'mean': g['sum'] / g['samples'], 'samples': int(g['samples'])}
+                      for name, g in self._gauges.items()}
+            dropped = self._dropped_events
+            metadata = dict(self._metadata)
+        for stats in stages.values():
+            stats['share_of_wall'] = stats['total_s'] / wall if wall > 0 else 0.0
+        stages = dict(sorted(stages.items(), key=lambda kv: kv[1]['total_s'], reverse=True))
+        return {
+            'started_at': self._started_at,
+            'wall_time_s': wall,
+            'metadata': metadata,
+            'stages': stages,
+            'counters': counters,
+            'gauges': gauges,
+            'dropped_trace_events': dropped,
+        }
+
+    def export_summary(self, path: str) -> Dict[str, Any]:
+        """Write summary() as JSON; returns the summary"""
+        summary = self.summary()
+        with open(path, 'w') as f:
+            json.dump(summary, f, indent=2, default=str)
+        return summary
+
+    def export_chrome_trace(self, path: str):
+        """Write recorded spans and gauge samples in Chrome trace-event format"""
+        pid = os.getpid()
+        with self._lock:
+            events = list(self._events)
+            thread_names = dict(self._thread_names)
+            origin = self._origin
+        trace_events = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}}
+                        for tid, name in thread_names.items()]
+        for event in events:
+            if event[0] == 'X':
+                _, name, start, duration, tid, args = event
+                entry = {'name': name, 'ph': 'X', 'pid': pid, 'tid': tid,
+                         'ts': (start - origin) * 1e6, 'dur': duration * 1e6}
+                if args:
+                    entry['args'] = args
+            else:
+                _, name, ts, value, tid = event
+                entry = {'name': name, 'ph': 'C', 'pid': pid, 'tid': tid,
+                         'ts': (ts - origin) * 1e6, 'args': {name: value}}
+            trace_events.append(entry)
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': trace_events, 'displayTimeUnit': 'ms'}, f, default=str)
+
+    def export(self, output_base: str) -> Dict[str, str]:
+        """Write <output_base>_perf_summary.json and <output_base>_perf_trace.json"""
+        paths = {'summary': f"{output_base}_perf_summary.json"}
+        self.export_summary(paths['summary'])
+        if self.trace:
+            paths['trace'] = f"{output_base}_perf_trace.json"
+            self.export_chrome_trace(paths['trace'])
+        return paths
+
+    def print_summary(self, top: int = 15):
+        """Short stage table on stdout"""
+        summary = self.summary()
+        print(f"⏱ Stage timings ({summary['wall_time_s']:.1f}s wall):")
+        for name, s in list(summary['stages'].items())[:top]:
+            print(f"   {name:<24} {s['total_s']:8.1f}s {100 * s['share_of_wall']:5.1f}%  "
+                  f"n={s['count']:<8} mean={s['mean_ms']:.2f}ms p95={s['p95_ms']:.2f}ms")
+        for name, g in summary['gauges'].items():
+            print(f"   {name:<24} last={g['last']:.1f} max={g['max']:.1f}")
+
+
+def _rss_mb() -> Optional[float]:
+    """Resident set size of this process in MB (None if it cannot be determined)"""
+    if PSUTIL_AVAILABLE:
+        try:
+            return psutil.Process().memory_info().rss / (1024 ** 2)
+        except Exception:
+            pass
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 ** 2)
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+_instrumentation = Instrumentation(enabled=False)
+
+
+def get_instrumentation() -> Instrumentation:
+    """Process-wide instrumentation instance shared by all pipeline stages"""
+    return _instrumentation
@@ -45,6 +45,13 @@ except ImportError:
     JSON_UTILS_AVAILABLE = False
     logger.warning("JSON utilities not available - using standard JSON operations")
 
+# Binary columnar gallery store (SQLite metadata + memory-mapped embeddings)
+try:
+    from gallery_store import GalleryStore, store_path_for
+    GALLERY_STORE_AVAILABLE = True
+except ImportError:
+    GALLERY_STORE_AVAILABLE = False
+
 
 @dataclass
 class PlayerProfile:
@@ -211,6 +218,207 @@ class PlayerProfile:
         return cls(**data)
 
 
+class GalleryMatchIndex:
+    """
+    Packed, read-only view of the gallery used for vectorized matching.
+    
+    Holds one contiguous, L2-normalized float32 matrix per feature kind
+    (general, body, jersey, foot) plus the per-player metadata that
+    match_player filters and boosts on (names, teams, jersey numbers,
+    dominant colors, uniform variants). A whole frame of detections can then
+    be scored against every player with one matrix multiply per feature kind.
+    
+    PlayerGallery rebuilds the index lazily after the gallery is modified
+    (add_player, update_player, merge_player, save_gallery, ...).
+    """
+    
+    FEATURE_KINDS = ('features', 'body_features', 'jersey_features', 'foot_features')
+    
+    def __init__(self, players: Dict[str, PlayerProfile]):
+        self.player_ids: List[str] = list(players.keys())
+        self.profiles: List[PlayerProfile] = list(players.values())
+        self.names: List[str] = [profile.name for profile in self.profiles]
+        self.size = len(self.profiles)
+        
+        # Feature matrices: kind -> {dim: (player_rows, (rows, dim) float32 matrix)}
+        # Rows are grouped by embedding dimension so a profile with an unexpected
+        # dimension never breaks (or silently corrupts) scoring of the others.
+        self.present: Dict[str, np.ndarray] = {}
+        self.blocks: Dict[str, Dict[int, Tuple[np.ndarray, np.ndarray]]] = {}
+        for kind in self.FEATURE_KINDS:
+            present = np.zeros(self.size, dtype=bool)
+            rows_by_dim: Dict[int, List[Tuple[int, np.ndarray]]] = {}
+            for idx, profile in enumerate(self.profiles):
+                value = getattr(profile, kind, None)
+                if value is None:
+                    continue
+                present[idx] = True
+                vector = self.normalize(value)
+                if vector is not None:
+                    rows_by_dim.setdefault(vector.size, []).append((idx, vector))
+            self.present[kind] = present
+            self.blocks[kind] = {
+                dim: (np.array([idx for idx, _ in rows], dtype=np.intp),
+                      np.ascontiguousarray(np.stack([vec for _, vec in rows]), dtype=np.float32))
+                for dim, rows in rows_by_dim.items()
+            }
+        
+        # Players are only considered if they have general, body or jersey features
+        # (foot features alone are not enough to identify a player)
+        self.eligible = self.present['features'] | self.present['body_features'] | self.present['jersey_features']
+        
+        # Team (roster) metadata: integer codes so team masks are a single comparison
+        self.team_codes = np.full(self.size, -1, dtype=np.int64)
+        self._team_to_code: Dict[Any, int] = {}
+        for idx, profile in enumerate(self.profiles):
+            if profile.team is not None:
+                self.team_codes[idx] = self._team_to_code.setdefault(profile.team, len(self._team_to_code))
+        self.has_team = self.team_codes >= 0
+        
+        # Dominant colors (HSV) for the color boost
+        self.colors = np.zeros((self.size, 3), dtype=np.float64)
+        self.has_color = np.zeros(self.size, dtype=bool)
+        for idx, profile in enumerate(self.profiles):
+            if profile.dominant_color is None:
+                continue
+            try:
+                color = np.asarray(profile.dominant_color, dtype=np.float64).flatten()
+            except (TypeError, ValueError):
+                continue
+            if color.size >= 3:
+                self.colors[idx] = color[:3]
+                self.has_color[idx] = True
+        
+        self._jersey_strings = [str(profile.jersey_number).strip() if profile.jersey_number is not None else None
+                                for profile in self.profiles]
+        self._uniform_keys = [set(profile.uniform_variants.keys()) if profile.uniform_variants is not None else None
+                              for profile in self.profiles]
+        
+        # Memoized per-query masks (queries repeat every frame)
+        self._name_mask_cache: Dict[Tuple[str, frozenset], np.ndarray] = {}
+        self._jersey_boost_cache: Dict[str, np.ndarray] = {}
+        self._uniform_boost_cache: Dict[Tuple[str, str], np.ndarray] = {}
+        self._early_tag_cache: Dict[Tuple[int, int], np.ndarray] = {}
+    
+    @staticmethod
+    def normalize(value) -> Optional[np.ndarray]:
+        """Flatten and L2-normalize an embedding, or None if it is unusable."""
+        try:
+            vector = np.asarray(value, dtype=np.float64).flatten()
+        except (TypeError, ValueError):
+            return None
+        if vector.size == 0:
+            return None
+        norm = np.linalg.norm(vector)
+        if not norm > 1e-8:  # Also rejects NaN norms
+            return None
+        return vector / norm
+    
+    @staticmethod
+    def pack_queries(vectors: List[Optional[np.ndarray]]) -> Dict[int, Tuple[np.ndarray, np.ndarray]]:
+        """Pack normalized query vectors into {dim: (query_rows, (rows, dim) float32 matrix)}."""
+        rows_by_dim: Dict[int, List[int]] = {}
+        for row, vector in enumerate(vectors):
+            if vector is not None:
+                rows_by_dim.setdefault(vector.size, []).append(row)
+        return {
+            dim: (np.array(rows, dtype=np.intp),
+                  np.ascontiguousarray(np.stack([vectors[row] for row in rows]), dtype=np.float32))
+            for dim, rows in rows_by_dim.items()
+        }
+    
+    def score(self, kind: str, queries: Dict[int, Tuple[np.ndarray, np.ndarray]], num_queries: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Cosine similarity of every query against every player for one feature kind.
+        
+        Returns:
+            (similarities, valid) arrays of shape (num_queries, num_players)
+        """
+        similarities = np.zeros((num_queries, self.size), dtype=np.float64)
+        valid = np.zeros((num_queries, self.size), dtype=bool)
+        for dim, (query_rows, query_matrix) in queries.items():
+            block = self.blocks[kind].get(dim)
+            if block is None:
+                continue
+            player_rows, player_matrix = block
+            block_sims = query_matrix @ player_matrix.T
+            similarities[np.ix_(query_rows, player_rows)] = block_sims
+            valid[np.ix_(query_rows, player_rows)] = np.isfinite(block_sims)
+        return similarities, valid
+    
+    def team_mismatch(self, team: Optional[str]) -> np.ndarray:
+        """Mask of players whose known team differs from the detection's team."""
+        if team is None:
+            return np.zeros(self.size, dtype=bool)
+        return self.has_team & (self.team_codes != self._team_to_code.get(team, -2))
+    
+    def name_mask(self, kind: str, names: set) -> np.ndarray:
+        """Mask of players whose name is in the given set (memoized per set)."""
+        key = (kind, frozenset(names))
+        mask = self._name_mask_cache.get(key)
+        if mask is None:
+            mask = np.fromiter((name in names for name in self.names), dtype=bool, count=self.size)
+            self._name_mask_cache[key] = mask
+        return mask
+    
+    def jersey_boosts(self, jersey_number) -> np.ndarray:
+        """Per-player jersey number boost: 15% for exact match, 5% for leading-zero variants."""
+        search_jersey = str(jersey_number).strip()
+        boosts = self._jersey_boost_cache.get(search_jersey)
+        if boosts is None:
+            boosts = np.zeros(self.size, dtype=np.float64)
+            for idx, profile_jersey in enumerate(self._jersey_strings):
+                if profile_jersey is None:
+                    continue
+                if profile_jersey == search_jersey:
+                    boosts[idx] = 0.15
+                elif profile_jersey and search_jersey:
+                    if profile_jersey.replace("0", "") == search_jersey.replace("0", ""):
+                        boosts[idx] = 0.05
+            self._jersey_boost_cache[search_jersey] = boosts
+        return boosts
+    
+    def uniform_boosts(self, uniform_info: Dict) -> np.ndarray:
+        """Per-player uniform boost: 10% for same uniform variant, 5% for same jersey color."""
+        det_jersey = str(uniform_info.get('jersey_color') or 'unknown').lower()
+        det_shorts = str(uniform_info.get('shorts_color') or 'unknown').lower()
+        det_socks = str(uniform_info.get('socks_color') or 'unknown').lower()
+        det_uniform_key = f"{det_jersey}-{det_shorts}-{det_socks}"
+        cache_key = (det_uniform_key, det_jersey)
+        boosts = self._uniform_boost_cache.get(cache_key)
+        if boosts is None:
+            boosts = np.zeros(self.size, dtype=np.float64)
+            for idx, variant_keys in enumerate(self._uniform_keys):
+                if variant_keys is None:
+                    continue
+                if det_uniform_key in variant_keys:
+                    boosts[idx] = 0.10
+                elif det_jersey != 'unknown':
+                    for variant_key in variant_keys:
+                        variant_jersey = variant_key.split('-')[0] if '-' in variant_key else variant_key
+                        if variant_jersey == det_jersey:
+                            boosts[idx] = 0.05
+                            break
+            self._uniform_boost_cache[cache_key] = boosts
+        return boosts
+    
+    def early_frame_tags(self, early_frame_range: tuple) -> np.ndarray:
+        """Mask of players with at least one reference frame inside early_frame_range."""
+        early_frame_min, early_frame_max = early_frame_range
+        key = (early_frame_min, early_frame_max)
+        tags = self._early_tag_cache.get(key)
+        if tags is None:
+            tags = np.zeros(self.size, dtype=bool)
+            for idx, profile in enumerate(self.profiles):
+                for ref_frame in profile.reference_frames or []:
+                    frame_num = ref_frame.get('frame_num', None)
+                    if frame_num is not None and early_frame_min <= frame_num <= early_frame_max:
+                        tags[idx] = True
+                        break
+            self._early_tag_cache[key] = tags
+        return tags
+
+
 class PlayerGallery:
     """
     Manages a persistent gallery of known players.
@@ -219,14 +427,35 @@ class PlayerGallery:
     allowing for cross-video identification and consistent naming.
     """
     
-    def __init__(self, gallery_path: str = "player_gallery.json"):
+    def __init__(self, gallery_path: str = "player_gallery.json", use_binary_store: Optional[bool] = None,
+                 read_only: bool = False, mirror_json: bool = False):
         """
         Initialize Player Gallery
         
         Args:
             gallery_path: Path to the gallery JSON file
+            use_binary_store: Storage backend. None (default) uses the binary store if one
+                              already exists next to the JSON (player_gallery.store/), True
+                              uses it and migrates the JSON gallery into it once, False
+                              always uses the JSON file.
+            read_only: Never write the gallery back to disk (in-memory learning still works).
+                       Used by parallel segment workers that share one gallery file.
+            mirror_json: With the binary store, also rewrite the gallery JSON after every save
+                         that changed something (default: False). This loads every lazy
+                         reference list and rewrites the whole file, so by default the JSON is
+                         only regenerated by sync_json() at the end of a run.
         """
         self.gallery_path = gallery_path
+        self.read_only = read_only
+        self.mirror_json = mirror_json
+        self._json_stale = False  # Binary store has changes not yet exported to the JSON
+        
+        # OPTIMIZATION: Binary columnar store (incremental per-player writes, lazy reference frames)
+        self._store: Optional[Any] = None
+        if use_binary_store is not False and GALLERY_STORE_AVAILABLE:
+            store_dir = store_path_for(gallery_path)
+            if use_binary_store or GalleryStore.exists(store_dir):
+                self._store = GalleryStore(str(store_dir))
         self.players: Dict[str, PlayerProfile] = {}
         self._update_count: Dict[str, int] = {}  # Track update counts per player
         
@@ -235,10 +464,28 @@ class PlayerGallery:
         self._gallery_stats_cache_frame: int = 0
         self._gallery_stats_update_interval: int = 1000  # Update stats every 1000 frames
         
+        # OPTIMIZATION: Packed embedding matrices for vectorized matching (built lazily)
+        self._match_index: Optional[GalleryMatchIndex] = None
+        
         self.load_gallery()
     
+    def _invalidate_match_index(self):
+        """Drop the packed matching index so the next match rebuilds it from self.players"""
+        self._match_index = None
+    
+    def _get_match_index(self) -> GalleryMatchIndex:
+        """Return the packed matching index, rebuilding it if the gallery changed"""
+        if self._match_index is None:
+            self._match_index = GalleryMatchIndex(self.players)
+        return self._match_index
+    
     def load_gallery(self):
         """Load player gallery from disk with corruption protection"""
+        self._invalidate_match_index()
+        if self._store is not None:
+            self._load_from_store()
+            return
+        
         gallery_path = Path(self.gallery_path)
         
         if JSON_UTILS_AVAILABLE:
@@ -314,6 +561,63 @@ class PlayerGallery:
                 logger.info("No existing player gallery found. Creating new gallery.")
                 self.players = {}
     
+    def _load_from_store(self):
+        """Load players from the binary store, migrating the JSON gallery on first use"""
+        data = self._store.load()
+        if not data and not self._store.is_migrated() and os.path.exists(self.gallery_path):
+            # One-time migration: read the JSON gallery with the normal loader, then write it to the store
+            store, self._store = self._store, None
+            try:
+                self.load_gallery()
+            finally:
+                self._store = store
+            if self.players:
+                written = self._store.save(self.players)
+                logger.info(f"Migrated {len(self.players)} players from {self.gallery_path} to binary store "
+                            f"{self._store.store_dir} ({written['embeddings']} embeddings, "
+                            f"{written['reference_lists']} reference lists)")
+                data = self._store.load()
+            self._store.mark_migrated(self.gallery_path)
+        
+        self.players = {}
+        for player_id, player_data in data.items():
+            try:
+                self.players[player_id] = PlayerProfile.from_dict(player_data)
+            except Exception as e:
+                logger.warning(f"Could not load player {player_id}: {e}")
+        logger.info(f"Loaded {len(self.players)} players from gallery store: {self._store.store_dir}")
+    
+    def export_json(self, json_path: Optional[str] = None):
+        """
+        Write the full gallery as JSON (e.g. for tools that read player_gallery.json directly).
+        
+        Args:
+            json_path: Output path (default: the gallery JSON path)
+        """
+        json_path = json_path or self.gallery_path
+        data = {player_id: profile.to_dict() for player_id, profile in self.players.items()}
+        if JSON_UTILS_AVAILABLE:
+            if not safe_json_save(Path(json_path), data, create_backup=True, validate=False):
+                raise Exception(f"Failed to export gallery JSON: {json_path}")
+        else:
+            with open(json_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2, ensure_ascii=False)
+        if json_path == self.gallery_path:
+            self._json_stale = False
+        logger.info(f"Exported {len(data)} players to {json_path}")
+    
+    def sync_json(self):
+        """
+        Bring the gallery JSON up to date with the binary store (call at the end of a run or on
+        shutdown). No-op for JSON galleries, read-only galleries and when nothing changed.
+        """
+        if self._store is None or self.read_only or not self._json_stale:
+            return
+        try:
+            self.export_json()
+        except Exception as e:
+            logger.error(f"Could not export gallery JSON: {e}", exc_info=True)
+    
     def _attempt_repair(self) -> bool:
         """
         Attempt to automatically repair corrupted JSON file.
@@ -415,6 +719,27 @@ class PlayerGallery:
     
     def save_gallery(self):
         """Save player gallery to disk with corruption protection"""
+        # Every gallery mutation ends in a save - make sure matching sees the new state
+        self._invalidate_match_index()
+        if self.read_only:
+            logger.debug(f"Read-only gallery - not saving {self.gallery_path}")
+            return
+        if self._store is not None:
+            try:
+                # Incremental write: only players/embeddings/reference lists that changed
+                written = self._store.save(self.players)
+                logger.info(f"Saved {len(self.players)} players to gallery store: {self._store.store_dir} "
+                            f"({written['players']} profiles, {written['embeddings']} embeddings, "
+                            f"{written['reference_lists']} reference lists updated)")
+                if any(written.values()):
+                    self._json_stale = True
+                    if self.mirror_json:
+                        self.export_json()
+            except Exception as e:
+                logger.error(f"Could not save player gallery: {e}", exc_info=True)
+                raise  # Re-raise to allow caller to handle
+            return
+        
         try:
             # Convert PlayerProfile objects to dictionaries
             data = {player_id: profile.to_dict() 
@@ -484,6 +809,7 @@ class PlayerGallery:
         )
         
         self.players[player_id] = profile
+        self._invalidate_match_index()
         self.save_gallery()
         
         print(f"✓ Added player '{name}' to gallery (ID: {player_id})")
@@ -524,6 +850,7 @@ class PlayerGallery:
             return
         
         profile = self.players[player_id]
+        self._invalidate_match_index()
         
         # ENHANCED: Quality-weighted feature aggregation (instead of simple average)
         # This prevents high-quality features from being diluted by low-quality ones
@@ -1018,6 +1345,7 @@ class PlayerGallery:
             return
         
         profile = self.players[player_id]
+        self._invalidate_match_index()  # Body/jersey features may be replaced below
         
         # Update body image if provided and better quality
         if body_image_data is not None:
@@ -2567,6 +2895,7 @@ class PlayerGallery:
         # Update player's current team
         profile.team = to_team
         profile.updated_at = datetime.now().isoformat()
+        self._invalidate_match_index()
         
         print(f"✓ Recorded team switch for '{profile.name}': {from_team} → {to_team} (frame {frame_num})")
         return True
@@ -2756,6 +3085,7 @@ class PlayerGallery:
         
         # Remove anonymous player
         del self.players[anonymous_player_id]
+        self._invalidate_match_index()
         
         # Save gallery
         self.save_gallery()
@@ -2832,652 +3162,388 @@ class PlayerGallery:
             If return_all=True:
                 List of (player_id, player_name, similarity_score) for ALL gallery players
         """
-        if len(self.players) == 0:
-            if return_all:
-                return []
-            return (None, None, 0.0)
-        
-        # NEW: Check feature quality using filter module if available
-        if filter_module is not None and FILTER_MODULE_AVAILABLE:
-            if not filter_module.is_feature_quality_sufficient(features):
-                # Low-quality features - skip matching
-                return (None, None, 0.0) if not return_all else []
-        
-        # Normalize features
-        if features is None or len(features) == 0:
-            return (None, None, 0.0) if not return_all else []
-        
-        features = np.array(features).flatten()
-        feature_norm = np.linalg.norm(features)
-        if feature_norm < 1e-8:
-            return (None, None, 0.0) if not return_all else []
-        
-        features = features / feature_norm
-        
-        best_match_id = None
-        best_match_name = None
-        best_similarity = 0.0
-        best_confidence = 0.0  # ENHANCED: Track confidence score
-        
-        all_similarities = []  # Store all for diagnostics
+        # Single detection = batch of one (same scoring path as match_players_batch)
+        return self.match_players_batch(
+            [features],
+            similarity_threshold=similarity_threshold,
+            dominant_colors=[dominant_color],
+            teams=[team],
+            jersey_numbers=[jersey_number],
+            uniform_info_list=[uniform_info],
+            body_features_list=[body_features] if body_features is not None else None,
+            jersey_features_list=[jersey_features] if jersey_features is not None else None,
+            foot_features_list=[foot_features] if foot_features is not None else None,
+            detection_confidences=[detection_confidence],
+            detection_qualities=[detection_quality],
+            return_all=return_all,
+            early_frame_range=early_frame_range,
+            early_frame_boost=early_frame_boost,
+            current_frame_num=current_frame_num,
+            enable_adaptive_threshold=enable_adaptive_threshold,
+            strict_team_filtering=strict_team_filtering,
+            hard_negative_miner=hard_negative_miner,
+            filter_module=filter_module,
+            suppress_diagnostics=suppress_diagnostics,
+            exclude_players=exclude_players,
+            include_only_players=include_only_players,
+            enable_foot_matching=enable_foot_matching,
+            log_matching_details=log_matching_details
+        )[0]
+    
+    def _effective_threshold(self,
+                             similarity_threshold: float,
+                             detection_confidence: Optional[float],
+                             detection_quality: Optional[float],
+                             gallery_stats: Optional[Dict]) -> float:
+        """
+        Adaptive match threshold for one detection.
         
-        # ENHANCED: Adaptive threshold calculation with gallery statistics
-        # CRITICAL: Always respect the GUI threshold - never lower it below the user's setting
+        CRITICAL: Always respects the GUI threshold - never lowers it below the user's setting.
+        """
         effective_threshold = similarity_threshold
         
-        # Get gallery statistics for adaptive thresholding
-        gallery_stats = self._get_gallery_statistics()
-        
-        if enable_adaptive_threshold:
-            # Adjust based on detection quality
-            if detection_confidence is not None and detection_quality is not None:
-                if detection_confidence > 0.7 and detection_quality > 0.6:
-                    effective_threshold += 0.05  # Slightly stricter for high-quality detections
-                elif detection_confidence < 0.4 or detection_quality < 0.4:
-                    # More lenient for low-quality detections, but NEVER below GUI threshold
-                    effective_threshold = max(similarity_threshold, effective_threshold - 0.20)
-                effective_threshold = max(similarity_threshold, min(0.85, effective_threshold))  # Never below GUI threshold
-            
-            # Adjust based on gallery diversity
-            if gallery_stats and gallery_stats.get('diversity_ratio') is not None:
-                diversity_ratio = gallery_stats['diversity_ratio']
-                # If gallery is diverse (low inter-player similarity): lower threshold
-                # If gallery is similar (high inter-player similarity): raise threshold
-                if diversity_ratio > 0.3:  # Diverse gallery (players look different)
-                    # Can be more lenient, but NEVER below GUI threshold
-                    effective_threshold = max(similarity_threshold, effective_threshold - 0.05)
-                elif diversity_ratio < 0.15:  # Similar gallery (players look similar)
-                    effective_threshold += 0.05  # Need to be stricter
-                effective_threshold = max(similarity_threshold, min(0.85, effective_threshold))  # Never below GUI threshold
-            
-            # Adjust based on gallery size
-            if gallery_stats and gallery_stats.get('gallery_size') is not None:
-                gallery_size = gallery_stats['gallery_size']
-                # Larger galleries may need slightly higher thresholds (more players to distinguish)
-                if gallery_size > 20:
-                    effective_threshold += 0.02  # Slightly stricter for large galleries
-                elif gallery_size < 5:
-                    # More lenient for small galleries, but NEVER below GUI threshold
-                    effective_threshold = max(similarity_threshold, effective_threshold - 0.03)
-                effective_threshold = max(similarity_threshold, min(0.85, effective_threshold))  # Never below GUI threshold
+        # Adjust based on detection quality
+        if detection_confidence is not None and detection_quality is not None:
+            if detection_confidence > 0.7 and detection_quality > 0.6:
+                effective_threshold += 0.05  # Slightly stricter for high-quality detections
+            elif detection_confidence < 0.4 or detection_quality < 0.4:
+                # More lenient for low-quality detections, but NEVER below GUI threshold
+                effective_threshold = max(similarity_threshold, effective_threshold - 0.20)
+            effective_threshold = max(similarity_threshold, min(0.85, effective_threshold))  # Never below GUI threshold
+        
+        # Adjust based on gallery diversity
+        if gallery_stats and gallery_stats.get('diversity_ratio') is not None:
+            diversity_ratio = gallery_stats['diversity_ratio']
+            # If gallery is diverse (low inter-player similarity): lower threshold
+            # If gallery is similar (high inter-player similarity): raise threshold
+            if diversity_ratio > 0.3:  # Diverse gallery (players look different)
+                # Can be more lenient, but NEVER below GUI threshold
+                effective_threshold = max(similarity_threshold, effective_threshold - 0.05)
+            elif diversity_ratio < 0.15:  # Similar gallery (players look similar)
+                effective_threshold += 0.05  # Need to be stricter
+            effective_threshold = max(similarity_threshold, min(0.85, effective_threshold))  # Never below GUI threshold
+        
+        # Adjust based on gallery size
+        if gallery_stats and gallery_stats.get('gallery_size') is not None:
+            gallery_size = gallery_stats['gallery_size']
+            # Larger galleries may need slightly higher thresholds (more players to distinguish)
+            if gallery_size > 20:
+                effective_threshold += 0.02  # Slightly stricter for large galleries
+            elif gallery_size < 5:
+                # More lenient for small galleries, but NEVER below GUI threshold
+                effective_threshold = max(similarity_threshold, effective_threshold - 0.03)
+            effective_threshold = max(similarity_threshold, min(0.85, effective_threshold))  # Never below GUI threshold
         
         # REMOVED: Auto-lowering threshold optimization - this was overriding GUI settings
         # The GUI threshold should always be respected - users set it for a reason
-        # If threshold is too high, users should adjust it in the GUI, not have it auto-lowered
+        return effective_threshold
+    
+    def match_players_batch(self,
+                            features_list: List[Optional[np.ndarray]],
+                            similarity_threshold: float = 0.6,
+                            dominant_colors: Optional[List[Optional[np.ndarray]]] = None,
+                            teams: Optional[List[Optional[str]]] = None,
+                            jersey_numbers: Optional[List[Optional[str]]] = None,
+                            uniform_info_list: Optional[List[Optional[Dict]]] = None,
+                            body_features_list: Optional[List[Optional[np.ndarray]]] = None,
+                            jersey_features_list: Optional[List[Optional[np.ndarray]]] = None,
+                            foot_features_list: Optional[List[Optional[np.ndarray]]] = None,
+                            detection_confidences: Optional[List[Optional[float]]] = None,
+                            detection_qualities: Optional[List[Optional[float]]] = None,
+                            return_all: bool = False,
+                            early_frame_range: tuple = (0, 1000),
+                            early_frame_boost: float = 0.10,
+                            current_frame_num: Optional[int] = None,
+                            enable_adaptive_threshold: bool = True,
+                            strict_team_filtering: bool = False,
+                            hard_negative_miner: Optional[Any] = None,
+                            filter_module: Optional[Any] = None,
+                            suppress_diagnostics: bool = False,
+                            exclude_players: Optional[set] = None,
+                            include_only_players: Optional[set] = None,
+                            enable_foot_matching: bool = True,
+                            log_matching_details: bool = False) -> List[Union[Tuple[Optional[str], Optional[str], float], List[Tuple[str, str, float]]]]:
+        """
+        Match all detections of a frame against the gallery in one vectorized pass.
+        
+        Scores every detection against every player with one matrix multiply per
+        feature kind (general, body, jersey, foot) using the packed GalleryMatchIndex,
+        then applies the same filters and boosts as match_player (team penalty,
+        color, jersey number, uniform and early-frame boosts) as array operations.
         
-        # Normalize input features and ensure 1D shape
-        try:
-            if isinstance(features, np.ndarray):  # type: ignore[reportUnnecessaryIsInstance]
-                features = np.array(features).flatten()  # Ensure 1D
-                if len(features) == 0 or np.isnan(features).any():
-                    # Invalid features - return empty list if return_all, otherwise no match
-                    if return_all:
-                        return []
-                    return (None, None, 0.0)
-                # Normalize features
-                norm = np.linalg.norm(features)
-                if norm < 1e-8:  # Features are all zeros or too small
-                    # Invalid features (all zeros) - return empty list if return_all, otherwise no match
-                    if return_all:
-                        return []
-                    return (None, None, 0.0)
-                features = features / norm
-            else:
-                # Invalid input - return empty list if return_all, otherwise no match
-                if return_all:
-                    return []
-                return (None, None, 0.0)
-        except Exception as e:
-            # Error normalizing features - return empty list if return_all, otherwise no match
-            # DIAGNOSTIC: Log the error for debugging
-            import sys
-            if hasattr(sys, '_getframe'):
-                frame_num = sys._getframe(1).f_locals.get('current_frame_num', 'unknown')
-                if frame_num and frame_num % 500 == 0:  # Only log occasionally
-                    print(f"   ⚠ DIAGNOSTIC: Error normalizing features in match_player: {e}")
-            if return_all:
-                return []
-            return (None, None, 0.0)
-        
-        # DIAGNOSTIC: Log matching attempt (occasionally)
-        # Note: current_frame_num is not passed to match_player, so we can't use it here
-        # We'll rely on the caller to pass it if needed, or log based on other criteria
-        
-        # DIAGNOSTIC: Check input features before matching (for debugging)
-        if isinstance(features, np.ndarray) and features.size > 0:
-            input_norm = np.linalg.norm(features)
-            if input_norm < 1e-8:
-                # Features are all zeros - this is a problem
-                if return_all:
-                    return []
-                return (None, None, 0.0)
-        
-        # DIAGNOSTIC: Track which players have features (for debugging why only some players match)
-        players_with_features = []
-        players_without_features = []
+        Args:
+            features_list: Re-ID embeddings, one per detection (None for detections to skip)
+            dominant_colors, teams, jersey_numbers, uniform_info_list: Optional per-detection values
+            body_features_list, jersey_features_list, foot_features_list: Optional per-detection
+                region features (fall back to the general features like match_player)
+            detection_confidences, detection_qualities: Optional per-detection values for adaptive thresholding
+            All other arguments are shared by every detection - see match_player.
         
-        for player_id, profile in self.players.items():
+        Returns:
+            One match_player result per detection, in input order
+        """
+        num_detections = len(features_list)
+        results: List[Any] = [[] if return_all else (None, None, 0.0) for _ in range(num_detections)]
+        if num_detections == 0 or len(self.players) == 0:
+            return results
+        
+        def _value_at(values, i):
+            return values[i] if values is not None and i < len(values) else None
+        
+        # Validate and normalize each detection's general features
+        general_vectors: List[Optional[np.ndarray]] = []
+        active: List[int] = []
+        for i, features in enumerate(features_list):
+            if features is None:
+                continue
+            # NEW: Check feature quality using filter module if available
+            if filter_module is not None and FILTER_MODULE_AVAILABLE:
+                if not filter_module.is_feature_quality_sufficient(features):
+                    continue  # Low-quality features - skip matching
             try:
-                # FILTER: Include only players in current video (if specified)
-                # If include_only_players is provided, ONLY match against these players
-                # This prevents matching to players like Jax Derryberry who aren't in the video
-                if include_only_players is not None and len(include_only_players) > 0:
-                    if profile.name not in include_only_players:
-                        # Player is not in current video - skip this match
-                        all_similarities.append((player_id, profile.name, 0.0))
-                        continue
-                
-                # FILTER: Exclude anchor players from matching
-                # If exclude_players is provided, it contains anchor player names
-                # We want to EXCLUDE these players (they're already identified)
-                if exclude_players is not None and profile.name in exclude_players:
-                    # Player is anchor-protected - skip this match
-                    # Anchor players are already identified and shouldn't be matched via Re-ID
-                    all_similarities.append((player_id, profile.name, 0.0))
-                    continue
-                
-                if profile.features is None:
-                    # Check if player has body_features or jersey_features as fallback
-                    has_any_features = (profile.body_features is not None or 
-                                       profile.jersey_features is not None)
-                    if not has_any_features:
-                        players_without_features.append(profile.name)
-                        all_similarities.append((player_id, profile.name, 0.0))
-                        continue
-                    else:
-                        players_with_features.append(profile.name)
-                else:
-                    players_with_features.append(profile.name)
-                
-                # ENHANCED: Team-based roster constraint filtering
-                # Team filtering serves multiple purposes:
-                # 1. Enforce roster constraints (player can only be on one team at a time)
-                # 2. Reduce wrong identifications by limiting search space
-                # 3. Force matches by defaulting to players on the correct team when similarities are low
-                # 
-                # Strategy: Prioritize same-team matches, but allow cross-team fallback if no good match found
-                # This balances roster enforcement with player identification accuracy
-                team_penalty = 0.0
-                is_team_match = True
-                if team is not None and profile.team is not None:
-                    if profile.team != team:
-                        is_team_match = False
-                        if strict_team_filtering:
-                            # STRICT MODE: Hard filter - skip players from different teams entirely
-                            # Use this when team assignments are very reliable (e.g., games with distinct uniforms)
-                            all_similarities.append((player_id, profile.name, 0.0))
-                            continue  # Skip this player completely
-                        else:
-                            # LENIENT MODE: Apply penalty but still allow cross-team matching
-                            # This helps enforce roster constraints while allowing fallback for difficult cases
-                            # Penalty of 0.08 (8%) strongly prefers same-team but doesn't block strong visual matches
-                            team_penalty = 0.08
-                    else:
-                        # Same team - no penalty, and can apply a small boost for roster consistency
-                        # Small boost (0.02 = 2%) to prefer same-team matches when similarities are close
-                        # This helps force matches to correct team when similarities are borderline
-                        pass  # Will apply boost later if similarity is close to threshold
-                
-                # ENHANCED: Additional negative filters could go here
-                # (size mismatch, impossible position jumps, etc.)
-                # These would require additional parameters (detection size, position, etc.)
-                
-                # JERSEY NUMBER FILTERING/BOOSTING: Use jersey number as search criterion
-                jersey_boost = 0.0
-                if jersey_number is not None:
-                    if profile.jersey_number is not None:
-                        # Convert both to strings for comparison (handle int/str mismatch)
-                        profile_jersey = str(profile.jersey_number).strip()
-                        search_jersey = str(jersey_number).strip()
-                        
-                        if profile_jersey == search_jersey:
-                            # Exact match: Boost similarity significantly (15% boost)
-                            jersey_boost = 0.15
-                        elif profile_jersey and search_jersey:
-                            # Partial match (e.g., "6" vs "06"): Small boost (5% boost)
-                            if profile_jersey.replace("0", "") == search_jersey.replace("0", ""):
-                                jersey_boost = 0.05
-                    # If jersey_number provided but doesn't match, don't filter out (just no boost)
-                    # This allows Re-ID features to still match even if jersey number is wrong
-                
-                # ENHANCED: Multi-feature ensemble matching with foot features
-                # Match against multiple features (body, jersey, foot, general) and combine results
-                # This provides more robust matching than single-feature matching
-                ensemble_similarities = []
-                ensemble_weights = []
-                feature_contributions = {}  # Track which features contributed for logging
-                
-                # Determine which input features to use (prefer specific, fallback to general)
-                input_body_features = body_features if body_features is not None else features
-                input_jersey_features = jersey_features if jersey_features is not None else features
-                input_foot_features = foot_features if foot_features is not None else None
-                
-                # 1. Body features (highest weight - most reliable)
-                if profile.body_features is not None:
-                    try:
-                        profile_body = np.array(profile.body_features).flatten()
-                        body_norm = np.linalg.norm(profile_body)
-                        if body_norm > 1e-8:
-                            profile_body = profile_body / body_norm
-                            input_body = np.array(input_body_features).flatten()
-                            input_body_norm = np.linalg.norm(input_body)
-                            if input_body_norm > 1e-8:
-                                input_body = input_body / input_body_norm
-                                body_sim = np.dot(input_body, profile_body)
-                                if np.isfinite(body_sim):
-                                    ensemble_similarities.append(body_sim)
-                                    ensemble_weights.append(0.35)  # 35% weight for body
-                                    feature_contributions['body'] = body_sim
-                    except Exception as e:
-                        if log_matching_details:
-                            logger.debug(f"Body feature matching error for {profile.name}: {e}")
-                
-                # 2. Jersey features (medium weight)
-                if profile.jersey_features is not None:
-                    try:
-                        profile_jersey = np.array(profile.jersey_features).flatten()
-                        jersey_norm = np.linalg.norm(profile_jersey)
-                        if jersey_norm > 1e-8:
-                            profile_jersey = profile_jersey / jersey_norm
-                            input_jersey = np.array(input_jersey_features).flatten()
-                            input_jersey_norm = np.linalg.norm(input_jersey)
-                            if input_jersey_norm > 1e-8:
-                                input_jersey = input_jersey / input_jersey_norm
-                                jersey_sim = np.dot(input_jersey, profile_jersey)
-                                if np.isfinite(jersey_sim):
-                                    ensemble_similarities.append(jersey_sim)
-                                    ensemble_weights.append(0.30)  # 30% weight for jersey
-                                    feature_contributions['jersey'] = jersey_sim
-                    except Exception as e:
-                        if log_matching_details:
-                            logger.debug(f"Jersey feature matching error for {profile.name}: {e}")
-                
-                # 3. Foot features (ENHANCED: Now properly weighted and used)
-                # Foot features are especially useful when:
-                # - Jerseys are similar (same team)
-                # - Players are facing away
-                # - Bottom portion is more visible than top
-                foot_sim = None
-                if enable_foot_matching and profile.foot_features is not None:
-                    if input_foot_features is not None:
-                        # Use provided foot features (extracted from detection)
-                        try:
-                            profile_foot = np.array(profile.foot_features).flatten()
-                            foot_norm = np.linalg.norm(profile_foot)
-                            if foot_norm > 1e-8:
-                                profile_foot = profile_foot / foot_norm
-                                input_foot = np.array(input_foot_features).flatten()
-                                input_foot_norm = np.linalg.norm(input_foot)
-                                if input_foot_norm > 1e-8:
-                                    input_foot = input_foot / input_foot_norm
-                                    foot_sim = np.dot(input_foot, profile_foot)
-                                    if np.isfinite(foot_sim):
-                                        ensemble_similarities.append(foot_sim)
-                                        ensemble_weights.append(0.30)  # 30% weight for foot (increased from 15%)
-                                        feature_contributions['foot'] = foot_sim
-                                        if log_matching_details:
-                                            logger.info(f"  👟 Foot features matched for {profile.name}: similarity={foot_sim:.3f}")
-                        except Exception as e:
-                            if log_matching_details:
-                                logger.debug(f"Foot feature matching error for {profile.name}: {e}")
-                    else:
-                        # Fallback: Use general features for foot matching (less accurate)
-                        try:
-                            profile_foot = np.array(profile.foot_features).flatten()
-                            foot_norm = np.linalg.norm(profile_foot)
-                            if foot_norm > 1e-8:
-                                profile_foot = profile_foot / foot_norm
-                                input_foot = np.array(features).flatten()
-                                input_foot_norm = np.linalg.norm(input_foot)
-                                if input_foot_norm > 1e-8:
-                                    input_foot = input_foot / input_foot_norm
-                                    foot_sim = np.dot(input_foot, profile_foot)
-                                    if np.isfinite(foot_sim):
-                                        ensemble_similarities.append(foot_sim)
-                                        ensemble_weights.append(0.20)  # 20% weight (lower since using general features)
-                                        feature_contributions['foot'] = foot_sim
-                                        if log_matching_details:
-                                            logger.info(f"  👟 Foot features matched (using general features) for {profile.name}: similarity={foot_sim:.3f}")
-                        except Exception:
-                            pass
-                
-                # 4. General features (fallback, lower weight)
-                if profile.features is not None:
-                    try:
-                        general_features = np.array(profile.features).flatten()
-                        general_norm = np.linalg.norm(general_features)
-                        if general_norm > 1e-8:
-                            general_features = general_features / general_norm
-                            input_general = np.array(features).flatten()
-                            input_general_norm = np.linalg.norm(input_general)
-                            if input_general_norm > 1e-8:
-                                input_general = input_general / input_general_norm
-                                general_sim = np.dot(input_general, general_features)
-                                if np.isfinite(general_sim):
-                                    # Only use general features if we don't have enough specific features
-                                    if len(ensemble_similarities) < 2:
-                                        ensemble_similarities.append(general_sim)
-                                        ensemble_weights.append(0.15)  # 15% weight for general (fallback)
-                                        feature_contributions['general'] = general_sim
-                    except Exception:
-                        pass
-                
-                # Combine ensemble similarities
-                if len(ensemble_similarities) > 0:
-                    # Normalize weights to sum to 1.0
-                    total_weight = sum(ensemble_weights)
-                    if total_weight > 0:
-                        # Weighted average of similarities
-                        weighted_sim = sum(sim * weight for sim, weight in zip(ensemble_similarities, ensemble_weights)) / total_weight
-                        
-                        # Log foot feature contribution if it was significant
-                        if log_matching_details and 'foot' in feature_contributions:
-                            foot_contrib = feature_contributions['foot']
-                            foot_idx = ensemble_similarities.index(foot_contrib) if foot_contrib in ensemble_similarities else -1
-                            foot_weight = ensemble_weights[foot_idx] / total_weight if foot_idx >= 0 else 0.0
-                            if foot_weight > 0.15:  # Only log if foot features have significant weight
-                                logger.info(f"  👟 Foot features contributed {foot_weight*100:.1f}% to match with {profile.name} (foot_sim={foot_contrib:.3f}, final_sim={weighted_sim:.3f})")
-                        
-                        # Log all feature contributions if enabled
-                        if log_matching_details and feature_contributions:
-                            contrib_str = ", ".join([f"{k}={v:.3f}" for k, v in feature_contributions.items()])
-                            logger.debug(f"  Feature contributions for {profile.name}: {contrib_str}")
-                        
-                        normalized_weights = [w / total_weight for w in ensemble_weights]
-                        # Weighted average of similarities
-                        weighted_avg = sum(sim * weight for sim, weight in zip(ensemble_similarities, normalized_weights))
-                        # Also use max pooling for conservative matching (take the best match)
-                        max_similarity = max(ensemble_similarities)
-                        # Combine: 70% weighted average, 30% max (conservative)
-                        similarity = 0.7 * weighted_avg + 0.3 * max_similarity
-                    else:
-                        similarity = max(ensemble_similarities) if ensemble_similarities else 0.0
-                else:
-                    # No features available
-                    all_similarities.append((player_id, profile.name, 0.0))
+                if np.isnan(np.asarray(features, dtype=np.float64)).any():
                     continue
-                
-                # ENHANCED: Hard negative mining integration
-                # Adjust similarity if this detection is similar to known hard negatives for this player
-                if hard_negative_miner is not None:
+            except (TypeError, ValueError):
+                continue
+            vector = GalleryMatchIndex.normalize(features)
+            if vector is None:
+                continue  # Empty or all-zero features
+            active.append(i)
+            general_vectors.append(vector)
+        
+        if not active:
+            return results
+        
+        index = self._get_match_index()
+        num_active = len(active)
+        
+        def _region_vectors(values):
+            # Region features fall back to the general features when not provided;
+            # provided-but-invalid region features skip that component (as before)
+            vectors = []
+            for row, i in enumerate(active):
+                value = _value_at(values, i)
+                vectors.append(general_vectors[row] if value is None else GalleryMatchIndex.normalize(value))
+            return vectors
+        
+        # ===== Vectorized multi-feature ensemble: one matmul per feature kind =====
+        general_queries = GalleryMatchIndex.pack_queries(general_vectors)
+        general_sims, general_ok = index.score('features', general_queries, num_active)
+        body_queries = general_queries if body_features_list is None else GalleryMatchIndex.pack_queries(_region_vectors(body_features_list))
+        body_sims, body_ok = index.score('body_features', body_queries, num_active)
+        jersey_queries = general_queries if jersey_features_list is None else GalleryMatchIndex.pack_queries(_region_vectors(jersey_features_list))
+        jersey_sims, jersey_ok = index.score('jersey_features', jersey_queries, num_active)
+        
+        # Foot features: detection foot features (30%) or general features as fallback (20%)
+        foot_weights = np.zeros((num_active, 1), dtype=np.float64)
+        if enable_foot_matching:
+            foot_sims, foot_ok = index.score('foot_features', general_queries, num_active)
+            foot_weights[:] = 0.20
+            if foot_features_list is not None:
+                foot_given = np.array([_value_at(foot_features_list, i) is not None for i in active], dtype=bool)
+                if foot_given.any():
+                    foot_vectors = [GalleryMatchIndex.normalize(_value_at(foot_features_list, i)) if given else None
+                                    for i, given in zip(active, foot_given)]
+                    given_sims, given_ok = index.score('foot_features', GalleryMatchIndex.pack_queries(foot_vectors), num_active)
+                    foot_sims = np.where(foot_given[:, None], given_sims, foot_sims)
+                    foot_ok = np.where(foot_given[:, None], given_ok, foot_ok)
+                    foot_weights[foot_given] = 0.30
+        else:
+            foot_sims = np.zeros((num_active, index.size), dtype=np.float64)
+            foot_ok = np.zeros((num_active, index.size), dtype=bool)
+        
+        # General features only contribute when fewer than 2 specific features matched
+        specific_count = body_ok.astype(np.int8) + jersey_ok + foot_ok
+        general_used = general_ok & (specific_count < 2)
+        weight_sum = 0.35 * body_ok + 0.30 * jersey_ok + foot_weights * foot_ok + 0.15 * general_used
+        weighted_sum = (0.35 * body_ok * body_sims + 0.30 * jersey_ok * jersey_sims +
+                        foot_weights * foot_ok * foot_sims + 0.15 * general_used * general_sims)
+        has_ensemble = weight_sum > 0
+        weighted_avg = np.divide(weighted_sum, weight_sum, out=np.zeros_like(weighted_sum), where=has_ensemble)
+        # Max pooling for conservative matching (take the best single-feature match)
+        max_similarity = np.maximum.reduce([
+            np.where(body_ok, body_sims, -np.inf),
+            np.where(jersey_ok, jersey_sims, -np.inf),
+            np.where(foot_ok, foot_sims, -np.inf),
+            np.where(general_used, general_sims, -np.inf)
+        ])
+        # Combine: 70% weighted average, 30% max (conservative)
+        ensemble_similarity = np.where(has_ensemble, 0.7 * weighted_avg + 0.3 * np.where(has_ensemble, max_similarity, 0.0), 0.0)
+        
+        # Roster filters shared by every detection
+        skipped_base = ~index.eligible
+        if include_only_players is not None and len(include_only_players) > 0:
+            # FILTER: Only match against players in current video
+            skipped_base = skipped_base | ~index.name_mask('include', include_only_players)
+        if exclude_players is not None:
+            # FILTER: Anchor-protected players are already identified
+            skipped_base = skipped_base | index.name_mask('exclude', exclude_players)
+        
+        gallery_stats = self._get_gallery_statistics()
+        early_frame_min, early_frame_max = early_frame_range
+        early_tags = None
+        if current_frame_num is None or early_frame_min <= current_frame_num <= early_frame_max:
+            early_tags = index.early_frame_tags(early_frame_range)
+        
+        for row, i in enumerate(active):
+            team = _value_at(teams, i)
+            effective_threshold = similarity_threshold
+            if enable_adaptive_threshold:
+                effective_threshold = self._effective_threshold(
+                    similarity_threshold, _value_at(detection_confidences, i),
+                    _value_at(detection_qualities, i), gallery_stats)
+            
+            similarity = ensemble_similarity[row].copy()
+            skipped = skipped_base | ~has_ensemble[row]
+            
+            # ENHANCED: Team-based roster constraint filtering
+            # Strict mode skips players from other teams; lenient mode applies an 8% penalty
+            team_mismatch = index.team_mismatch(team)
+            if strict_team_filtering:
+                skipped = skipped | team_mismatch
+            scored = np.flatnonzero(~skipped)
+            
+            if log_matching_details:
+                for p in scored:
+                    contributions = {kind: sims[row, p] for kind, sims, ok in (
+                        ('body', body_sims, body_ok), ('jersey', jersey_sims, jersey_ok),
+                        ('foot', foot_sims, foot_ok), ('general', general_sims, general_used)) if ok[row, p]}
+                    contrib_str = ", ".join([f"{k}={v:.3f}" for k, v in contributions.items()])
+                    logger.debug(f"  Feature contributions for {index.names[p]}: {contrib_str}")
+            
+            # ENHANCED: Hard negative mining integration
+            if hard_negative_miner is not None and hasattr(hard_negative_miner, 'adjust_similarity_with_negatives'):
+                detection_feature_norm = general_vectors[row]
+                for p in scored:
+                    profile = index.profiles[p]
                     try:
-                        # Get player feature for hard negative comparison
-                        player_feature_for_hn = None
                         if profile.body_features is not None:
                             player_feature_for_hn = np.array(profile.body_features).flatten()
                         elif profile.features is not None:
                             player_feature_for_hn = np.array(profile.features).flatten()
-                        
-                        if player_feature_for_hn is not None:
-                            # Check if hard negative miner has method to adjust similarity
-                            if hasattr(hard_negative_miner, 'adjust_similarity_with_negatives'):
-                                original_similarity = similarity
-                                # Normalize features for comparison
-                                player_feature_norm = player_feature_for_hn / (np.linalg.norm(player_feature_for_hn) + 1e-8)
-                                detection_feature_norm = features / (np.linalg.norm(features) + 1e-8)
-                                
-                                similarity = hard_negative_miner.adjust_similarity_with_negatives(
-                                    player_feature=player_feature_norm,
-                                    candidate_feature=detection_feature_norm,
-                                    player_id=player_id,
-                                    base_similarity=similarity
-                                )
-                                # Log if adjustment was significant
-                                if abs(original_similarity - similarity) > 0.05:
-                                    if len(all_similarities) < 3:
-                                        print(f"   ⚠ Hard negative adjustment for {profile.name}: {original_similarity:.3f} → {similarity:.3f}")
+                        else:
+                            continue
+                        original_similarity = similarity[p]
+                        player_feature_norm = player_feature_for_hn / (np.linalg.norm(player_feature_for_hn) + 1e-8)
+                        similarity[p] = hard_negative_miner.adjust_similarity_with_negatives(
+                            player_feature=player_feature_norm,
+                            candidate_feature=detection_feature_norm,
+                            player_id=index.player_ids[p],
+                            base_similarity=original_similarity
+                        )
+                        # Log if adjustment was significant
+                        if p < 3 and abs(original_similarity - similarity[p]) > 0.05:
+                            print(f"   ⚠ Hard negative adjustment for {profile.name}: {original_similarity:.3f} → {similarity[p]:.3f}")
                     except Exception as e:
                         # If hard negative mining fails, continue with original similarity
-                        if len(all_similarities) < 3:
+                        if p < 3:
                             print(f"   ⚠ Hard negative mining error: {e}")
-                        pass
-                
-                # Apply team mismatch penalty (soft filter for roster enforcement)
-                if team_penalty > 0:
-                    similarity = max(0.0, similarity - team_penalty)
-                    # DIAGNOSTIC: Log team penalty application
-                    if len(all_similarities) < 3:
-                        print(f"   ⚠ DIAGNOSTIC: match_player - {profile.name}: Applied team penalty (-{team_penalty:.2f}), similarity: {similarity:.4f}")
-                
-                # Apply same-team boost for roster consistency (helps force matches when similarities are borderline)
-                if is_team_match and team is not None:
-                    # Small boost (0.02 = 2%) to prefer same-team matches when similarity is close to threshold
-                    # This helps enforce roster constraints by pushing borderline matches over the threshold
-                    if similarity >= (effective_threshold - 0.05) and similarity < effective_threshold:
-                        similarity = min(1.0, similarity + 0.02)
-                        if len(all_similarities) < 3:
-                            print(f"   ✓ DIAGNOSTIC: match_player - {profile.name}: Applied same-team boost (+0.02), similarity: {similarity:.4f}")
-                
-                # DIAGNOSTIC: Log similarity computation for debugging (occasionally)
-                # Only log for first few players to avoid spam
-                if len(all_similarities) < 3:
-                    # Check if similarity is actually being computed
-                    if np.isnan(similarity) or not np.isfinite(similarity):
-                        print(f"   ⚠ DIAGNOSTIC: match_player - {profile.name}: similarity is NaN or Inf (features norm: {np.linalg.norm(features):.4f}, gallery norm: {np.linalg.norm(gallery_features):.4f})")
-                    elif abs(similarity) < 1e-6:
-                        print(f"   ⚠ DIAGNOSTIC: match_player - {profile.name}: similarity is near-zero ({similarity:.6f}) - features may be orthogonal or incorrectly normalized")
-                    else:
-                        # Log successful similarity computation (before boosts)
-                        # Note: Final similarity after boosts will be logged separately if it exceeds threshold
-                        pass  # Reduced verbosity - only log if needed for debugging
-                
-                # Note: Multi-feature ensemble matching is now done above (replaces old multi-region fusion)
-                # The similarity computed above already combines body, jersey, foot, and general features
-                # using weighted ensemble with max pooling for conservative matching
-                
-                # DIAGNOSTIC: Log first few similarity computations (only for debugging, disabled by default)
-                # Uncomment the line below to enable detailed similarity logging
-                # if len(all_similarities) < 3:
-                #     print(f"   🔍 DIAGNOSTIC: match_player - {profile.name}: similarity={similarity:.4f}")
-                
-                # Check for NaN or invalid similarity
-                if np.isnan(similarity) or not np.isfinite(similarity):
-                    similarity = 0.0
-                
-                # Color similarity boost (optional)
-                # IMPROVED: Better color matching with weighted HSV components
-                if dominant_color is not None and profile.dominant_color is not None:
-                    try:
-                        profile_color = np.array(profile.dominant_color)
-                        detection_color = np.array(dominant_color)
-                        
-                        # Compute color distance in HSV space with proper weighting
-                        # Hue is most important (0-180), Saturation and Value are 0-255
-                        hue_diff = abs(detection_color[0] - profile_color[0])
-                        hue_diff = min(hue_diff, 180 - hue_diff)  # Handle wraparound
-                        sat_diff = abs(detection_color[1] - profile_color[1])
-                        val_diff = abs(detection_color[2] - profile_color[2])
-                        
-                        # Normalize differences: hue (0-90), sat/val (0-255)
-                        hue_sim = 1.0 - (hue_diff / 90.0)  # Hue difference normalized to 0-1
-                        sat_sim = 1.0 - (sat_diff / 255.0)  # Saturation similarity
-                        val_sim = 1.0 - (val_diff / 255.0)  # Value similarity
-                        
-                        # Weighted combination: hue (50%), saturation (30%), value (20%)
-                        color_similarity = 0.5 * hue_sim + 0.3 * sat_sim + 0.2 * val_sim
-                        color_similarity = max(0.0, min(1.0, color_similarity))  # Clamp to [0, 1]
-                        
-                        # IMPROVED: Only boost if color similarity is good (>= 0.6) to avoid false matches
-                        # Use 15% weight instead of 10% for better color-based matching
-                        if color_similarity >= 0.6:
-                            similarity = 0.85 * similarity + 0.15 * color_similarity
-                    except Exception:
-                        # If color matching fails, continue without color boost
-                        pass
-                
-                # Apply jersey number boost (proportional, like early-frame boost)
-                # IMPROVED: Lower threshold to 0.25 to help borderline matches
-                if jersey_boost > 0 and similarity >= 0.25:  # Boost if similarity is reasonable
-                    similarity = min(1.0, similarity * (1.0 + jersey_boost))
-                
-                # UNIFORM MATCHING BOOST: Boost matches with same uniform variant
-                uniform_boost = 0.0
-                if uniform_info is not None and profile.uniform_variants is not None:
-                    # Create uniform key for detection
-                    det_jersey = uniform_info.get('jersey_color', 'unknown').lower()
-                    det_shorts = uniform_info.get('shorts_color', 'unknown').lower()
-                    det_socks = uniform_info.get('socks_color', 'unknown').lower()
-                    det_uniform_key = f"{det_jersey}-{det_shorts}-{det_socks}"
-                    
-                    # Check if player has this uniform variant
-                    if det_uniform_key in profile.uniform_variants:
-                        # Exact uniform match: Strong boost (10% boost)
-                        uniform_boost = 0.10
-                    else:
-                        # Partial match: Check for jersey color match only (5% boost)
-                        for variant_key in profile.uniform_variants.keys():
-                            variant_jersey = variant_key.split('-')[0] if '-' in variant_key else variant_key
-                            if variant_jersey == det_jersey and det_jersey != 'unknown':
-                                uniform_boost = 0.05
-                                break
-                
-                # Apply uniform boost
-                # IMPROVED: Lower threshold to 0.25 to help borderline matches
-                if uniform_boost > 0 and similarity >= 0.25:  # Boost if similarity is reasonable
-                    similarity = min(1.0, similarity * (1.0 + uniform_boost))
-                
-                # Early-frame priority boost: Boost players tagged in early frames (20-120)
-                # BUT: Only boost if the CURRENT detection is also from an early frame
-                # This prevents early-frame tagged players from dominating later detections
-                if profile.reference_frames and len(profile.reference_frames) > 0:
-                    early_frame_min, early_frame_max = early_frame_range
-                    has_early_frame_tag = False
-                    for ref_frame in profile.reference_frames:
-                        frame_num = ref_frame.get('frame_num', None)
-                        if frame_num is not None and early_frame_min <= frame_num <= early_frame_max:
-                            has_early_frame_tag = True
-                            break
-                    
-                    # Only boost if BOTH conditions are met:
-                    # 1. Player was tagged in early frames (20-120)
-                    # 2. Current detection is also from early frames (if frame number is provided)
-                    should_boost = has_early_frame_tag
-                    if current_frame_num is not None:
-                        # Only boost if current detection is also from early frames
-                        should_boost = should_boost and (early_frame_min <= current_frame_num <= early_frame_max)
-                    
-                    if should_boost:
-                        # Boost similarity for early-frame tagged players matching early-frame detections
-                        # Use PROPORTIONAL boost (10% increase) instead of flat boost
-                        # This prevents early-frame players from dominating when they shouldn't
-                        # IMPROVED: Lower threshold to 0.35 to help more borderline matches
-                        if similarity >= 0.35:
-                            # Proportional boost: multiply by (1 + boost_factor)
-                            # e.g., 0.10 boost = 10% increase: 0.45 * 1.10 = 0.495, still below 0.60
-                            # But if we have jersey boost too: 0.45 * 1.10 * 1.15 = 0.57, closer to threshold
-                            similarity = min(1.0, similarity * (1.0 + early_frame_boost))
-                
-                # Store final similarity (after all boosts)
-                all_similarities.append((player_id, profile.name, similarity))
-                
-                # DIAGNOSTIC: Log final similarity for ALL players (not just first 3)
-                # Log if similarity is above a minimum threshold to reduce spam
-                # Show top matches and any that are close to threshold
-                # Skip diagnostics if suppress_diagnostics is True (for alternative matching)
-                if not suppress_diagnostics:
-                    min_log_threshold = max(0.25, effective_threshold - 0.20)  # Log if within 0.20 of threshold or above 0.25
-                    if similarity >= min_log_threshold:
-                        print(f"   ✓ DIAGNOSTIC: match_player - {profile.name}: final_similarity={similarity:.4f} (threshold: {effective_threshold:.2f})")
-                
-                # ENHANCED: Use confidence score for best match selection
-                match_confidence = confidence_score if 'confidence_score' in locals() else similarity
-                
-                if similarity > best_similarity and similarity >= effective_threshold:
-                    best_similarity = similarity
-                    best_confidence = match_confidence
-                    best_match_id = player_id
-                    best_match_name = profile.name
-            except Exception:
-                # If there's an error processing this player, skip it
-                # Don't append anything invalid to all_similarities
+            
+            # Apply team mismatch penalty (soft filter for roster enforcement)
+            penalized = team_mismatch & ~skipped
+            if penalized.any():
+                similarity = np.where(penalized, np.maximum(0.0, similarity - 0.08), similarity)
+                for p in np.flatnonzero(penalized[:3]):
+                    print(f"   ⚠ DIAGNOSTIC: match_player - {index.names[p]}: Applied team penalty (-0.08), similarity: {similarity[p]:.4f}")
+            
+            # Apply same-team boost for roster consistency (helps force matches when similarities are borderline)
+            if team is not None:
+                boosted = (~team_mismatch & ~skipped & (similarity >= effective_threshold - 0.05) &
+                           (similarity < effective_threshold))
+                if boosted.any():
+                    similarity = np.where(boosted, np.minimum(1.0, similarity + 0.02), similarity)
+                    for p in np.flatnonzero(boosted[:3]):
+                        print(f"   ✓ DIAGNOSTIC: match_player - {index.names[p]}: Applied same-team boost (+0.02), similarity: {similarity[p]:.4f}")
+            
+            # Check for NaN or invalid similarity
+            similarity = np.where(np.isfinite(similarity), similarity, 0.0)
+            
+            # Color similarity boost (weighted HSV: hue 50%, saturation 30%, value 20%)
+            dominant_color = _value_at(dominant_colors, i)
+            if dominant_color is not None and index.has_color.any():
+                try:
+                    detection_color = np.asarray(dominant_color, dtype=np.float64).flatten()
+                    hue_diff = np.abs(detection_color[0] - index.colors[:, 0])
+                    hue_diff = np.minimum(hue_diff, 180 - hue_diff)  # Handle wraparound
+                    color_similarity = (0.5 * (1.0 - hue_diff / 90.0) +
+                                        0.3 * (1.0 - np.abs(detection_color[1] - index.colors[:, 1]) / 255.0) +
+                                        0.2 * (1.0 - np.abs(detection_color[2] - index.colors[:, 2]) / 255.0))
+                    color_similarity = np.clip(color_similarity, 0.0, 1.0)
+                    # Only boost if color similarity is good (>= 0.6) to avoid false matches
+                    color_match = index.has_color & (color_similarity >= 0.6)
+                    similarity = np.where(color_match, 0.85 * similarity + 0.15 * color_similarity, similarity)
+                except (IndexError, TypeError, ValueError):
+                    pass  # If color matching fails, continue without color boost
+            
+            # JERSEY NUMBER BOOST (proportional, only if similarity is reasonable)
+            jersey_number = _value_at(jersey_numbers, i)
+            if jersey_number is not None:
+                jersey_boost = index.jersey_boosts(jersey_number)
+                apply = (jersey_boost > 0) & (similarity >= 0.25)
+                similarity = np.where(apply, np.minimum(1.0, similarity * (1.0 + jersey_boost)), similarity)
+            
+            # UNIFORM MATCHING BOOST: Boost matches with same uniform variant
+            uniform_info = _value_at(uniform_info_list, i)
+            if uniform_info is not None:
+                uniform_boost = index.uniform_boosts(uniform_info)
+                apply = (uniform_boost > 0) & (similarity >= 0.25)
+                similarity = np.where(apply, np.minimum(1.0, similarity * (1.0 + uniform_boost)), similarity)
+            
+            # Early-frame priority boost: only when the player was tagged in early frames
+            # AND the current detection is also from early frames
+            if early_tags is not None:
+                apply = early_tags & (similarity >= 0.35)
+                similarity = np.where(apply, np.minimum(1.0, similarity * (1.0 + early_frame_boost)), similarity)
+            
+            similarity[skipped] = 0.0
+            similarity_values = similarity.tolist()
+            all_similarities = list(zip(index.player_ids, index.names, similarity_values))
+            
+            # DIAGNOSTIC: Log final similarity for players close to or above threshold
+            if not suppress_diagnostics:
+                min_log_threshold = max(0.25, effective_threshold - 0.20)
+                for p in scored:
+                    if similarity_values[p] >= min_log_threshold:
+                        print(f"   ✓ DIAGNOSTIC: match_player - {index.names[p]}: final_similarity={similarity_values[p]:.4f} (threshold: {effective_threshold:.2f})")
+            
+            # Return all similarities if requested (for diagnostics)
+            if return_all:
+                results[i] = sorted(all_similarities, key=lambda x: x[2], reverse=True)
                 continue
+            
+            positive = ~skipped & (similarity > 0.0)
+            same_team = positive & ~team_mismatch  # No team info counts as same team (neutral)
+            cross_team = positive & team_mismatch
+            
+            if not suppress_diagnostics and positive.any():
+                sorted_similarities = sorted(all_similarities, key=lambda x: x[2], reverse=True)
+                match_list = ", ".join([f"{name}={sim:.3f}" for _, name, sim in sorted_similarities[:5]])
+                same_team_count = int(np.count_nonzero(same_team & index.has_team)) if team is not None else 0
+                print(f"   🔍 DIAGNOSTIC: match_player - Top matches: {match_list} | "
+                      f"Max: {sorted_similarities[0][2]:.4f} (threshold: {effective_threshold:.2f}), "
+                      f"same-team: {same_team_count}/{int(np.count_nonzero(positive))}, total checked: {len(all_similarities)}")
+            
+            def _best(mask):
+                candidates = np.flatnonzero(mask)
+                if candidates.size == 0:
+                    return None
+                return int(candidates[np.argmax(similarity[candidates])])
+            
+            best_same = _best(same_team)
+            best_cross = _best(cross_team)
+            
+            # ENHANCED: Multi-pass matching for roster enforcement
+            # Pass 1: same-team match meeting threshold
+            # Pass 2: cross-team fallback meeting threshold (team assignment may be uncertain)
+            # Pass 3: best same-team match >= 0.3 (forced matching keeps players tagged to tracks)
+            # Pass 4: best cross-team match >= 0.3
+            for best, min_similarity in ((best_same, effective_threshold), (best_cross, effective_threshold),
+                                         (best_same, 0.3), (best_cross, 0.3)):
+                if best is not None and similarity_values[best] >= min_similarity:
+                    results[i] = (index.player_ids[best], index.names[best], float(similarity_values[best]))
+                    break
         
-        # Return all similarities if requested (for diagnostics)
-        if return_all:
-            return sorted(all_similarities, key=lambda x: x[2], reverse=True)
-        
-        # ENHANCED: Two-pass matching for roster enforcement
-        # Pass 1: Prefer same-team matches (roster constraint enforcement)
-        # Pass 2: Fallback to cross-team if no good same-team match found
-        
-        # DIAGNOSTIC: Log matching results with more detail
-        # Skip diagnostics if suppress_diagnostics is True (for alternative matching)
-        # Only log when there's a meaningful match (similarity > 0) to avoid spam
-        if not suppress_diagnostics and len(all_similarities) > 0:
-            # Sort by similarity for better diagnostics
-            sorted_similarities = sorted(all_similarities, key=lambda x: x[2], reverse=True)
-            max_sim = sorted_similarities[0][2] if sorted_similarities else 0
-            
-            # Only print diagnostic if there's a meaningful match (similarity > 0)
-            # If all similarities are 0.000, that's expected (no gallery data) and doesn't need logging
-            if max_sim > 0:
-                # Log top 5 matches for better visibility
-                top_matches = sorted_similarities[:5]
-                if len(top_matches) > 0:
-                    match_list = ", ".join([f"{name}={sim:.3f}" for _, name, sim in top_matches])
-                    same_team_count = sum(1 for pid, _, sim in all_similarities 
-                                        if sim > 0 and self.players.get(pid) and 
-                                        team is not None and self.players[pid].team == team)
-                    total_checked = len([s for s in all_similarities if s[2] > 0])
-                    print(f"   🔍 DIAGNOSTIC: match_player - Top matches: {match_list} | "
-                          f"Max: {max_sim:.4f} (threshold: {effective_threshold:.2f}), "
-                          f"same-team: {same_team_count}/{total_checked}, total checked: {len(all_similarities)}")
-        
-        # Separate same-team and cross-team matches
-        same_team_matches = []
-        cross_team_matches = []
-        
-        for player_id, player_name, similarity in all_similarities:
-            if similarity <= 0.0:
-                continue  # Skip invalid matches
-            
-            # Check if this is a same-team match
-            profile = self.players.get(player_id)
-            if profile and team is not None and profile.team is not None:
-                if profile.team == team:
-                    same_team_matches.append((player_id, player_name, similarity))
-                else:
-                    cross_team_matches.append((player_id, player_name, similarity))
-            else:
-                # No team info - treat as potential match (neutral)
-                same_team_matches.append((player_id, player_name, similarity))
-        
-        # Sort by similarity (highest first)
-        same_team_matches.sort(key=lambda x: x[2], reverse=True)
-        cross_team_matches.sort(key=lambda x: x[2], reverse=True)
-        
-        # Pass 1: Check for same-team matches that meet threshold
-        if same_team_matches and same_team_matches[0][2] >= effective_threshold:
-            best_match_id, best_match_name, best_similarity = same_team_matches[0]
-            similarity_float = float(best_similarity) if isinstance(best_similarity, (np.floating, np.ndarray)) else best_similarity
-            return (best_match_id, best_match_name, similarity_float)
-        
-        # Pass 2: Fallback to cross-team matches if no good same-team match
-        # This allows player identification when team assignment is uncertain
-        # but still enforces roster constraints when team info is reliable
-        if cross_team_matches and cross_team_matches[0][2] >= effective_threshold:
-            best_match_id, best_match_name, best_similarity = cross_team_matches[0]
-            similarity_float = float(best_similarity) if isinstance(best_similarity, (np.floating, np.ndarray)) else best_similarity
-            return (best_match_id, best_match_name, similarity_float)
-        
-        # Pass 3: If no match meets threshold, return best available (for forced matching)
-        # This helps keep players tagged to tracks even when similarities are low
-        # Prefer same-team matches even if below threshold (roster enforcement)
-        if same_team_matches:
-            best_match_id, best_match_name, best_similarity = same_team_matches[0]
-            # Only return if similarity is reasonable (>= 0.3) to avoid very wrong matches
-            if best_similarity >= 0.3:
-                similarity_float = float(best_similarity) if isinstance(best_similarity, (np.floating, np.ndarray)) else best_similarity
-                return (best_match_id, best_match_name, similarity_float)
-        
-        # Final fallback: cross-team match if reasonable
-        if cross_team_matches and cross_team_matches[0][2] >= 0.3:
-            best_match_id, best_match_name, best_similarity = cross_team_matches[0]
-            similarity_float = float(best_similarity) if isinstance(best_similarity, (np.floating, np.ndarray)) else best_similarity
-            return (best_match_id, best_match_name, similarity_float)
-        
-        # No reasonable match found
-        return (None, None, 0.0)
+        return results
     
     def get_player(self, player_id: str) -> Optional[PlayerProfile]:
         """Get a player profile by ID"""
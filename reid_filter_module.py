@@ -193,17 +193,91 @@ class ReIDFilterModule:
             if confidences is None:
                 confidences = np.ones(len(bboxes))
         
-        quality_mask = np.zeros(len(bboxes), dtype=bool)
-        
-        for i, bbox in enumerate(bboxes):
-            confidence = float(confidences[i]) if i < len(confidences) else 1.0
-            passed, reason = self.filter_detection(frame, bbox, confidence)
-            quality_mask[i] = passed
-        
+        quality_mask = self.filter_mask(frame, bboxes, confidences)
         filtered_detections = bboxes[quality_mask]
         
         return filtered_detections, quality_mask
     
+    def filter_mask(self,
+                    frame: np.ndarray,
+                    bboxes: np.ndarray,
+                    confidences: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Boolean pass mask for a frame's boxes (same checks and statistics as filter_detection).
+        
+        Size and confidence checks are vectorized; blur/contrast are only computed for the
+        boxes that pass them, from a single grayscale conversion per crop.
+        
+        Args:
+            frame: Full frame image (BGR)
+            bboxes: Array of bounding boxes (N x 4)
+            confidences: Optional array of confidence scores (N,)
+        
+        Returns:
+            Boolean array (N,) - True where the detection passed
+        """
+        bboxes = np.asarray(bboxes, dtype=np.float64).reshape(-1, 4)
+        n = len(bboxes)
+        self.stats['total_checked'] += n
+        if n == 0:
+            return np.zeros(0, dtype=bool)
+        
+        conf = np.ones(n, dtype=np.float64)
+        if confidences is not None:
+            confidences = np.asarray(confidences, dtype=np.float64).reshape(-1)
+            m = min(n, len(confidences))
+            conf[:m] = confidences[:m]
+        
+        boxes = np.trunc(bboxes).astype(np.int64)  # int() truncation like filter_detection
+        width = boxes[:, 2] - boxes[:, 0]
+        height = boxes[:, 3] - boxes[:, 1]
+        
+        # Same order of checks as filter_detection (first failing check is counted)
+        remaining = np.ones(n, dtype=bool)
+        for stat, failed in (('filtered_bbox_too_small', width * height < self.min_bbox_area),
+                             ('filtered_bbox_too_small', width < self.min_bbox_width),
+                             ('filtered_bbox_too_short', height < self.min_bbox_height),
+                             ('filtered_low_confidence', conf < self.min_confidence)):
+            hit = remaining & failed
+            self.stats[stat] += int(hit.sum())
+            remaining &= ~failed
+        
+        frame_h, frame_w = frame.shape[:2]
+        x1 = np.maximum(boxes[:, 0], 0)
+        y1 = np.maximum(boxes[:, 1], 0)
+        x2 = np.minimum(boxes[:, 2], frame_w)
+        y2 = np.minimum(boxes[:, 3], frame_h)
+        
+        for i in np.flatnonzero(remaining):
+            crop = frame[y1[i]:y2[i], x1[i]:x2[i]]
+            if crop.size == 0 or crop.shape[0] < 5 or crop.shape[1] < 5:
+                self.stats['filtered_invalid_crop'] += 1
+                remaining[i] = False
+                continue
+            
+            if self.enable_blur_check or self.enable_contrast_check:
+                try:
+                    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+                except Exception as e:
+                    logger.warning(f"Blur/contrast check failed: {e}")
+                    gray = None
+                
+                if gray is not None and self.enable_blur_check:
+                    if cv2.Laplacian(gray, cv2.CV_64F).var() < self.max_blur_threshold:
+                        self.stats['filtered_too_blurry'] += 1
+                        remaining[i] = False
+                        continue
+                
+                if gray is not None and self.enable_contrast_check:
+                    if np.std(gray) < self.min_contrast_threshold:
+                        self.stats['filtered_low_contrast'] += 1
+                        remaining[i] = False
+                        continue
+        
+        # Occlusion is only checked when a ratio is supplied (not available in batch mode)
+        self.stats['passed'] += int(remaining.sum())
+        return remaining
+    
     def is_feature_quality_sufficient(self, features: np.ndarray) -> bool:
         """
         Check if extracted features are of sufficient quality
@@ -9,8 +9,9 @@ import cv2
 import numpy as np
 import torch
 import torch.nn as nn
-from typing import Dict, List, Tuple, Optional
+from typing import Any, Dict, List, Tuple, Optional
 from collections import defaultdict
+from collections.abc import Mapping
 import os
 import json
 
@@ -88,6 +89,206 @@ class SimpleFeatureExtractor(nn.Module):
         return x
 
 
+class TrackFeatureStore:
+    """
+    Per-track Re-ID history in preallocated NumPy ring buffers.
+    
+    Each track owns one slot of a (max_tracks, history, feature_dim) float32 array with
+    parallel (max_tracks, history) arrays for frame, confidence and quality, plus a small
+    position ring for motion verification. Slots are recycled when tracks are removed and
+    the arrays grow (doubling) when more tracks are alive than max_tracks.
+    """
+    
+    def __init__(self, history: int = 50, max_tracks: int = 64, position_history: int = 20):
+        self.history = max(1, int(history))
+        self.position_history = max(1, int(position_history))
+        self.feature_dim: Optional[int] = None
+        self._slots: Dict[int, int] = {}  # track_id -> slot
+        self._free: List[int] = []
+        self._allocate(max(1, int(max_tracks)))
+    
+    def _allocate(self, capacity: int):
+        h, ph = self.history, self.position_history
+        dim = self.feature_dim or 1
+        self.features = np.zeros((capacity, h, dim), dtype=np.float32)
+        self.frames = np.full((capacity, h), -1, dtype=np.int64)
+        self.confidence = np.zeros((capacity, h), dtype=np.float32)
+        self.quality = np.zeros((capacity, h), dtype=np.float32)
+        self.count = np.zeros(capacity, dtype=np.int32)
+        self.head = np.zeros(capacity, dtype=np.int32)  # Next write position
+        self.positions = np.zeros((capacity, ph, 3), dtype=np.float64)  # (x, y, frame)
+        self.position_count = np.zeros(capacity, dtype=np.int32)
+        self.position_head = np.zeros(capacity, dtype=np.int32)
+        self.velocity = np.zeros((capacity, 2), dtype=np.float64)
+        self.has_velocity = np.zeros(capacity, dtype=bool)
+        self._free = list(range(capacity - 1, -1, -1))
+        self._slots = {}
+    
+    def _grow(self):
+        old = (self.features, self.frames, self.confidence, self.quality, self.count, self.head,
+               self.positions, self.position_count, self.position_head, self.velocity, self.has_velocity)
+        old_capacity = len(self.count)
+        slots = self._slots
+        self._allocate(old_capacity * 2)
+        for new, prev in zip((self.features, self.frames, self.confidence, self.quality, self.count, self.head,
+                              self.positions, self.position_count, self.position_head, self.velocity,
+                              self.has_velocity), old):
+            new[:old_capacity] = prev
+        self._slots = slots
+        self._free = list(range(len(self.count) - 1, old_capacity - 1, -1))
+    
+    def __contains__(self, track_id) -> bool:
+        return track_id in self._slots
+    
+    def __len__(self) -> int:
+        return len(self._slots)
+    
+    def track_ids(self) -> List[int]:
+        return list(self._slots.keys())
+    
+    def slot(self, track_id: int) -> Optional[int]:
+        return self._slots.get(track_id)
+    
+    def _get_or_create_slot(self, track_id: int) -> int:
+        slot = self._slots.get(track_id)
+        if slot is None:
+            if not self._free:
+                self._grow()
+            slot = self._free.pop()
+            self.count[slot] = 0
+            self.head[slot] = 0
+            self.position_count[slot] = 0
+            self.position_head[slot] = 0
+            self.has_velocity[slot] = False
+            self._slots[track_id] = slot
+        return slot
+    
+    def add_feature(self, track_id: int, feature: np.ndarray, frame: int = -1,
+                    confidence: float = 0.5, quality: float = 0.5):
+        """Append one sample (the oldest is overwritten once the ring is full)"""
+        dim = feature.shape[-1]
+        if self.feature_dim != dim:
+            if self.feature_dim is not None and self._slots:
+                logger.warning(f"Re-ID feature dimension changed ({self.feature_dim} -> {dim}), clearing track history")
+            self.feature_dim = dim
+            self._allocate(len(self.count))
+        slot = self._get_or_create_slot(track_id)
+        pos = self.head[slot]
+        self.features[slot, pos] = feature
+        self.frames[slot, pos] = frame
+        self.confidence[slot, pos] = confidence
+        self.quality[slot, pos] = quality
+        self.head[slot] = (pos + 1) % self.history
+        if self.count[slot] < self.history:
+            self.count[slot] += 1
+    
+    def add_position(self, track_id: int, x: float, y: float, frame: int = -1, velocity_window: int = 5):
+        """Append a position and update the track velocity (mean step over the last velocity_window positions)"""
+        slot = self._get_or_create_slot(track_id)
+        pos = self.position_head[slot]
+        self.positions[slot, pos] = (x, y, frame)
+        self.position_head[slot] = (pos + 1) % self.position_history
+        if self.position_count[slot] < self.position_history:
+            self.position_count[slot] += 1
+        n = min(int(self.position_count[slot]), velocity_window)
+        if n >= 2:
+            # Mean of consecutive differences = (newest - oldest) / (n - 1)
+            newest = self.positions[slot, (self.position_head[slot] - 1) % self.position_history]
+            oldest = self.positions[slot, (self.position_head[slot] - n) % self.position_history]
+            self.velocity[slot] = (newest[:2] - oldest[:2]) / (n - 1)
+            self.has_velocity[slot] = True
+    
+    def _recent_index(self, slots: np.ndarray, last_n: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Ring positions of the last_n samples of each slot, oldest first.
+        
+        Returns:
+            (index (S, last_n), valid (S, last_n)) - rows are left-padded when a track has fewer samples
+        """
+        last_n = max(1, min(last_n, self.history))
+        counts = np.minimum(self.count[slots], last_n)
+        k = np.arange(last_n)[None, :] - (last_n - counts[:, None])  # 0..counts-1 for valid columns
+        valid = k >= 0
+        index = (self.head[slots][:, None] - counts[:, None] + k) % self.history
+        return index, valid
+    
+    def recent(self, track_id: int, last_n: Optional[int] = None) -> np.ndarray:
+        """Stored features of a track, oldest first (n, feature_dim)"""
+        slot = self._slots.get(track_id)
+        if slot is None or self.count[slot] == 0:
+            return np.zeros((0, self.feature_dim or 0), dtype=np.float32)
+        index, valid = self._recent_index(np.array([slot]), last_n or self.history)
+        return self.features[slot, index[0][valid[0]]]
+    
+    def sample_count(self, track_id: int) -> int:
+        slot = self._slots.get(track_id)
+        return int(self.count[slot]) if slot is not None else 0
+    
+    def mean_feature(self, track_id: int) -> Optional[np.ndarray]:
+        feats = self.recent(track_id)
+        return feats.mean(axis=0) if len(feats) else None
+    
+    def last_position(self, track_id: int) -> Optional[Tuple[float, float, int]]:
+        slot = self._slots.get(track_id)
+        if slot is None or self.position_count[slot] == 0:
+            return None
+        x, y, frame = self.positions[slot, (self.position_head[slot] - 1) % self.position_history]
+        return float(x), float(y), int(frame)
+    
+    def get_velocity(self, track_id: int) -> Optional[Tuple[float, float]]:
+        slot = self._slots.get(track_id)
+        if slot is None or not self.has_velocity[slot]:
+            return None
+        return float(self.velocity[slot, 0]), float(self.velocity[slot, 1])
+    
+    def history_block(self, track_ids: List[int], last_n: int):
+        """
+        Last last_n samples of several tracks as dense arrays (oldest first).
+        
+        Returns:
+            (features (M, last_n, dim) float64, confidence (M, last_n), quality (M, last_n), valid (M, last_n))
+        """
+        slots = np.array([self._slots[tid] for tid in track_ids], dtype=np.intp)
+        index, valid = self._recent_index(slots, last_n)
+        rows = slots[:, None]
+        return (self.features[rows, index].astype(np.float64),
+                self.confidence[rows, index].astype(np.float64),
+                self.quality[rows, index].astype(np.float64),
+                valid)
+    
+    def remove(self, track_id: int):
+        slot = self._slots.pop(track_id, None)
+        if slot is not None:
+            self.count[slot] = 0
+            self.position_count[slot] = 0
+            self.has_velocity[slot] = False
+            self._free.append(slot)
+    
+    def clear(self):
+        self._allocate(len(self.count))
+
+
+class _TrackFeaturesView(Mapping):
+    """Read-only track_id -> (n, feature_dim) view of a TrackFeatureStore (oldest sample first)"""
+    
+    def __init__(self, store: TrackFeatureStore):
+        self._store = store
+    
+    def __getitem__(self, track_id):
+        if track_id not in self._store:
+            raise KeyError(track_id)
+        return self._store.recent(track_id)
+    
+    def __contains__(self, track_id):
+        return track_id in self._store
+    
+    def __iter__(self):
+        return iter(self._store.track_ids())
+    
+    def __len__(self):
+        return len(self._store)
+
+
 class ReIDTracker:
     """
     Re-ID Tracker for maintaining player identities using feature embeddings
@@ -97,6 +298,9 @@ class ReIDTracker:
     during occlusions and temporary detection loss.
     """
     
+    REID_INPUT_SIZE = (64, 128)  # (width, height) of crops fed to the backbone
+    REID_MAX_BATCH = 256  # Max crops per forward pass (extract_features / extract_features_batch)
+    
     def __init__(self, 
                  feature_dim=128,
                  similarity_threshold=0.5,
@@ -144,20 +348,18 @@ class ReIDTracker:
             device = self._detect_device()
         self.device = device
         
-        # Store features for each track ID
-        self.track_features: Dict[int, List[np.ndarray]] = defaultdict(list)
-        
-        # ENHANCED: Store track history with metadata (frame_num, confidence, quality)
-        self.track_history: Dict[int, List[Dict]] = defaultdict(list)  # track_id -> [{'feature': ..., 'frame': ..., 'confidence': ..., 'quality': ...}, ...]
-        self.max_history_length = 10  # Keep last 10 features with metadata
+        # PERFORMANCE: Per-track features, sample metadata (frame, confidence, quality) and positions
+        # live in preallocated ring buffers instead of per-sample Python lists/dicts
+        self.track_store = TrackFeatureStore(history=max_features_per_track, position_history=20)
+        self.track_features = _TrackFeaturesView(self.track_store)  # track_id -> (n, feature_dim), read-only
+        self.max_history_length = 10  # Last 10 samples (with confidence/quality) used for history matching
         
         # ENHANCED: Multi-frame verification - track match history per track
         self.track_match_history: Dict[int, List[Tuple[str, float, int]]] = defaultdict(list)  # track_id -> [(player_id, similarity, frame_num), ...]
         self.verification_frames_required = 2  # Require 2-3 consistent matches
         
-        # ENHANCED: Track positions and velocities for motion verification
-        self.track_positions: Dict[int, List[Tuple[float, float, int]]] = defaultdict(list)  # track_id -> [(x, y, frame_num), ...]
-        self.track_velocities: Dict[int, Tuple[float, float]] = {}  # track_id -> (vx, vy)
+        # ENHANCED: Track positions and velocities for motion verification are kept in track_store
+        # (last 20 positions, velocity = mean step over the last 5)
         
         # Store color features for each track ID (team color, ball color)
         self.track_color_features: Dict[int, Dict[str, np.ndarray]] = defaultdict(dict)
@@ -743,7 +945,8 @@ class ReIDTracker:
         # This method exists for clarity and consistency with jersey/foot features
         return self.extract_features(frame, detections)
     
-    def extract_features(self, frame: np.ndarray, detections, team_colors=None, ball_colors=None) -> np.ndarray:
+    def extract_features(self, frame: np.ndarray, detections, team_colors=None, ball_colors=None,
+                         reuse: Optional[Tuple[Any, np.ndarray]] = None) -> np.ndarray:
         """
         Extract features from bounding boxes in the frame
         
@@ -752,85 +955,180 @@ class ReIDTracker:
             detections: Supervision Detections object with bounding boxes
             team_colors: Optional team color configuration for color feature extraction
             ball_colors: Optional ball color configuration for color feature extraction
+            reuse: Optional (detections, features) for the same frame from extract_features_batch.
+                   Detections that clamp to the same crop as one of those boxes take its
+                   feature instead of being embedded again.
             
         Returns:
             features: Array of shape (N, feature_dim) where N is number of detections
         """
         if len(detections) == 0:
             return np.array([])
+        valid_indices, crop_boxes = self._select_reid_crops(frame, detections)
+        if not valid_indices:
+            return np.array([])
+        
+        known = self._reusable_features(frame, reuse) if reuse is not None else {}
+        missing = [slot for slot, box in enumerate(crop_boxes) if box not in known]
+        features = self._embed_crops([frame], [[crop_boxes[slot] for slot in missing]]) if missing else None
+        
+        # Create full feature array (with NaN for invalid detections)
+        # Map back to original detection indices (accounting for filter module)
+        full_features = np.full((len(detections), self.feature_dim), np.nan, dtype=np.float32)
+        for slot, box in enumerate(crop_boxes):
+            row = known.get(box)
+            if row is not None and len(row) == self.feature_dim:
+                full_features[valid_indices[slot]] = row
+        if features is not None:
+            if features.ndim == 2 and features.shape[1] == self.feature_dim:
+                rows = [valid_indices[slot] for slot in missing[:len(features)]]
+                full_features[rows] = features[:len(rows)]
+            else:
+                # Dimension mismatch - skip these features
+                print(f"⚠ Feature dimension mismatch: expected {self.feature_dim}, got {features.shape[-1]}")
+        return full_features
+    
+    def extract_features_batch(self, frames: List[np.ndarray], detections_list: List) -> List[np.ndarray]:
+        """
+        Extract Re-ID features for several frames (e.g. one YOLO batch) with one forward pass.
+        
+        Args:
+            frames: Input frames (BGR format)
+            detections_list: Supervision Detections object (or None) per frame
+            
+        Returns:
+            List of feature arrays, one per frame: (N_i, feature_dim) with NaN rows for
+            detections that were filtered out, or np.array([]) when a frame has none
+        """
+        # PERFORMANCE: Collect crops of every frame first so the backbone sees one large batch
+        # instead of per-frame micro-batches of 10-20 crops
+        per_frame = []
+        for frame, detections in zip(frames, detections_list):
+            if detections is None or len(detections) == 0:
+                per_frame.append(([], []))
+            else:
+                per_frame.append(self._select_reid_crops(frame, detections))
+        features = self._embed_crops(frames, [crop_boxes for _, crop_boxes in per_frame])
+        
+        results = []
+        offset = 0
+        for detections, (valid_indices, _) in zip(detections_list, per_frame):
+            if not valid_indices:
+                results.append(np.array([]))
+                continue
+            full_features = np.full((len(detections), self.feature_dim), np.nan, dtype=np.float32)
+            frame_features = features[offset:offset + len(valid_indices)]
+            offset += len(valid_indices)
+            if frame_features.ndim == 2 and frame_features.shape[1] == self.feature_dim:
+                full_features[valid_indices[:len(frame_features)]] = frame_features
+            else:
+                # Dimension mismatch - skip these features
+                print(f"⚠ Feature dimension mismatch: expected {self.feature_dim}, got {frame_features.shape[-1]}")
+            results.append(full_features)
+        return results
+    
+    def _embed_crops(self, frames: List[np.ndarray],
+                     crop_boxes_list: List[List[Tuple[int, int, int, int]]]) -> Optional[np.ndarray]:
+        """
+        Embed clamped crops (per frame) in one go: (total crops, feature_dim), or None when there are none.
+        
+        Every crop is resized straight into a reusable uint8 buffer, normalized once on the
+        device and run through the backbone in chunks of REID_MAX_BATCH crops.
+        """
+        total = sum(len(crop_boxes) for crop_boxes in crop_boxes_list)
+        if total == 0:
+            return None
+        buffer = self._get_crop_buffer(total)
+        slot = 0
+        for frame, crop_boxes in zip(frames, crop_boxes_list):
+            for x1, y1, x2, y2 in crop_boxes:
+                cv2.resize(frame[y1:y2, x1:x2], self.REID_INPUT_SIZE, dst=buffer[slot])
+                slot += 1
+        
+        chunks = []
+        with torch.no_grad():
+            for start in range(0, total, self.REID_MAX_BATCH):
+                stop = min(total, start + self.REID_MAX_BATCH)
+                # Transfer uint8 and normalize on the target device (4x less data to copy)
+                crops_tensor = torch.from_numpy(buffer[start:stop]).to(self.device)
+                crops_tensor = crops_tensor.permute(0, 3, 1, 2).float().div_(255.0)
+                chunks.append(self._run_feature_extractor(crops_tensor))
+        features = chunks[0] if len(chunks) == 1 else np.concatenate(chunks, axis=0)
+        
+        # Get actual feature dimension from extracted features
+        # OSNet outputs 512-dimensional features, not 128
+        if len(features) > 0 and features.ndim == 2 and features.shape[1] != self.feature_dim:
+            self.feature_dim = features.shape[1]
+        return features
+    
+    def _reusable_features(self, frame: np.ndarray, reuse: Tuple[Any, np.ndarray]) -> Dict[Tuple[int, int, int, int], np.ndarray]:
+        """Clamped crop box -> feature for the embedded rows of an extract_features_batch result"""
+        batch_detections, batch_features = reuse
+        if batch_detections is None or batch_features is None or len(batch_features) == 0:
+            return {}
+        _, clamped = self._clamp_boxes(frame, batch_detections.xyxy)
+        known = {}
+        for row, box in enumerate(clamped[:len(batch_features)]):
+            if np.isfinite(batch_features[row]).all():
+                known[tuple(int(v) for v in box)] = batch_features[row]
+        return known
+    
+    def _clamp_boxes(self, frame: np.ndarray, xyxy) -> Tuple[np.ndarray, np.ndarray]:
+        """Truncate boxes to pixels and clamp them to the frame: (boxes (N, 4), clamped (N, 4))"""
+        frame_h, frame_w = frame.shape[:2]
+        boxes = np.trunc(np.asarray(xyxy, dtype=np.float64).reshape(-1, 4)).astype(np.int64)
+        x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+        
+        # Clamp coordinates to frame boundaries (handle out-of-bounds gracefully)
+        # CRITICAL FIX: Ensure boxes don't collapse to 1 pixel after clamping
+        x1c = np.clip(x1, 0, max(0, frame_w - 2))  # Leave room for at least 2px width
+        y1c = np.clip(y1, 0, max(0, frame_h - 2))  # Leave room for at least 2px height
+        x2c = np.maximum(x1c + 1, np.minimum(x2, frame_w))  # Ensure x2 > x1
+        y2c = np.maximum(y1c + 1, np.minimum(y2, frame_h))  # Ensure y2 > y1
+        return boxes, np.stack([x1c, y1c, x2c, y2c], axis=1)
+    
+    def _select_reid_crops(self, frame: np.ndarray, detections) -> Tuple[List[int], List[Tuple[int, int, int, int]]]:
+        """
+        Filter and clamp one frame's boxes for Re-ID.
+        
+        Returns:
+            (valid_indices, clamped boxes (x1, y1, x2, y2)) for the detections to embed
+        """
+        xyxy = np.asarray(detections.xyxy, dtype=np.float64).reshape(-1, 4)
+        n = len(xyxy)
         
         # NEW: Pre-filter detections using filter module
         if self.filter_module is not None:
-            # Get confidences if available
             confidences = detections.confidence if hasattr(detections, 'confidence') else None
-            
-            # Filter detections - create quality mask
-            quality_mask = np.ones(len(detections), dtype=bool)
-            for i, bbox in enumerate(detections.xyxy):
-                confidence = float(confidences[i]) if confidences is not None and i < len(confidences) else 1.0
-                passed, reason = self.filter_module.filter_detection(frame, bbox, confidence)
-                quality_mask[i] = passed
-            
-            # Only process filtered detections
+            quality_mask = self.filter_module.filter_mask(frame, xyxy, confidences)
             if not np.any(quality_mask):
-                return np.array([])
-            
-            # Create filtered indices list
-            filtered_indices = np.where(quality_mask)[0].tolist()
+                return [], []
         else:
-            filtered_indices = list(range(len(detections)))
-        
-        # Extract crops from bounding boxes (only for filtered detections)
-        crops = []
-        valid_indices = []
-        rejection_reasons = []  # Track why boxes were rejected (for diagnostics)
+            quality_mask = np.ones(n, dtype=bool)
         
         frame_h, frame_w = frame.shape[:2]
-        
-        for i in filtered_indices:
-            x1, y1, x2, y2 = detections.xyxy[i]
-            x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
-            
-            # DIAGNOSTIC: Track rejection reasons
-            rejection_reason = None
-            
-            # First check for obviously invalid boxes
-            if not (x2 > x1 and y2 > y1):
-                rejection_reason = f"invalid_size(w={x2-x1},h={y2-y1},orig=({x1},{y1},{x2},{y2}))"
-            else:
-                # Clamp coordinates to frame boundaries (handle out-of-bounds gracefully)
-                # CRITICAL FIX: Ensure boxes don't collapse to 1 pixel after clamping
-                # Clamp x1 and y1 to valid range
-                x1_clamped = max(0, min(x1, frame_w - 2))  # Leave room for at least 2px width
-                y1_clamped = max(0, min(y1, frame_h - 2))  # Leave room for at least 2px height
-                # Clamp x2 and y2, but ensure they're > x1/y1
-                x2_clamped = max(x1_clamped + 1, min(x2, frame_w))  # Ensure x2 > x1
-                y2_clamped = max(y1_clamped + 1, min(y2, frame_h))  # Ensure y2 > y1
-                
-                # Final validation: ensure box is still valid after clamping
-                if x2_clamped <= x1_clamped or y2_clamped <= y1_clamped:
-                    rejection_reason = f"collapsed_after_clamp(x:{x1_clamped}->{x2_clamped},y:{y1_clamped}->{y2_clamped})"
+        boxes, clamped = self._clamp_boxes(frame, xyxy)
+        x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+        x1c, y1c, x2c, y2c = clamped[:, 0], clamped[:, 1], clamped[:, 2], clamped[:, 3]
+        crop_w = np.minimum(x2c, frame_w) - x1c
+        crop_h = np.minimum(y2c, frame_h) - y1c
+        
+        invalid_size = ~((x2 > x1) & (y2 > y1))
+        too_small = ~invalid_size & ((crop_h < 10) | (crop_w < 10))
+        valid = quality_mask & ~invalid_size & ~too_small
+        
+        # DIAGNOSTIC: Log rejection stats when many boxes are rejected (> 50%)
+        rejected = quality_mask & ~valid
+        if rejected.sum() > n * 0.5:
+            rejection_reasons = []
+            for i in np.flatnonzero(rejected):
+                if invalid_size[i]:
+                    reason = f"invalid_size(w={x2[i]-x1[i]},h={y2[i]-y1[i]},orig=({x1[i]},{y1[i]},{x2[i]},{y2[i]}))"
                 else:
-                    crop = frame[y1_clamped:y2_clamped, x1_clamped:x2_clamped]
-                    if crop.size == 0:
-                        rejection_reason = f"empty_crop(size=0)"
-                    elif crop.shape[0] < 10 or crop.shape[1] < 10:
-                        rejection_reason = f"too_small(h={crop.shape[0]},w={crop.shape[1]},orig=({x1},{y1},{x2},{y2}),clamped=({x1_clamped},{y1_clamped},{x2_clamped},{y2_clamped}))"
-                    else:
-                        # Valid crop!
-                        try:
-                            crop_resized = cv2.resize(crop, (64, 128))  # Smaller for speed
-                            crops.append(crop_resized)
-                            valid_indices.append(i)
-                        except Exception as e:
-                            rejection_reason = f"resize_failed({str(e)})"
-            
-            if rejection_reason:
-                rejection_reasons.append((i, rejection_reason))
-        
-        # DIAGNOSTIC: Log rejection stats on first call or when many rejected
-        if len(rejection_reasons) > len(detections) * 0.5:  # > 50% rejected
-            print(f"\n⚠ Re-ID Feature Extraction: {len(rejection_reasons)}/{len(detections)} detections rejected:")
+                    reason = (f"too_small(h={crop_h[i]},w={crop_w[i]},orig=({x1[i]},{y1[i]},{x2[i]},{y2[i]}),"
+                              f"clamped=({x1c[i]},{y1c[i]},{x2c[i]},{y2c[i]}))")
+                rejection_reasons.append((int(i), reason))
+            print(f"\n⚠ Re-ID Feature Extraction: {len(rejection_reasons)}/{n} detections rejected:")
             reason_counts = {}
             for _, reason in rejection_reasons:
                 reason_type = reason.split('(')[0]
@@ -840,68 +1138,51 @@ class ReIDTracker:
             # Show first few examples
             print(f"   Examples: {', '.join([f'#{i}: {r}' for i, r in rejection_reasons[:3]])}")
         
-        if len(crops) == 0:
-            return np.array([])
-        
-        # Convert to tensor
-        crops_array = np.array(crops)
-        crops_tensor = torch.from_numpy(crops_array).permute(0, 3, 1, 2).float() / 255.0
-        crops_tensor = crops_tensor.to(self.device)
-        
-        # Extract features
-        with torch.no_grad():
-            # BoxMOT backend: Try calling directly first, then fall back to .model
-            if self.feature_extractor is None:
-                raise RuntimeError("Feature extractor is None")
-            
-            try:
-                # First try: Call backend directly (ReidAutoBackend should be callable)
-                if callable(self.feature_extractor):
-                    features = self.feature_extractor(crops_tensor)  # type: ignore[reportCallIssue]
-                else:
-                    raise TypeError("Feature extractor is not callable")
-            except (TypeError, AttributeError):
-                # Fallback: Try accessing .model attribute
-                if hasattr(self.feature_extractor, 'model') and self.feature_extractor.model is not None:
-                    if callable(self.feature_extractor.model):
-                        features = self.feature_extractor.model(crops_tensor)  # type: ignore[reportCallIssue]
-                    elif hasattr(self.feature_extractor.model, 'forward'):
-                        features = self.feature_extractor.model.forward(crops_tensor)
-                    else:
-                        raise RuntimeError("BoxMOT backend model is not callable")
-                elif hasattr(self.feature_extractor, 'forward'):
-                    features = self.feature_extractor.forward(crops_tensor)
-                else:
-                    raise RuntimeError("Could not determine how to call feature extractor")
-            
-            # Convert to numpy (handle both tensor and numpy output)
-            if isinstance(features, torch.Tensor):
-                features = features.cpu().numpy()
-            elif not isinstance(features, np.ndarray):
-                features = np.array(features)
-        
-        # Get actual feature dimension from extracted features
-        # OSNet outputs 512-dimensional features, not 128
-        if len(features) > 0:
-            actual_feature_dim = features.shape[1]
-            # Update self.feature_dim if it doesn't match (for torchreid models)
-            if actual_feature_dim != self.feature_dim:
-                self.feature_dim = actual_feature_dim
+        valid_indices = np.flatnonzero(valid).tolist()
+        crop_boxes = [(int(x1c[i]), int(y1c[i]), int(x2c[i]), int(y2c[i])) for i in valid_indices]
+        return valid_indices, crop_boxes
+    
+    def _get_crop_buffer(self, count: int) -> np.ndarray:
+        """Reusable uint8 crop buffer (N, H, W, 3) with room for at least count crops"""
+        buffer = getattr(self, '_crop_buffer', None)
+        if buffer is None or len(buffer) < count:
+            capacity = max(32, 1 << (max(1, count) - 1).bit_length())
+            buffer = np.empty((capacity, self.REID_INPUT_SIZE[1], self.REID_INPUT_SIZE[0], 3), dtype=np.uint8)
+            self._crop_buffer = buffer
+        return buffer
+    
+    def _run_feature_extractor(self, crops_tensor):
+        """One forward pass of the Re-ID backbone (returns numpy features)"""
+        # BoxMOT backend: Try calling directly first, then fall back to .model
+        if self.feature_extractor is None:
+            raise RuntimeError("Feature extractor is None")
         
-        # Create full feature array (with NaN for invalid detections)
-        # Use detected feature dimension (now updated in self.feature_dim)
-        # Map back to original detection indices (accounting for filter module)
-        full_features = np.full((len(detections), self.feature_dim), np.nan, dtype=np.float32)
-        for idx, valid_idx in enumerate(valid_indices):
-            if idx < len(features):
-                # Ensure feature dimension matches
-                if features[idx].shape[0] == self.feature_dim:
-                    full_features[valid_idx] = features[idx]
+        try:
+            # First try: Call backend directly (ReidAutoBackend should be callable)
+            if callable(self.feature_extractor):
+                features = self.feature_extractor(crops_tensor)  # type: ignore[reportCallIssue]
+            else:
+                raise TypeError("Feature extractor is not callable")
+        except (TypeError, AttributeError):
+            # Fallback: Try accessing .model attribute
+            if hasattr(self.feature_extractor, 'model') and self.feature_extractor.model is not None:
+                if callable(self.feature_extractor.model):
+                    features = self.feature_extractor.model(crops_tensor)  # type: ignore[reportCallIssue]
+                elif hasattr(self.feature_extractor.model, 'forward'):
+                    features = self.feature_extractor.model.forward(crops_tensor)
                 else:
-                    # Dimension mismatch - skip this feature
-                    print(f"⚠ Feature dimension mismatch: expected {self.feature_dim}, got {features[idx].shape[0]}")
-        
-        return full_features
+                    raise RuntimeError("BoxMOT backend model is not callable")
+            elif hasattr(self.feature_extractor, 'forward'):
+                features = self.feature_extractor.forward(crops_tensor)
+            else:
+                raise RuntimeError("Could not determine how to call feature extractor")
+        
+        # Convert to numpy (handle both tensor and numpy output)
+        if isinstance(features, torch.Tensor):
+            features = features.cpu().numpy()
+        elif not isinstance(features, np.ndarray):
+            features = np.array(features)
+        return features
     
     def update_tracks(self, track_ids: List[Optional[int]], features: np.ndarray, 
                      color_features: Optional[Dict] = None,
@@ -923,43 +1204,21 @@ class ReIDTracker:
         """
         for i, (track_id, feature) in enumerate(zip(track_ids, features)):
             if track_id is not None and not np.isnan(feature).any():
-                # Add visual feature to track's history
-                self.track_features[track_id].append(feature.copy())
-                
-                # ENHANCED: Store track history with metadata
-                history_entry = {
-                    'feature': feature.copy(),
-                    'frame': frame_num if frame_num is not None else -1,
-                    'confidence': float(confidences[i]) if confidences is not None and i < len(confidences) else 0.5,
-                    'quality': float(quality_scores[i]) if quality_scores is not None and i < len(quality_scores) else 0.5
-                }
-                self.track_history[track_id].append(history_entry)
+                # Add visual feature with its metadata to the track's ring buffer
+                # (oldest sample is overwritten after max_features_per_track samples)
+                self.track_store.add_feature(
+                    track_id, feature,
+                    frame=frame_num if frame_num is not None else -1,
+                    confidence=float(confidences[i]) if confidences is not None and i < len(confidences) else 0.5,
+                    quality=float(quality_scores[i]) if quality_scores is not None and i < len(quality_scores) else 0.5
+                )
                 
                 # ENHANCED: Update track positions for motion verification
                 if positions is not None and i < len(positions):
                     pos = positions[i]
                     if len(pos) >= 2:
-                        self.track_positions[track_id].append((float(pos[0]), float(pos[1]), frame_num if frame_num is not None else -1))
-                        # Keep last 20 positions
-                        if len(self.track_positions[track_id]) > 20:
-                            self.track_positions[track_id].pop(0)
-                        
-                        # Calculate velocity from recent positions
-                        if len(self.track_positions[track_id]) >= 2:
-                            recent_positions = self.track_positions[track_id][-5:]  # Last 5 positions
-                            if len(recent_positions) >= 2:
-                                # Calculate average velocity
-                                dx = sum(recent_positions[j][0] - recent_positions[j-1][0] for j in range(1, len(recent_positions))) / (len(recent_positions) - 1)
-                                dy = sum(recent_positions[j][1] - recent_positions[j-1][1] for j in range(1, len(recent_positions))) / (len(recent_positions) - 1)
-                                self.track_velocities[track_id] = (dx, dy)
-                
-                # Limit history size
-                if len(self.track_features[track_id]) > self.max_features_per_track:
-                    _ = self.track_features[track_id].pop(0)  # Remove oldest, discard value
-                
-                # Limit history metadata size
-                if len(self.track_history[track_id]) > self.max_history_length:
-                    self.track_history[track_id].pop(0)
+                        self.track_store.add_position(track_id, float(pos[0]), float(pos[1]),
+                                                      frame_num if frame_num is not None else -1)
                 
                 # Store color features if available
                 if color_features is not None:
@@ -1009,53 +1268,29 @@ class ReIDTracker:
         matches = {}
         
         # ENHANCED: Get features using track history matching
-        track_avg_features = {}
-        for track_id in existing_track_ids:
-            if track_id in self.track_features and len(self.track_features[track_id]) > 0:
-                # Use weighted average of recent features (more weight on recent/high-quality)
-                if track_id in self.track_history and len(self.track_history[track_id]) > 0:
-                    # Use history-based weighted average
-                    recent_entries = self.track_history[track_id][-10:]  # Last 10
-                    weights = []
-                    features_list = []
-                    for entry in recent_entries:
-                        weight = entry.get('confidence', 0.5) * entry.get('quality', 0.5)
-                        weights.append(weight)
-                        features_list.append(entry['feature'])
-                    weights = np.array(weights)
-                    if weights.sum() > 0:
-                        weights = weights / weights.sum()  # Normalize
-                        avg_feature = np.average(features_list, axis=0, weights=weights)
-                    else:
-                        # Fallback to simple average
-                        avg_feature = np.mean([e['feature'] for e in recent_entries], axis=0)
-                else:
-                    # Fallback: Use average of recent features
-                    recent_features = self.track_features[track_id][-10:]  # Last 10 features
-                    avg_feature = np.mean(recent_features, axis=0)
-                track_avg_features[track_id] = avg_feature
-        
-        if len(track_avg_features) == 0:
+        # PERFORMANCE: Weighted average of the last 10 samples for all tracks in one vectorized step
+        track_ids_list = [tid for tid in existing_track_ids
+                          if tid in self.track_store and self.track_store.sample_count(tid) > 0]
+        if len(track_ids_list) == 0:
             return {}
         
         # Filter out NaN features
-        valid_feature_indices = []
-        valid_features = []
-        for i, feat in enumerate(new_features):
-            if not np.isnan(feat).any():
-                valid_feature_indices.append(i)
-                valid_features.append(feat)
-        
-        if len(valid_features) == 0:
+        new_features = np.asarray(new_features)
+        valid_mask = ~np.isnan(new_features).any(axis=1)
+        valid_feature_indices = np.flatnonzero(valid_mask).tolist()
+        if len(valid_feature_indices) == 0:
             return {}
-        
-        valid_features = np.array(valid_features)
-        
-        # Compute similarity matrix (cosine similarity)
-        # new_features: (N, feature_dim)
-        # track_features: (M, feature_dim) where M = len(track_avg_features)
-        track_ids_list = list(track_avg_features.keys())
-        track_features_array = np.array([track_avg_features[tid] for tid in track_ids_list])
+        valid_features = new_features[valid_mask].astype(np.float64)
+        
+        hist_features, hist_conf, hist_quality, hist_valid = self.track_store.history_block(
+            track_ids_list, self.max_history_length)
+        weights = np.where(hist_valid, hist_conf * hist_quality, 0.0)
+        weight_sums = weights.sum(axis=1)
+        sample_counts = hist_valid.sum(axis=1)
+        # Weighted average (more weight on high confidence/quality); simple average if all weights are 0
+        weights = np.where(weight_sums[:, None] > 0, weights / np.where(weight_sums > 0, weight_sums, 1.0)[:, None],
+                           hist_valid / sample_counts[:, None])
+        track_features_array = np.einsum('mk,mkd->md', weights, hist_features)
         
         # Normalize features (already normalized, but ensure)
         valid_features_norm = valid_features / (np.linalg.norm(valid_features, axis=1, keepdims=True) + 1e-8)
@@ -1079,48 +1314,56 @@ class ReIDTracker:
             # Weighted combination: 70% feature, 30% position
             similarity_matrix = 0.7 * similarity_matrix + 0.3 * position_similarity
         
+        # ENHANCED: Match against track history for better accuracy
+        # Use the better of the two similarities (slight penalty for history-only match)
+        history_similarity = self._history_similarity_matrix(valid_features_norm, hist_features, hist_conf,
+                                                             hist_quality, hist_valid, use_weighted_average=True)
+        similarity_matrix = np.maximum(similarity_matrix, history_similarity * 0.9)
+        
+        # ENHANCED: Use adaptive threshold
+        adaptive_thresh = self.similarity_threshold
+        if self.enable_adaptive_thresholds:
+            # Get detection confidence if available (would need to pass this in)
+            adaptive_thresh = self._calculate_adaptive_threshold(
+                self.similarity_threshold,
+                confidence=0.5,  # Default, would be better with actual confidence
+                quality=0.5  # Default, would be better with actual quality
+            )
+        
         # Match each detection to best track (Hungarian algorithm would be better, but greedy is faster)
-        used_tracks = set()
+        matches = {}
+        available = np.ones(len(track_ids_list), dtype=bool)
         for valid_idx, original_idx in enumerate(valid_feature_indices):
-            # Find best match
-            best_similarity = -1
-            best_track_idx = -1
-            
-            for track_idx, track_id in enumerate(track_ids_list):
-                if track_id in used_tracks:
-                    continue
-                
-                similarity = similarity_matrix[valid_idx, track_idx]
-                
-                # ENHANCED: Use adaptive threshold
-                adaptive_thresh = self.similarity_threshold
-                if self.enable_adaptive_thresholds:
-                    # Get detection confidence if available (would need to pass this in)
-                    adaptive_thresh = self._calculate_adaptive_threshold(
-                        self.similarity_threshold,
-                        confidence=0.5,  # Default, would be better with actual confidence
-                        quality=0.5  # Default, would be better with actual quality
-                    )
-                
-                # ENHANCED: Match against track history for better accuracy
-                if track_id in self.track_features and len(self.track_features[track_id]) > 0:
-                    history_similarity = self._match_against_track_history(
-                        valid_features[valid_idx], track_id, use_weighted_average=True
-                    )
-                    # Use the better of the two similarities
-                    similarity = max(similarity, history_similarity * 0.9)  # Slight penalty for history-only match
-                
-                if similarity > best_similarity and similarity >= adaptive_thresh:
-                    best_similarity = similarity
-                    best_track_idx = track_idx
-            
-            if best_track_idx >= 0:
-                matched_track_id = track_ids_list[best_track_idx]
-                matches[original_idx] = matched_track_id
-                used_tracks.add(matched_track_id)
+            candidates = np.where(available & (similarity_matrix[valid_idx] >= adaptive_thresh),
+                                  similarity_matrix[valid_idx], -np.inf)
+            best_track_idx = int(np.argmax(candidates))
+            if np.isfinite(candidates[best_track_idx]) and candidates[best_track_idx] > -1:
+                matches[original_idx] = track_ids_list[best_track_idx]
+                available[best_track_idx] = False
         
         return matches
     
+    def _history_similarity_matrix(self, features_norm: np.ndarray, hist_features: np.ndarray,
+                                   hist_conf: np.ndarray, hist_quality: np.ndarray, hist_valid: np.ndarray,
+                                   use_weighted_average: bool = True) -> np.ndarray:
+        """
+        Best similarity of each feature against each track's recent history (N, M).
+        
+        Vectorized form of _match_against_track_history for normalized features and the
+        dense blocks returned by TrackFeatureStore.history_block.
+        """
+        hist_norm = hist_features / (np.linalg.norm(hist_features, axis=2, keepdims=True) + 1e-8)
+        similarity = np.einsum('nd,mkd->nmk', features_norm, hist_norm)
+        if use_weighted_average:
+            # More recent = higher weight, higher quality = higher weight
+            counts = hist_valid.sum(axis=1)
+            position = np.cumsum(hist_valid, axis=1)  # 1-based position among valid samples
+            recency_weight = position / np.maximum(counts, 1)[:, None]
+            factor = 0.5 + 0.3 * recency_weight + 0.2 * (hist_quality * hist_conf)
+            similarity = np.maximum(similarity, similarity * factor[None, :, :])
+        similarity = np.where(hist_valid[None, :, :], similarity, 0.0)
+        return np.maximum(similarity.max(axis=2), 0.0)
+    
     def _calculate_adaptive_threshold(self, 
                                      base_threshold: float,
                                      confidence: float = 0.5,
@@ -1271,19 +1514,20 @@ class ReIDTracker:
         if not self.enable_position_verification:
             return (True, 0.5)  # No verification, neutral confidence
         
-        if track_id not in self.track_positions or len(self.track_positions[track_id]) == 0:
+        last_pos = self.track_store.last_position(track_id)
+        if last_pos is None:
             return (True, 0.3)  # No history, low confidence but allow
         
         # Get last known position
-        last_pos = self.track_positions[track_id][-1]
         last_x, last_y, last_frame = last_pos
         
         # Calculate expected position using velocity
         frames_since_last = frame_num - last_frame
         expected_x, expected_y = last_x, last_y
         
-        if track_id in self.track_velocities and frames_since_last > 0:
-            vx, vy = self.track_velocities[track_id]
+        velocity = self.track_store.get_velocity(track_id)
+        if velocity is not None and frames_since_last > 0:
+            vx, vy = velocity
             expected_x += vx * frames_since_last
             expected_y += vy * frames_since_last
         
@@ -1316,36 +1560,17 @@ class ReIDTracker:
         Returns:
             Best similarity score from track history
         """
-        if track_id not in self.track_history or len(self.track_history[track_id]) == 0:
+        if track_id not in self.track_store or self.track_store.sample_count(track_id) == 0:
             return 0.0
         
         # Normalize input feature
+        feature = np.asarray(feature, dtype=np.float64)
         feature_norm = feature / (np.linalg.norm(feature) + 1e-8)
         
-        best_similarity = 0.0
-        
-        for i, history_entry in enumerate(self.track_history[track_id]):
-            hist_feature = history_entry['feature']
-            hist_confidence = history_entry.get('confidence', 0.5)
-            hist_quality = history_entry.get('quality', 0.5)
-            
-            # Normalize history feature
-            hist_feature_norm = hist_feature / (np.linalg.norm(hist_feature) + 1e-8)
-            
-            # Compute similarity
-            similarity = np.dot(feature_norm, hist_feature_norm)
-            
-            # Weight by recency and quality if enabled
-            if use_weighted_average:
-                # More recent = higher weight, higher quality = higher weight
-                recency_weight = (i + 1) / len(self.track_history[track_id])  # Later entries = higher
-                quality_weight = hist_quality * hist_confidence
-                weighted_similarity = similarity * (0.5 + 0.3 * recency_weight + 0.2 * quality_weight)
-                similarity = max(similarity, weighted_similarity)
-            
-            best_similarity = max(best_similarity, similarity)
-        
-        return best_similarity
+        hist_features, hist_conf, hist_quality, hist_valid = self.track_store.history_block(
+            [track_id], self.max_history_length)
+        return float(self._history_similarity_matrix(feature_norm[None, :], hist_features, hist_conf,
+                                                     hist_quality, hist_valid, use_weighted_average)[0, 0])
     
     def _check_multi_frame_verification(self,
                                       track_id: int,
@@ -1457,19 +1682,35 @@ class ReIDTracker:
     
     def clear_track(self, track_id: int):
         """Clear features for a track that's been deleted"""
-        if track_id in self.track_features:
-            del self.track_features[track_id]
+        self.track_store.remove(track_id)
         if track_id in self.track_color_features:
             del self.track_color_features[track_id]
     
     def clear_all_tracks(self):
         """Clear all stored track features"""
-        self.track_features.clear()
+        self.track_store.clear()
     
     def get_track_count(self) -> int:
         """Get number of active tracks"""
         return len(self.track_features)
-    
+
+    def get_track_state(self) -> Dict:
+        """Per-track Re-ID state (feature store, match history, color features) for checkpoints"""
+        return {
+            'track_store': self.track_store,
+            'track_match_history': dict(self.track_match_history),
+            'track_color_features': dict(self.track_color_features),
+        }
+
+    def load_track_state(self, state: Dict):
+        """Restore state captured by get_track_state() (resuming an interrupted analysis)"""
+        store = state.get('track_store')
+        if isinstance(store, TrackFeatureStore):
+            self.track_store = store
+            self.track_features = _TrackFeaturesView(store)
+        self.track_match_history = defaultdict(list, state.get('track_match_history', {}))
+        self.track_color_features = defaultdict(dict, state.get('track_color_features', {}))
+
     # ============================================================
     # PLAYER GALLERY SUPPORT (Cross-Video Identification)
     # ============================================================
@@ -1533,6 +1774,28 @@ class ReIDTracker:
                     else:
                         print(f"      → Feature #{i}: Valid (shape: {f.shape})")
         
+        # OPTIMIZATION: Score all detections of this frame against the gallery in one
+        # vectorized pass (one matrix multiply per feature kind) instead of per detection
+        batch_matches = None
+        if hasattr(gallery, 'match_players_batch'):
+            valid_features = [
+                feature if (isinstance(feature, np.ndarray) and feature.size > 0 and not np.isnan(feature).any()) else None
+                for feature in features
+            ]
+            batch_matches = gallery.match_players_batch(
+                valid_features,
+                similarity_threshold=similarity_threshold,
+                dominant_colors=dominant_colors,
+                teams=teams,
+                jersey_numbers=jersey_numbers,
+                uniform_info_list=uniform_info_list,
+                early_frame_range=(0, 1000),
+                early_frame_boost=0.10,
+                current_frame_num=current_frame_num,
+                exclude_players=exclude_players,
+                include_only_players=include_only_players
+            )
+        
         for i, feature in enumerate(features):
             # Skip invalid features
             if feature is None:
@@ -1563,19 +1826,22 @@ class ReIDTracker:
             uniform_info = uniform_info_list[i] if uniform_info_list is not None and i < len(uniform_info_list) else None
             
             # Match against gallery
-            player_id, player_name, similarity = gallery.match_player(
-                features=feature,
-                similarity_threshold=similarity_threshold,
-                dominant_color=dominant_color,
-                team=team,
-                jersey_number=jersey_number,  # Pass jersey number for filtering/boosting
-                early_frame_range=(0, 1000),  # Boost players tagged in first 1000 frames
-                early_frame_boost=0.10,  # 10% proportional boost for early-frame tags (only if similarity >= 0.5)
-                current_frame_num=current_frame_num,  # Only boost if detection is also from early frames
-                uniform_info=uniform_info,  # Pass uniform info for uniform-based matching boost
-                exclude_players=exclude_players,  # Exclude anchor-protected players from matching (if provided)
-                include_only_players=include_only_players  # Restrict to players in current video (if provided)
-            )
+            if batch_matches is not None:
+                player_id, player_name, similarity = batch_matches[i]
+            else:
+                player_id, player_name, similarity = gallery.match_player(
+                    features=feature,
+                    similarity_threshold=similarity_threshold,
+                    dominant_color=dominant_color,
+                    team=team,
+                    jersey_number=jersey_number,  # Pass jersey number for filtering/boosting
+                    early_frame_range=(0, 1000),  # Boost players tagged in first 1000 frames
+                    early_frame_boost=0.10,  # 10% proportional boost for early-frame tags (only if similarity >= 0.5)
+                    current_frame_num=current_frame_num,  # Only boost if detection is also from early frames
+                    uniform_info=uniform_info,  # Pass uniform info for uniform-based matching boost
+                    exclude_players=exclude_players,  # Exclude anchor-protected players from matching (if provided)
+                    include_only_players=include_only_players  # Restrict to players in current video (if provided)
+                )
             
             # DIAGNOSTIC: Log first few matches (occasionally)
             if current_frame is not None and current_frame % 500 == 0 and i < 3:
@@ -1671,8 +1937,7 @@ class ReIDTracker:
             return None
         
         # Compute average features for this track
-        track_features_array = np.array(self.track_features[track_id])
-        avg_features = np.mean(track_features_array, axis=0)
+        avg_features = self.track_store.mean_feature(track_id)
         # Normalize
         avg_features = avg_features / (np.linalg.norm(avg_features) + 1e-8)
         
@@ -1777,8 +2042,7 @@ class ReIDTracker:
             return
         
         # Compute average features for this track
-        track_features_array = np.array(self.track_features[track_id])
-        avg_features = np.mean(track_features_array, axis=0)
+        avg_features = self.track_store.mean_feature(track_id)
         # Normalize
         avg_features = avg_features / (np.linalg.norm(avg_features) + 1e-8)
         
@@ -0,0 +1,521 @@
+"""
+Segment-Parallel Analysis
+Analyse one video as N overlapping time segments in separate processes and stitch the tracks
+
+    from segment_parallel import analyze_video_parallel
+    analyze_video_parallel("game.mp4", "out/game_analyzed.mp4", num_segments=8,
+                           analysis_kwargs={'tracker_type': 'bytetrack', 'use_reid': True})
+
+Every worker runs the normal combined_analysis_optimized pipeline on its frame range
+(frame_range=...) with read-only copies of the player gallery and team_color_config.json
+(learned team colors stay in the worker). Segment k analyses
+
+    [boundary_k - overlap, boundary_k+1)
+
+so the frames just before each boundary are analysed by both neighbours. The later
+segment uses them as tracker warm-up, and the stitcher matches tracks in that
+overlap by mean box IoU and Re-ID similarity (mean feature per track, exported by
+the workers). The earlier segment owns the overlap rows. The later segment owns
+everything from the boundary on.
+
+Outputs (same names as a sequential run):
+    <output>_tracking_data.csv        rows of all segments, global track IDs, names reconciled
+    <output>_overlay_metadata.ovl     merged overlay store (track IDs remapped)
+    <output>_segments/                per-segment outputs (kept for inspection)
+
+Workers do not encode video (labels would carry per-segment IDs); render the analysed
+video from the merged overlay metadata instead (playback viewer / overlay renderer).
+"""
+
+import csv
+import os
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from itertools import chain
+from multiprocessing import cpu_count, get_context
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from box_ops import greedy_match, iou_pairs
+from detection_cache import default_cache_root
+
+# Analysis options that cannot be sent to (or make no sense in) a worker process
+_WORKER_EXCLUDED_KWARGS = ('progress_callback', 'frame_range', 'gallery_read_only', 'shared_config_read_only',
+                           'stitch_windows', 'stitch_features_output', 'resume', 'checkpoint_interval',
+                           'profile_output')
+
+
+@dataclass
+class Segment:
+    """One worker's share of the video (frames are [start, end), rows owned are [owned_start, owned_end))"""
+    index: int
+    start: int
+    end: int
+    owned_start: int
+    owned_end: int
+    output_path: str = ''
+
+    @property
+    def csv_path(self) -> str:
+        return self.output_path.replace('.mp4', '_tracking_data.csv')
+
+    @property
+    def overlay_path(self) -> str:
+        return os.path.splitext(self.output_path)[0] + '_overlay_metadata.ovl'
+
+    @property
+    def features_path(self) -> str:
+        return os.path.splitext(self.output_path)[0] + '_stitch_features.npz'
+
+
+def plan_segments(total_frames: int, num_segments: int, overlap_frames: int) -> List[Segment]:
+    """Split [0, total_frames) into num_segments segments that overlap their predecessor by overlap_frames"""
+    num_segments = max(1, min(int(num_segments), total_frames // max(1, 2 * overlap_frames) or 1))
+    boundaries = [round(k * total_frames / num_segments) for k in range(num_segments + 1)]
+    segments = []
+    for k in range(num_segments):
+        start = max(0, boundaries[k] - overlap_frames) if k > 0 else 0
+        segments.append(Segment(k, start, boundaries[k + 1], boundaries[k], boundaries[k + 1]))
+    return segments
+
+
+# ----------------------------------------------------------------------
+# Re-ID features for stitching (called from the analysis loop)
+# ----------------------------------------------------------------------
+
+def accumulate_stitch_features(sums: Dict, windows: Sequence[Tuple[int, int]], frame_num: int,
+                               track_ids, features):
+    """Add one frame's Re-ID features to the per-(window, track) sums if the frame is in a window"""
+    if track_ids is None or features is None:
+        return
+    for w, (lo, hi) in enumerate(windows):
+        if lo <= frame_num < hi:
+            break
+    else:
+        return
+    for track_id, feature in zip(track_ids, features):
+        if track_id is None or feature is None or np.isnan(feature).any():
+            continue
+        entry = sums.get((w, int(track_id)))
+        if entry is None:
+            sums[(w, int(track_id))] = [np.array(feature, dtype=np.float64), 1]
+        else:
+            entry[0] += feature
+            entry[1] += 1
+
+
+def save_stitch_features(path: str, sums: Dict):
+    """Write the mean feature per (window, track) collected by accumulate_stitch_features"""
+    try:
+        keys = sorted(sums)
+        features = np.stack([sums[k][0] / sums[k][1] for k in keys]).astype(np.float32) if keys else np.zeros((0, 0), np.float32)
+        np.savez_compressed(path, window=np.array([k[0] for k in keys], dtype=np.int32),
+                            track_id=np.array([k[1] for k in keys], dtype=np.int64), feature=features)
+    except Exception as e:
+        print(f"⚠ Could not write stitch features {path}: {e}")
+
+
+def _load_stitch_features(path: str) -> Dict[int, Dict[int, np.ndarray]]:
+    """window -> {track_id: L2-normalised mean feature}"""
+    result = defaultdict(dict)
+    if not os.path.exists(path):
+        return result
+    data = np.load(path)
+    for w, track_id, feature in zip(data['window'], data['track_id'], data['feature']):
+        norm = np.linalg.norm(feature)
+        if norm > 0:
+            result[int(w)][int(track_id)] = feature / norm
+    return result
+
+
+# ----------------------------------------------------------------------
+# Worker
+# ----------------------------------------------------------------------
+
+def _run_segment(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Process-pool entry point: analyse one segment"""
+    threads = str(job['threads'])
+    for var in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS'):
+        os.environ[var] = threads
+    started = time.time()
+    try:
+        import cv2
+        cv2.setNumThreads(job['threads'])
+        try:
+            import torch
+            torch.set_num_threads(job['threads'])
+        except ImportError:
+            pass
+        from combined_analysis_optimized import combined_analysis_optimized
+        combined_analysis_optimized(
+            job['input_path'], job['output_path'],
+            frame_range=(job['start'], job['end']),
+            gallery_read_only=True,
+            shared_config_read_only=True,
+            stitch_windows=job['windows'],
+            stitch_features_output=job['features_path'],
+            **job['analysis_kwargs'])
+        return {'index': job['index'], 'ok': True, 'seconds': time.time() - started}
+    except Exception as e:
+        import traceback
+        return {'index': job['index'], 'ok': False, 'error': f"{e}\n{traceback.format_exc()}",
+                'seconds': time.time() - started}
+
+
+# ----------------------------------------------------------------------
+# Stitching
+# ----------------------------------------------------------------------
+
+def _read_tracking_csv(path: str):
+    """(header, '#' metadata lines, row iterator) of a tracking CSV"""
+    f = open(path, 'r', newline='')
+    header = next(csv.reader([f.readline()]), None)
+    comments = []
+    first_data = None
+    for line in f:
+        if line.startswith('#'):
+            comments.append(line.rstrip('\r\n'))
+        elif line.strip():
+            first_data = line
+            break
+
+    def rows():
+        try:
+            if first_data is None:
+                return
+            for row in csv.reader(chain([first_data], f)):
+                if row and not row[0].startswith('#'):
+                    yield row
+        finally:
+            f.close()
+    return header, comments, rows()
+
+
+def _frame_of(row: List[str], frame_idx: int) -> Optional[int]:
+    try:
+        return int(float(row[frame_idx]))
+    except (ValueError, IndexError):
+        return None
+
+
+def _track_boxes(segment: Segment, lo: int, hi: int) -> Dict[str, Dict[int, List[float]]]:
+    """track_id -> {frame: [x1, y1, x2, y2]} for frames in [lo, hi)"""
+    header, _, rows = _read_tracking_csv(segment.csv_path)
+    columns = {name: i for i, name in enumerate(header or [])}
+    tracks = defaultdict(dict)
+    if not {'frame', 'player_id', 'x1', 'y1', 'x2', 'y2'} <= set(columns):
+        return tracks
+    frame_idx, id_idx = columns['frame'], columns['player_id']
+    box_idx = [columns[c] for c in ('x1', 'y1', 'x2', 'y2')]
+    for row in rows:
+        frame = _frame_of(row, frame_idx)
+        if frame is None or not lo <= frame < hi or not row[id_idx]:
+            continue
+        try:
+            tracks[row[id_idx]][frame] = [float(row[i]) for i in box_idx]
+        except (ValueError, IndexError):
+            continue
+    return tracks
+
+
+def match_tracks(tracks_a: Dict[str, Dict[int, List[float]]], tracks_b: Dict[str, Dict[int, List[float]]],
+                 features_a: Optional[Dict[int, np.ndarray]] = None, features_b: Optional[Dict[int, np.ndarray]] = None,
+                 iou_weight: float = 0.7, min_common_frames: int = 5, threshold: float = 0.4) -> Dict[str, str]:
+    """
+    Match tracks of two segments over their shared frames
+
+    Score = iou_weight * mean IoU on common frames + (1 - iou_weight) * Re-ID cosine similarity
+    (mean IoU alone when either track has no feature). Pairs are matched greedily by score.
+
+    Returns:
+        {track_id in b: track_id in a}
+    """
+    ids_a, ids_b = list(tracks_a), list(tracks_b)
+    scores = np.full((len(ids_a), len(ids_b)), -np.inf)
+    features_a, features_b = features_a or {}, features_b or {}
+    for i, a in enumerate(ids_a):
+        frames_a = tracks_a[a]
+        for j, b in enumerate(ids_b):
+            common = frames_a.keys() & tracks_b[b].keys()
+            if len(common) < min_common_frames:
+                continue
+            common = sorted(common)
+            mean_iou = float(iou_pairs([frames_a[f] for f in common], [tracks_b[b][f] for f in common]).mean())
+            fa, fb = features_a.get(_as_int(a)), features_b.get(_as_int(b))
+            if fa is not None and fb is not None and fa.shape == fb.shape:
+                similarity = max(0.0, float(np.dot(fa, fb)))
+                scores[i, j] = iou_weight * mean_iou + (1.0 - iou_weight) * similarity
+            else:
+                scores[i, j] = mean_iou
+    rows, cols = greedy_match(scores, threshold)
+    return {ids_b[c]: ids_a[r] for r, c in zip(rows, cols)}
+
+
+def _as_int(track_id: str) -> Optional[int]:
+    try:
+        return int(float(track_id))
+    except (TypeError, ValueError):
+        return None
+
+
+def stitch_segments(segments: List[Segment], iou_weight: float = 0.7, min_common_frames: int = 5,
+                    threshold: float = 0.4) -> Tuple[List[Dict[str, str]], Dict[str, Any]]:
+    """
+    Global track IDs for every segment's local track IDs
+
+    Returns:
+        (id_maps, stats) - id_maps[k] maps segment k's local ID (CSV text) to its global ID (text)
+    """
+    id_maps: List[Dict[str, str]] = []
+    next_id = 1
+    stats = {'stitched': 0, 'new_tracks': 0}
+
+    # All local IDs per segment (rows it owns) - unmatched ones get fresh global IDs
+    local_ids = []
+    for segment in segments:
+        tracks = _track_boxes(segment, segment.owned_start, segment.owned_end)
+        local_ids.append(sorted(tracks, key=lambda t: (_as_int(t) is None, _as_int(t) or 0, t)))
+
+    for k, segment in enumerate(segments):
+        id_map = {}
+        if k > 0:
+            previous = segments[k - 1]
+            lo, hi = segment.start, previous.end
+            matches = match_tracks(_track_boxes(previous, lo, hi), _track_boxes(segment, lo, hi),
+                                   _load_stitch_features(previous.features_path).get(1 if k - 1 > 0 else 0),
+                                   _load_stitch_features(segment.features_path).get(0),
+                                   iou_weight=iou_weight, min_common_frames=min_common_frames, threshold=threshold)
+            for local_b, local_a in matches.items():
+                if local_a in id_maps[k - 1]:
+                    id_map[local_b] = id_maps[k - 1][local_a]
+            stats['stitched'] += len(id_map)
+        for local_id in local_ids[k]:
+            if local_id not in id_map:
+                id_map[local_id] = str(next_id)
+                next_id += 1
+                if k > 0:
+                    stats['new_tracks'] += 1
+        id_maps.append(id_map)
+    stats['global_tracks'] = next_id - 1
+    return id_maps, stats
+
+
+def _reconciled_names(segments: List[Segment], id_maps: List[Dict[str, str]]) -> Tuple[Dict[str, str], int]:
+    """Most frequent player name per global track, and how many global tracks had conflicting names"""
+    counts = defaultdict(Counter)
+    for segment, id_map in zip(segments, id_maps):
+        header, _, rows = _read_tracking_csv(segment.csv_path)
+        columns = {name: i for i, name in enumerate(header or [])}
+        if 'player_name' not in columns:
+            continue
+        frame_idx, id_idx, name_idx = columns['frame'], columns['player_id'], columns['player_name']
+        for row in rows:
+            frame = _frame_of(row, frame_idx)
+            if frame is None or not segment.owned_start <= frame < segment.owned_end:
+                continue
+            if row[id_idx] and row[name_idx]:
+                counts[id_map.get(row[id_idx], row[id_idx])][row[name_idx]] += 1
+    names = {track: counter.most_common(1)[0][0] for track, counter in counts.items()}
+    conflicts = sum(1 for counter in counts.values() if len(counter) > 1)
+    return names, conflicts
+
+
+def merge_csvs(segments: List[Segment], id_maps: List[Dict[str, str]], names: Dict[str, str], output_csv: str) -> int:
+    """Write the owned rows of every segment with global IDs; empty names are filled per track"""
+    written = 0
+    with open(output_csv, 'w', newline='', buffering=1024 * 1024) as out:
+        writer = csv.writer(out)
+        for k, (segment, id_map) in enumerate(zip(segments, id_maps)):
+            header, comments, rows = _read_tracking_csv(segment.csv_path)
+            columns = {name: i for i, name in enumerate(header or [])}
+            frame_idx = columns.get('frame', 0)
+            id_idx, name_idx = columns.get('player_id'), columns.get('player_name')
+            possession_idx = columns.get('possession_player_id')
+            if k == 0:
+                # Header, then the '#' metadata lines, as written by the sequential analysis
+                writer.writerow(header)
+                for line in comments:
+                    out.write(line + '\n')
+            for row in rows:
+                frame = _frame_of(row, frame_idx)
+                if frame is None or not segment.owned_start <= frame < segment.owned_end:
+                    continue
+                if id_idx is not None and row[id_idx]:
+                    row[id_idx] = id_map.get(row[id_idx], row[id_idx])
+                    if name_idx is not None and not row[name_idx]:
+                        row[name_idx] = names.get(row[id_idx], '')
+                if possession_idx is not None and row[possession_idx]:
+                    row[possession_idx] = id_map.get(row[possession_idx], row[possession_idx])
+                writer.writerow(row)
+                written += 1
+    return written
+
+
+def _remap_overlay(overlay: Dict, id_map: Dict[str, str], names: Dict[str, str]) -> Dict:
+    for key in ('players', 'predicted_boxes', 'trajectories'):
+        for item in overlay.get(key) or []:
+            local_id = item.get('track_id')
+            if local_id is None:
+                continue
+            global_id = id_map.get(str(local_id))
+            if global_id is not None:
+                item['track_id'] = int(global_id)
+                if key == 'players' and not item.get('player_name') and global_id in names:
+                    item['player_name'] = names[global_id]
+    return overlay
+
+
+def merge_overlays(segments: List[Segment], id_maps: List[Dict[str, str]], names: Dict[str, str],
+                   output_path: str, video_path: str, fps: float, total_frames: int) -> Optional[str]:
+    """Merge the owned frames of every segment's overlay store into one store"""
+    try:
+        from overlay_metadata import OverlayMetadata
+    except ImportError:
+        return None
+    merged = OverlayMetadata(video_path, fps, total_frames)
+    store_path = merged.enable_incremental_save(output_path)
+    for segment, id_map in zip(segments, id_maps):
+        if not os.path.exists(segment.overlay_path):
+            print(f"⚠ Segment {segment.index}: no overlay metadata ({segment.overlay_path})")
+            continue
+        source = OverlayMetadata.open_store(segment.overlay_path)
+        if not merged.visualization_settings:
+            merged.set_visualization_settings(source.visualization_settings)
+        for frame_num in source.overlays:
+            if segment.owned_start <= frame_num < segment.owned_end:
+                merged.overlays[frame_num] = _remap_overlay(source.overlays[frame_num], id_map, names)
+        for frame_num in source.analytics_data:
+            if segment.owned_start <= frame_num < segment.owned_end:
+                merged.analytics_data[frame_num] = source.analytics_data[frame_num]
+        source.close()
+    merged.close()
+    return store_path
+
+
+# ----------------------------------------------------------------------
+# Driver
+# ----------------------------------------------------------------------
+
+def analyze_video_parallel(input_path: str, output_path: str, num_segments: Optional[int] = None,
+                           overlap_seconds: float = 2.0, threads_per_worker: int = 2,
+                           analysis_kwargs: Optional[Dict[str, Any]] = None,
+                           iou_weight: float = 0.7, match_threshold: float = 0.4) -> Optional[Dict[str, Any]]:
+    """
+    Analyse a video as parallel overlapping segments and stitch the results
+
+    Args:
+        input_path: Source video
+        output_path: Output video path of the equivalent sequential run (outputs are named after it)
+        num_segments: Worker processes / segments (default: CPU cores // threads_per_worker)
+        overlap_seconds: Frames analysed by both neighbours at each boundary (tracker warm-up + stitching)
+        threads_per_worker: Intra-op threads per worker (OpenCV / PyTorch / BLAS)
+        analysis_kwargs: Extra combined_analysis_optimized options (same for every segment)
+        iou_weight: Weight of box IoU vs Re-ID similarity when matching tracks across a boundary
+        match_threshold: Minimum stitching score
+
+    Returns:
+        Summary dict (output paths, per-segment timings, stitching stats), or None if a segment failed
+    """
+    import cv2
+    cap = cv2.VideoCapture(input_path)
+    if not cap.isOpened():
+        print(f"Error: Could not open video file {input_path}")
+        return None
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    cap.release()
+
+    analysis_kwargs = {k: v for k, v in (analysis_kwargs or {}).items() if k not in _WORKER_EXCLUDED_KWARGS}
+    if analysis_kwargs.get('video_fps'):
+        fps = float(analysis_kwargs['video_fps'])
+    analysis_kwargs.update(enable_video_encoding=False, preserve_audio=False, show_live_viewer=False,
+                           watch_only=False)
+    # Workers write into <output>_segments/ - share one detection cache next to the real output
+    if not analysis_kwargs.get('detection_cache_dir'):
+        analysis_kwargs['detection_cache_dir'] = default_cache_root(output_path)
+    threads_per_worker = max(1, int(threads_per_worker))
+    if not num_segments:
+        num_segments = max(1, cpu_count() // threads_per_worker)
+    overlap_frames = max(1, int(round(overlap_seconds * fps)))
+    segments = plan_segments(total_frames, num_segments, overlap_frames)
+
+    # Load (and if needed migrate / repair) the gallery once, before workers open it read-only
+    if analysis_kwargs.get('use_reid', True):
+        try:
+            from player_gallery import PlayerGallery
+            PlayerGallery(use_binary_store=True if analysis_kwargs.get('gallery_binary_store') else None)
+        except Exception as e:
+            print(f"⚠ Could not pre-load player gallery: {e}")
+
+    output_base = os.path.splitext(output_path)[0]
+    segment_dir = output_base + '_segments'
+    os.makedirs(segment_dir, exist_ok=True)
+    jobs = []
+    for segment in segments:
+        segment.output_path = os.path.join(segment_dir, f"segment_{segment.index:02d}.mp4")
+        windows = []
+        if segment.index > 0:
+            windows.append((segment.start, segment.owned_start))
+        if segment.index + 1 < len(segments):
+            windows.append((segments[segment.index + 1].start, segment.end))
+        jobs.append({'index': segment.index, 'input_path': input_path, 'output_path': segment.output_path,
+                     'start': segment.start, 'end': segment.end, 'windows': windows,
+                     'features_path': segment.features_path, 'threads': threads_per_worker,
+                     'analysis_kwargs': analysis_kwargs})
+
+    print(f"⚡ Segment-parallel analysis: {len(segments)} segments x {threads_per_worker} threads, "
+          f"{overlap_frames} overlap frames ({total_frames} frames total)")
+    started = time.time()
+    results = {}
+    # spawn: workers must not inherit CUDA / OpenCV thread state from this process
+    with ProcessPoolExecutor(max_workers=len(segments), mp_context=get_context('spawn')) as executor:
+        futures = [executor.submit(_run_segment, job) for job in jobs]
+        for future in as_completed(futures):
+            result = future.result()
+            results[result['index']] = result
+            segment = segments[result['index']]
+            if result['ok']:
+                print(f"✓ Segment {segment.index} (frames {segment.start}-{segment.end - 1}) done in {result['seconds']:.0f}s")
+            else:
+                print(f"⚠ Segment {segment.index} failed: {result['error']}")
+    analysis_seconds = time.time() - started
+
+    failed = [segments[i] for i, r in results.items() if not r['ok'] or not os.path.exists(segments[i].csv_path)]
+    if failed:
+        print(f"⚠ {len(failed)} segment(s) failed - not stitching (segment outputs kept in {segment_dir})")
+        return None
+
+    id_maps, stats = stitch_segments(segments, iou_weight=iou_weight, threshold=match_threshold)
+    names, stats['name_conflicts'] = _reconciled_names(segments, id_maps)
+    output_csv = output_path.replace('.mp4', '_tracking_data.csv')
+    stats['rows'] = merge_csvs(segments, id_maps, names, output_csv)
+    overlay_path = None
+    if analysis_kwargs.get('export_overlay_metadata', True):
+        overlay_path = merge_overlays(segments, id_maps, names, output_base + '_overlay_metadata.ovl',
+                                      input_path, fps, total_frames)
+    try:
+        from tracking_data_io import write_sidecar
+        write_sidecar(output_csv, metadata={'fps': float(fps)})
+    except ImportError:
+        pass
+
+    print(f"✓ Stitched {len(segments)} segments in {time.time() - started - analysis_seconds:.1f}s: "
+          f"{stats['stitched']} tracks continued across boundaries, {stats['new_tracks']} started in a later segment, "
+          f"{stats['global_tracks']} global tracks")
+    if stats['name_conflicts']:
+        print(f"   ⚠ {stats['name_conflicts']} stitched track(s) carry more than one player name (rows keep their own names)")
+    print(f"✓ Tracking data exported to: {output_csv}")
+    if overlay_path:
+        print(f"✓ Overlay metadata saved: {overlay_path}")
+    return {
+        'csv': output_csv,
+        'overlay': overlay_path,
+        'segment_dir': segment_dir,
+        'segments': [{'index': s.index, 'start': s.start, 'end': s.end, 'seconds': results[s.index]['seconds']}
+                     for s in segments],
+        'analysis_seconds': analysis_seconds,
+        'stitch': stats,
+    }
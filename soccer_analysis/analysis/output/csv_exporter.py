@@ -31,6 +31,12 @@ except ImportError:
 
 logger = get_logger("csv_export")
 
+# Typed columnar sidecar (Parquet) written next to the CSV on close
+try:
+    from tracking_data_io import write_sidecar, PYARROW_AVAILABLE as TRACKING_SIDECAR_AVAILABLE
+except ImportError:
+    TRACKING_SIDECAR_AVAILABLE = False
+
 
 class CSVExporter:
     """Handles CSV export of tracking data"""
@@ -53,29 +59,39 @@ class CSVExporter:
         'bbox_x1', 'bbox_y1', 'bbox_x2', 'bbox_y2'
     ]
     
-    def __init__(self):
-        """Initialize CSV exporter"""
+    def __init__(self, write_columnar: bool = True):
+        """
+        Initialize CSV exporter
+        
+        Args:
+            write_columnar: Also write a typed Parquet sidecar when the CSV is closed
+        """
         self.csv_file: Optional[TextIO] = None
         self.csv_writer: Optional[csv.writer] = None
         self.csv_filename: Optional[str] = None
+        self.write_columnar = write_columnar
+        self.file_metadata: Dict[str, Any] = {}
+        self.sidecar_filename: Optional[str] = None
         self.export_stats = {
             'total_player_rows': 0,
             'frames_with_players': 0,
             'frames_with_empty_centers': 0
         }
     
-    def initialize_csv(self, output_path: str) -> bool:
+    def initialize_csv(self, output_path: str, metadata: Optional[Dict[str, Any]] = None) -> bool:
         """
         Initialize CSV file and writer
         
         Args:
             output_path: Output CSV file path
+            metadata: Optional file metadata (fps, width, height, ...) stored in the columnar sidecar
             
         Returns:
             True if successful, False otherwise
         """
         try:
             self.csv_filename = output_path
+            self.file_metadata = dict(metadata or {})
             self.csv_file = open(output_path, 'w', newline='', encoding='utf-8')
             self.csv_writer = csv.writer(self.csv_file)
             
@@ -351,6 +367,12 @@ class CSVExporter:
             finally:
                 self.csv_file = None
                 self.csv_writer = None
+            
+            # PERFORMANCE: Typed, frame-sorted sidecar so post-analysis tools skip CSV parsing
+            if self.write_columnar and TRACKING_SIDECAR_AVAILABLE and self.csv_filename:
+                self.sidecar_filename = write_sidecar(self.csv_filename, metadata=self.file_metadata)
+                if self.sidecar_filename:
+                    logger.info(f"   → Columnar sidecar: {self.sidecar_filename}")
     
     def get_stats(self) -> Dict[str, Any]:
         """Get export statistics"""
@@ -11,6 +11,12 @@ from dataclasses import dataclass, asdict
 from collections import deque
 import os
 
+try:
+    from tracking_data_io import load_tracking_data
+    TRACKING_DATA_IO_AVAILABLE = True
+except ImportError:
+    TRACKING_DATA_IO_AVAILABLE = False
+
 @dataclass
 class DetectedEvent:
     """Represents a detected game event"""
@@ -44,33 +50,34 @@ class EventDetector:
     def load_tracking_data(self):
         """Load tracking data from CSV"""
         try:
-            # Read CSV, skipping comment lines
-            self.df = pd.read_csv(self.csv_path, comment='#')
-            
-            # Try to extract FPS from comment lines if available
-            try:
-                with open(self.csv_path, 'r') as f:
-                    for line in f:
-                        if line.startswith('# Video FPS:'):
-                            fps_str = line.split(':')[1].strip()
-                            self.fps = float(fps_str)
-                            break
-            except:
-                pass
+            # Read CSV, skipping comment lines (typed sidecar is used when current)
+            if TRACKING_DATA_IO_AVAILABLE:
+                self.df = load_tracking_data(self.csv_path)
+            else:
+                self.df = pd.read_csv(self.csv_path, comment='#')
             
-            # Try to extract resolution from comment lines
-            try:
-                with open(self.csv_path, 'r') as f:
-                    for line in f:
-                        if line.startswith('# Video Resolution:'):
-                            res_str = line.split(':')[1].strip()
-                            if 'x' in res_str:
-                                w, h = res_str.split('x')
-                                self.frame_width = int(w.strip())
-                                self.frame_height = int(h.strip())
-                            break
-            except:
-                pass
+            # Try to extract FPS and resolution from file metadata / comment lines if available
+            # (metadata is only at the top of the file - don't scan every row looking for it)
+            metadata = self.df.attrs.get('tracking_metadata', {})
+            if not metadata:
+                try:
+                    with open(self.csv_path, 'r') as f:
+                        for _, line in zip(range(64), f):
+                            if line.startswith('# Video FPS:'):
+                                metadata['fps'] = float(line.split(':')[1].strip())
+                            elif line.startswith('# Video Resolution:'):
+                                res_str = line.split(':')[1].strip()
+                                if 'x' in res_str:
+                                    w, h = res_str.split('x')
+                                    metadata['width'] = int(w.strip())
+                                    metadata['height'] = int(h.strip().split()[0])
+                except:
+                    pass
+            if metadata.get('fps'):
+                self.fps = float(metadata['fps'])
+            if metadata.get('width') and metadata.get('height'):
+                self.frame_width = int(metadata['width'])
+                self.frame_height = int(metadata['height'])
             
             print(f"✓ Loaded {len(self.df)} rows of tracking data")
             print(f"  → FPS: {self.fps:.2f}")
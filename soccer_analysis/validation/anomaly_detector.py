@@ -23,6 +23,12 @@ except ImportError:
 
 logger = get_logger("anomaly_detector")
 
+try:
+    from tracking_data_io import load_tracking_data
+    TRACKING_DATA_IO_AVAILABLE = True
+except ImportError:
+    TRACKING_DATA_IO_AVAILABLE = False
+
 
 class AnomalyDetector:
     """
@@ -59,7 +65,10 @@ class AnomalyDetector:
             Dictionary with detected anomalies
         """
         try:
-            df = pd.read_csv(csv_path)
+            if TRACKING_DATA_IO_AVAILABLE:
+                df = load_tracking_data(csv_path, columns=['frame_num', 'track_id', 'x', 'y', 'speed', 'confidence'])
+            else:
+                df = pd.read_csv(csv_path, comment='#')
         except Exception as e:
             logger.error(f"Error reading CSV: {e}")
             return {'error': str(e)}
@@ -208,15 +217,21 @@ class AnomalyDetector:
         numeric_columns = ['x', 'y', 'speed', 'confidence']
         for col in numeric_columns:
             if col in df.columns:
-                values = df[col].dropna().values
+                valid_rows = df[df[col].notna()]
+                values = valid_rows[col].values
                 if len(values) > 10:  # Need enough data
                     z_scores = np.abs(stats.zscore(values))
                     outliers = np.where(z_scores > self.z_score_threshold)[0]
                     
+                    # Identify rows by frame/track (the DataFrame index is not the CSV row
+                    # number - sidecar loads are sorted by frame)
+                    frames = valid_rows['frame_num'].values if 'frame_num' in valid_rows.columns else None
+                    track_ids = valid_rows['track_id'].values if 'track_id' in valid_rows.columns else None
                     for idx in outliers:
                         anomalies.append({
                             'column': col,
-                            'row_index': int(df.index[idx]),
+                            'frame': int(frames[idx]) if frames is not None and pd.notna(frames[idx]) else None,
+                            'track_id': int(track_ids[idx]) if track_ids is not None and pd.notna(track_ids[idx]) else None,
                             'value': float(values[idx]),
                             'z_score': float(z_scores[idx]),
                             'type': 'statistical_anomaly',
@@ -24,6 +24,12 @@ except ImportError:
 
 logger = get_logger("quality_reporter")
 
+try:
+    from tracking_data_io import load_tracking_data
+    TRACKING_DATA_IO_AVAILABLE = True
+except ImportError:
+    TRACKING_DATA_IO_AVAILABLE = False
+
 
 class QualityReporter:
     """
@@ -46,7 +52,10 @@ class QualityReporter:
             Dictionary with quality metrics and issues
         """
         try:
-            df = pd.read_csv(csv_path)
+            if TRACKING_DATA_IO_AVAILABLE:
+                df = load_tracking_data(csv_path, columns=['frame_num', 'track_id', 'player_name', 'x', 'y', 'speed', 'confidence'])
+            else:
+                df = pd.read_csv(csv_path, comment='#')
         except Exception as e:
             logger.error(f"Error reading CSV: {e}")
             return {'error': str(e)}
@@ -23,6 +23,12 @@ except ImportError:
 
 logger = get_logger("track_validator")
 
+try:
+    from tracking_data_io import load_tracking_data
+    TRACKING_DATA_IO_AVAILABLE = True
+except ImportError:
+    TRACKING_DATA_IO_AVAILABLE = False
+
 
 class TrackValidator:
     """
@@ -51,7 +57,10 @@ class TrackValidator:
             Dictionary with validation results
         """
         try:
-            df = pd.read_csv(csv_path)
+            if TRACKING_DATA_IO_AVAILABLE:
+                df = load_tracking_data(csv_path, columns=['frame_num', 'track_id'])
+            else:
+                df = pd.read_csv(csv_path, comment='#')
         except Exception as e:
             logger.error(f"Error reading CSV: {e}")
             return {'error': str(e)}
@@ -138,7 +147,10 @@ class TrackValidator:
             Dictionary with missing track information
         """
         try:
-            df = pd.read_csv(csv_path)
+            if TRACKING_DATA_IO_AVAILABLE:
+                df = load_tracking_data(csv_path, columns=['player_name'])
+            else:
+                df = pd.read_csv(csv_path, comment='#')
         except Exception as e:
             return {'error': str(e)}
         
@@ -5391,6 +5391,15 @@ class SoccerAnalysisGUI:
         ttk.Spinbox(self.custom_fps_frame, from_=1.0, to=120.0, increment=1.0, textvariable=self.custom_fps_var, width=10).pack(side=tk.LEFT, padx=5)
         fps_combo.bind("<<ComboboxSelected>>", lambda e: self._update_fps_ui())
         
+        # Cutting method (FFmpeg stream copy when possible, OpenCV re-encode otherwise)
+        cut_frame = ttk.Frame(output_frame)
+        cut_frame.pack(fill=tk.X, pady=5)
+        ttk.Label(cut_frame, text="Cutting:").pack(side=tk.LEFT, padx=5)
+        self.cut_mode_var = tk.StringVar(value="Fast (keyframe copy)")
+        ttk.Combobox(cut_frame, textvariable=self.cut_mode_var,
+                     values=["Fast (keyframe copy)", "Frame-accurate", "Re-encode (OpenCV)"],
+                     state="readonly", width=20).pack(side=tk.LEFT, padx=5)
+        
         # Output directory
         dir_frame = ttk.Frame(output_frame)
         dir_frame.pack(fill=tk.X, pady=5)
@@ -5683,6 +5692,14 @@ class SoccerAnalysisGUI:
                     }
                     fps = fps_map.get(self.fps_var.get())
             
+            # Set cutting method
+            cut_mode_map = {
+                "Fast (keyframe copy)": "auto",
+                "Frame-accurate": "accurate",
+                "Re-encode (OpenCV)": "reencode"
+            }
+            splicer.set_cut_mode(cut_mode_map.get(self.cut_mode_var.get(), "auto"))
+            
             # Set progress callback
             splicer.set_progress_callback(self._splicer_progress_callback)
             
@@ -10,6 +10,8 @@ import numpy as np
 from collections import defaultdict, deque
 from typing import Dict, Tuple
 
+import box_ops
+
 try:
     import supervision as sv
     SUPERVISION_AVAILABLE = True
@@ -276,6 +278,21 @@ class TrackPostProcessor:
         tracks_to_remove = set()
         track_ids_list = list(track_groups.keys())
         
+        # PERFORMANCE: Pairwise IoU, normalized center distance and size ratio in one step
+        # (each track is represented by its first box)
+        first_boxes = box_ops.as_boxes([detections.xyxy[track_groups[tid][0]] for tid in track_ids_list])
+        iou_table = box_ops.iou_matrix(first_boxes, first_boxes)
+        # Normalize center distance by box1's diagonal (row box)
+        normalized_distances = (box_ops.center_distance_matrix(first_boxes, first_boxes)
+                                / np.maximum(box_ops.box_diagonals(first_boxes), 1.0)[:, None])
+        areas = box_ops.box_area(first_boxes)
+        max_areas = np.maximum(areas[:, None], areas[None, :])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            size_ratios = np.where(max_areas > 0, np.minimum(areas[:, None], areas[None, :]) / max_areas, 0.0)
+        # If IoU is very high OR centers are very close (< 30% of box size) with similar box size (> 70% ratio),
+        # they're likely the same player - catches boxes that don't overlap but are clearly the same player
+        duplicates = (iou_table > self.nms_iou_threshold) | ((normalized_distances < 0.3) & (size_ratios > 0.7))
+        
         for i, tid1 in enumerate(track_ids_list):
             if tid1 in tracks_to_remove:
                 continue
@@ -284,12 +301,11 @@ class TrackPostProcessor:
             if len(indices1) == 0:
                 continue
             
-            box1 = detections.xyxy[indices1[0]]
             conf1 = detections.confidence[indices1[0]]
             age1 = len(self.track_history.get(tid1, []))
-            center1 = ((box1[0] + box1[2]) / 2, (box1[1] + box1[3]) / 2)
             
-            for tid2 in track_ids_list[i+1:]:
+            for j in range(i + 1, len(track_ids_list)):
+                tid2 = track_ids_list[j]
                 if tid2 in tracks_to_remove:
                     continue
                 
@@ -297,34 +313,9 @@ class TrackPostProcessor:
                 if len(indices2) == 0:
                     continue
                 
-                box2 = detections.xyxy[indices2[0]]
-                conf2 = detections.confidence[indices2[0]]
-                age2 = len(self.track_history.get(tid2, []))
-                center2 = ((box2[0] + box2[2]) / 2, (box2[1] + box2[3]) / 2)
-                
-                # Calculate IoU
-                iou = self._calculate_iou(box1, box2)
-                
-                # Calculate center distance (for detecting same player with different boxes)
-                center_distance = np.sqrt((center1[0] - center2[0])**2 + (center1[1] - center2[1])**2)
-                box1_size = np.sqrt((box1[2] - box1[0])**2 + (box1[3] - box1[1])**2)
-                normalized_distance = center_distance / max(box1_size, 1.0)  # Normalize by box size
-                
-                # If IoU is very high OR centers are very close, they're likely the same player
-                # Also check if boxes are similar size (same player should have similar box size)
-                box1_area = (box1[2] - box1[0]) * (box1[3] - box1[1])
-                box2_area = (box2[2] - box2[0]) * (box2[3] - box2[1])
-                size_ratio = min(box1_area, box2_area) / max(box1_area, box2_area) if max(box1_area, box2_area) > 0 else 0
-                
-                is_duplicate = False
-                if iou > self.nms_iou_threshold:
-                    is_duplicate = True
-                elif normalized_distance < 0.3 and size_ratio > 0.7:
-                    # Centers are very close (< 30% of box size) and boxes are similar size (> 70% ratio)
-                    # This catches cases where boxes don't overlap but are clearly the same player
-                    is_duplicate = True
-                
-                if is_duplicate:
+                if duplicates[i, j]:
+                    conf2 = detections.confidence[indices2[0]]
+                    age2 = len(self.track_history.get(tid2, []))
                     # Keep the track with longer history (older ID) or higher confidence if same age
                     # Prefer keeping the older track ID to maintain consistency
                     if age1 < age2 or (age1 == age2 and conf1 < conf2):
@@ -349,29 +340,7 @@ class TrackPostProcessor:
     
     def _calculate_iou(self, box1, box2):
         """Calculate IoU between two boxes"""
-        x1_min, y1_min, x1_max, y1_max = box1
-        x2_min, y2_min, x2_max, y2_max = box2
-        
-        # Calculate intersection
-        inter_x_min = max(x1_min, x2_min)
-        inter_y_min = max(y1_min, y2_min)
-        inter_x_max = min(x1_max, x2_max)
-        inter_y_max = min(y1_max, y2_max)
-        
-        if inter_x_max < inter_x_min or inter_y_max < inter_y_min:
-            return 0.0
-        
-        inter_area = (inter_x_max - inter_x_min) * (inter_y_max - inter_y_min)
-        
-        # Calculate union
-        box1_area = (x1_max - x1_min) * (y1_max - y1_min)
-        box2_area = (x2_max - x2_min) * (y2_max - y2_min)
-        union_area = box1_area + box2_area - inter_area
-        
-        if union_area == 0:
-            return 0.0
-        
-        return inter_area / union_area
+        return box_ops.iou(box1, box2)
     
     def cleanup_inactive_tracks(self, active_track_ids):
         """Clean up history for tracks that are no longer active"""
@@ -0,0 +1,336 @@
+"""
+Tracking Data I/O
+Typed columnar sidecar (Parquet/Feather) for tracking CSVs and a shared loader
+
+The tracking CSV stays the interchange format (Excel, external tools), but every
+post-analysis tool re-parsing 40+ text columns is slow. When a tracking CSV is closed,
+the exporters also write `<name>.parquet` next to it:
+- Columns are typed (numbers stay numbers, empty cells are nulls)
+- Rows are sorted by frame (rows without a frame number are dropped), so frame-range
+  reads only touch the row groups they need
+- FPS / resolution that the legacy writer keeps in `#` comment lines are stored as file metadata
+- Size and mtime of the source CSV are recorded, so a CSV that was edited or rewritten
+  afterwards is detected and the loader falls back to parsing the CSV
+
+Usage:
+    df = load_tracking_data(csv_path, columns=['frame', 'player_id', 'player_x', 'player_y'])
+    meta = df.attrs['tracking_metadata']   # {'fps': 29.97, 'width': 1920, 'height': 1080, ...}
+"""
+
+import json
+import os
+import re
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+    import pyarrow.feather as feather
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+SIDECAR_FORMATS = ('parquet', 'feather')
+FRAME_COLUMNS = ('frame', 'frame_num')
+METADATA_KEY = b'soccer_analysis.tracking'
+SIDECAR_VERSION = 1
+
+# Rows per Parquet row group: small enough that frame-range reads skip most of a
+# 90 minute match, large enough to keep per-group overhead negligible
+_ROW_GROUP_SIZE = 65536
+# Comment metadata is only written at the top of the file
+_COMMENT_SCAN_LINES = 64
+
+
+def sidecar_path(csv_path: str, fmt: str = 'parquet') -> str:
+    """Path of the columnar sidecar for a tracking CSV (`x_tracking_data.csv` -> `x_tracking_data.parquet`)"""
+    if fmt not in SIDECAR_FORMATS:
+        raise ValueError(f"Unknown sidecar format: {fmt} (expected one of {SIDECAR_FORMATS})")
+    base, ext = os.path.splitext(csv_path)
+    if ext.lower() != '.csv':
+        base = csv_path
+    return f"{base}.{fmt}"
+
+
+def _source_signature(csv_path: str) -> Optional[Dict[str, int]]:
+    try:
+        st = os.stat(csv_path)
+    except OSError:
+        return None
+    return {'source_size': int(st.st_size), 'source_mtime_ns': int(st.st_mtime_ns)}
+
+
+def _snake_case(key: str) -> str:
+    return re.sub(r'[^0-9a-z]+', '_', key.strip().lower()).strip('_')
+
+
+def parse_csv_comment_metadata(csv_path: str, max_lines: int = _COMMENT_SCAN_LINES) -> Dict[str, Any]:
+    """
+    Parse `# Key: value` comment lines at the top of a tracking CSV.
+
+    Every comment becomes a snake_case string entry; the well-known ones are also
+    returned typed: width/height (video resolution), fps, yolo_width/yolo_height and
+    yolo_scale_factor.
+    """
+    metadata: Dict[str, Any] = {}
+    try:
+        with open(csv_path, 'r', encoding='utf-8', errors='replace') as f:
+            for _ in range(max_lines):
+                line = f.readline()
+                if not line:
+                    break
+                if not line.startswith('#') or ':' not in line:
+                    continue
+                key, value = line[1:].split(':', 1)
+                key = _snake_case(key)
+                if key:
+                    metadata[key] = value.strip()
+    except OSError:
+        return metadata
+
+    resolution = re.search(r'(\d+)\s*x\s*(\d+)', metadata.get('video_resolution', ''))
+    if resolution:
+        metadata['width'], metadata['height'] = int(resolution.group(1)), int(resolution.group(2))
+    yolo_resolution = re.search(r'(\d+)\s*x\s*(\d+)', metadata.get('yolo_resolution', ''))
+    if yolo_resolution:
+        metadata['yolo_width'], metadata['yolo_height'] = int(yolo_resolution.group(1)), int(yolo_resolution.group(2))
+    for key, target in (('video_fps', 'fps'), ('yolo_scale_factor', 'yolo_scale_factor')):
+        try:
+            metadata[target] = float(metadata[key].split()[0])
+        except (KeyError, ValueError, IndexError):
+            pass
+    return metadata
+
+
+def frame_column(columns: Iterable[str]) -> Optional[str]:
+    """Name of the frame column ('frame' for the legacy writer, 'frame_num' for CSVExporter)"""
+    columns = list(columns)
+    for name in FRAME_COLUMNS:
+        if name in columns:
+            return name
+    return None
+
+
+def _read_csv(csv_path: str, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    usecols = None
+    if columns is not None:
+        wanted = set(columns)
+        usecols = lambda c: c in wanted
+    return pd.read_csv(csv_path, comment='#', usecols=usecols, low_memory=False)
+
+
+def _to_table(df: pd.DataFrame, metadata: Dict[str, Any]) -> 'pa.Table':
+    df = df.copy()
+    for col in df.columns:
+        if df[col].dtype == object:
+            values = df[col].dropna()
+            if len(values) and values.map(type).eq(bool).all():
+                continue
+            # Mixed cells (e.g. '' and numbers) are kept as text; pure numbers become numeric
+            converted = pd.to_numeric(df[col], errors='coerce')
+            if converted.notna().sum() == df[col].notna().sum():
+                df[col] = converted
+            else:
+                df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    schema_metadata = dict(table.schema.metadata or {})
+    schema_metadata[METADATA_KEY] = json.dumps(metadata, default=str).encode('utf-8')
+    return table.replace_schema_metadata(schema_metadata)
+
+
+def write_sidecar(csv_path: str, metadata: Optional[Dict[str, Any]] = None,
+                  fmt: str = 'parquet', df: Optional[pd.DataFrame] = None) -> Optional[str]:
+    """
+    Write the typed columnar sidecar for a (closed) tracking CSV.
+
+    Args:
+        csv_path: Tracking CSV the sidecar mirrors
+        metadata: Extra file metadata (fps, width, height, ...); merged over the CSV's `#` comments
+        fmt: 'parquet' (default) or 'feather'
+        df: Already-parsed CSV contents (parsed from csv_path if None)
+
+    Returns:
+        Sidecar path, or None if pyarrow is unavailable or the CSV could not be converted
+    """
+    if not PYARROW_AVAILABLE:
+        return None
+    signature = _source_signature(csv_path)
+    if signature is None:
+        return None
+
+    try:
+        if df is None:
+            df = _read_csv(csv_path)
+        frame_col = frame_column(df.columns)
+        if frame_col is not None:
+            df = df[df[frame_col].notna()]
+            if not df[frame_col].is_monotonic_increasing:
+                df = df.sort_values(frame_col, kind='stable')
+            if (df[frame_col] % 1 == 0).all():
+                df = df.astype({frame_col: 'int64'})
+
+        file_metadata = parse_csv_comment_metadata(csv_path)
+        file_metadata.update({k: v for k, v in (metadata or {}).items() if v is not None})
+        file_metadata.update(signature)
+        file_metadata['frame_column'] = frame_col
+        file_metadata['num_rows'] = int(len(df))
+        file_metadata['sidecar_version'] = SIDECAR_VERSION
+
+        table = _to_table(df, file_metadata)
+        out_path = sidecar_path(csv_path, fmt)
+        tmp_path = out_path + '.tmp'
+        if fmt == 'parquet':
+            pq.write_table(table, tmp_path, row_group_size=_ROW_GROUP_SIZE, compression='zstd')
+        else:
+            feather.write_feather(table, tmp_path, compression='zstd')
+        os.replace(tmp_path, out_path)
+        return out_path
+    except Exception as e:
+        print(f"⚠ Could not write columnar sidecar for {os.path.basename(csv_path)}: {e}")
+        try:
+            os.remove(sidecar_path(csv_path, fmt) + '.tmp')
+        except OSError:
+            pass
+        return None
+
+
+def _read_schema(path: str) -> Optional['pa.Schema']:
+    try:
+        if path.endswith('.parquet'):
+            return pq.read_schema(path)
+        return feather.read_table(path, memory_map=True).schema
+    except Exception:
+        return None
+
+
+def _schema_metadata(schema: 'pa.Schema') -> Dict[str, Any]:
+    raw = (schema.metadata or {}).get(METADATA_KEY)
+    if not raw:
+        return {}
+    try:
+        return json.loads(raw.decode('utf-8'))
+    except (ValueError, UnicodeDecodeError):
+        return {}
+
+
+def find_sidecar(csv_path: str) -> Optional[str]:
+    """
+    Sidecar for a tracking CSV, if one exists and still matches the CSV.
+
+    A sidecar is used only if the CSV's size and mtime equal the ones recorded when the
+    sidecar was written (or the CSV no longer exists).
+    """
+    if not PYARROW_AVAILABLE:
+        return None
+    signature = _source_signature(csv_path)
+    for fmt in SIDECAR_FORMATS:
+        path = sidecar_path(csv_path, fmt)
+        if not os.path.exists(path):
+            continue
+        schema = _read_schema(path)
+        if schema is None:
+            continue
+        if signature is None:
+            return path
+        meta = _schema_metadata(schema)
+        if (meta.get('source_size') == signature['source_size'] and
+                meta.get('source_mtime_ns') == signature['source_mtime_ns']):
+            return path
+    return None
+
+
+def load_tracking_metadata(csv_path: str) -> Dict[str, Any]:
+    """File metadata (fps, width, height, ...) from the sidecar, or from the CSV's `#` comments"""
+    path = _columnar_path(csv_path)
+    if path is not None:
+        schema = _read_schema(path)
+        if schema is not None:
+            return _schema_metadata(schema)
+    return parse_csv_comment_metadata(csv_path)
+
+
+def _columnar_path(path: str) -> Optional[str]:
+    ext = os.path.splitext(path)[1].lower().lstrip('.')
+    if ext in SIDECAR_FORMATS:
+        return path if (PYARROW_AVAILABLE and os.path.exists(path)) else None
+    return find_sidecar(path)
+
+
+def load_tracking_data(csv_path: str, columns: Optional[Sequence[str]] = None,
+                       frame_range: Optional[Tuple[Optional[int], Optional[int]]] = None,
+                       prefer_sidecar: bool = True) -> pd.DataFrame:
+    """
+    Load tracking data, preferring the columnar sidecar over parsing the CSV.
+
+    Args:
+        csv_path: Tracking CSV (a .parquet/.feather path is also accepted)
+        columns: Only load these columns (names missing from the file are ignored)
+        frame_range: Optional inclusive (start, end) frame filter; either end may be None
+        prefer_sidecar: Set False to always parse the CSV
+
+    Returns:
+        DataFrame (same columns as pd.read_csv(csv_path, comment='#') would give);
+        df.attrs['tracking_metadata'] holds fps/resolution metadata when known.
+        Read from the sidecar, rows are ordered by frame (stable within a frame) and rows
+        without a frame number are not included; the CSV path keeps the file's row order
+        and all rows. Pass prefer_sidecar=False when the original order or frameless rows matter.
+    """
+    path = _columnar_path(csv_path) if prefer_sidecar else None
+    df = None
+    metadata: Dict[str, Any] = {}
+
+    if path is not None:
+        try:
+            schema = _read_schema(path)
+            metadata = _schema_metadata(schema)
+            names = schema.names
+            requested = set(columns) if columns is not None else None
+            wanted = [c for c in names if requested is None or c in requested]
+            frame_col = metadata.get('frame_column') or frame_column(names)
+            filters = None
+            if frame_range is not None and frame_col in names:
+                start, end = frame_range
+                filters = [(frame_col, '>=', start)] if start is not None else []
+                if end is not None:
+                    filters.append((frame_col, '<=', end))
+                filters = filters or None
+            if path.endswith('.parquet'):
+                table = pq.read_table(path, columns=wanted, filters=filters)
+            else:
+                table = feather.read_table(path, columns=wanted, memory_map=True)
+                if filters:
+                    frames = feather.read_table(path, columns=[frame_col], memory_map=True).column(0)
+                    mask = None
+                    for _, op, value in filters:
+                        cond = pc.greater_equal(frames, value) if op == '>=' else pc.less_equal(frames, value)
+                        mask = cond if mask is None else pc.and_(mask, cond)
+                    table = table.filter(mask)
+            df = table.to_pandas()
+            # Text columns come back with None for empty cells; match the CSV path's NaN
+            for col in df.columns:
+                if df[col].dtype == object:
+                    df[col] = df[col].where(df[col].notna(), np.nan)
+        except Exception as e:
+            print(f"⚠ Could not read columnar sidecar {os.path.basename(path)}, parsing CSV instead: {e}")
+            df = None
+
+    if df is None:
+        df = _read_csv(csv_path, columns)
+        metadata = parse_csv_comment_metadata(csv_path)
+        if frame_range is not None:
+            frame_col = frame_column(df.columns)
+            if frame_col is not None:
+                start, end = frame_range
+                mask = pd.Series(True, index=df.index)
+                if start is not None:
+                    mask &= df[frame_col] >= start
+                if end is not None:
+                    mask &= df[frame_col] <= end
+                df = df[mask].reset_index(drop=True)
+
+    df.attrs['tracking_metadata'] = metadata
+    return df
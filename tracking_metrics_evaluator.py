@@ -15,6 +15,7 @@ from typing import Dict, List, Tuple, Optional
 import os
 from collections import defaultdict
 from hota_evaluator import HOTAEvaluator
+import box_ops
 
 # Import advanced tracking utilities
 try:
@@ -271,14 +272,9 @@ class TrackingMetricsEvaluator:
             gt_dets = gt_by_frame.get(frame, [])
             if len(pred_dets) > 0 and len(gt_dets) > 0:
                 sample_frames_checked += 1
-                for pred_track_id, px1, py1, px2, py2 in pred_dets:
-                    for gt_track_id, gx1, gy1, gx2, gy2 in gt_dets:
-                        iou = self._calculate_iou((px1, py1, px2, py2), (gx1, gy1, gx2, gy2))
-                        if iou > 0.01:  # Any overlap at all
-                            sample_frames_with_overlap += 1
-                            break
-                    if sample_frames_with_overlap > 0:
-                        break
+                ious = box_ops.iou_matrix([d[1:5] for d in pred_dets], [d[1:5] for d in gt_dets])
+                if (ious > 0.01).any():  # Any overlap at all
+                    sample_frames_with_overlap += 1
         
         if sample_frames_checked > 0 and sample_frames_with_overlap == 0:
             print(f"  ⚠ CRITICAL WARNING: After normalization, {sample_frames_checked} sample frames checked, 0 with any bbox overlap!")
@@ -428,15 +424,19 @@ class TrackingMetricsEvaluator:
             matched_pred = set()
             frame_max_iou = 0.0
             
+            # PERFORMANCE: IoU and center distance of every prediction/GT pair in one step
+            pred_boxes = [d[1:5] for d in pred_dets]
+            gt_boxes = [d[1:5] for d in gt_dets]
+            frame_ious = box_ops.iou_matrix(pred_boxes, gt_boxes)
+            frame_center_distances = box_ops.center_distance_matrix(pred_boxes, gt_boxes)
+            
             for i, (pred_track_id, px1, py1, px2, py2) in enumerate(pred_dets):
                 best_iou = 0.0
                 best_gt_idx = -1
                 best_gt_track_id = None
                 best_distance = float('inf')
                 
-                # Calculate prediction bbox center and size for distance-based fallback
-                pred_center_x = (px1 + px2) / 2.0
-                pred_center_y = (py1 + py2) / 2.0
+                # Calculate prediction bbox size for distance-based fallback
                 pred_width = px2 - px1
                 pred_height = py2 - py1
                 pred_diagonal = np.sqrt(pred_width**2 + pred_height**2)  # Diagonal for normalized distance
@@ -445,10 +445,7 @@ class TrackingMetricsEvaluator:
                     if j in matched_gt:
                         continue
                     
-                    iou = self._calculate_iou(
-                        (px1, py1, px2, py2),
-                        (gx1, gy1, gx2, gy2)
-                    )
+                    iou = float(frame_ious[i, j])
                     
                     total_iou_attempts += 1
                     total_iou_sum_for_diagnostics += iou
@@ -468,15 +465,8 @@ class TrackingMetricsEvaluator:
                     # DISTANCE-BASED FALLBACK: If IoU is 0 or very low, check center-to-center distance
                     # This handles cases where bboxes are close but don't overlap (e.g., 2-3 pixel gap)
                     elif iou < 0.05:  # Only use distance fallback when IoU is below threshold
-                        # Calculate GT bbox center
-                        gt_center_x = (gx1 + gx2) / 2.0
-                        gt_center_y = (gy1 + gy2) / 2.0
-                        
-                        # Calculate Euclidean distance between centers
-                        center_distance = np.sqrt(
-                            (pred_center_x - gt_center_x)**2 + 
-                            (pred_center_y - gt_center_y)**2
-                        )
+                        # Euclidean distance between centers
+                        center_distance = frame_center_distances[i, j]
                         
                         # Normalize distance by bbox diagonal (so it's scale-invariant)
                         # If distance is less than 0.5x the diagonal, consider it a match
@@ -720,6 +710,7 @@ class TrackingMetricsEvaluator:
             matches = []
             matched_gt = set()
             matched_pred = set()
+            frame_ious = box_ops.iou_matrix([d[1:5] for d in pred_dets], [d[1:5] for d in gt_dets])
             
             for i, (pred_track_id, px1, py1, px2, py2) in enumerate(pred_dets):
                 best_iou = 0.0
@@ -730,10 +721,7 @@ class TrackingMetricsEvaluator:
                     if j in matched_gt:
                         continue
                     
-                    iou = self._calculate_iou(
-                        (px1, py1, px2, py2),
-                        (gx1, gy1, gx2, gy2)
-                    )
+                    iou = float(frame_ious[i, j])
                     
                     # More lenient IoU threshold for matching (0.05 instead of 0.3)
                     # Lowered to match MOTA threshold for consistency
@@ -941,26 +929,7 @@ class TrackingMetricsEvaluator:
             return advanced_calculate_iou(box1, box2)
         else:
             # Fallback to standard IOU
-            x1_1, y1_1, x2_1, y2_1 = box1
-            x1_2, y1_2, x2_2, y2_2 = box2
-            
-            # Calculate intersection
-            x1_i = max(x1_1, x1_2)
-            y1_i = max(y1_1, y1_2)
-            x2_i = min(x2_1, x2_2)
-            y2_i = min(y2_1, y2_2)
-            
-            if x2_i <= x1_i or y2_i <= y1_i:
-                return 0.0
-            
-            intersection = (x2_i - x1_i) * (y2_i - y1_i)
-            
-            # Calculate union
-            area1 = (x2_1 - x1_1) * (y2_1 - y1_1)
-            area2 = (x2_2 - x1_2) * (y2_2 - y1_2)
-            union = area1 + area2 - intersection
-            
-            return intersection / union if union > 0 else 0.0
+            return box_ops.iou(box1, box2)
     
     def _load_tracks_from_csv(self, csv_path: str) -> Dict[int, List[Tuple[int, float, float, float, float]]]:
         """Load tracks from CSV file."""
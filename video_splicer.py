@@ -7,9 +7,24 @@ Supports time-based, size-based, and manual splitting with resolution/fps contro
 import cv2
 import os
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import List, Tuple, Optional, Callable
 import shutil
 
+# Keyframe-aware FFmpeg cutting (stream copy, no re-encode); OpenCV path is the fallback
+try:
+    import ffmpeg_tools
+    FFMPEG_TOOLS_AVAILABLE = True
+except ImportError:
+    FFMPEG_TOOLS_AVAILABLE = False
+
+# Cut modes:
+# - 'auto': 'keyframe' when FFmpeg is available and no resolution/fps change is requested, else 'reencode'
+# - 'keyframe': split points snapped to the keyframe at or before them, pure stream copy (audio kept)
+# - 'accurate': exact split points, only the partial GOP at each boundary is re-encoded
+# - 'reencode': decode and re-encode every frame with OpenCV (supports resolution/fps changes)
+CUT_MODES = ('auto', 'keyframe', 'accurate', 'reencode')
+
 
 class VideoSplicer:
     """Handles video splitting operations"""
@@ -19,6 +34,8 @@ class VideoSplicer:
         self.cap: Optional[cv2.VideoCapture] = None
         self.video_info: Optional[dict] = None
         self.progress_callback: Optional[Callable] = None
+        self.cut_mode: str = 'auto'
+        self.max_workers: Optional[int] = None  # Parallel FFmpeg chunks (None = min(4, cpu count))
         
     def load_video(self, video_path: str) -> bool:
         """
@@ -90,6 +107,19 @@ class VideoSplicer:
         """Set callback function for progress updates"""
         self.progress_callback = callback
     
+    def set_cut_mode(self, mode: str, max_workers: Optional[int] = None):
+        """
+        Choose how chunks are cut (see CUT_MODES)
+        
+        Args:
+            mode: 'auto', 'keyframe', 'accurate' or 'reencode'
+            max_workers: Number of chunks cut in parallel by FFmpeg (None = min(4, cpu count))
+        """
+        if mode not in CUT_MODES:
+            raise ValueError(f"Unknown cut mode: {mode} (expected one of {CUT_MODES})")
+        self.cut_mode = mode
+        self.max_workers = max_workers
+    
     def _update_progress(self, message: str, percent: float = None):
         """Call progress callback if set"""
         if self.progress_callback:
@@ -119,56 +149,16 @@ class VideoSplicer:
         
         os.makedirs(output_dir, exist_ok=True)
         
-        # Get output settings
-        out_width = resolution[0] if resolution else self.video_info['width']
-        out_height = resolution[1] if resolution else self.video_info['height']
-        out_fps = fps if fps else self.video_info['fps']
-        
         # Calculate number of chunks
         total_duration = self.video_info['duration_seconds']
         num_chunks = int(np.ceil(total_duration / chunk_duration_seconds))
         
-        output_files = []
-        base_name = os.path.splitext(os.path.basename(self.video_path))[0]
-        ext = os.path.splitext(self.video_path)[1]
+        ranges = [(chunk_idx * chunk_duration_seconds,
+                   min((chunk_idx + 1) * chunk_duration_seconds, total_duration))
+                  for chunk_idx in range(num_chunks)]
         
         self._update_progress(f"Splitting into {num_chunks} chunks...", 0.0)
-        
-        for chunk_idx in range(num_chunks):
-            start_time = chunk_idx * chunk_duration_seconds
-            end_time = min((chunk_idx + 1) * chunk_duration_seconds, total_duration)
-            
-            output_filename = f"{output_prefix}{chunk_idx + 1:03d}{ext}"
-            output_path = os.path.join(output_dir, output_filename)
-            
-            # Calculate overall progress (chunk-level)
-            chunk_base_progress = (chunk_idx / num_chunks) * 100.0
-            chunk_progress_range = 100.0 / num_chunks  # Progress range for this chunk
-            
-            self._update_progress(
-                f"Processing chunk {chunk_idx + 1}/{num_chunks} ({start_time:.1f}s - {end_time:.1f}s)...",
-                chunk_base_progress
-            )
-            
-            # Store progress context for _process_chunk
-            self._current_chunk_base = chunk_base_progress
-            self._current_chunk_range = chunk_progress_range
-            
-            success = self._process_chunk(start_time, end_time, output_path, 
-                                         out_width, out_height, out_fps)
-            
-            if success:
-                output_files.append(output_path)
-                # Update to show chunk is complete
-                self._update_progress(
-                    f"✓ Completed chunk {chunk_idx + 1}/{num_chunks}",
-                    chunk_base_progress + chunk_progress_range
-                )
-            else:
-                self._update_progress(f"⚠ Failed to create chunk {chunk_idx + 1}", None)
-        
-        self._update_progress(f"✓ Created {len(output_files)} chunks", 100.0)
-        return output_files
+        return self._split_ranges(ranges, output_dir, resolution, fps, output_prefix)
     
     def split_by_size(self,
                      chunk_size_mb: float,
@@ -251,26 +241,67 @@ class VideoSplicer:
         # Add start and end
         all_points = [0.0] + split_points + [total_duration]
         
+        ranges = list(zip(all_points[:-1], all_points[1:]))
+        
+        self._update_progress(f"Splitting into {len(ranges)} chunks at {len(split_points)} points...", 0.0)
+        return self._split_ranges(ranges, output_dir, resolution, fps, output_prefix)
+    
+    def _resolve_cut_mode(self, resolution: Optional[Tuple[int, int]], fps: Optional[float]) -> str:
+        """Cut mode actually used for this split ('keyframe', 'accurate' or 'reencode')"""
+        mode = self.cut_mode
+        if mode == 'reencode':
+            return mode
+        
+        # Stream copy keeps the source resolution and frame rate
+        changes_format = (
+            (resolution is not None and tuple(resolution) != (self.video_info['width'], self.video_info['height'])) or
+            (fps is not None and abs(fps - self.video_info['fps']) > 0.01)
+        )
+        if changes_format:
+            if mode != 'auto':
+                self._update_progress("⚠ Resolution/FPS change requires re-encoding - using OpenCV", None)
+            return 'reencode'
+        
+        if not FFMPEG_TOOLS_AVAILABLE or not ffmpeg_tools.ffmpeg_available():
+            if mode != 'auto':
+                self._update_progress("⚠ FFmpeg not found - falling back to OpenCV re-encoding", None)
+            return 'reencode'
+        
+        return 'keyframe' if mode == 'auto' else mode
+    
+    def _split_ranges(self,
+                      ranges: List[Tuple[float, float]],
+                      output_dir: str,
+                      resolution: Optional[Tuple[int, int]],
+                      fps: Optional[float],
+                      output_prefix: str) -> List[str]:
+        """
+        Write one output file per (start_time, end_time) range
+        
+        Returns:
+            List of output file paths (in range order)
+        """
+        ext = os.path.splitext(self.video_path)[1]
+        output_paths = [os.path.join(output_dir, f"{output_prefix}{chunk_idx + 1:03d}{ext}")
+                        for chunk_idx in range(len(ranges))]
+        
+        mode = self._resolve_cut_mode(resolution, fps)
+        if mode != 'reencode':
+            output_files = self._split_ranges_ffmpeg(ranges, output_paths, mode)
+            if output_files is not None:
+                self._update_progress(f"✓ Created {len(output_files)} chunks", 100.0)
+                return output_files
+            self._update_progress("⚠ FFmpeg could not index keyframes - falling back to OpenCV", None)
+        
         # Get output settings
         out_width = resolution[0] if resolution else self.video_info['width']
         out_height = resolution[1] if resolution else self.video_info['height']
         out_fps = fps if fps else self.video_info['fps']
         
-        base_name = os.path.splitext(os.path.basename(self.video_path))[0]
-        ext = os.path.splitext(self.video_path)[1]
-        
         output_files = []
-        num_chunks = len(all_points) - 1
-        
-        self._update_progress(f"Splitting into {num_chunks} chunks at {len(split_points)} points...", 0.0)
+        num_chunks = len(ranges)
         
-        for chunk_idx in range(num_chunks):
-            start_time = all_points[chunk_idx]
-            end_time = all_points[chunk_idx + 1]
-            
-            output_filename = f"{output_prefix}{chunk_idx + 1:03d}{ext}"
-            output_path = os.path.join(output_dir, output_filename)
-            
+        for chunk_idx, ((start_time, end_time), output_path) in enumerate(zip(ranges, output_paths)):
             # Calculate overall progress (chunk-level)
             chunk_base_progress = (chunk_idx / num_chunks) * 100.0
             chunk_progress_range = 100.0 / num_chunks  # Progress range for this chunk
@@ -300,6 +331,71 @@ class VideoSplicer:
         self._update_progress(f"✓ Created {len(output_files)} chunks", 100.0)
         return output_files
     
+    def _split_ranges_ffmpeg(self,
+                             ranges: List[Tuple[float, float]],
+                             output_paths: List[str],
+                             mode: str) -> Optional[List[str]]:
+        """
+        Cut all ranges with FFmpeg, several chunks in parallel
+        
+        'keyframe' snaps every split point to the keyframe at or before it, so chunks
+        still tile the video without gaps or overlap; 'accurate' keeps the exact points.
+        
+        Returns:
+            List of output file paths, or None if keyframes could not be read
+        """
+        keyframes = ffmpeg_tools.probe_keyframes(self.video_path)
+        if not keyframes:
+            return None
+        stream_info = ffmpeg_tools.probe_video_stream(self.video_path)
+        total_duration = self.video_info['duration_seconds']
+        
+        jobs = []
+        for (start_time, end_time), output_path in zip(ranges, output_paths):
+            if mode == 'keyframe':
+                start_time = ffmpeg_tools.keyframe_at_or_before(keyframes, start_time)
+                # The last chunk runs to the end of the file
+                end_time = (None if end_time >= total_duration
+                            else ffmpeg_tools.keyframe_at_or_before(keyframes, end_time))
+                if end_time is not None and end_time <= start_time:
+                    self._update_progress(
+                        f"⚠ Skipping {os.path.basename(output_path)} (no keyframe inside {start_time:.1f}s - {end_time:.1f}s)",
+                        None)
+                    continue
+            jobs.append((start_time, end_time, output_path))
+        
+        def cut(job):
+            start_time, end_time, output_path = job
+            if mode == 'keyframe':
+                return ffmpeg_tools.stream_copy_segment(self.video_path, output_path, start_time, end_time)
+            return ffmpeg_tools.smart_cut_segment(self.video_path, output_path, start_time, end_time,
+                                                  keyframes, stream_info)
+        
+        label = "stream copy" if mode == 'keyframe' else "frame-accurate smart cut"
+        max_workers = self.max_workers or min(4, os.cpu_count() or 1)
+        self._update_progress(f"Cutting {len(jobs)} chunks ({label}, {max_workers} parallel)...", 0.0)
+        
+        # Progress is reported from this thread only (callbacks may touch the GUI)
+        succeeded = set()
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(cut, job): job for job in jobs}
+            for done_count, future in enumerate(as_completed(futures), start=1):
+                start_time, end_time, output_path = futures[future]
+                try:
+                    ok = future.result()
+                except Exception as e:
+                    print(f"Error processing chunk: {e}")
+                    ok = False
+                end_label = f"{end_time:.1f}s" if end_time is not None else "end"
+                if ok:
+                    succeeded.add(output_path)
+                    self._update_progress(f"✓ Completed {os.path.basename(output_path)} ({start_time:.1f}s - {end_label})",
+                                          done_count / max(len(jobs), 1) * 100.0)
+                else:
+                    self._update_progress(f"⚠ Failed to create {os.path.basename(output_path)}", None)
+        
+        return [path for _, _, path in jobs if path in succeeded]
+    
     def _process_chunk(self,
                       start_time: float,
                       end_time: float,
@@ -322,15 +418,13 @@ class VideoSplicer:
             True if successful, False otherwise
         """
         try:
-            # Reset to start
-            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-            
             # Calculate frame numbers
             start_frame = int(start_time * self.video_info['fps'])
             end_frame = int(end_time * self.video_info['fps'])
             
-            # Set starting position
-            self.cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+            # Set starting position (consecutive chunks continue where the last one stopped)
+            if int(self.cap.get(cv2.CAP_PROP_POS_FRAMES)) != start_frame:
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
             
             # Determine codec
             codec = self._detect_codec()